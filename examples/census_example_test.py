@@ -116,6 +116,19 @@ input {
         self.assertEqual(results[0].classes[1].label, '1')
         self.assertGreater(results[0].classes[1].score, 0.99)
 
+  def testCensusExampleWithDecodeProcesses(self):
+    raw_data_dir = os.path.join(os.path.dirname(__file__), 'testdata/census')
+    working_dir = self.get_temp_dir()
+
+    train_data_file = os.path.join(raw_data_dir, 'adult.data')
+    test_data_file = os.path.join(raw_data_dir, 'adult.test')
+
+    census_example.transform_data(
+        train_data_file, test_data_file, working_dir, num_decode_processes=2)
+    results = census_example.train_and_evaluate(
+        working_dir, num_train_instances=1000, num_test_instances=1000)
+    self.assertGreaterEqual(results['accuracy'], 0.7)
+
 
 if __name__ == '__main__':
   tf.test.main()
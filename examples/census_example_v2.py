@@ -19,6 +19,7 @@ from __future__ import division
 from __future__ import print_function
 
 import argparse
+import functools
 import math
 import os
 import pprint
@@ -95,7 +96,10 @@ EXPORTED_MODEL_DIR = 'exported_model_dir'
 # Functions for preprocessing
 
 
-def transform_data(train_data_file, test_data_file, working_dir):
+def transform_data(train_data_file,
+                   test_data_file,
+                   working_dir,
+                   num_decode_processes=None):
   """Transform the data and write out as a TFRecord of Example protos.
 
   Read in the data using the CSV reader, and transform it using a
@@ -107,6 +111,9 @@ def transform_data(train_data_file, test_data_file, working_dir):
     train_data_file: File containing training data
     test_data_file: File containing test data
     working_dir: Directory to write transformed data and metadata to
+    num_decode_processes: (Optional) If set, the CSV lines are decoded with a
+      `tft.coders.CsvCoder` in a pool of this many processes instead of with a
+      CSV TFXIO, so that decoding is not limited to a single core.
   """
 
   def preprocessing_fn(inputs):
@@ -168,29 +175,44 @@ def transform_data(train_data_file, test_data_file, working_dir):
       # to both read the CSV files and parse them to TFT inputs:
       # csv_tfxio = tfxio.CsvTFXIO(...)
       # raw_data = (pipeline | 'ToRecordBatches' >> csv_tfxio.BeamSource())
-      csv_tfxio = tfxio.BeamRecordCsvTFXIO(
-          physical_format='text',
-          column_names=ORDERED_CSV_COLUMNS,
-          schema=SCHEMA)
+      # If num_decode_processes is set, the records are instead decoded with a
+      # CsvCoder in a pool of local processes.
+      if num_decode_processes:
+        csv_coder = tft.coders.CsvCoder(ORDERED_CSV_COLUMNS, SCHEMA)
+        make_decoder = functools.partial(
+            tft_beam.DecodeInProcessPool,
+            csv_coder,
+            num_processes=num_decode_processes)
+        tensor_adapter_config = csv_coder.tensor_adapter_config()
+      else:
+        csv_tfxio = tfxio.BeamRecordCsvTFXIO(
+            physical_format='text',
+            column_names=ORDERED_CSV_COLUMNS,
+            schema=SCHEMA)
+        make_decoder = csv_tfxio.BeamSource
+        tensor_adapter_config = csv_tfxio.TensorAdapterConfig()
 
       # Read in raw data and convert using CSV TFXIO.  Note that we apply
       # some Beam transformations here, which will not be encoded in the TF
       # graph since we don't do the from within tf.Transform's methods
       # (AnalyzeDataset, TransformDataset etc.).  These transformations are just
       # to get data into a format that the CSV TFXIO can read, in particular
-      # removing spaces after commas.
+      # removing spaces after commas and the empty lines at the end of the
+      # census files, which the CsvCoder can't decode.
       raw_data = (
           pipeline
           | 'ReadTrainData' >> beam.io.ReadFromText(
               train_data_file, coder=beam.coders.BytesCoder())
           | 'FixCommasTrainData' >> beam.Map(
               lambda line: line.replace(b', ', b','))
-          | 'DecodeTrainData' >> csv_tfxio.BeamSource())
+          | 'RemoveEmptyLinesTrainData' >> beam.Filter(
+              lambda line: line.strip())
+          | 'DecodeTrainData' >> make_decoder())
 
       # Combine data and schema into a dataset tuple.  Note that we already used
       # the schema to read the CSV data, but we also need it to interpret
       # raw_data.
-      raw_dataset = (raw_data, csv_tfxio.TensorAdapterConfig())
+      raw_dataset = (raw_data, tensor_adapter_config)
       transformed_dataset, transform_fn = (
           raw_dataset | tft_beam.AnalyzeAndTransformDataset(preprocessing_fn))
       transformed_data, transformed_metadata = transformed_dataset
@@ -214,9 +236,10 @@ def transform_data(train_data_file, test_data_file, working_dir):
           | 'FixCommasTestData' >> beam.Map(
               lambda line: line.replace(b', ', b','))
           | 'RemoveTrailingPeriodsTestData' >> beam.Map(lambda line: line[:-1])
-          | 'DecodeTestData' >> csv_tfxio.BeamSource())
+          | 'RemoveEmptyLinesTestData' >> beam.Filter(lambda line: line.strip())
+          | 'DecodeTestData' >> make_decoder())
 
-      raw_test_dataset = (raw_test_data, csv_tfxio.TensorAdapterConfig())
+      raw_test_dataset = (raw_test_data, tensor_adapter_config)
 
       transformed_test_dataset = (
           (raw_test_dataset, transform_fn) | tft_beam.TransformDataset())
@@ -444,14 +467,16 @@ def main(input_data_dir,
          working_dir,
          read_raw_data_for_training=True,
          num_train_instances=NUM_TRAIN_INSTANCES,
-         num_test_instances=NUM_TEST_INSTANCES):
+         num_test_instances=NUM_TEST_INSTANCES,
+         num_decode_processes=None):
   if not working_dir:
     working_dir = tempfile.mkdtemp(dir=input_data_dir)
 
   train_data_file = os.path.join(input_data_dir, 'adult.data')
   test_data_file = os.path.join(input_data_dir, 'adult.test')
 
-  transform_data(train_data_file, test_data_file, working_dir)
+  transform_data(train_data_file, test_data_file, working_dir,
+                 num_decode_processes)
 
   if read_raw_data_for_training:
     raw_train_and_eval_patterns = (train_data_file, test_data_file)
@@ -483,5 +508,10 @@ if __name__ == '__main__':
   parser.add_argument(
       '--working_dir',
       help='optional, path to directory to hold transformed data')
+  parser.add_argument(
+      '--num_decode_processes',
+      type=int,
+      help='optional, number of local processes that decode the CSV data')
   args = parser.parse_args()
-  main(args.input_data_dir, args.working_dir)
+  main(args.input_data_dir, args.working_dir,
+       num_decode_processes=args.num_decode_processes)
@@ -216,6 +216,15 @@ class CensusExampleV2Test(tft_test_case.TransformTestCase):
         num_train_instances=10,
         num_test_instances=10)
 
+  def test_main_runs_with_decode_processes(self):
+    census_example_v2.main(
+        self._get_data_dir(),
+        self._get_working_dir(),
+        read_raw_data_for_training=False,
+        num_train_instances=10,
+        num_test_instances=10,
+        num_decode_processes=2)
+
 
 if __name__ == '__main__':
   tf.test.main()
@@ -31,6 +31,7 @@ import json
 import os
 import struct
 import uuid
+import zlib
 
 # GOOGLE-INITIALIZATION
 
@@ -270,6 +271,27 @@ class Combiner(object):
     """
     raise NotImplementedError
 
+  def add_instances(self, accumulator, instances_values):
+    """Return result of folding a group of instances into accumulator.
+
+    Per-key analyzers group the instances of a batch by key and call this once
+    per key, so that a batch yields one accumulator per distinct key instead of
+    one element per instance.  The default implementation calls `add_input`
+    once per instance; combiners that can reduce the whole group in one call
+    should override it.
+
+    Args:
+      accumulator: the current accumulator
+      instances_values: A list of ndarrays representing the values of the
+          inputs for a group of instances, sliced along the first dimension of
+          the batch.
+
+    Returns: An accumulator that includes the given instances.
+    """
+    for instance_values in zip(*instances_values):
+      accumulator = self.add_input(accumulator, list(instance_values))
+    return accumulator
+
   def merge_accumulators(self, accumulators):
     """Merges several accumulators to a single accumulator value.
 
@@ -280,6 +302,27 @@ class Combiner(object):
     """
     raise NotImplementedError
 
+  @property
+  def is_retractable(self):
+    """Whether this combiner implements `retract_accumulators`."""
+    return False
+
+  def retract_accumulators(self, accumulator, accumulators):
+    """Removes the contribution of several accumulators from an accumulator.
+
+    This is the inverse of `merge_accumulators`: retracting `b` from the result
+    of merging `a` and `b` results in an accumulator equivalent to `a`.  It
+    allows maintaining an aggregate over a sliding window of datasets without
+    re-merging the accumulators of all of them.
+
+    Args:
+      accumulator: An accumulator that `accumulators` were merged into.
+      accumulators: The accumulators to retract.
+
+    Returns: An accumulator that excludes the retracted accumulators.
+    """
+    raise NotImplementedError
+
   def extract_output(self, accumulator):
     """Return result of converting accumulator into the output value.
 
@@ -302,7 +345,7 @@ class Combiner(object):
 
   @property
   def accumulator_coder(self):
-    return JsonNumpyCacheCoder()
+    return NumpyCacheCoder()
 
 
 class CacheCoder(with_metaclass(abc.ABCMeta, object)):
@@ -311,6 +354,16 @@ class CacheCoder(with_metaclass(abc.ABCMeta, object)):
   def __repr__(self):
     return '<{}>'.format(self.__class__.__name__)
 
+  @property
+  def block_size(self):
+    """The number of cache items encoded per record.
+
+    If not None, `encode_cache` accepts a list of up to `block_size` items, and
+    `decode_cache` returns a list of items.  Otherwise each item is encoded
+    into its own record.
+    """
+    return None
+
   @abc.abstractmethod
   def encode_cache(self, cache):
     pass
@@ -342,6 +395,130 @@ class JsonNumpyCacheCoder(CacheCoder):
     return np.array(json.loads(tf.compat.as_text(encoded_accumulator)))
 
 
+# Encoded entries start with a magic string that can't start a JSON document,
+# so that `NumpyCacheCoder` can tell them apart from `JsonNumpyCacheCoder`
+# entries.
+_NUMPY_CACHE_MAGIC = b'\x93TFTNPY'
+# Compressed entries start with this magic string followed by the zlib
+# compressed entry.
+_NUMPY_CACHE_COMPRESSED_MAGIC = b'\x93TFTNPZ'
+_NUMPY_CACHE_FORMAT_VERSION = 1
+# Format version, whether the accumulator is a sequence and number of arrays.
+_NUMPY_CACHE_HEADER_FORMAT = '<BBI'
+# Length of the dtype descriptor and number of dimensions of an array.
+_NUMPY_CACHE_ARRAY_HEADER_FORMAT = '<BB'
+# Array buffers are aligned so that decoded arrays are aligned as well.
+_NUMPY_CACHE_ALIGNMENT = 8
+
+
+class NumpyCacheCoder(CacheCoder):
+  """An accumulator cache coder for numeric arrays and lists of arrays.
+
+  Each array is written as a header with its dtype and shape followed by its
+  raw buffer, so dtypes and shapes are preserved.  Decoded arrays are read-only
+  views of the encoded bytes, or of the decompressed bytes if the entry was
+  compressed.
+
+  Accumulators that contain non-numeric values are encoded with
+  `JsonNumpyCacheCoder`, and entries encoded with `JsonNumpyCacheCoder` can be
+  decoded as well.  Subclasses can override `_encode_fallback` and
+  `_decode_fallback` to use a different encoding for those.
+  """
+
+  def __init__(self, compression_level=None):
+    """Init method.
+
+    Args:
+      compression_level: (Optional) A zlib compression level from 0 to 9.  If
+        given, encoded entries are compressed.  Entries can be decoded either
+        way.
+    """
+    self._json_coder = JsonNumpyCacheCoder()
+    self._compression_level = compression_level
+    super(NumpyCacheCoder, self).__init__()
+
+  def __repr__(self):
+    # The repr is part of the cache keys of accumulators.  Since entries of
+    # `JsonNumpyCacheCoder` are decoded as well, this coder keeps its name so
+    # that those entries are still found.
+    if type(self) is NumpyCacheCoder:
+      return repr(self._json_coder)
+    return super(NumpyCacheCoder, self).__repr__()
+
+  def _encode_fallback(self, accumulator):
+    return self._json_coder.encode_cache(accumulator)
+
+  def _decode_fallback(self, encoded_accumulator):
+    return self._json_coder.decode_cache(encoded_accumulator)
+
+  def encode_cache(self, accumulator):
+    is_sequence = isinstance(accumulator, (list, tuple))
+    arrays = [
+        np.asarray(a) for a in (accumulator if is_sequence else [accumulator])
+    ]
+    if any(a.dtype.kind not in 'biufc' for a in arrays):
+      return self._encode_fallback(accumulator)
+
+    pieces = [
+        _NUMPY_CACHE_MAGIC,
+        struct.pack(_NUMPY_CACHE_HEADER_FORMAT, _NUMPY_CACHE_FORMAT_VERSION,
+                    is_sequence, len(arrays))
+    ]
+    offset = sum(len(piece) for piece in pieces)
+    for array in arrays:
+      descr = tf.compat.as_bytes(array.dtype.str)
+      header = (
+          struct.pack(_NUMPY_CACHE_ARRAY_HEADER_FORMAT, len(descr), array.ndim)
+          + descr + struct.pack('<{}q'.format(array.ndim), *array.shape))
+      offset += len(header)
+      padding = b'\x00' * (-offset % _NUMPY_CACHE_ALIGNMENT)
+      offset += len(padding) + array.nbytes
+      pieces.extend([header, padding, np.ascontiguousarray(array).tobytes()])
+    result = b''.join(pieces)
+    if self._compression_level is not None:
+      result = _NUMPY_CACHE_COMPRESSED_MAGIC + zlib.compress(
+          result, self._compression_level)
+    return result
+
+  def decode_cache(self, encoded_accumulator):
+    if encoded_accumulator.startswith(_NUMPY_CACHE_COMPRESSED_MAGIC):
+      encoded_accumulator = zlib.decompress(
+          encoded_accumulator[len(_NUMPY_CACHE_COMPRESSED_MAGIC):])
+    if not encoded_accumulator.startswith(_NUMPY_CACHE_MAGIC):
+      return self._decode_fallback(encoded_accumulator)
+
+    offset = len(_NUMPY_CACHE_MAGIC)
+    version, is_sequence, num_arrays = struct.unpack_from(
+        _NUMPY_CACHE_HEADER_FORMAT, encoded_accumulator, offset)
+    if version > _NUMPY_CACHE_FORMAT_VERSION:
+      raise ValueError(
+          'Unsupported NumpyCacheCoder format version {}, expected at most '
+          '{}'.format(version, _NUMPY_CACHE_FORMAT_VERSION))
+    offset += struct.calcsize(_NUMPY_CACHE_HEADER_FORMAT)
+
+    arrays = []
+    for _ in range(num_arrays):
+      descr_length, ndim = struct.unpack_from(_NUMPY_CACHE_ARRAY_HEADER_FORMAT,
+                                              encoded_accumulator, offset)
+      offset += struct.calcsize(_NUMPY_CACHE_ARRAY_HEADER_FORMAT)
+      dtype = np.dtype(
+          tf.compat.as_str(encoded_accumulator[offset:offset + descr_length]))
+      offset += descr_length
+      shape_format = '<{}q'.format(ndim)
+      shape = struct.unpack_from(shape_format, encoded_accumulator, offset)
+      offset += struct.calcsize(shape_format)
+      offset += -offset % _NUMPY_CACHE_ALIGNMENT
+      count = int(np.prod(shape, dtype=np.int64))
+      if count:
+        array = np.frombuffer(
+            encoded_accumulator, dtype=dtype, count=count, offset=offset)
+      else:
+        array = np.zeros((0,), dtype)
+      arrays.append(array.reshape(shape))
+      offset += count * dtype.itemsize
+    return arrays if is_sequence else arrays[0]
+
+
 class AnalyzerDef(with_metaclass(abc.ABCMeta, nodes.OperationDef)):
   """A subclass of OperationDef whose outputs can be constant tensors.
 
@@ -488,6 +665,28 @@ class CacheableCombineMerge(
     return 1
 
 
+class CombineRollingAggregate(
+    collections.namedtuple('CombineRollingAggregate',
+                           ['combiner', 'num_retracted', 'label']),
+    nodes.OperationDef):
+  """An operation that updates a rolling aggregate of accumulators.
+
+  The last `num_retracted` inputs are accumulators that are retracted from the
+  aggregate, the other inputs are accumulators that are merged into it (this
+  includes the previous rolling aggregate, if there is one).  The output is the
+  updated accumulator, on which `extract_output` has not been called.
+
+  Fields:
+    combiner: A retractable `Combiner`.
+    num_retracted: The number of trailing inputs to retract.
+    label: A unique label for this operation.
+  """
+
+  @property
+  def num_outputs(self):
+    return 1
+
+
 class _CombinerPerKeyAccumulatorCoder(CacheCoder):
   """Coder for per-key combiner accumulators."""
 
@@ -696,7 +895,7 @@ class VocabularyAccumulate(
 
   @property
   def cache_coder(self):
-    return _VocabularyAccumulatorCoder(input_dtype=self.input_dtype)
+    return _VocabularyAccumulatorBlockCoder(input_dtype=self.input_dtype)
 
 
 class _BaseKVCoder(CacheCoder):
@@ -762,6 +961,147 @@ class _VocabularyAccumulatorCoder(_BaseKVCoder):
     return token, value
 
 
+# Blocks start with a magic string that is not a valid token length prefix of
+# a `_VocabularyAccumulatorCoder` entry.
+_VOCABULARY_BLOCK_MAGIC = b'\x93TFTVOC'
+_VOCABULARY_BLOCK_FORMAT_VERSION = 1
+# Format version and kind of values.
+_VOCABULARY_BLOCK_HEADER_FORMAT = '<BB'
+_VOCABULARY_BLOCK_SIZE = 4096
+
+# Kinds of values stored in a vocabulary block.
+_VOCABULARY_BLOCK_INT_VALUES = 0
+_VOCABULARY_BLOCK_FLOAT_VALUES = 1
+_VOCABULARY_BLOCK_MEAN_AND_VAR_VALUES = 2
+_VOCABULARY_BLOCK_JSON_VALUES = 3
+
+
+def _join_length_prefixed(blobs):
+  """Returns the lengths of `blobs` and their concatenation as uint8 arrays."""
+  lengths = np.array([len(blob) for blob in blobs], np.int64)
+  joined_blobs = b''.join(blobs)
+  if not joined_blobs:
+    return lengths, np.zeros((0,), np.uint8)
+  return lengths, np.frombuffer(joined_blobs, np.uint8)
+
+
+def _split_length_prefixed(lengths, joined_blobs):
+  """Inverse of `_join_length_prefixed`."""
+  joined_blobs = joined_blobs.tobytes()
+  ends = np.cumsum(lengths).tolist()
+  starts = [0] + ends[:-1]
+  return [joined_blobs[start:end] for start, end in zip(starts, ends)]
+
+
+def _is_scalar_mean_and_var(value):
+  """Whether `value` is a mean and var accumulator with a vector mean."""
+  if not isinstance(value, tuple) or len(value) != 4:
+    return False
+  count, mean, variance, weight = value
+  return (np.ndim(count) == 0 and np.ndim(mean) == 1 and
+          np.ndim(variance) == 0 and np.ndim(weight) == 0)
+
+
+class _VocabularyAccumulatorBlockCoder(CacheCoder):
+  """Coder for blocks of vocabulary accumulators.
+
+  Encodes a list of up to `block_size` (token, value) pairs as a single record.
+  Tokens are stored as a length-prefixed blob, and values as one array per
+  accumulator field.  Records written by `_VocabularyAccumulatorCoder` are
+  decoded as a block of a single pair.
+  """
+
+  def __init__(self, input_dtype=tf.string.name):
+    self._input_dtype = tf.dtypes.as_dtype(input_dtype)
+    self._arrays_coder = NumpyCacheCoder()
+    self._single_accumulator_coder = _VocabularyAccumulatorCoder(input_dtype)
+    super(_VocabularyAccumulatorBlockCoder, self).__init__()
+
+  def __repr__(self):
+    # The repr is part of the cache keys of vocabulary accumulators.  Since
+    # records of `_VocabularyAccumulatorCoder` are decoded as well, this coder
+    # keeps its name so that those records are still found.
+    return repr(self._single_accumulator_coder)
+
+  @property
+  def block_size(self):
+    return _VOCABULARY_BLOCK_SIZE
+
+  def _encode_values(self, values):
+    """Returns the kind of `values` and a list of arrays representing them."""
+    if all(isinstance(v, (int, np.integer)) for v in values):
+      return _VOCABULARY_BLOCK_INT_VALUES, [np.array(values, np.int64)]
+    if all(isinstance(v, (int, float, np.integer, np.floating))
+           for v in values):
+      return _VOCABULARY_BLOCK_FLOAT_VALUES, [np.array(values, np.float64)]
+    if all(_is_scalar_mean_and_var(v) for v in values):
+      counts, means, variances, weights = zip(*values)
+      mean_lengths = np.array([len(mean) for mean in means], np.int64)
+      if all(w is None for w in weights):
+        weights = np.zeros((0,))
+      return _VOCABULARY_BLOCK_MEAN_AND_VAR_VALUES, [
+          np.array(counts), mean_lengths,
+          np.concatenate(means) if means else np.zeros((0,)),
+          np.array(variances), np.array(weights, np.float64)
+      ]
+    value_lengths, joined_values = _join_length_prefixed([
+        tf.compat.as_bytes(json.dumps(v, default=lambda a: a.tolist()))
+        for v in values
+    ])
+    return _VOCABULARY_BLOCK_JSON_VALUES, [value_lengths, joined_values]
+
+  def _decode_values(self, kind, arrays):
+    """Inverse of `_encode_values`."""
+    if kind in (_VOCABULARY_BLOCK_INT_VALUES, _VOCABULARY_BLOCK_FLOAT_VALUES):
+      values, = arrays
+      return values.tolist()
+    if kind == _VOCABULARY_BLOCK_MEAN_AND_VAR_VALUES:
+      counts, mean_lengths, means, variances, weights = arrays
+      means = np.split(means, np.cumsum(mean_lengths)[:-1])
+      if weights.size:
+        weights = [np.array(w) for w in weights]
+      else:
+        weights = [None] * len(counts)
+      return [(np.array(count), mean, np.array(variance), weight)
+              for count, mean, variance, weight
+              in zip(counts, means, variances, weights)]
+    if kind == _VOCABULARY_BLOCK_JSON_VALUES:
+      return [json.loads(tf.compat.as_text(v))
+              for v in _split_length_prefixed(*arrays)]
+    raise ValueError('Unsupported vocabulary block value kind {}'.format(kind))
+
+  def encode_cache(self, accumulators):
+    tokens, values = zip(*accumulators) if accumulators else ((), ())
+    if self._input_dtype is not tf.string:
+      tokens = [tf.compat.as_bytes(json.dumps(token)) for token in tokens]
+    kind, value_arrays = self._encode_values(values)
+    return b''.join([
+        _VOCABULARY_BLOCK_MAGIC,
+        struct.pack(_VOCABULARY_BLOCK_HEADER_FORMAT,
+                    _VOCABULARY_BLOCK_FORMAT_VERSION, kind),
+        self._arrays_coder.encode_cache(
+            list(_join_length_prefixed(tokens)) + value_arrays)
+    ])
+
+  def decode_cache(self, encoded_accumulators):
+    if not encoded_accumulators.startswith(_VOCABULARY_BLOCK_MAGIC):
+      return [self._single_accumulator_coder.decode_cache(encoded_accumulators)]
+
+    offset = len(_VOCABULARY_BLOCK_MAGIC)
+    version, kind = struct.unpack_from(_VOCABULARY_BLOCK_HEADER_FORMAT,
+                                       encoded_accumulators, offset)
+    if version > _VOCABULARY_BLOCK_FORMAT_VERSION:
+      raise ValueError(
+          'Unsupported vocabulary block format version {}, expected at most '
+          '{}'.format(version, _VOCABULARY_BLOCK_FORMAT_VERSION))
+    offset += struct.calcsize(_VOCABULARY_BLOCK_HEADER_FORMAT)
+    arrays = self._arrays_coder.decode_cache(encoded_accumulators[offset:])
+    tokens = _split_length_prefixed(*arrays[:2])
+    if self._input_dtype is not tf.string:
+      tokens = [json.loads(tf.compat.as_text(token)) for token in tokens]
+    return list(zip(tokens, self._decode_values(kind, arrays[2:])))
+
+
 class VocabularyCount(
     collections.namedtuple('VocabularyCount', ['label']), nodes.OperationDef):
   """An operation counts the total number of tokens in a vocabulary.
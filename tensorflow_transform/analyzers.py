@@ -35,6 +35,7 @@ import os
 import pickle
 import random
 import re
+import struct
 import threading
 
 # GOOGLE-INITIALIZATION
@@ -268,6 +269,13 @@ class NumPyCombiner(analyzer_nodes.Combiner):
           for sub_accumulator, batch_value in zip(accumulator, batch_values)
       ]
 
+  def add_instances(self, accumulator, instances_values):
+    # Reducing the instances along the first dimension is equivalent to folding
+    # them into the accumulator one at a time.
+    return self.add_input(
+        accumulator,
+        [self._fn(values, axis=0) for values in instances_values])
+
   def merge_accumulators(self, accumulators):
     # If the first subaccumulator is default, then the accumulator is default
     # and can be discarded. Note that `np.array_equal` below does at most
@@ -288,6 +296,26 @@ class NumPyCombiner(analyzer_nodes.Combiner):
     else:
       return self.create_accumulator()
 
+  @property
+  def is_retractable(self):
+    # Only sums can be retracted, reductions such as min and max discard the
+    # information that would be needed.
+    fn = self._fn.func if isinstance(self._fn, functools.partial) else self._fn
+    return fn is np.sum
+
+  def retract_accumulators(self, accumulator, accumulators):
+    if not self.is_retractable:
+      raise NotImplementedError(
+          'Only sums can be retracted, got {}'.format(self._fn))
+    retracted = self.merge_accumulators(accumulators)
+    if np.array_equal(retracted[0], self._default_sub_accumulator):
+      return accumulator
+    return [
+        np.subtract(sub_accumulator, retracted_sub_accumulator)
+        for sub_accumulator, retracted_sub_accumulator in zip(
+            accumulator, retracted)
+    ]
+
   def extract_output(self, accumulator):
     # For each output, cast that output to the specified type. Note there
     # will be one output for each input tensor to the analyzer.
@@ -1126,6 +1154,77 @@ class WeightedMeanAndVarCombiner(analyzer_nodes.Combiner):
       result = self._combine_mean_and_var_accumulators(result, accumulator)
     return result
 
+  @property
+  def is_retractable(self):
+    return True
+
+  def retract_accumulators(self, accumulator, accumulators):
+    """Retracts several `_WeightedMeanAndVarAccumulator`s from an accumulator.
+
+    This inverts the update formulas of `merge_accumulators`, so precision is
+    lost when the retracted accumulators hold most of the count.
+
+    Args:
+      accumulator: A `_WeightedMeanAndVarAccumulator` that `accumulators` were
+        merged into.
+      accumulators: A list of `_WeightedMeanAndVarAccumulator`s to retract.
+
+    Returns:
+      A `_WeightedMeanAndVarAccumulator` which excludes `accumulators`.
+    """
+    a = _WeightedMeanAndVarAccumulator.make_nan_to_num(
+        *accumulator,
+        compute_variance=self._compute_variance,
+        compute_weighted=self._compute_weighted)
+    b = _WeightedMeanAndVarAccumulator.make_nan_to_num(
+        *self.merge_accumulators(accumulators),
+        compute_variance=self._compute_variance,
+        compute_weighted=self._compute_weighted)
+
+    if np.sum(b.count) == 0:
+      return a
+
+    a_count, b_count = _pad_arrays_to_match(a.count, b.count)
+    a_mean, b_mean = _pad_arrays_to_match(a.mean, b.mean)
+    if self._compute_variance:
+      a_variance, b_variance = _pad_arrays_to_match(a.variance, b.variance)
+    if self._compute_weighted:
+      a_weight, b_weight = _pad_arrays_to_match(a.weight, b.weight)
+
+    remaining_total = a_count - b_count
+    is_empty = remaining_total <= 0
+    # Avoids dividing by zero, the values of empty entries are reset below.
+    safe_total = np.where(is_empty, 1, remaining_total)
+
+    if self._compute_weighted:
+      remaining_weights_mean = (
+          a_weight + (b_count / safe_total) * (a_weight - b_weight))
+      safe_weights_mean = np.where(remaining_weights_mean == 0, 1,
+                                   remaining_weights_mean)
+      remaining_mean = a_mean + (b_count * b_weight /
+                                 (safe_total * safe_weights_mean)) * (
+                                     a_mean - b_mean)
+    else:
+      remaining_weights_mean = np.ones(shape=remaining_total.shape)
+      remaining_mean = a_mean + b_count / safe_total * (a_mean - b_mean)
+
+    if self._compute_variance:
+      assert not self._compute_weighted
+      remaining_variance = (
+          a_variance + (b_count / safe_total) * (a_variance - b_variance) -
+          (b_count / np.where(a_count == 0, 1, a_count)) *
+          np.square(b_mean - remaining_mean))
+      # Rounding errors can otherwise result in small negative variances.
+      remaining_variance = np.maximum(remaining_variance, 0)
+    else:
+      remaining_variance = np.zeros(remaining_mean.shape)
+
+    return _WeightedMeanAndVarAccumulator(
+        np.where(is_empty, 0, remaining_total),
+        np.where(is_empty, 0, remaining_mean),
+        np.where(is_empty, 0, remaining_variance),
+        np.where(is_empty, 0, remaining_weights_mean))
+
   def extract_output(self, accumulator):
     """Converts an accumulator into the output (mean, var) tuple.
 
@@ -1368,8 +1467,7 @@ class _LMomentsCombiner(analyzer_nodes.Combiner):
                                 where=valid_kurtosis,
                                 out=np.zeros_like(accumulator.l4))
     l_skewness_and_kurtosis = np.stack((l_skewness, l_kurtosis), axis=0)
-    h_params = np.apply_along_axis(
-        gaussianization.compute_tukey_hh_params, 0, l_skewness_and_kurtosis)
+    h_params = gaussianization.compute_tukey_hh_params(l_skewness_and_kurtosis)
     hh_l_mean, hh_l_scale = gaussianization.tukey_hh_l_mean_and_scale(h_params)
 
     scale = np.true_divide(accumulator.l2, hh_l_scale,
@@ -1442,15 +1540,29 @@ class _LMomentsCombiner(analyzer_nodes.Combiner):
         combined_count_l4, combined_l1, combined_l2, combined_l3, combined_l4)
 
 
-class _LMomentsAccumulatorCacheCoder(analyzer_nodes.CacheCoder):
-  """The _LMomentsAccumulator is a list of np. arrays."""
+class _LMomentsAccumulatorCacheCoder(analyzer_nodes.NumpyCacheCoder):
+  """Encodes the arrays of a _LMomentsAccumulator with `NumpyCacheCoder`.
 
-  def encode_cache(self, accumulator):
+  Entries that were pickled by previous versions can still be decoded.
+  """
+
+  def _encode_fallback(self, accumulator):
     return pickle.dumps(accumulator)
 
-  def decode_cache(self, encoded_accumulator):
+  def _decode_fallback(self, encoded_accumulator):
     return pickle.loads(encoded_accumulator)
 
+  def encode_cache(self, accumulator):
+    return super(_LMomentsAccumulatorCacheCoder,
+                 self).encode_cache(list(accumulator))
+
+  def decode_cache(self, encoded_accumulator):
+    result = super(_LMomentsAccumulatorCacheCoder,
+                   self).decode_cache(encoded_accumulator)
+    if isinstance(result, _LMomentsAccumulator):
+      return result
+    return _LMomentsAccumulator(*result)
+
 
 def sanitized_vocab_filename(filename=None, prefix=None):
   """Generates a sanitized filename either from the given filename or the scope.
@@ -2052,6 +2164,11 @@ class QuantilesCombiner(analyzer_nodes.Combiner):
     with graph_state.lock:
       return graph_state.thread_hostile_add_input_callable(*callable_args)
 
+  def add_instances(self, summary, instances_values):
+    # add_input flattens its inputs, so a group of instances is just a smaller
+    # batch.
+    return self.add_input(summary, instances_values)
+
   def merge_accumulators(self, summaries):
     # Since graph_state modification needs to happen under lock, and for
     # performance reasons, we will merge summaries in a chunked fashion,
@@ -2123,20 +2240,24 @@ class QuantilesCombiner(analyzer_nodes.Combiner):
     return _QuantilesAccumulatorCacheCoder()
 
 
-class _QuantilesAccumulatorCacheCoder(analyzer_nodes.CacheCoder):
-  """The quantiles accumulator is a list of already encoded bytes.
+class _QuantilesAccumulatorCacheCoder(analyzer_nodes.NumpyCacheCoder):
+  """Encodes quantiles accumulators with `NumpyCacheCoder`.
 
-  It needs to be pickled into a cacheable form.
+  The quantiles accumulator is a list with the summary of each stream, which is
+  a float32 array of shape [n, 4].  Accumulators that aren't, as well as entries
+  that were pickled by previous versions, are pickled.
   """
 
-  def encode_cache(self, accumulator):
-    # TODO(b/37788560): Should we be "intelligently" choosing the 'protocol'
-    # argument for 'dumps'?
+  def _encode_fallback(self, accumulator):
     return pickle.dumps(accumulator)
 
-  def decode_cache(self, encoded_accumulator):
+  def _decode_fallback(self, encoded_accumulator):
     return pickle.loads(encoded_accumulator)
 
+  def encode_cache(self, accumulator):
+    return super(_QuantilesAccumulatorCacheCoder,
+                 self).encode_cache(list(accumulator))
+
 
 # TODO(KesterTong): We could perhaps enable even more graph_state sharing by making
 # the various options be "inputs" as opposed to "constants" (or more generally
@@ -2520,18 +2641,28 @@ def _quantiles_per_key(x, key, num_buckets, epsilon, name=None):
 class CovarianceCombiner(analyzer_nodes.Combiner):
   """Combines the PCollection to compute the biased covariance matrix."""
 
-  def __init__(self, output_shape, numpy_dtype=np.float64):
-    """Store the dtype and shape for np arrays/matrices for precision."""
+  def __init__(self, output_shape, numpy_dtype=np.float64,
+               accumulator_dtype=None):
+    """Store the dtype and shape for np arrays/matrices for precision.
+
+    Args:
+      output_shape: The shape of the resulting covariance matrix.
+      numpy_dtype: The numpy dtype of the output.
+      accumulator_dtype: (Optional) The numpy dtype used for the sum of
+        cross-terms and the sum of inputs. Defaults to `numpy_dtype`.
+    """
     self._output_shape = output_shape
     self._numpy_dtype = numpy_dtype
+    self._accumulator_dtype = (
+        numpy_dtype if accumulator_dtype is None else accumulator_dtype)
 
   def create_accumulator(self):
     """Create an accumulator with all zero entries."""
     return [
         np.zeros((self._output_shape[0], self._output_shape[0]),
-                 self._numpy_dtype),
-        np.zeros((self._output_shape[0],), self._numpy_dtype),
-        np.zeros((), self._numpy_dtype)
+                 self._accumulator_dtype),
+        np.zeros((self._output_shape[0],), self._accumulator_dtype),
+        np.zeros((), np.float64)
     ]
 
   def add_input(self, accumulator, batch_values):
@@ -2540,8 +2671,10 @@ class CovarianceCombiner(analyzer_nodes.Combiner):
     The cross terms for a numeric 1d array x are given by the set:
     {z_ij = x_i * x_j for all indices i and j}. This is stored as a 2d array.
     Since next_input is an array of 1d numeric arrays (i.e. a 2d array),
-    matmul(transpose(next_input), next_input) will automatically sum up
-    the cross terms of each 1d array in next_input.
+    dot(transpose(next_input), next_input) will automatically sum up
+    the cross terms of each 1d array in next_input. The batch is cast to the
+    accumulator dtype first so that this product is computed by a BLAS
+    symmetric rank-k update, and it is added to the accumulator in place.
 
     Args:
       accumulator: running sum of cross terms, input vectors, and count
@@ -2558,28 +2691,41 @@ class CovarianceCombiner(analyzer_nodes.Combiner):
 
     assert len(np.shape(batch_value)) == 2
 
-    batch_cross_terms = np.matmul(
-        np.transpose(batch_value),
-        batch_value
-    ).astype(self._numpy_dtype)
-
-    batch_sum = np.array(np.sum(batch_value, axis=0), self._numpy_dtype)
-    batch_count = np.shape(batch_value)[0]
-
+    batch_value = np.ascontiguousarray(batch_value, self._accumulator_dtype)
     sum_product, sum_vectors, count = accumulator
+    sum_product += np.dot(batch_value.T, batch_value)
+    sum_vectors += np.sum(batch_value, axis=0)
 
-    return [
-        sum_product + batch_cross_terms, sum_vectors + batch_sum,
-        count + batch_count
-    ]
+    return [sum_product, sum_vectors, count + batch_value.shape[0]]
 
   def merge_accumulators(self, accumulators):
     """Sums values in each accumulator entry."""
-    products, vectors, counts = zip(*accumulators)
+    result = None
+    for sum_product, sum_vectors, count in accumulators:
+      if result is None:
+        result = [
+            np.array(sum_product, self._accumulator_dtype),
+            np.array(sum_vectors, self._accumulator_dtype),
+            np.array(count, np.float64)
+        ]
+      else:
+        result[0] += sum_product
+        result[1] += sum_vectors
+        result[2] += count
+    return self.create_accumulator() if result is None else result
+
+  @property
+  def is_retractable(self):
+    return True
+
+  def retract_accumulators(self, accumulator, accumulators):
+    """Subtracts the values in each entry of the retracted accumulators."""
+    retracted = self.merge_accumulators(accumulators)
+    sum_product, sum_vectors, count = accumulator
     return [
-        np.sum(products, axis=0),
-        np.sum(vectors, axis=0),
-        np.sum(counts, axis=0)
+        np.subtract(sum_product, retracted[0], dtype=self._accumulator_dtype),
+        np.subtract(sum_vectors, retracted[1], dtype=self._accumulator_dtype),
+        np.subtract(count, retracted[2], dtype=np.float64)
     ]
 
   def extract_output(self, accumulator):
@@ -2617,8 +2763,290 @@ class CovarianceCombiner(analyzer_nodes.Combiner):
     ]
 
 
+class _SparseCovarianceAccumulator(
+    collections.namedtuple('SparseCovarianceAccumulator', [
+        'pair_indices', 'pair_values', 'sum_vectors', 'sum_squares',
+        'column_counts', 'count'
+    ])):
+  """Container for SparseCovarianceCombiner intermediate values.
+
+  Fields:
+    pair_indices: Sorted, unique flat indices `i * input_dim + j` of the
+      cross-terms of pairs of values at different positions of a row, with the
+      value of column `i` to the left of the value of column `j`.
+    pair_values: The sums of the cross-terms at `pair_indices`.
+    sum_vectors: The sum of input vectors.
+    sum_squares: The sum of the squares of the values of each column.
+    column_counts: The number of values seen for each column.
+    count: The number of input rows.
+  """
+
+  def __reduce__(self):
+    return self.__class__, tuple(self)
+
+
+def _sum_by_index(indices, values):
+  """Sums `values` that share the same index, returning sorted unique indices."""
+  unique_indices, inverse = np.unique(indices, return_inverse=True)
+  return unique_indices, np.bincount(
+      np.reshape(inverse, [-1]), weights=values, minlength=unique_indices.size)
+
+
+class SparseCovarianceCombiner(analyzer_nodes.Combiner):
+  """Combines sparse batches to compute the biased covariance matrix.
+
+  The inputs are the indices, values and dense_shape of a rank-2
+  `SparseTensor`. Only the cross-terms of columns that appear together in some
+  row are accumulated, as sums keyed by their flat index in the upper triangle
+  of the cross-terms matrix, so the size of the accumulator is proportional to
+  the number of co-occurring column pairs rather than to input_dim**2.  The
+  sums of squares of each column are accumulated densely.
+
+  If `top_n_columns` is set, the output is restricted to the `top_n_columns`
+  columns with the most values, and the covariance of all other columns is
+  reported as zero. All values of the input are accumulated, so
+  `tft.covariance` and `tft.pca` only pass the values of the `top_n_columns`
+  columns with the most values over the whole dataset to the combiner, which
+  bounds the size of the accumulator by the square of `top_n_columns`.
+  """
+
+  def __init__(self, output_shape, numpy_dtype=np.float64, top_n_columns=None):
+    """Store the dtype, shape and number of output columns."""
+    self._output_shape = output_shape
+    self._numpy_dtype = numpy_dtype
+    self._top_n_columns = top_n_columns
+
+  def create_accumulator(self):
+    """Create an accumulator with no cross-terms and all zero entries."""
+    input_dim = self._output_shape[0]
+    return _SparseCovarianceAccumulator(
+        np.zeros((0,), np.int64), np.zeros((0,), np.float64),
+        np.zeros((input_dim,), np.float64), np.zeros((input_dim,), np.float64),
+        np.zeros((input_dim,), np.int64), np.zeros((), np.int64))
+
+  def _batch_cross_terms(self, rows, columns, values):
+    """Computes the sums of the cross-terms of a batch of sparse rows.
+
+    Every value is paired with all values to its right in the same row, which
+    generates the upper triangle of each row's outer product without its
+    diagonal.
+
+    Args:
+      rows: A 1d ndarray of row indices.
+      columns: A 1d ndarray of column indices.
+      values: A 1d ndarray of values.
+
+    Returns:
+      A 2-tuple of the sorted unique flat pair indices and their sums.
+    """
+    order = np.lexsort((columns, rows))
+    rows, columns, values = rows[order], columns[order], values[order]
+    _, row_starts, row_lengths = np.unique(
+        rows, return_index=True, return_counts=True)
+    positions_in_row = np.arange(rows.size) - np.repeat(row_starts, row_lengths)
+    num_partners = np.repeat(row_lengths, row_lengths) - positions_in_row - 1
+    left = np.repeat(np.arange(rows.size), num_partners)
+    right = left + 1 + np.arange(left.size) - np.repeat(
+        np.cumsum(num_partners) - num_partners, num_partners)
+    return _sum_by_index(columns[left] * self._output_shape[0] + columns[right],
+                         values[left] * values[right])
+
+  def add_input(self, accumulator, batch_values):
+    """Compute the sums of co-occurring cross-terms, inputs, squares and count.
+
+    Args:
+      accumulator: running `_SparseCovarianceAccumulator`.
+      batch_values: entries from the pipeline, which must be a list containing
+        the indices, values and dense_shape of a rank-2 `SparseTensor`.
+
+    Returns:
+      A `_SparseCovarianceAccumulator` with the batch considered.
+
+    Raises:
+      ValueError: If any column index is outside of [0, input_dim).
+    """
+    indices, values, dense_shape = batch_values
+
+    assert np.shape(indices)[1:] == (2,)
+
+    input_dim = self._output_shape[0]
+    indices = np.asarray(indices, np.int64)
+    rows, columns = indices[:, 0], indices[:, 1]
+    values = np.asarray(values, np.float64)
+    if columns.size and (np.min(columns) < 0 or np.max(columns) >= input_dim):
+      raise ValueError(
+          'SparseTensor column indices must be in [0, {}), got {}'.format(
+              input_dim, columns))
+
+    sum_vectors = np.bincount(columns, weights=values, minlength=input_dim)
+    sum_squares = np.bincount(
+        columns, weights=np.square(values), minlength=input_dim)
+    column_counts = np.bincount(columns, minlength=input_dim)
+    pair_indices, pair_values = self._batch_cross_terms(rows, columns, values)
+    return self.merge_accumulators([
+        accumulator,
+        _SparseCovarianceAccumulator(pair_indices, pair_values, sum_vectors,
+                                     sum_squares, column_counts,
+                                     np.array(dense_shape[0], np.int64))
+    ])
+
+  def merge_accumulators(self, accumulators):
+    """Sums cross-terms with the same index and all other entries.
+
+    Args:
+      accumulators: An iterable of `_SparseCovarianceAccumulator`s.
+
+    Returns:
+      The merged `_SparseCovarianceAccumulator`.
+    """
+    result = self.create_accumulator()
+    pair_indices, pair_values = [result.pair_indices], [result.pair_values]
+    sum_vectors, sum_squares, column_counts, count = result[2:]
+    for accumulator in accumulators:
+      pair_indices.append(accumulator.pair_indices)
+      pair_values.append(accumulator.pair_values)
+      sum_vectors = sum_vectors + accumulator.sum_vectors
+      sum_squares = sum_squares + accumulator.sum_squares
+      column_counts = column_counts + accumulator.column_counts
+      count = count + accumulator.count
+    pair_indices, pair_values = _sum_by_index(
+        np.concatenate(pair_indices), np.concatenate(pair_values))
+    return _SparseCovarianceAccumulator(pair_indices, pair_values, sum_vectors,
+                                        sum_squares, column_counts, count)
+
+  def _selected_columns(self, accumulator):
+    """Returns the sorted columns that the output is restricted to."""
+    if self._top_n_columns is None:
+      return np.arange(self._output_shape[0])
+    top_columns = np.argsort(-accumulator.column_counts, kind='stable')
+    return np.sort(top_columns[:self._top_n_columns])
+
+  def _covariance_of_columns(self, accumulator, columns):
+    """Run covariance logic on the accumulated values of the given columns.
+
+    Args:
+      accumulator: final `_SparseCovarianceAccumulator`, with a non-zero count.
+      columns: A sorted 1d ndarray of columns.
+
+    Returns:
+      A float64 covariance matrix of shape (len(columns), len(columns)).
+    """
+    input_dim = self._output_shape[0]
+    positions = np.full((input_dim,), -1, np.int64)
+    positions[columns] = np.arange(columns.size)
+    left, right = np.divmod(accumulator.pair_indices, input_dim)
+    left, right = positions[left], positions[right]
+    selected = np.logical_and(left >= 0, right >= 0)
+    left, right = left[selected], right[selected]
+    cross_terms = np.diag(accumulator.sum_squares[columns])
+    # Pairs are unique, and repeated values of a column in the same row form a
+    # pair on the diagonal which is added twice, as in the square of their sum.
+    cross_terms[left, right] += accumulator.pair_values[selected]
+    cross_terms[right, left] += accumulator.pair_values[selected]
+    expected_terms = accumulator.sum_vectors[columns] / accumulator.count
+    return (cross_terms / accumulator.count -
+            np.outer(expected_terms, expected_terms))
+
+  def extract_output(self, accumulator):
+    """Run covariance logic on the co-occurring cross-terms, sum, and count.
+
+    Args:
+      accumulator: final `_SparseCovarianceAccumulator`.
+
+    Returns:
+      A list containing a single 2d ndarray, the covariance matrix.
+    """
+    if accumulator.count == 0:
+      return [np.zeros(self._output_shape, self._numpy_dtype)]
+    columns = self._selected_columns(accumulator)
+    cov = self._covariance_of_columns(accumulator, columns)
+    if self._top_n_columns is None:
+      return [cov.astype(self._numpy_dtype)]
+    result = np.zeros(self._output_shape, self._numpy_dtype)
+    result[np.ix_(columns, columns)] = cov
+    return [result]
+
+  def output_tensor_infos(self):
+    return [
+        analyzer_nodes.TensorInfo(
+            tf.as_dtype(self._numpy_dtype), self._output_shape, None)
+    ]
+
+  @property
+  def accumulator_coder(self):
+    return _SparseCovarianceAccumulatorCacheCoder()
+
+
+class _SparseCovarianceAccumulatorCacheCoder(analyzer_nodes.NumpyCacheCoder):
+  """Encodes the arrays of a _SparseCovarianceAccumulator with `NumpyCacheCoder`.
+  """
+
+  def encode_cache(self, accumulator):
+    return super(_SparseCovarianceAccumulatorCacheCoder,
+                 self).encode_cache(list(accumulator))
+
+  def decode_cache(self, encoded_accumulator):
+    return _SparseCovarianceAccumulator(
+        *super(_SparseCovarianceAccumulatorCacheCoder,
+               self).decode_cache(encoded_accumulator))
+
+
+def _retain_most_frequent_columns(x, top_n_columns, input_dim):
+  """Returns the values of `x` in the `top_n_columns` most frequent columns.
+
+  The number of values of each column over the whole dataset is computed by a
+  `sum` analyzer, so the same columns are retained in every batch.  Ties are
+  broken in favor of the lower column index.
+
+  Args:
+    x: A rank-2 `SparseTensor` with `input_dim` columns.
+    top_n_columns: The number of columns to retain.
+    input_dim: The number of columns of `x`.
+
+  Returns:
+    A `SparseTensor` with the same dense shape as `x`.
+  """
+  columns = x.indices[:, 1]
+  batch_column_counts = tf.reshape(
+      tf.math.bincount(
+          tf.cast(columns, tf.int32),
+          minlength=input_dim,
+          maxlength=input_dim,
+          dtype=tf.int64), [1, input_dim])
+  column_counts = sum(batch_column_counts, reduce_instance_dims=False)
+  _, top_columns = tf.math.top_k(
+      column_counts, k=builtin_min(top_n_columns, input_dim), sorted=False)
+  is_top_column = tf.scatter_nd(
+      tf.expand_dims(top_columns, 1), tf.ones_like(top_columns),
+      [input_dim]) > 0
+  return tf.sparse.retain(x, tf.gather(is_top_column, columns))
+
+
+def _get_covariance_input_dim(x, top_n_columns, accumulator_dtype):
+  """Validates the input of covariance analyzers and returns its dimension."""
+  if isinstance(x, tf.SparseTensor):
+    x.get_shape().assert_has_rank(2)
+    input_dim = x.get_shape().as_list()[1]
+    if input_dim is None:
+      raise ValueError(
+          'A SparseTensor input must have a known dense shape in its 1st '
+          'dimension, got {}'.format(x.get_shape()))
+    if accumulator_dtype is not None:
+      raise ValueError(
+          'accumulator_dtype is not supported for SparseTensor inputs')
+  elif isinstance(x, tf.Tensor):
+    x.shape.assert_has_rank(2)
+    input_dim = x.shape.as_list()[1]
+    if top_n_columns is not None:
+      raise ValueError('top_n_columns is only supported for SparseTensor inputs')
+  else:
+    raise TypeError('Expected a Tensor or SparseTensor, but got %r' % x)
+  return input_dim
+
+
 @common.log_api_use(common.ANALYZER_COLLECTION)
-def covariance(x, dtype, name=None):
+def covariance(x, dtype, name=None, top_n_columns=None,
+               accumulator_dtype=None):
   """Computes the covariance matrix over the whole dataset.
 
   The covariance matrix M is defined as follows:
@@ -2627,39 +3055,63 @@ def covariance(x, dtype, name=None):
   Notice that the diagonal entries correspond to variances of individual
   elements in the vector, i.e. M[i,i] corresponds to the variance of x[:i].
 
+  If `x` is a `SparseTensor`, missing values are treated as zeros, and only the
+  cross-terms of elements that are present together in some input vector are
+  accumulated.
+
   Args:
-    x: A rank-2 `Tensor`, 0th dim are rows, 1st dim are indices in each input
-      vector.
+    x: A rank-2 `Tensor` or `SparseTensor`, 0th dim are rows, 1st dim are
+      indices in each input vector. The 1st dim of a `SparseTensor` must have a
+      known size.
     dtype: Tensorflow dtype of entries in the returned matrix.
     name: (Optional) A name for this operation.
+    top_n_columns: (Optional) Only for `SparseTensor` inputs. If set, only the
+      covariance of the `top_n_columns` elements with the most values over the
+      dataset is computed, and all other entries of the returned matrix are
+      zero. The elements are found by a preceding analyzer that counts the
+      values of each element, so memory is bounded by the square of
+      `top_n_columns`.
+    accumulator_dtype: (Optional) Only for `Tensor` inputs. Tensorflow dtype
+      used to accumulate the sums of cross-terms and inputs, e.g. `tf.float32`
+      to halve the memory of accumulators. Defaults to `dtype`.
 
   Raises:
-    ValueError: if input is not a rank-2 Tensor.
+    ValueError: if input is not a rank-2 Tensor or SparseTensor, or options are
+      given that are not supported for its type.
 
   Returns:
     A rank-2 (matrix) covariance `Tensor`
   """
 
-  if not isinstance(x, tf.Tensor):
-    raise TypeError('Expected a Tensor, but got %r' % x)
+  input_dim = _get_covariance_input_dim(x, top_n_columns, accumulator_dtype)
 
   with tf.compat.v1.name_scope(name, 'covariance'):
-    x.shape.assert_has_rank(2)
-
-    input_dim = x.shape.as_list()[1]
     shape = (input_dim, input_dim)
 
-    (result,) = _apply_cacheable_combiner(
-        CovarianceCombiner(shape, dtype.as_numpy_dtype), x)
+    if isinstance(x, tf.SparseTensor):
+      if top_n_columns is not None:
+        x = _retain_most_frequent_columns(x, top_n_columns, input_dim)
+      (result,) = _apply_cacheable_combiner(
+          SparseCovarianceCombiner(shape, dtype.as_numpy_dtype, top_n_columns),
+          x.indices, x.values, x.dense_shape)
+    else:
+      (result,) = _apply_cacheable_combiner(
+          CovarianceCombiner(
+              shape, dtype.as_numpy_dtype,
+              accumulator_dtype and accumulator_dtype.as_numpy_dtype), x)
     return result
 
 
 class PCACombiner(CovarianceCombiner):
   """Compute PCA of accumulated data using the biased covariance matrix."""
 
-  def __init__(self, output_shape, output_dim=None, numpy_dtype=np.float64):
+  def __init__(self, output_shape, output_dim=None, numpy_dtype=np.float64,
+               accumulator_dtype=None):
     """Store pca output dimension, shape and dtype for precision."""
-    super(PCACombiner, self).__init__(output_shape, numpy_dtype=numpy_dtype)
+    super(PCACombiner, self).__init__(
+        output_shape,
+        numpy_dtype=numpy_dtype,
+        accumulator_dtype=accumulator_dtype)
     self._output_dim = output_dim
 
   def extract_output(self, accumulator):
@@ -2696,8 +3148,253 @@ class PCACombiner(CovarianceCombiner):
       return [sorted_vecs[:, :self._output_dim]]
 
 
+class SparsePCACombiner(SparseCovarianceCombiner):
+  """Compute PCA of sparse data using the biased covariance matrix."""
+
+  def __init__(self, output_shape, output_dim=None, numpy_dtype=np.float64,
+               top_n_columns=None):
+    """Store pca output dimension, shape, dtype and number of columns."""
+    super(SparsePCACombiner, self).__init__(
+        output_shape, numpy_dtype=numpy_dtype, top_n_columns=top_n_columns)
+    self._output_dim = output_dim
+
+  def extract_output(self, accumulator):
+    """Compute PCA of the accumulated data using the biased covariance matrix.
+
+    Following the covariance computation in SparseCovarianceCombiner, this
+    method runs eigenvalue decomposition on the covariance matrix of the
+    selected columns and returns the first output_dim eigenvectors, with zeros
+    for all other columns. If fewer than output_dim columns are selected, the
+    remaining principal components are unit vectors of unselected columns.
+
+    Args:
+      accumulator: final `_SparseCovarianceAccumulator`.
+
+    Returns:
+      A list containing a matrix of shape (input_dim, output_dim).
+    """
+    input_dim = self._output_shape[0]
+    if accumulator.count == 0:
+      # In this case all eigenvalues==0 and we output (possibly truncated) basis
+      # vectors. Note that if _output_dim is None, then M is set to N in np.eye.
+      return [np.eye(N=input_dim, M=self._output_dim, dtype=self._numpy_dtype)]
+    columns = self._selected_columns(accumulator)
+    vals, vecs = np.linalg.eigh(
+        self._covariance_of_columns(accumulator, columns))
+    sorted_vecs = vecs[:, np.argsort(vals)[::-1]]
+    if self._top_n_columns is None:
+      return [sorted_vecs[:, :self._output_dim].astype(self._numpy_dtype)]
+    output_dim = input_dim if self._output_dim is None else self._output_dim
+    num_selected = builtin_min(columns.size, output_dim)
+    result = np.zeros((input_dim, output_dim), self._numpy_dtype)
+    result[columns, :num_selected] = sorted_vecs[:, :num_selected]
+    unselected = np.setdiff1d(
+        np.arange(input_dim), columns)[:output_dim - num_selected]
+    result[unselected, np.arange(num_selected,
+                                 num_selected + unselected.size)] = 1
+    return [result]
+
+
+class _PCASketchAccumulator(
+    collections.namedtuple('PCASketchAccumulator',
+                           ['sketch', 'sum_vectors', 'count'])):
+  """Container for PCASketchCombiner intermediate values."""
+
+  def __reduce__(self):
+    return self.__class__, tuple(self)
+
+
+class PCASketchCombiner(analyzer_nodes.Combiner):
+  """Compute PCA of accumulated data using a Frequent Directions sketch.
+
+  Instead of the dense (input_dim, input_dim) matrix of cross-terms that
+  CovarianceCombiner accumulates, this combiner keeps a Frequent Directions
+  sketch B with at most `sketch_size` rows such that B^T B approximates X^T X,
+  along with the sum of input vectors and the count of rows. Sketches of
+  different accumulators are merged by stacking and shrinking them again, so
+  the accumulator stays O(input_dim * sketch_size) throughout the pipeline.
+
+  The sketch size is `output_dim + ceil(output_dim / epsilon) + oversampling`.
+  For a sketch of that size the spectral error of B^T B is bounded by
+  epsilon / output_dim times the energy of X outside of its top `output_dim`
+  directions. The extra `oversampling` rows leave room for the direction of the
+  mean, which is subtracted only when the output is extracted.
+  """
+
+  def __init__(self, output_shape, output_dim, epsilon=0.5, oversampling=10,
+               numpy_dtype=np.float64):
+    """Store the sketch parameters, output shape and dtype for precision."""
+    if epsilon <= 0:
+      raise ValueError('epsilon must be positive, got {}'.format(epsilon))
+    if oversampling < 0:
+      raise ValueError(
+          'oversampling must be non-negative, got {}'.format(oversampling))
+    self._output_shape = output_shape
+    self._output_dim = output_dim
+    self._numpy_dtype = numpy_dtype
+    self._sketch_size = (
+        output_dim + int(np.ceil(output_dim / epsilon)) + oversampling)
+
+  def create_accumulator(self):
+    """Create an accumulator with an empty sketch and all zero entries."""
+    input_dim = self._output_shape[0]
+    return _PCASketchAccumulator(
+        np.zeros((0, input_dim), np.float64), np.zeros((input_dim,),
+                                                       np.float64),
+        np.zeros((), np.float64))
+
+  def _shrink(self, sketch):
+    """Shrinks a stack of sketch rows down to at most `_sketch_size` rows.
+
+    Each shrink computes the SVD of the stacked rows and subtracts the squared
+    (sketch_size + 1)-th singular value from all squared singular values, which
+    zeroes out all but the leading `_sketch_size` directions.
+
+    Args:
+      sketch: A 2d ndarray with rows of sketches and/or inputs.
+
+    Returns:
+      A 2d ndarray with at most `_sketch_size` rows.
+    """
+    if sketch.shape[0] <= self._sketch_size:
+      return sketch
+    _, singular_values, right_vectors = np.linalg.svd(
+        sketch, full_matrices=False)
+    if singular_values.shape[0] > self._sketch_size:
+      delta = np.square(singular_values[self._sketch_size])
+      singular_values = np.sqrt(
+          np.maximum(
+              np.square(singular_values[:self._sketch_size]) - delta, 0.))
+      right_vectors = right_vectors[:self._sketch_size]
+    return singular_values[:, np.newaxis] * right_vectors
+
+  def add_input(self, accumulator, batch_values):
+    """Folds the batch rows into the sketch, sum of inputs, and count.
+
+    Rows are added in chunks of `_sketch_size` so that each shrink runs an SVD
+    of at most 2 * `_sketch_size` rows.
+
+    Args:
+      accumulator: running sketch, sum of input vectors, and count.
+      batch_values: entries from the pipeline, which must be single element list
+        containing a 2d array representing multiple 1d arrays.
+
+    Returns:
+      A `_PCASketchAccumulator` with the batch considered.
+    """
+    # Expect a single input representing the batch for the input tensor.
+    batch_value, = batch_values
+
+    assert len(np.shape(batch_value)) == 2
+
+    batch_value = np.asarray(batch_value, np.float64)
+    sketch = accumulator.sketch
+    for start in range(0, batch_value.shape[0], self._sketch_size):
+      sketch = self._shrink(
+          np.concatenate(
+              [sketch, batch_value[start:start + self._sketch_size]]))
+
+    return _PCASketchAccumulator(
+        sketch, accumulator.sum_vectors + np.sum(batch_value, axis=0),
+        accumulator.count + batch_value.shape[0])
+
+  def merge_accumulators(self, accumulators):
+    """Merges sketches by stacking and shrinking, and sums the other values."""
+    result = self.create_accumulator()
+    sketch, sum_vectors, count = result
+    for accumulator in accumulators:
+      sketch = self._shrink(np.concatenate([sketch, accumulator.sketch]))
+      sum_vectors = sum_vectors + accumulator.sum_vectors
+      count = count + accumulator.count
+    return _PCASketchAccumulator(sketch, sum_vectors, count)
+
+  def extract_output(self, accumulator):
+    """Compute PCA of the accumulated data using the sketched covariance.
+
+    The sketched covariance is B^T B / count - uu^T, where u = mean(x). Its
+    range is contained in the span of the rows of B and u, so it is projected
+    onto an orthonormal basis of that span (padded with unit vectors to have at
+    least output_dim directions), and the eigenvalue decomposition is done on
+    the resulting small matrix.
+
+    Args:
+      accumulator: final `_PCASketchAccumulator`.
+
+    Returns:
+      A list containing a matrix of shape (input_dim, output_dim).
+    """
+    sketch, sum_vectors, count = accumulator
+    input_dim = self._output_shape[0]
+    if count == 0:
+      # In this case all eigenvalues==0 and we output truncated basis vectors.
+      return [np.eye(N=input_dim, M=self._output_dim, dtype=self._numpy_dtype)]
+    expected_terms = sum_vectors / count
+    basis, _ = np.linalg.qr(
+        np.concatenate([
+            sketch, expected_terms[np.newaxis, :],
+            np.eye(N=self._output_dim, M=input_dim)
+        ]).T)
+    projected_sketch = np.matmul(sketch, basis)
+    projected_terms = np.matmul(expected_terms, basis)
+    cov = (np.matmul(np.transpose(projected_sketch), projected_sketch) / count -
+           np.outer(projected_terms, projected_terms))
+    vals, vecs = np.linalg.eigh(cov)
+    sorted_vecs = vecs[:, np.argsort(vals)[::-1][:self._output_dim]]
+    return [np.matmul(basis, sorted_vecs).astype(self._numpy_dtype)]
+
+  def output_tensor_infos(self):
+    return [
+        analyzer_nodes.TensorInfo(
+            tf.as_dtype(self._numpy_dtype), self._output_shape, None)
+    ]
+
+  @property
+  def accumulator_coder(self):
+    return _PCASketchAccumulatorCacheCoder()
+
+
+class _PCASketchAccumulatorCacheCoder(analyzer_nodes.CacheCoder):
+  """Encodes a `_PCASketchAccumulator` as raw float64 buffers.
+
+  The encoding is a header with the number of sketch rows and the input
+  dimension, followed by the sketch, the sum of input vectors and the count.
+  """
+
+  _HEADER_FORMAT = '<qq'
+
+  def encode_cache(self, accumulator):
+    sketch, sum_vectors, count = accumulator
+    return b''.join([
+        struct.pack(self._HEADER_FORMAT, *sketch.shape),
+        np.ascontiguousarray(sketch, '<f8').tobytes(),
+        np.ascontiguousarray(sum_vectors, '<f8').tobytes(),
+        np.asarray(count, '<f8').tobytes()
+    ])
+
+  def decode_cache(self, encoded_accumulator):
+    num_rows, input_dim = struct.unpack_from(self._HEADER_FORMAT,
+                                             encoded_accumulator)
+    values = np.frombuffer(
+        encoded_accumulator,
+        dtype='<f8',
+        offset=struct.calcsize(self._HEADER_FORMAT))
+    sketch_size = num_rows * input_dim
+    return _PCASketchAccumulator(
+        values[:sketch_size].reshape((num_rows, input_dim)),
+        values[sketch_size:sketch_size + input_dim],
+        values[sketch_size + input_dim])
+
+
 @common.log_api_use(common.ANALYZER_COLLECTION)
-def pca(x, output_dim, dtype, name=None):
+def pca(x,
+        output_dim,
+        dtype,
+        name=None,
+        use_sketch=False,
+        sketch_epsilon=0.5,
+        sketch_oversampling=10,
+        top_n_columns=None,
+        accumulator_dtype=None):
   """Computes PCA on the dataset using biased covariance.
 
   The PCA analyzer computes output_dim orthonormal vectors that capture
@@ -2760,30 +3457,83 @@ def pca(x, output_dim, dtype, name=None):
   be seen, the benefit of normalization is that PCA would capture highly
   correlated components first and collapse them into a lower dimension.
 
+  By default the full (input_dim, input_dim) covariance matrix is accumulated,
+  which becomes prohibitively large for high dimensional inputs. With
+  `use_sketch=True` the covariance is instead approximated with a mergeable
+  Frequent Directions sketch of
+  `output_dim + ceil(output_dim / sketch_epsilon) + sketch_oversampling` rows,
+  so memory and cache size are linear in input_dim.
+
+  If `x` is a `SparseTensor`, missing values are treated as zeros and only the
+  cross-terms of elements that are present together in some row vector are
+  accumulated. With `top_n_columns`, the principal components are computed for
+  the `top_n_columns` elements with the most values only.
+
   Args:
-    x: A rank-2 `Tensor`, 0th dim are rows, 1st dim are indices in row vectors.
+    x: A rank-2 `Tensor` or `SparseTensor`, 0th dim are rows, 1st dim are
+      indices in row vectors. The 1st dim of a `SparseTensor` must have a known
+      size.
     output_dim: The PCA output dimension (number of eigenvectors to return).
     dtype: Tensorflow dtype of entries in the returned matrix.
     name: (Optional) A name for this operation.
+    use_sketch: (Optional) If True, approximate the covariance using a Frequent
+      Directions sketch instead of accumulating it exactly.
+    sketch_epsilon: (Optional) Accuracy parameter of the sketch, only used if
+      `use_sketch` is True. Smaller values result in a larger, more accurate
+      sketch.
+    sketch_oversampling: (Optional) Number of extra rows kept in the sketch,
+      only used if `use_sketch` is True.
+    top_n_columns: (Optional) Only for `SparseTensor` inputs. If set, the
+      principal components are restricted to the `top_n_columns` elements with
+      the most values over the dataset. As with `tft.covariance`, memory is
+      bounded by the square of `top_n_columns`.
+    accumulator_dtype: (Optional) Only for `Tensor` inputs without
+      `use_sketch`. Tensorflow dtype used to accumulate the sums of cross-terms
+      and inputs, e.g. `tf.float32` to halve the memory of accumulators.
+      Defaults to `dtype`.
 
   Raises:
-    ValueError: if input is not a rank-2 Tensor.
+    ValueError: if input is not a rank-2 Tensor or SparseTensor, if options are
+      given that are not supported for its type, or if `use_sketch` is True and
+      `output_dim` or the input dimension are not known.
 
   Returns:
     A 2D `Tensor` (matrix) M of shape (input_dim, output_dim).
   """
 
-  if not isinstance(x, tf.Tensor):
-    raise TypeError('Expected a Tensor, but got %r' % x)
+  input_dim = _get_covariance_input_dim(x, top_n_columns, accumulator_dtype)
 
   with tf.compat.v1.name_scope(name, 'pca'):
-    x.shape.assert_has_rank(2)
-
-    input_dim = x.shape.as_list()[1]
     shape = (input_dim, output_dim)
 
-    (result,) = _apply_cacheable_combiner(
-        PCACombiner(shape, output_dim, dtype.as_numpy_dtype), x)
+    if isinstance(x, tf.SparseTensor):
+      if use_sketch:
+        raise ValueError('use_sketch is not supported for SparseTensor inputs')
+      if top_n_columns is not None:
+        x = _retain_most_frequent_columns(x, top_n_columns, input_dim)
+      (result,) = _apply_cacheable_combiner(
+          SparsePCACombiner(shape, output_dim, dtype.as_numpy_dtype,
+                            top_n_columns), x.indices, x.values, x.dense_shape)
+      return result
+
+    if use_sketch:
+      if output_dim is None or input_dim is None:
+        raise ValueError(
+            'A sketched pca requires known output_dim and input dimension, '
+            'got output_dim={} and input shape {}'.format(output_dim, x.shape))
+      if accumulator_dtype is not None:
+        raise ValueError('accumulator_dtype is not supported with use_sketch')
+      combiner = PCASketchCombiner(
+          shape,
+          output_dim,
+          epsilon=sketch_epsilon,
+          oversampling=sketch_oversampling,
+          numpy_dtype=dtype.as_numpy_dtype)
+    else:
+      combiner = PCACombiner(
+          shape, output_dim, dtype.as_numpy_dtype,
+          accumulator_dtype and accumulator_dtype.as_numpy_dtype)
+    (result,) = _apply_cacheable_combiner(combiner, x)
     return result
 
 
@@ -17,6 +17,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import pickle
 
 # GOOGLE-INITIALIZATION
@@ -595,6 +596,250 @@ class AnalyzersTest(test_case.TransformTestCase):
 
       self.assertAllEqual(output, expected_output)
 
+  def testPCASketchCombinerMatchesPCACombiner(self):
+    random_state = np.random.RandomState(0)
+    input_dim, output_dim = 50, 3
+    # Low rank inputs with a large offset and a small amount of noise.
+    x = (np.matmul(random_state.randn(1000, output_dim),
+                   random_state.randn(output_dim, input_dim)) * 10. + 5. +
+         random_state.randn(1000, input_dim) * 0.01)
+    batches = [(x[start:start + 128],) for start in range(0, 1000, 128)]
+    results = []
+    for combiner in (
+        analyzers.PCACombiner((input_dim, output_dim), output_dim),
+        analyzers.PCASketchCombiner((input_dim, output_dim), output_dim)):
+      combiner = pickle.loads(pickle.dumps(combiner))
+      accumulators = (
+          combiner.add_input(combiner.create_accumulator(), batch)
+          for batch in batches)
+      final_accumulator = combiner.merge_accumulators(accumulators)
+      results.append(combiner.extract_output(final_accumulator)[0])
+    expected, actual = results
+    self.assertEqual(actual.shape, (input_dim, output_dim))
+    # Principal components are only defined up to their sign.
+    self.assertAllClose(
+        np.abs(np.sum(expected * actual, axis=0)), np.ones(output_dim),
+        atol=1e-6)
+
+  @test_case.named_parameters(
+      dict(
+          testcase_name='Covariance',
+          dense_combiner=analyzers.CovarianceCombiner((20, 20)),
+          sparse_combiner=analyzers.SparseCovarianceCombiner((20, 20))),
+      dict(
+          testcase_name='PCA',
+          dense_combiner=analyzers.PCACombiner((20, 3), 3),
+          sparse_combiner=analyzers.SparsePCACombiner((20, 3), 3)),
+  )
+  def testSparseCombinerMatchesDenseCombiner(self, dense_combiner,
+                                             sparse_combiner):
+    random_state = np.random.RandomState(0)
+    x = (random_state.rand(200, 20) < 0.2) * random_state.randn(200, 20)
+    dense_batches = [(x[start:start + 64],) for start in range(0, 200, 64)]
+    sparse_batches = []
+    for batch, in dense_batches:
+      rows, columns = np.nonzero(batch)
+      sparse_batches.append((np.stack([rows, columns], axis=1),
+                             batch[rows, columns], np.array(batch.shape)))
+    results = []
+    for combiner, batches in ((dense_combiner, dense_batches),
+                              (sparse_combiner, sparse_batches)):
+      combiner = pickle.loads(pickle.dumps(combiner))
+      accumulators = (
+          combiner.add_input(combiner.create_accumulator(), batch)
+          for batch in batches)
+      final_accumulator = combiner.merge_accumulators(accumulators)
+      encoded = combiner.accumulator_coder.encode_cache(final_accumulator)
+      final_accumulator = combiner.accumulator_coder.decode_cache(encoded)
+      results.append(combiner.extract_output(final_accumulator)[0])
+    expected, actual = results
+    # Principal components are only defined up to their sign.
+    self.assertAllClose(np.abs(actual), np.abs(expected))
+
+  def testSparseCovarianceCombinerTopNColumns(self):
+    combiner = analyzers.SparseCovarianceCombiner((3, 3), top_n_columns=2)
+    accumulator = combiner.add_input(
+        combiner.create_accumulator(),
+        (np.array([[0, 0], [0, 2], [1, 0], [1, 1], [2, 0], [2, 2]]),
+         np.array([1., 2., 3., 4., 5., -2.]), np.array([3, 3])))
+    # Column 1 has the fewest values, its covariance is not computed.
+    self.assertAllClose(
+        combiner.extract_output(accumulator)[0],
+        np.array([[8. / 3, 0., -8. / 3], [0., 0., 0.], [-8. / 3, 0., 8. / 3]]))
+
+  def testSparseCovarianceCombinerIsExactInAnyMergeOrder(self):
+    combiner = analyzers.SparseCovarianceCombiner((10, 10), top_n_columns=1)
+    first = combiner.add_input(
+        combiner.create_accumulator(),
+        (np.array([[0, column] for column in range(10)] + [[1, 0], [1, 3]]),
+         np.arange(1., 13.), np.array([2, 10])))
+    second = combiner.add_input(
+        combiner.create_accumulator(),
+        (np.array([[0, 5], [1, 5], [2, 5]]), np.array([1., 1., 1.]),
+         np.array([3, 10])))
+    # Only the cross-terms of values at different positions of a row are kept,
+    # sums of squares are kept for every column.
+    self.assertAllEqual(first.pair_indices[:2], [0 * 10 + 1, 0 * 10 + 2])
+    self.assertAllEqual(second.pair_indices, [])
+    self.assertAllClose(second.sum_squares, [0.] * 5 + [3.] + [0.] * 4)
+    # Column 5 has the most values once both accumulators are merged.
+    expected = np.zeros((10, 10))
+    expected[5, 5] = (6.**2 + 3.) / 5 - (9. / 5)**2
+    self.assertAllClose(
+        combiner.extract_output(combiner.merge_accumulators([first,
+                                                             second]))[0],
+        expected)
+    self.assertAllClose(
+        combiner.extract_output(combiner.merge_accumulators([second,
+                                                             first]))[0],
+        expected)
+
+  def testSparseCovarianceCombinerRepeatedIndices(self):
+    combiner = analyzers.SparseCovarianceCombiner((2, 2))
+    accumulator = combiner.add_input(
+        combiner.create_accumulator(),
+        (np.array([[0, 0], [0, 0], [0, 1], [1, 1]]),
+         np.array([1., 2., 4., 5.]), np.array([2, 2])))
+    # Repeated values of a column are summed, as in a dense [[3, 4], [0, 5]].
+    self.assertAllClose(
+        combiner.extract_output(accumulator)[0],
+        np.array([[2.25, -0.75], [-0.75, 0.25]]))
+
+  def testSparseCovarianceCombinerInvalidColumn(self):
+    combiner = analyzers.SparseCovarianceCombiner((2, 2))
+    with self.assertRaisesRegexp(ValueError, 'column indices must be in'):
+      combiner.add_input(combiner.create_accumulator(),
+                         (np.array([[0, 2]]), np.array([1.]), np.array([1, 3])))
+
+  def testCovarianceCombinerFloat32Accumulator(self):
+    combiner = analyzers.CovarianceCombiner(
+        (2, 2), numpy_dtype=np.float64, accumulator_dtype=np.float32)
+    accumulator = combiner.add_input(combiner.create_accumulator(),
+                                     [np.array([[0, 0], [4, 0], [2, -2]])])
+    accumulator = combiner.merge_accumulators(
+        [accumulator,
+         combiner.add_input(combiner.create_accumulator(),
+                            [np.array([[2, 2]])])])
+    self.assertEqual(accumulator[0].dtype, np.float32)
+    output, = combiner.extract_output(accumulator)
+    self.assertEqual(output.dtype, np.float64)
+    self.assertAllClose(output, np.array([[2., 0.], [0., 2.]]))
+
+  @test_case.named_parameters(
+      dict(
+          testcase_name='Sum',
+          combiner=analyzers.NumPyCombiner(
+              fn=functools.partial(np.sum, dtype=np.int64),
+              default_accumulator_value=0,
+              output_dtypes=[np.int64],
+              output_shapes=[None]),
+          batches=[
+              (np.array([1, 2, 3]),),
+              (np.array([4, 5, 6]),),
+              (np.array([7, 8, 9]),),
+          ]),
+      dict(
+          testcase_name='WeightedMeanAndVar',
+          combiner=analyzers.WeightedMeanAndVarCombiner(
+              np.float64, output_shape=()),
+          batches=[
+              _make_mean_and_var_accumulator_from_instance([[1., 2., 3.]]),
+              _make_mean_and_var_accumulator_from_instance(
+                  [[8., 9., 10., 11.]]),
+              _make_mean_and_var_accumulator_from_instance([[100., -2.]]),
+          ]),
+      dict(
+          testcase_name='WeightedMeanAndVarForVectors',
+          combiner=analyzers.WeightedMeanAndVarCombiner(
+              np.float64, output_shape=(None,)),
+          batches=[
+              _make_mean_and_var_accumulator_from_instance(
+                  [[1., 2., 3.], [4., 5., 6.]], axis=0),
+              _make_mean_and_var_accumulator_from_instance([[7., 8.]],
+                                                           axis=0),
+              _make_mean_and_var_accumulator_from_instance([[0., 1., -3.]],
+                                                           axis=0),
+          ]),
+      dict(
+          testcase_name='WeightedMean',
+          combiner=analyzers.WeightedMeanAndVarCombiner(
+              np.float64,
+              output_shape=(),
+              compute_variance=False,
+              compute_weighted=True),
+          batches=[
+              analyzers._WeightedMeanAndVarAccumulator(
+                  np.array(3), np.array(2.), np.array(0.), np.array(1.5)),
+              analyzers._WeightedMeanAndVarAccumulator(
+                  np.array(2), np.array(-1.), np.array(0.), np.array(.5)),
+              analyzers._WeightedMeanAndVarAccumulator(
+                  np.array(4), np.array(5.), np.array(0.), np.array(2.)),
+          ]),
+      dict(
+          testcase_name='Covariance',
+          combiner=analyzers.CovarianceCombiner((2, 2)),
+          batches=[
+              (np.array([[0., 1.], [2., 3.]]),),
+              (np.array([[4., -1.]]),),
+              (np.array([[1., 1.], [5., 2.], [0., 0.]]),),
+          ]),
+  )
+  def testRetractAccumulators(self, combiner, batches):
+    combiner = pickle.loads(pickle.dumps(combiner))
+    self.assertTrue(combiner.is_retractable)
+    accumulators = [
+        combiner.add_input(combiner.create_accumulator(), batch)
+        for batch in batches
+    ]
+    merged = combiner.merge_accumulators(accumulators)
+
+    retracted = combiner.retract_accumulators(merged, accumulators[1:2])
+    expected = combiner.merge_accumulators(accumulators[::2])
+    for output, expected_output in zip(
+        combiner.extract_output(retracted), combiner.extract_output(expected)):
+      self.assertAllClose(output, expected_output)
+
+    # Retracting all accumulators results in an empty accumulator.
+    retracted = combiner.retract_accumulators(merged, accumulators)
+    expected = combiner.merge_accumulators(
+        [retracted, combiner.add_input(combiner.create_accumulator(),
+                                       batches[0])])
+    for output, expected_output in zip(
+        combiner.extract_output(expected),
+        combiner.extract_output(accumulators[0])):
+      self.assertAllClose(output, expected_output)
+
+  def testMaxCombinerIsNotRetractable(self):
+    combiner = analyzers.NumPyCombiner(
+        fn=np.max,
+        default_accumulator_value=np.nan,
+        output_dtypes=[np.int64],
+        output_shapes=[None])
+    self.assertFalse(combiner.is_retractable)
+    accumulator = combiner.add_input(combiner.create_accumulator(),
+                                     [np.array([1, 2])])
+    with self.assertRaises(NotImplementedError):
+      combiner.retract_accumulators(accumulator, [accumulator])
+
+  def testPCASketchCombinerSketchSize(self):
+    combiner = analyzers.PCASketchCombiner((100, 2), 2, epsilon=0.5,
+                                           oversampling=4)
+    accumulator = combiner.add_input(
+        combiner.create_accumulator(),
+        [np.random.RandomState(0).randn(1000, 100)])
+    self.assertEqual(accumulator.sketch.shape, (10, 100))
+    self.assertEqual(accumulator.count, 1000)
+
+  def testPCASketchAccumulatorCacheCoder(self):
+    combiner = analyzers.PCASketchCombiner((4, 2), 2, oversampling=0)
+    accumulator = combiner.add_input(
+        combiner.create_accumulator(),
+        [np.arange(40, dtype=np.float32).reshape(10, 4)])
+    coder = combiner.accumulator_coder
+    decoded = coder.decode_cache(coder.encode_cache(accumulator))
+    for decoded_value, value in zip(decoded, accumulator):
+      self.assertAllEqual(decoded_value, value)
+
   @test_case.named_parameters(
       {
           'testcase_name': '1d',
@@ -24,5 +24,6 @@ from tensorflow_transform.beam.impl import AnalyzeAndTransformDataset
 from tensorflow_transform.beam.impl import AnalyzeDataset
 from tensorflow_transform.beam.impl import AnalyzeDatasetWithCache
 from tensorflow_transform.beam.impl import TransformDataset
+from tensorflow_transform.beam.parallel_decode import DecodeInProcessPool
 from tensorflow_transform.beam.tft_beam_io import *
 # pylint: enable=wildcard-import
@@ -19,16 +19,20 @@ from __future__ import print_function
 
 import collections
 import copy
+import functools
 import hashlib
+import weakref
 
 # GOOGLE-INITIALIZATION
 
+import six
 import tensorflow as tf
 from tensorflow_transform import analyzer_nodes
 from tensorflow_transform import graph_tools
 from tensorflow_transform import impl_helper
 from tensorflow_transform import nodes
 from tensorflow_transform import tf_utils
+from tensorflow_transform import version
 from tensorflow_transform.beam import analyzer_cache
 from tensorflow_transform.beam import beam_nodes
 from tensorflow_transform.beam import combiner_packing_util
@@ -37,6 +41,10 @@ from tensorflow_transform.beam import combiner_packing_util
 # Used for debugging only. This will point to the most recent graph built.
 _ANALYSIS_GRAPH = None
 
+# A dict from `tf.Graph` to the `_AnalyzerCacheHashMemo` of its nodes.  The
+# memos only hold names and hashes so they don't keep their graphs alive.
+_ANALYZER_CACHE_HASH_MEMOS = weakref.WeakKeyDictionary()
+
 
 def _serialize_op_attr(op_attr):
   """Deterministicly serializes tf.Operation attrs since it is a map."""
@@ -52,18 +60,72 @@ def _serialize_op_attr(op_attr):
   result = []
   for key, attr_value in sorted_attributes:
     result.append(key)
-    attr_value = copy.deepcopy(attr_value)
     if attr_value.list.func:
       raise ValueError(
           'Unable to serialize op attributes that contain a `list.func` field')
     if attr_value.HasField('func'):
       # There should be a separate call for the FuncGraph attributes.
+      attr_value = copy.deepcopy(attr_value)
       attr_value.ClearField('func')
     result.append(attr_value.SerializeToString())
   return result
 
 
-def _describe_path_as_analyzer_cache_hash(x, parents=None):
+def _make_node_hash(x):
+  """Returns a sha1 hash object that was updated with a description of x."""
+  if isinstance(x, tf.Operation):
+    values = _serialize_op_attr(x.node_def.attr)
+  elif isinstance(x, tf.Tensor):
+    # No need to add x.op to the hash since that should be included in parents.
+    values = [tf.compat.as_str_any(x.value_index)]
+  else:
+    assert isinstance(x, (str, bytes))
+    values = [x]
+
+  h = hashlib.sha1()
+  for value in values:
+    encoded = tf.compat.as_bytes(value)
+    h.update(encoded)
+  return h
+
+
+class _AnalyzerCacheHashMemo(object):
+  """Memoizes the analyzer cache hashes of the nodes of a graph.
+
+  The hashes only depend on the graph, so a memo is shared by the graph
+  analyzers of all phases of `build`, and by any later analysis of the same
+  graph.  Nodes are identified by name, which is unique within a graph.
+  """
+
+  def __init__(self):
+    # A dict from node name to the sha1 hash object of the node.
+    self._node_hashes = {}
+    # A dict from (node name, parent path hashes) to the path hash.
+    self._path_hashes = {}
+
+  def get_node_hash(self, x):
+    """Returns a copy of the hash object of x, see `_make_node_hash`."""
+    result = self._node_hashes.get(x.name)
+    if result is None:
+      result = self._node_hashes[x.name] = _make_node_hash(x)
+    return result.copy()
+
+  def get_path_hash(self, x, parents):
+    return self._path_hashes.get((x.name, tuple(parents)))
+
+  def set_path_hash(self, x, parents, path_hash):
+    self._path_hashes[(x.name, tuple(parents))] = path_hash
+
+
+def _get_analyzer_cache_hash_memo(graph):
+  """Returns the `_AnalyzerCacheHashMemo` of the given graph."""
+  result = _ANALYZER_CACHE_HASH_MEMOS.get(graph)
+  if result is None:
+    result = _ANALYZER_CACHE_HASH_MEMOS[graph] = _AnalyzerCacheHashMemo()
+  return result
+
+
+def _describe_path_as_analyzer_cache_hash(x, parents=None, use_memo=False):
   """Constructs a hash to describe a unique TF graph path.
 
   Note: We do not rely on names for hashing since it can be fragile.
@@ -72,6 +134,8 @@ def _describe_path_as_analyzer_cache_hash(x, parents=None):
     x: One of (None, tf.Operation, tf.Tensor, str), the current TF graph node.
     parents: (Optional) a list of bytes, results of previous calls to this
       function, where x was an ancestor to the current node x.
+    use_memo: (Optional) A bool, whether hashes of `tf.Operation`s and
+      `tf.Tensor`s should be memoized in the memo of their graph.
 
   Returns:
     A bytes hash of the path from x to its sources. None if x is None.
@@ -85,24 +149,21 @@ def _describe_path_as_analyzer_cache_hash(x, parents=None):
   if any(p is None for p in parents):
     return None
 
-  if isinstance(x, tf.Operation):
-    values = _serialize_op_attr(x.node_def.attr)
-  elif isinstance(x, tf.Tensor):
-    # No need to add x.op to the hash since that should be included in parents.
-    values = [tf.compat.as_str_any(x.value_index)]
-  else:
-    assert isinstance(x, (str, bytes))
-    values = [x]
-
-  h = hashlib.sha1()
-  for value in values:
-    encoded = tf.compat.as_bytes(value)
-    h.update(encoded)
-
-  for p in parents:
-    h.update(p)
-
-  return h.digest()
+  if not use_memo or not isinstance(x, (tf.Operation, tf.Tensor)):
+    h = _make_node_hash(x)
+    for p in parents:
+      h.update(p)
+    return h.digest()
+
+  memo = _get_analyzer_cache_hash_memo(x.graph)
+  result = memo.get_path_hash(x, parents)
+  if result is None:
+    h = memo.get_node_hash(x)
+    for p in parents:
+      h.update(p)
+    result = h.digest()
+    memo.set_path_hash(x, parents, result)
+  return result
 
 
 def _tensor_name(tensor):
@@ -165,7 +226,7 @@ class _TranslateVisitor(nodes.Visitor):
 class _OptimizationView(
     collections.namedtuple('_OptimizationView', [
         'prefer_fine_grained_view', 'flattened_view', 'fine_grained_view',
-        'hashed_path'
+        'hashed_path', 'cache_entry_key'
     ])):
   """A container for operation outputs during _OptimizeVisitor traversal.
 
@@ -175,14 +236,17 @@ class _OptimizationView(
   `prefer_fine_grained_view` is a hint that means that if True, the
   `fine_grained_view` should be used.  It should be set to true if the upstream
   view has cacheing operations that haven't been flattened yet.
+
+  `cache_entry_key` is the cache entry key of the values in the
+  `fine_grained_view` if they are cacheable, and None otherwise.
   """
 
   def __init__(self, prefer_fine_grained_view, flattened_view,
-               fine_grained_view, hashed_path):
+               fine_grained_view, hashed_path, cache_entry_key):
     if prefer_fine_grained_view and not fine_grained_view:
       raise ValueError(
           'Cannot prefer fine_grained_view when one is not provided')
-    del hashed_path
+    del hashed_path, cache_entry_key
     self._validate_flattened_view(flattened_view)
     self._validate_fine_grained_view(fine_grained_view)
     super(_OptimizationView, self).__init__()
@@ -211,10 +275,15 @@ class _OptimizeVisitor(nodes.Visitor):
   accumulator cache to avoid recomputing them over already seen datasets.
   This type of optimization requires also creating a partitioned view of the
   input data, according to the `is_partitionable` annotation.
+
+  When rolling aggregates are used, the accumulators of retractable combiners
+  are merged by updating a cached aggregate over a previous window of datasets,
+  rather than by merging the accumulators of all datasets.
   """
 
   def __init__(self, dataset_keys, cache_dict, tensor_keys_to_paths,
-               cache_output_nodes):
+               cache_output_nodes, use_rolling_aggregates=False,
+               cache_decisions=None):
     """Init method for _OptimizeVisitor.
 
     Args:
@@ -228,11 +297,18 @@ class _OptimizeVisitor(nodes.Visitor):
         path hash.
       cache_output_nodes: A dictionary from (dataset_key, cache_key) to encoded
         cache ValueNode. This is the output cache for this graph.
+      use_rolling_aggregates: (Optional) A bool, whether retractable combiners
+        should maintain a rolling aggregate over the dataset keys.
+      cache_decisions: (Optional) A list that an
+        `analyzer_cache.CacheDecision` is appended to for each cacheable
+        operation and dataset key.
     """
     self._sorted_dataset_keys = sorted(dataset_keys)
     self._cache_dict = cache_dict
     self._tensor_keys_to_paths = tensor_keys_to_paths
     self.cache_output_nodes = cache_output_nodes
+    self._use_rolling_aggregates = use_rolling_aggregates
+    self._cache_decisions = cache_decisions
 
   def _validate_operation_def(self, operation_def):
     if operation_def.cache_coder is not None:
@@ -283,8 +359,12 @@ class _OptimizeVisitor(nodes.Visitor):
     if self._cache_dict is not None and operation_def.is_partitionable:
       return self._visit_partitionable_operation(operation_def, input_values)
 
-    if input_values and any(v.fine_grained_view and v.prefer_fine_grained_view
-                            for v in input_values):
+    if self._should_use_rolling_aggregate(operation_def, input_values):
+      next_inputs = (self._make_rolling_aggregate(operation_def,
+                                                  input_values[0]),)
+    elif input_values and any(
+        v.fine_grained_view and v.prefer_fine_grained_view
+        for v in input_values):
       # We can 'flatten' the cached outputs of the parent operation since this
       # operation doesn't support partitioning.
       disaggregated_input_values = []
@@ -310,7 +390,106 @@ class _OptimizeVisitor(nodes.Visitor):
             prefer_fine_grained_view=False,
             flattened_view=flat,
             fine_grained_view=None,
-            hashed_path=None) for flat in flattened_view)
+            hashed_path=None,
+            cache_entry_key=None) for flat in flattened_view)
+
+  def _should_use_rolling_aggregate(self, operation_def, upstream_views):
+    if not (self._use_rolling_aggregates and
+            isinstance(operation_def, analyzer_nodes.CacheableCombineMerge) and
+            operation_def.combiner.is_retractable):
+      return False
+    if len(upstream_views) != 1:
+      return False
+    (view,) = upstream_views
+    return (view.prefer_fine_grained_view and
+            view.cache_entry_key is not None)
+
+  def _make_rolling_aggregate(self, operation_def, upstream_view):
+    """Merges accumulators by updating a rolling aggregate.
+
+    The cached rolling aggregate whose window is closest to the current dataset
+    keys is updated by merging the accumulators of the datasets that entered
+    the window and retracting those of the datasets that left it.  If there is
+    no such aggregate, or if updating it would involve more accumulators than
+    merging the accumulators of all datasets, all of them are merged.  The
+    resulting aggregate is also written to cache.
+
+    Args:
+      operation_def: A `CacheableCombineMerge` with a retractable combiner.
+      upstream_view: The `_OptimizationView` of the accumulators to merge.
+
+    Returns:
+      A `ValueNode` of the aggregate over all dataset keys.
+    """
+    combiner = operation_def.combiner
+    cache_entry_key = upstream_view.cache_entry_key
+    dataset_keys = frozenset(self._sorted_dataset_keys)
+
+    rolling_aggregate_key = None
+    window = frozenset()
+    windows = analyzer_cache.get_rolling_aggregate_windows(
+        self._cache_dict.get(analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY, {}),
+        cache_entry_key)
+    # Sorting the candidate windows makes the choice between equally close
+    # windows deterministic.
+    for candidate_key, candidate_window in sorted(windows.items()):
+      # The accumulators of datasets that left the window must be in cache in
+      # order to retract them.
+      if any(
+          self._cache_dict.get(dataset_key, {}).get(cache_entry_key) is None
+          for dataset_key in candidate_window - dataset_keys):
+        continue
+      num_updates = len(candidate_window ^ dataset_keys)
+      if num_updates + 1 >= len(dataset_keys):
+        continue
+      if (rolling_aggregate_key is None or
+          num_updates < len(window ^ dataset_keys)):
+        rolling_aggregate_key, window = candidate_key, candidate_window
+
+    merged_inputs = []
+    retracted_inputs = []
+    if rolling_aggregate_key is not None:
+      (decoded_aggregate,) = nodes.OperationNode(
+          analyzer_nodes.DecodeCache(
+              analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY,
+              rolling_aggregate_key,
+              coder=combiner.accumulator_coder,
+              label='DecodeCache[{}][RollingAggregate]'.format(
+                  operation_def.label)), tuple()).outputs
+      if window == dataset_keys:
+        return decoded_aggregate
+      merged_inputs.append(decoded_aggregate)
+      for retracted_idx, dataset_key in enumerate(
+          sorted(window - dataset_keys)):
+        (retracted,) = nodes.OperationNode(
+            analyzer_nodes.DecodeCache(
+                dataset_key,
+                cache_entry_key,
+                coder=combiner.accumulator_coder,
+                label='DecodeCache[{}][RetractedIndex{}]'.format(
+                    operation_def.label, retracted_idx)), tuple()).outputs
+        retracted_inputs.append(retracted)
+    merged_inputs.extend(
+        upstream_view.fine_grained_view[dataset_key]
+        for dataset_key in self._sorted_dataset_keys
+        if dataset_key not in window)
+
+    rolling_aggregate = nodes.apply_operation(
+        analyzer_nodes.CombineRollingAggregate,
+        *(merged_inputs + retracted_inputs),
+        combiner=combiner,
+        num_retracted=len(retracted_inputs),
+        label='CombineRollingAggregate[{}]'.format(operation_def.label))
+    self.cache_output_nodes[(
+        analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY,
+        analyzer_cache.make_rolling_aggregate_cache_entry_key(
+            cache_entry_key, dataset_keys))] = nodes.apply_operation(
+                analyzer_nodes.EncodeCache,
+                rolling_aggregate,
+                coder=combiner.accumulator_coder,
+                label='EncodeCache[{}][RollingAggregate]'.format(
+                    operation_def.label))
+    return rolling_aggregate
 
   def _visit_partitionable_operation(self, operation_def, upstream_views):
 
@@ -327,12 +506,17 @@ class _OptimizeVisitor(nodes.Visitor):
 
     next_hashed_path = self._make_next_hashed_path(
         [v.hashed_path for v in upstream_views], operation_def)
+    cache_entry_key = None
     if all_fine_grained_views_available:
+      cache_entry_key = analyzer_cache.make_cache_entry_key(
+          tf.compat.as_bytes(operation_def.label) + b'-' + next_hashed_path)
       fine_grained_views = (self._apply_operation_on_fine_grained_view(
           operation_def, tuple(v.fine_grained_view for v in upstream_views),
-          next_hashed_path),)
+          cache_entry_key),)
     else:
       fine_grained_views = (None,) * operation_def.num_outputs
+    if operation_def.cache_coder is None:
+      cache_entry_key = None
 
     flattened_views = nodes.OperationNode(
         operation_def, tuple(v.flattened_view for v in upstream_views)).outputs
@@ -343,12 +527,13 @@ class _OptimizeVisitor(nodes.Visitor):
             prefer_fine_grained_view=prefer_fine_grained_view,
             flattened_view=flat,
             fine_grained_view=fine,
-            hashed_path=next_hashed_path)
+            hashed_path=next_hashed_path,
+            cache_entry_key=cache_entry_key)
         for flat, fine in zip(flattened_views, fine_grained_views))
 
   def _apply_operation_on_fine_grained_view(self, operation_def,
                                             fine_grained_views,
-                                            next_hashed_path):
+                                            cache_entry_key):
     """Applies a shardable operation on a fine grained view.
 
     This also updates `cache_output_nodes` when necessary.
@@ -356,7 +541,7 @@ class _OptimizeVisitor(nodes.Visitor):
     Args:
       operation_def: A shardable `OperationDef`.
       fine_grained_views: A tuple of `_OptimizationView.fine_grained_view`s.
-      next_hashed_path: The hashed path for the currently processed
+      cache_entry_key: The cache entry key for the currently processed
         operation_def.
 
     Returns:
@@ -364,14 +549,24 @@ class _OptimizeVisitor(nodes.Visitor):
     """
     result_fine_grained_view = collections.OrderedDict()
 
-    cache_entry_key = analyzer_cache.make_cache_entry_key(
-        tf.compat.as_bytes(operation_def.label) + b'-' + next_hashed_path)
-
     for (dataset_idx, dataset_key) in enumerate(self._sorted_dataset_keys):
       # We use an index for the label in order to make beam labels more stable.
       infix = 'AnalysisIndex{}'.format(dataset_idx)
-      if (operation_def.cache_coder and self._cache_dict.get(
-          dataset_key, {}).get(cache_entry_key) is not None):
+      is_cache_hit = (
+          operation_def.cache_coder and
+          self._cache_dict.get(dataset_key, {}).get(cache_entry_key) is not None)
+      if operation_def.cache_coder and self._cache_decisions is not None:
+        self._cache_decisions.append(
+            analyzer_cache.CacheDecision(
+                label=operation_def.label,
+                dataset_key=dataset_key,
+                cache_entry_key=cache_entry_key,
+                is_hit=bool(is_cache_hit),
+                miss_reason=None if is_cache_hit else
+                analyzer_cache.get_cache_miss_reason(
+                    self._cache_dict.get(dataset_key), cache_entry_key,
+                    operation_def.label)))
+      if is_cache_hit:
         decode_cache = analyzer_nodes.DecodeCache(
             dataset_key,
             cache_entry_key,
@@ -424,7 +619,8 @@ class _OptimizeVisitor(nodes.Visitor):
         prefer_fine_grained_view=False,
         flattened_view=flattened_view,
         fine_grained_view=fine_grained_view,
-        hashed_path=b'APPLY_SAVEDMODEL'),)
+        hashed_path=b'APPLY_SAVEDMODEL',
+        cache_entry_key=None),)
 
   def validate_value(self, value):
     assert isinstance(value, _OptimizationView), value
@@ -435,11 +631,13 @@ class _OptimizeVisitor(nodes.Visitor):
 
 
 def _perform_cache_optimization(saved_model_future, dataset_keys,
-                                tensor_keys_to_paths, cache_dict):
+                                tensor_keys_to_paths, cache_dict,
+                                use_rolling_aggregates, cache_decisions):
   """Performs cache optimization on the given graph."""
   cache_output_nodes = {}
   optimize_visitor = _OptimizeVisitor(dataset_keys or {}, cache_dict,
-                                      tensor_keys_to_paths, cache_output_nodes)
+                                      tensor_keys_to_paths, cache_output_nodes,
+                                      use_rolling_aggregates, cache_decisions)
   optimize_traverser = nodes.Traverser(optimize_visitor)
   optimized = optimize_traverser.visit_value_node(
       saved_model_future).flattened_view
@@ -466,16 +664,133 @@ class _InspectVisitor(nodes.Visitor):
     assert isinstance(value, nodes.ValueNode)
 
 
+class _InspectCacheVisitor(nodes.Visitor):
+  """A visitor that looks for the cache entries decoded by the graph."""
+
+  def __init__(self, required_cache_entry_keys_output):
+    self._required_cache_entry_keys = required_cache_entry_keys_output
+
+  def visit(self, operation_def, input_values):
+    if isinstance(operation_def, analyzer_nodes.DecodeCache):
+      self._required_cache_entry_keys[operation_def.dataset_key].add(
+          operation_def.cache_key)
+    return nodes.OperationNode(operation_def, input_values).outputs
+
+  def validate_value(self, value):
+    assert isinstance(value, nodes.ValueNode)
+
+
+def get_required_cache_entry_keys(transform_fn_future):
+  """Computes the cache entries that are read by an analysis graph.
+
+  Args:
+    transform_fn_future: The `ValueNode` returned by `build`.
+
+  Returns:
+    A dict from dataset key to the set of cache entry keys that are read for
+    that dataset key.  Dataset keys whose cache is not read are omitted.
+  """
+  result = collections.defaultdict(set)
+  inspect_traverser = nodes.Traverser(_InspectCacheVisitor(result))
+  _ = inspect_traverser.visit_value_node(transform_fn_future)
+  return dict(result)
+
+
+def _describe_attribute_for_fingerprint(value):
+  """Describes an attribute of a combiner without using memory addresses."""
+  if isinstance(value, functools.partial):
+    return 'partial({}, {}, {})'.format(
+        _describe_attribute_for_fingerprint(value.func),
+        [_describe_attribute_for_fingerprint(arg) for arg in value.args],
+        sorted((key, _describe_attribute_for_fingerprint(arg))
+               for key, arg in six.iteritems(value.keywords or {})))
+  if callable(value) and hasattr(value, '__name__'):
+    return '{}.{}'.format(getattr(value, '__module__', None), value.__name__)
+  return repr(value)
+
+
+class _FingerprintVisitor(nodes.Visitor):
+  """A visitor that computes a fingerprint of each value of the graph.
+
+  The fingerprint of a value that depends on input data is None, since it can't
+  be known without reading the data.
+  """
+
+  def _describe_field(self, operation_def, field):
+    value = getattr(operation_def, field)
+    if isinstance(value, analyzer_nodes.Combiner):
+      # The str representation of combiners doesn't include their parameters.
+      # Attributes whose representation varies across runs, such as objects
+      # without a custom repr, only cause the fingerprint to change.
+      return '{}{}'.format(
+          value,
+          sorted((name, _describe_attribute_for_fingerprint(attribute))
+                 for name, attribute in six.iteritems(
+                     getattr(value, '__dict__', {}))))
+    if isinstance(operation_def, analyzer_nodes.DecodeCache):
+      if field == 'cache_key':
+        return value
+    return operation_def.get_field_str(field)
+
+  def visit(self, operation_def, input_values):
+    if (isinstance(operation_def, beam_nodes.ExtractInputForSavedModel) or
+        any(value is None for value in input_values)):
+      return (None,) * operation_def.num_outputs
+
+    hash_container = hashlib.sha1(
+        tf.compat.as_bytes(operation_def.__class__.__name__))
+    for field in operation_def._fields:
+      hash_container.update(
+          tf.compat.as_bytes(
+              str((field, self._describe_field(operation_def, field)))))
+    for value in input_values:
+      hash_container.update(value)
+    digest = hash_container.digest()
+    return tuple(
+        digest + tf.compat.as_bytes(str(idx))
+        for idx in range(operation_def.num_outputs))
+
+  def validate_value(self, value):
+    assert value is None or isinstance(value, bytes)
+
+
+def get_transform_fn_fingerprint(graph, transform_fn_future, dataset_keys):
+  """Computes a fingerprint of the transform_fn that an analysis graph outputs.
+
+  Two analysis graphs with the same fingerprint output the same transform_fn,
+  assuming that the datasets and their cache don't change once written.  The
+  cache that is read is identified by its cache entry keys, which don't depend
+  on where the cache is stored, so the fingerprint is the same for a copy of
+  the cache or after the cache is compacted.
+
+  Args:
+    graph: The `tf.Graph` that the analysis graph was built from.
+    transform_fn_future: The `ValueNode` returned by `build`.
+    dataset_keys: An iterable of the `DatasetKey`s that are analyzed.
+
+  Returns:
+    A bytes fingerprint, or None if the analysis graph reads input data.
+  """
+  fingerprint = nodes.Traverser(_FingerprintVisitor()).visit_value_node(
+      transform_fn_future)
+  if fingerprint is None:
+    return None
+  hash_container = hashlib.sha1(fingerprint)
+  for dataset_key in sorted(dataset_keys):
+    hash_container.update(tf.compat.as_bytes(str(dataset_key)))
+  hash_container.update(tf.compat.as_bytes(tf.version.VERSION))
+  hash_container.update(tf.compat.as_bytes(version.__version__))
+  hash_container.update(graph.as_graph_def().SerializeToString(
+      deterministic=True))
+  return hash_container.digest()
+
+
 def _build_analysis_graph_for_inspection(
     preprocessing_fn, specs, dataset_keys, input_cache):
   """Builds the analysis graph for inspection."""
-  with tf.compat.v1.Graph().as_default() as graph:
-    with tf.compat.v1.name_scope('inputs'):
-      input_signature = impl_helper.batched_placeholders_from_specs(specs)
-      # TODO(b/34288791): This needs to be exactly the same as in impl.py
-      copied_inputs = impl_helper.copy_tensors(input_signature)
-
-    output_signature = preprocessing_fn(copied_inputs)
+  graph, input_signature, output_signature = (
+      impl_helper.trace_preprocessing_function(
+          preprocessing_fn, specs, use_tf_compat_v1=True))
   transform_fn_future, cache_dict = build(
       graph,
       input_signature,
@@ -501,7 +816,19 @@ def get_analysis_dataset_keys(
   """
   transform_fn_future, _ = _build_analysis_graph_for_inspection(
       preprocessing_fn, specs, dataset_keys, input_cache)
+  return get_read_dataset_keys(transform_fn_future, dataset_keys)
+
 
+def get_read_dataset_keys(transform_fn_future, dataset_keys):
+  """Computes the dataset keys whose input data an analysis graph reads.
+
+  Args:
+    transform_fn_future: The analysis graph returned by `build`.
+    dataset_keys: The dataset keys that the graph was built with.
+
+  Returns:
+    A set of dataset keys whose input data is read by the graph.
+  """
   result = set()
   inspect_visitor = _InspectVisitor(result)
   inspect_traverser = nodes.Traverser(inspect_visitor)
@@ -535,7 +862,9 @@ def build(graph,
           input_signature,
           output_signature,
           dataset_keys=None,
-          cache_dict=None):
+          cache_dict=None,
+          use_rolling_aggregates=False,
+          cache_decisions=None):
   """Returns a list of `Phase`s describing how to execute the pipeline.
 
   The default graph is assumed to contain some `Analyzer`s which must be
@@ -576,6 +905,14 @@ def build(graph,
     dataset_keys: (Optional) A set of strings which are dataset keys, they
       uniquely identify these datasets across analysis runs.
     cache_dict: (Optional): A cache dictionary.
+    use_rolling_aggregates: (Optional) A bool, whether retractable combiners
+      should update a cached rolling aggregate over a previous window of
+      dataset keys instead of merging the accumulators of all dataset keys.
+      Rolling aggregates are cached under
+      `analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY`.
+    cache_decisions: (Optional) A list that an `analyzer_cache.CacheDecision`
+      is appended to for each cacheable operation and dataset key, describing
+      whether its output is read from `cache_dict` and if not, why.
 
   Returns:
     A pair of:
@@ -611,7 +948,8 @@ def build(graph,
     # in this phase, based in whether their dependencies are ready.
     graph_analyzer = graph_tools.InitializableGraphAnalyzer(
         graph, input_signature, list(sink_tensors_ready.items()),
-        _describe_path_as_analyzer_cache_hash)
+        functools.partial(_describe_path_as_analyzer_cache_hash,
+                          use_memo=True))
     ready_traverser = nodes.Traverser(_ReadyVisitor(graph_analyzer))
 
     # Now create and apply a SavedModel with all tensors in tensor_bindings
@@ -622,6 +960,7 @@ def build(graph,
         *tensor_bindings,
         table_initializers=tuple(graph_analyzer.ready_table_initializers),
         output_signature=intermediate_output_signature,
+        analysis_only=True,
         label='CreateSavedModelForAnalyzerInputs[{}]'.format(infix))
 
     extracted_values_dict = nodes.apply_operation(
@@ -672,6 +1011,7 @@ def build(graph,
       table_initializers=tuple(
           graph.get_collection(tf.compat.v1.GraphKeys.TABLE_INITIALIZERS)),
       output_signature=output_signature,
+      analysis_only=False,
       label='CreateSavedModel')
 
   tensor_keys_to_paths = {
@@ -681,7 +1021,8 @@ def build(graph,
   }
   (optimized_saved_model_future,
    output_cache_value_nodes) = _perform_cache_optimization(
-       saved_model_future, dataset_keys, tensor_keys_to_paths, cache_dict)
+       saved_model_future, dataset_keys, tensor_keys_to_paths, cache_dict,
+       use_rolling_aggregates, cache_decisions)
 
   (optimized_saved_model_future, output_cache_value_nodes) = (
       combiner_packing_util.perform_combiner_packing_optimization(
@@ -17,17 +17,26 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import binascii
 import collections
+from concurrent import futures
+import contextlib
+import json
 import os
 import pickle
 import re
+import struct
 import sys
+import time
+import uuid
+import zlib
 
 # GOOGLE-INITIALIZATION
 
 import apache_beam as beam
 import six
 import tensorflow as tf
+from tensorflow_transform.beam.tft_beam_io import transform_fn_io
 
 # This should be advanced whenever a non-backwards compatible change is made
 # that affects analyzer cache. For example, changing accumulator format.
@@ -35,6 +44,27 @@ _CACHE_VERSION_NUMBER = 1
 _CACHE_VERSION = tf.compat.as_bytes('__v{}__{}.{}_'.format(
     _CACHE_VERSION_NUMBER, sys.version_info.major, sys.version_info.minor))
 
+# The maximum number of manifests that are read concurrently.
+_MAX_CONCURRENT_MANIFEST_READS = 32
+
+# Cache entries accessed more recently than this are not evicted by default
+# when compacting the cache.
+_DEFAULT_MIN_AGE_SECONDS = 24 * 60 * 60
+
+# Compacting the cache keeps this many of the most recent cache plans by
+# default.
+_DEFAULT_MAX_CACHE_PLANS = 100
+
+# Writers and compactions of a cache wait this long for its lock before failing.
+_LOCK_TIMEOUT_SECONDS = 10 * 60
+_LOCK_POLL_INTERVAL_SECONDS = 1
+# The lock is only held while updating manifests, so a lock that was acquired
+# longer ago than this was left by a holder that crashed, and is taken over.
+_LOCK_LEASE_SECONDS = 5 * 60
+# Filesystems whose renames are not atomic, so the lock doesn't serialize
+# updates of concurrent pipelines.
+_NON_ATOMIC_RENAME_SCHEMES = ('gs://', 's3://')
+
 _CACHE_COMPONENT_CHARACTER_REPLACEMENTS = (
     ('/', '-'),
     ('\\', '-'),
@@ -85,19 +115,57 @@ def _make_flattened_dataset_key():
   return DatasetKey(DatasetKey._FLATTENED_DATASET_KEY)  # pylint: disable=protected-access
 
 
+# The dataset key that the rolling aggregates of windowed analysis are cached
+# under.
+ROLLING_AGGREGATE_DATASET_KEY = DatasetKey('__ROLLING_AGGREGATES__')
+
+# Separates the cache entry key of the aggregated accumulators from the dataset
+# keys of the window in the cache entry key of a rolling aggregate.  Dataset
+# keys can't contain '[' so the last occurrence of this is the separator.
+_ROLLING_AGGREGATE_WINDOW_INFIX = b'-Window['
+
+# The directory of the cache base directory that transform_fns are stored in.
+# It has no manifest, and stored transform_fns are named by the hex of their
+# fingerprint.
+_TRANSFORM_FN_STORE_DIR = '__TRANSFORM_FNS__'
+
+# The dataset key that `get_cache_entry_stats` and `compact_analysis_cache`
+# report stored transform_fns under.  Their cache entry keys are the
+# fingerprints of the transform_fns.
+TRANSFORM_FN_STORE_DATASET_KEY = DatasetKey(_TRANSFORM_FN_STORE_DIR)
+
+# The directory of the cache base directory that cache plans are written to.
+_CACHE_PLAN_DIR = '__CACHE_PLANS__'
+
+# Matches the version prefix of cache entry keys, see `_CACHE_VERSION`.
+_CACHE_VERSION_REGEX = re.compile(br'^__v[0-9]+__[0-9]+\.[0-9]+_')
+
+# Reasons for an analyzer's accumulators of a dataset not being in cache.
+CACHE_MISS_NEW_DATASET_KEY = 'new_dataset_key'
+CACHE_MISS_CHANGED_PATH_HASH = 'changed_path_hash'
+CACHE_MISS_VERSION_MISMATCH = 'version_mismatch'
+CACHE_MISS_NOT_CACHED = 'not_cached'
+
+
 def _get_dataset_cache_path(base_dir, dataset_key):
   return os.path.join(base_dir, dataset_key.key)
 
 
 class _ManifestFile(object):
-  """A manifest file wrapper used to read and write tft cache manifest files."""
+  """A manifest file wrapper used to read and write tft cache manifest files.
+
+  The manifest maps cache entry keys to cache key indices.  It also stores the
+  next cache key index to assign, so that an index is never reused after its
+  entry is evicted, and cache files are never mistaken for another entry's.
+  """
 
   # TODO(b/37788560): Use artifacts instead.
-  _MANIFEST_FILE_NAME = 'MANIFEST'
+  MANIFEST_FILE_NAME = 'MANIFEST'
+  _NEXT_CACHE_KEY_INDEX_KEY = '__next_cache_key_index__'
 
   def __init__(self, base_path):
     self._base_path = base_path
-    self._manifest_path = os.path.join(base_path, self._MANIFEST_FILE_NAME)
+    self._manifest_path = os.path.join(base_path, self.MANIFEST_FILE_NAME)
     self._file = None
 
   def _open(self):
@@ -137,7 +205,7 @@ class _ManifestFile(object):
                                  str(e))
       return {}
 
-  def read(self):
+  def _read_contents(self):
     if not tf.io.gfile.exists(self._manifest_path):
       return {}
 
@@ -147,7 +215,33 @@ class _ManifestFile(object):
       with tf.io.gfile.GFile(self._manifest_path, 'rb') as f:
         return self._get_manifest_contents(f)
 
-  def write(self, manifest):
+  def read(self):
+    """Returns a dict from cache entry key to cache key index."""
+    contents = self._read_contents()
+    contents.pop(self._NEXT_CACHE_KEY_INDEX_KEY, None)
+    return contents
+
+  def read_next_cache_key_index(self):
+    """Returns the next cache key index to assign."""
+    contents = self._read_contents()
+    next_cache_key_idx = contents.pop(self._NEXT_CACHE_KEY_INDEX_KEY, 0)
+    # Manifests written before the next index was stored only have entries.
+    if contents:
+      next_cache_key_idx = max(next_cache_key_idx, max(contents.values()) + 1)
+    return next_cache_key_idx
+
+  def write(self, manifest, next_cache_key_idx):
+    """Writes the manifest.
+
+    Should only be called while holding the `_CacheLock` of the cache.
+
+    Args:
+      manifest: A dict from cache entry key to cache key index.
+      next_cache_key_idx: The next cache key index to assign, which must be
+        greater than all indices that were ever assigned.
+    """
+    contents = dict(manifest)
+    contents[self._NEXT_CACHE_KEY_INDEX_KEY] = next_cache_key_idx
     try:
       # First attempt to delete the manifest if it exists in case it can't be
       # edited in-place.
@@ -157,14 +251,829 @@ class _ManifestFile(object):
     self._open()
     # Manifests are small, so writing in a semi-human readable form (protocol=0)
     # is preferred over the efficiency gains of higher protocols.
-    self._file.write(pickle.dumps(manifest, protocol=0))
+    self._file.write(pickle.dumps(contents, protocol=0))
+
+
+def _read_manifests(cache_base_dir, dataset_keys):
+  """Reads the manifests of the given dataset keys concurrently.
+
+  Args:
+    cache_base_dir: A str, the path that the cache is stored in.
+    dataset_keys: An iterable of `DatasetKey`s.
+
+  Returns:
+    A dict from `DatasetKey` to a dict from cache entry key to cache key index.
+    Dataset keys without cache are omitted.
+  """
+  dataset_keys = list(dataset_keys)
+  if not dataset_keys:
+    return {}
+
+  def read_manifest(dataset_key):
+    return _ManifestFile(_get_dataset_cache_path(cache_base_dir,
+                                                 dataset_key)).read()
+
+  with futures.ThreadPoolExecutor(
+      max_workers=min(len(dataset_keys),
+                      _MAX_CONCURRENT_MANIFEST_READS)) as executor:
+    manifests = list(executor.map(read_manifest, dataset_keys))
+  return {
+      dataset_key: manifest
+      for dataset_key, manifest in zip(dataset_keys, manifests)
+      if manifest
+  }
+
+
+class _AccessLog(object):
+  """Records writes and reads of the cache entries of a dataset key.
+
+  Each access is recorded into a new file in the log directory, so that
+  pipelines sharing a cache directory never write to the same file.  Records
+  are tuples of (cache key index, timestamp, hit count).
+  """
+
+  _LOG_DIR_NAME = 'ACCESS_LOG'
+
+  def __init__(self, base_path):
+    self._log_dir = os.path.join(base_path, self._LOG_DIR_NAME)
+
+  def _write_records(self, records):
+    if not tf.io.gfile.isdir(self._log_dir):
+      tf.io.gfile.makedirs(self._log_dir)
+    log_path = os.path.join(self._log_dir, uuid.uuid4().hex)
+    with tf.io.gfile.GFile(log_path, 'wb') as f:
+      f.write(pickle.dumps(records, protocol=0))
+
+  def _read_records(self):
+    """Returns the paths of the log files read and the records they contain."""
+    if not tf.io.gfile.isdir(self._log_dir):
+      return [], []
+    log_paths, records = [], []
+    for file_name in tf.io.gfile.listdir(self._log_dir):
+      log_path = os.path.join(self._log_dir, file_name)
+      try:
+        with tf.io.gfile.GFile(log_path, 'rb') as f:
+          records.extend(pickle.loads(f.read()))
+      except Exception as e:  # pylint: disable=broad-except
+        # The file may have been removed by a concurrent compaction, or not be
+        # completely written yet.  Either way its accesses are not lost, so it
+        # is fine to skip it.
+        tf.compat.v1.logging.warning('Can\'t read cache access log %s: %s',
+                                     log_path, str(e))
+        continue
+      log_paths.append(log_path)
+    return log_paths, records
+
+  def record(self, cache_key_indices, is_hit):
+    """Records an access of the given cache entries.
+
+    Args:
+      cache_key_indices: An iterable of cache key indices.
+      is_hit: A bool, whether the entries are read (as opposed to written).
+    """
+    timestamp = time.time()
+    records = [(cache_key_idx, timestamp, int(is_hit))
+               for cache_key_idx in cache_key_indices]
+    if records:
+      self._write_records(records)
+
+  def read(self):
+    """Returns a dict from cache key index to (last access time, hit count)."""
+    _, records = self._read_records()
+    return _aggregate_access_records(records)
+
+  def consolidate(self, cache_key_indices):
+    """Replaces the log files with a single one.
+
+    Only safe to call while holding the `_CacheLock` of the cache.
+
+    Args:
+      cache_key_indices: A container of the cache key indices whose accesses
+        should be kept.
+    """
+    log_paths, records = self._read_records()
+    if not log_paths:
+      return
+    accesses = _aggregate_access_records(records)
+    self._write_records([
+        (cache_key_idx, last_access_time, hit_count)
+        for cache_key_idx, (last_access_time, hit_count) in accesses.items()
+        if cache_key_idx in cache_key_indices
+    ])
+    for log_path in log_paths:
+      tf.io.gfile.remove(log_path)
+
+
+def _aggregate_access_records(records):
+  result = {}
+  for cache_key_idx, timestamp, hit_count in records:
+    last_access_time, total_hit_count = result.get(cache_key_idx, (0., 0))
+    result[cache_key_idx] = (max(last_access_time, timestamp),
+                             total_hit_count + hit_count)
+  return result
+
+
+class _CacheLock(object):
+  """A lock file that serializes updates of the manifests of a cache.
+
+  Writers of cache hold it while assigning cache key indices and while adding
+  written entries to a manifest, and compactions hold it while removing evicted
+  entries.
+
+  The lock file is created by renaming a temporary file without overwriting,
+  which only excludes other holders on filesystems with atomic renames, such as
+  local filesystems and HDFS.  On object stores such as GCS and S3 a rename is
+  a copy followed by a delete, so concurrent pipelines may hold the lock at the
+  same time.
+
+  The lock file contains the time it was acquired at and a unique token.  A
+  lock acquired more than `_LOCK_LEASE_SECONDS` ago is stale and taken over.
+  """
+
+  _LOCK_FILE_NAME = 'LOCK'
+
+  def __init__(self, cache_base_dir):
+    self._cache_base_dir = cache_base_dir
+    self._lock_path = os.path.join(cache_base_dir, self._LOCK_FILE_NAME)
+    self._acquired = False
+    self._contents = None
+
+  def _try_acquire(self):
+    temp_path = '{}.{}'.format(self._lock_path, uuid.uuid4().hex)
+    self._contents = tf.compat.as_bytes('{} {}'.format(time.time(),
+                                                       uuid.uuid4().hex))
+    with tf.io.gfile.GFile(temp_path, 'wb') as f:
+      f.write(self._contents)
+    try:
+      tf.io.gfile.rename(temp_path, self._lock_path, overwrite=False)
+      self._acquired = True
+    except tf.errors.AlreadyExistsError:
+      tf.io.gfile.remove(temp_path)
+    return self._acquired
+
+  def _try_take_over_stale_lock(self):
+    """Removes the lock file if it is stale.
+
+    The lock file is moved aside before it is removed, so that of concurrent
+    pipelines that found it stale only one removes it.  If it was replaced by a
+    new lock in the meantime, the new lock is moved back.
+    """
+    try:
+      with tf.io.gfile.GFile(self._lock_path, 'rb') as f:
+        contents = f.read()
+      try:
+        acquire_time = float(contents.split()[0])
+      except (IndexError, ValueError):
+        # Lock files are written completely before they are renamed, so this
+        # is not a lock written by `_try_acquire`.
+        acquire_time = tf.io.gfile.stat(self._lock_path).mtime_nsec / 1e9
+    except tf.errors.NotFoundError:
+      return
+    if time.time() - acquire_time < _LOCK_LEASE_SECONDS:
+      return
+    stale_path = '{}.{}.stale'.format(self._lock_path, uuid.uuid4().hex)
+    try:
+      tf.io.gfile.rename(self._lock_path, stale_path, overwrite=False)
+    except tf.errors.NotFoundError:
+      return
+    with tf.io.gfile.GFile(stale_path, 'rb') as f:
+      moved_contents = f.read()
+    if moved_contents != contents:
+      try:
+        tf.io.gfile.rename(stale_path, self._lock_path, overwrite=False)
+      except tf.errors.AlreadyExistsError:
+        tf.io.gfile.remove(stale_path)
+      return
+    tf.compat.v1.logging.warning(
+        'Took over the lock of the analysis cache in %s, which was acquired at '
+        '%s and not released.', self._cache_base_dir, time.ctime(acquire_time))
+    tf.io.gfile.remove(stale_path)
+
+  def acquire(self):
+    """Returns whether the lock was acquired within `_LOCK_TIMEOUT_SECONDS`."""
+    if self._cache_base_dir.startswith(_NON_ATOMIC_RENAME_SCHEMES):
+      tf.compat.v1.logging.warning(
+          'The analysis cache in %s is on a filesystem without atomic renames, '
+          'concurrent pipelines writing or compacting it may lose updates of '
+          'its manifests.', self._cache_base_dir)
+    if not tf.io.gfile.isdir(self._cache_base_dir):
+      tf.io.gfile.makedirs(self._cache_base_dir)
+    deadline = time.time() + _LOCK_TIMEOUT_SECONDS
+    while not self._try_acquire():
+      if time.time() >= deadline:
+        return False
+      self._try_take_over_stale_lock()
+      time.sleep(_LOCK_POLL_INTERVAL_SECONDS)
+    return True
+
+  def release(self):
+    if not self._acquired:
+      return
+    self._acquired = False
+    try:
+      with tf.io.gfile.GFile(self._lock_path, 'rb') as f:
+        contents = f.read()
+    except tf.errors.NotFoundError:
+      contents = None
+    # The lock was taken over if it was held for longer than its lease.
+    if contents != self._contents:
+      tf.compat.v1.logging.warning(
+          'The lock of the analysis cache in %s was taken over before it was '
+          'released.', self._cache_base_dir)
+      return
+    tf.io.gfile.remove(self._lock_path)
+
+  @property
+  def lock_path(self):
+    return self._lock_path
+
+
+@contextlib.contextmanager
+def _hold_cache_lock(cache_base_dir):
+  """A context manager that holds the `_CacheLock` of a cache.
+
+  Args:
+    cache_base_dir: A str, the path that the cache is stored in.
+
+  Yields:
+    Nothing.
+
+  Raises:
+    RuntimeError: If the lock can't be acquired within `_LOCK_TIMEOUT_SECONDS`.
+  """
+  lock = _CacheLock(cache_base_dir)
+  if not lock.acquire():
+    raise RuntimeError(
+        'Timed out waiting for the lock of the analysis cache in {}. It is '
+        'taken over once it was held for {} seconds, or can be removed at {} '
+        'if no other pipeline is updating the cache.'.format(
+            cache_base_dir, _LOCK_LEASE_SECONDS, lock.lock_path))
+  try:
+    yield
+  finally:
+    lock.release()
+
+
+def _get_cache_entry_file_paths(dataset_cache_path, cache_key_idx):
+  return tf.io.gfile.glob('{}{}'.format(
+      os.path.join(dataset_cache_path, str(cache_key_idx)), '-*-of-*'))
+
+
+def _remove_orphaned_cache_files(dataset_cache_path, cache_key_indices,
+                                 min_age_seconds):
+  """Removes cache files whose cache key index is not in the manifest.
+
+  These are left behind by pipelines that failed after writing cache files, or
+  whose entries were written again under a new index.  Files that are more
+  recent than `min_age_seconds` may belong to a pipeline that is still writing
+  cache, and are kept.
+
+  Args:
+    dataset_cache_path: A str, the path of the cache of a dataset key.
+    cache_key_indices: A container of the cache key indices in the manifest.
+    min_age_seconds: The time in seconds since a file was modified below which
+      it is never removed.
+  """
+  now = time.time()
+  for path in tf.io.gfile.glob(os.path.join(dataset_cache_path, '*-*-of-*')):
+    cache_key_idx = os.path.basename(path).split('-', 1)[0]
+    if not cache_key_idx.isdigit() or int(cache_key_idx) in cache_key_indices:
+      continue
+    if now - tf.io.gfile.stat(path).mtime_nsec / 1e9 >= min_age_seconds:
+      tf.io.gfile.remove(path)
+
+
+class CacheEntryStats(
+    collections.namedtuple('CacheEntryStats', [
+        'dataset_key', 'cache_entry_key', 'size_bytes', 'last_access_time',
+        'hit_count'
+    ])):
+  """Usage statistics of an analysis cache entry.
+
+  Fields:
+    dataset_key: The `DatasetKey` of the entry.
+    cache_entry_key: The cache entry key.
+    size_bytes: The total size of the files of the entry.
+    last_access_time: The time in seconds since the epoch at which the entry
+      was last written or read.
+    hit_count: The number of times the entry was read by
+      `ReadAnalysisCacheFromFS`.
+  """
 
 
-class _WriteToTFRecordGzip(beam.io.WriteToTFRecord):
+def _get_total_size_and_mtime(path):
+  """Returns the total size and latest modification time of a directory."""
+  size_bytes, mtime = 0, 0.
+  for dir_path, _, file_names in tf.io.gfile.walk(path):
+    for file_name in file_names:
+      file_stat = tf.io.gfile.stat(os.path.join(dir_path, file_name))
+      size_bytes += file_stat.length
+      mtime = max(mtime, file_stat.mtime_nsec / 1e9)
+  return size_bytes, mtime
 
-  def __init__(self, file_path_prefix):
-    super(_WriteToTFRecordGzip, self).__init__(
-        file_path_prefix, file_name_suffix='.gz')
+
+def _list_stored_transform_fns(store_path):
+  """Returns the names of the transform_fns in the store, skipping temp dirs."""
+  if not tf.io.gfile.isdir(store_path):
+    return []
+  result = []
+  for name in tf.io.gfile.listdir(store_path):
+    name = name.rstrip('/')
+    try:
+      binascii.unhexlify(name)
+    except (binascii.Error, TypeError):
+      continue
+    result.append(name)
+  return result
+
+
+def _get_transform_fn_store_entry_stats(cache_base_dir):
+  """Returns a dict from stored transform_fn name to `CacheEntryStats`."""
+  store_path = os.path.join(cache_base_dir, _TRANSFORM_FN_STORE_DIR)
+  accesses = _AccessLog(store_path).read()
+  result = {}
+  for name in _list_stored_transform_fns(store_path):
+    last_access_time, hit_count = accesses.get(name, (0., 0))
+    size_bytes, mtime = _get_total_size_and_mtime(
+        os.path.join(store_path, name))
+    result[name] = CacheEntryStats(
+        dataset_key=TRANSFORM_FN_STORE_DATASET_KEY,
+        cache_entry_key=binascii.unhexlify(name),
+        size_bytes=size_bytes,
+        last_access_time=max(last_access_time, mtime),
+        hit_count=hit_count)
+  return result
+
+
+def _get_dataset_cache_entry_stats(cache_base_dir, dataset_key):
+  """Returns a dict from cache key index to `CacheEntryStats`."""
+  if dataset_key == TRANSFORM_FN_STORE_DATASET_KEY:
+    return _get_transform_fn_store_entry_stats(cache_base_dir)
+  dataset_cache_path = _get_dataset_cache_path(cache_base_dir, dataset_key)
+  manifest = _ManifestFile(dataset_cache_path).read()
+  accesses = _AccessLog(dataset_cache_path).read()
+  result = {}
+  for cache_entry_key, cache_key_idx in manifest.items():
+    last_access_time, hit_count = accesses.get(cache_key_idx, (0., 0))
+    size_bytes = 0
+    for path in _get_cache_entry_file_paths(dataset_cache_path, cache_key_idx):
+      file_stat = tf.io.gfile.stat(path)
+      size_bytes += file_stat.length
+      # Entries written before accesses were recorded are only known by the
+      # modification time of their files.
+      last_access_time = max(last_access_time, file_stat.mtime_nsec / 1e9)
+    result[cache_key_idx] = CacheEntryStats(
+        dataset_key=dataset_key,
+        cache_entry_key=cache_entry_key,
+        size_bytes=size_bytes,
+        last_access_time=last_access_time,
+        hit_count=hit_count)
+  return result
+
+
+def _list_dataset_keys(cache_base_dir):
+  if not tf.io.gfile.isdir(cache_base_dir):
+    return []
+  result = [
+      DatasetKey(name.rstrip('/'))
+      for name in tf.io.gfile.listdir(cache_base_dir)
+      if tf.io.gfile.exists(
+          os.path.join(cache_base_dir, name, _ManifestFile.MANIFEST_FILE_NAME))
+  ]
+  if _list_stored_transform_fns(
+      os.path.join(cache_base_dir, _TRANSFORM_FN_STORE_DIR)):
+    result.append(TRANSFORM_FN_STORE_DATASET_KEY)
+  return result
+
+
+def get_cache_entry_stats(cache_base_dir, dataset_keys=None):
+  """Returns usage statistics of the analysis cache entries in a directory.
+
+  Args:
+    cache_base_dir: A str, the path that the cache is stored in.
+    dataset_keys: (Optional) An iterable of `DatasetKey`s.  Defaults to all
+      dataset keys that have cache in `cache_base_dir`, and
+      `TRANSFORM_FN_STORE_DATASET_KEY` if transform_fns are stored there.
+
+  Returns:
+    A list of `CacheEntryStats`.
+  """
+  if dataset_keys is None:
+    dataset_keys = _list_dataset_keys(cache_base_dir)
+  result = []
+  for dataset_key in sorted(dataset_keys):
+    result.extend(
+        _get_dataset_cache_entry_stats(cache_base_dir, dataset_key).values())
+  return result
+
+
+def compact_analysis_cache(cache_base_dir,
+                           dataset_keys=None,
+                           max_bytes=None,
+                           max_age_seconds=None,
+                           min_age_seconds=_DEFAULT_MIN_AGE_SECONDS,
+                           max_cache_plans=_DEFAULT_MAX_CACHE_PLANS):
+  """Evicts analysis cache entries according to a size and age budget.
+
+  Entries that were not written or read for longer than `max_age_seconds` are
+  evicted.  Then, if the remaining entries are larger than `max_bytes` in
+  total, the least recently accessed entries are evicted until they fit.
+
+  Entries that were accessed within the last `min_age_seconds` are never
+  evicted, since pipelines read the files of an entry some time after reading
+  the manifest.  Evicted entries are removed from the manifest while holding
+  the lock of the cache, which writers of cache also hold while updating
+  manifests, and their files are deleted afterwards.  Cache files that are not
+  in the manifest and older than `min_age_seconds` are deleted as well.
+
+  Stored transform_fns are entries of `TRANSFORM_FN_STORE_DATASET_KEY`, which
+  are evicted in the same way.  Cache plans written by `WriteCachePlanToFS` are
+  pruned to the most recent `max_cache_plans`, and those older than
+  `max_age_seconds` are deleted.
+
+  Args:
+    cache_base_dir: A str, the path that the cache is stored in.
+    dataset_keys: (Optional) An iterable of `DatasetKey`s to compact.  Defaults
+      to all dataset keys that have cache in `cache_base_dir`, and
+      `TRANSFORM_FN_STORE_DATASET_KEY` if transform_fns are stored there.
+    max_bytes: (Optional) The maximum total size in bytes of the cache entries
+      of `dataset_keys`.
+    max_age_seconds: (Optional) The maximum time in seconds since an entry was
+      last accessed.
+    min_age_seconds: (Optional) The time in seconds since an entry was last
+      accessed below which it is never evicted.
+    max_cache_plans: (Optional) The maximum number of cache plans to keep, or
+      None to keep all of them.
+
+  Returns:
+    A list of `CacheEntryStats` of the evicted entries.
+
+  Raises:
+    RuntimeError: If the lock of the cache can't be acquired.
+  """
+  if dataset_keys is None:
+    dataset_keys = _list_dataset_keys(cache_base_dir)
+  dataset_keys = sorted(dataset_keys)
+  entries = []
+  for dataset_key in dataset_keys:
+    entries.extend(
+        (cache_key_idx, stats) for cache_key_idx, stats in six.iteritems(
+            _get_dataset_cache_entry_stats(cache_base_dir, dataset_key)))
+
+  now = time.time()
+  evicted, kept = [], []
+  for cache_key_idx, stats in entries:
+    if (max_age_seconds is not None and
+        now - stats.last_access_time > max(max_age_seconds, min_age_seconds)):
+      evicted.append((cache_key_idx, stats))
+    else:
+      kept.append((cache_key_idx, stats))
+  if max_bytes is not None:
+    total_bytes = sum(stats.size_bytes for _, stats in kept)
+    for cache_key_idx, stats in sorted(
+        kept, key=lambda entry: entry[1].last_access_time):
+      if (total_bytes <= max_bytes or
+          now - stats.last_access_time < min_age_seconds):
+        break
+      evicted.append((cache_key_idx, stats))
+      total_bytes -= stats.size_bytes
+
+  evicted_indices = collections.defaultdict(set)
+  for cache_key_idx, stats in evicted:
+    evicted_indices[stats.dataset_key].add(cache_key_idx)
+  for dataset_key in dataset_keys:
+    if dataset_key == TRANSFORM_FN_STORE_DATASET_KEY:
+      _evict_stored_transform_fns(cache_base_dir, evicted_indices[dataset_key])
+      continue
+    dataset_cache_path = _get_dataset_cache_path(cache_base_dir, dataset_key)
+    with _hold_cache_lock(cache_base_dir):
+      with _ManifestFile(dataset_cache_path) as manifest_file:
+        # The manifest is read again since pipelines may have added entries.
+        manifest = manifest_file.read()
+        if evicted_indices[dataset_key]:
+          next_cache_key_idx = manifest_file.read_next_cache_key_index()
+          manifest = {
+              cache_entry_key: cache_key_idx
+              for cache_entry_key, cache_key_idx in six.iteritems(manifest)
+              if cache_key_idx not in evicted_indices[dataset_key]
+          }
+          manifest_file.write(manifest, next_cache_key_idx)
+      _AccessLog(dataset_cache_path).consolidate(set(manifest.values()))
+    # Cache key indices are never reused, so the files of evicted entries can
+    # be deleted without holding the lock.
+    for cache_key_idx in evicted_indices[dataset_key]:
+      for path in _get_cache_entry_file_paths(dataset_cache_path,
+                                              cache_key_idx):
+        tf.io.gfile.remove(path)
+    _remove_orphaned_cache_files(dataset_cache_path, set(manifest.values()),
+                                 min_age_seconds)
+  _prune_cache_plans(cache_base_dir, max_cache_plans, max_age_seconds)
+  return [stats for _, stats in evicted]
+
+
+def _prune_cache_plans(cache_base_dir, max_cache_plans, max_age_seconds):
+  """Deletes all but the most recent cache plans, and those that are too old."""
+  plan_dir = os.path.join(cache_base_dir, _CACHE_PLAN_DIR)
+  if not tf.io.gfile.isdir(plan_dir):
+    return
+  # Plan file names start with the time they were written at, so sorting them
+  # orders them from the oldest to the most recent.
+  plan_paths = sorted(tf.io.gfile.glob(os.path.join(plan_dir, '*.json')))
+  if max_cache_plans is not None:
+    removed_paths = plan_paths[:max(len(plan_paths) - max_cache_plans, 0)]
+    plan_paths = plan_paths[len(removed_paths):]
+  else:
+    removed_paths = []
+  if max_age_seconds is not None:
+    now = time.time()
+    removed_paths.extend(
+        path for path in plan_paths
+        if now - tf.io.gfile.stat(path).mtime_nsec / 1e9 > max_age_seconds)
+  for path in removed_paths:
+    tf.io.gfile.remove(path)
+
+
+def _evict_stored_transform_fns(cache_base_dir, names):
+  """Deletes stored transform_fns, and consolidates the store's access log."""
+  store_path = os.path.join(cache_base_dir, _TRANSFORM_FN_STORE_DIR)
+  evicted_paths = []
+  with _hold_cache_lock(cache_base_dir):
+    for name in names:
+      # The transform_fn is renamed first so that it is never found partially
+      # deleted.  The temporary name is skipped when listing the store.
+      evicted_path = '{}.{}'.format(
+          os.path.join(store_path, name), uuid.uuid4().hex)
+      tf.io.gfile.rename(os.path.join(store_path, name), evicted_path)
+      evicted_paths.append(evicted_path)
+    _AccessLog(store_path).consolidate(
+        set(_list_stored_transform_fns(store_path)))
+  for evicted_path in evicted_paths:
+    tf.io.gfile.rmtree(evicted_path)
+
+
+# Codecs that cache files can be written with.  The fast codec is GZIP at the
+# lowest compression level.
+CACHE_CODEC_NONE = 'none'
+CACHE_CODEC_FAST = 'fast'
+CACHE_CODEC_GZIP = 'gzip'
+_CACHE_CODEC_FILE_NAME_SUFFIXES = {
+    CACHE_CODEC_NONE: '',
+    CACHE_CODEC_FAST: '.gz',
+    CACHE_CODEC_GZIP: '.gz',
+}
+_FAST_CACHE_CODEC_COMPRESSION_LEVEL = 1
+
+# Cache entries are written in shards of roughly this many bytes by default.
+_DEFAULT_TARGET_SHARD_SIZE_BYTES = 256 * 1024 * 1024
+_DEFAULT_MAX_NUM_SHARDS = 1024
+
+# Files whose records hold batches of cache items have this infix before the
+# codec suffix.  Each of their records is the number of items, the length of
+# each item and the items.
+_BATCHED_CACHE_FILE_NAME_INFIX = '.batched'
+_CACHE_RECORD_BATCH_HEADER_FORMAT = '<I'
+
+
+def _encode_cache_record_batch(items):
+  items = list(items)
+  return b''.join([
+      struct.pack(_CACHE_RECORD_BATCH_HEADER_FORMAT, len(items)),
+      struct.pack('<{}Q'.format(len(items)), *[len(item) for item in items])
+  ] + items)
+
+
+def _decode_cache_record_batch(record):
+  """Yields the cache items of a record written by `CacheSink` in batches."""
+  num_items, = struct.unpack_from(_CACHE_RECORD_BATCH_HEADER_FORMAT, record)
+  offset = struct.calcsize(_CACHE_RECORD_BATCH_HEADER_FORMAT)
+  lengths_format = '<{}Q'.format(num_items)
+  lengths = struct.unpack_from(lengths_format, record, offset)
+  offset += struct.calcsize(lengths_format)
+  for length in lengths:
+    yield record[offset:offset + length]
+    offset += length
+
+
+def _is_batched_cache_file(path):
+  file_name = os.path.basename(path)
+  for suffix in set(_CACHE_CODEC_FILE_NAME_SUFFIXES.values()):
+    if suffix and file_name.endswith(suffix):
+      file_name = file_name[:-len(suffix)]
+      break
+  return file_name.endswith(_BATCHED_CACHE_FILE_NAME_INFIX)
+
+
+def _get_tf_record_options(path, compression_level=None):
+  if path.endswith('.gz'):
+    return tf.io.TFRecordOptions(
+        compression_type='GZIP', compression_level=compression_level)
+  return tf.io.TFRecordOptions(compression_type='')
+
+
+def _write_cache_shard(shard, file_path_prefix, file_name_suffix,
+                       compression_level, num_shards):
+  """Writes the records of a shard, returns the path of the shard."""
+  shard_idx, records = shard
+  path = '{}-{:05d}-of-{:05d}{}'.format(file_path_prefix, shard_idx, num_shards,
+                                        file_name_suffix)
+  # Writing to a temporary file first makes retried writes of a shard safe.  Its
+  # name doesn't match the file pattern of the entry.
+  temp_path = os.path.join(
+      os.path.dirname(path), '.tmp-{}-{}'.format(uuid.uuid4().hex,
+                                                 os.path.basename(path)))
+  tf.io.gfile.makedirs(os.path.dirname(path))
+  with tf.io.TFRecordWriter(
+      temp_path, _get_tf_record_options(path, compression_level)) as writer:
+    for record in records:
+      if record is not None:
+        writer.write(record)
+  tf.io.gfile.rename(temp_path, path, overwrite=True)
+  return path
+
+
+class CacheSink(beam.PTransform):
+  """Writes a cache entry as sharded TFRecord files.
+
+  The number of shards is derived from the total size of the entry unless it is
+  given explicitly, and items can be batched into fewer, larger records.  The
+  names of files with batched records end with '.batched' before the codec
+  suffix.  The files can be read by `CacheSource`, and by
+  `beam.io.ReadFromTFRecord` if items are not batched.
+  """
+
+  def __init__(self,
+               file_path_prefix,
+               codec=CACHE_CODEC_GZIP,
+               compression_level=None,
+               max_items_per_record=1,
+               num_shards=None,
+               target_shard_size_bytes=_DEFAULT_TARGET_SHARD_SIZE_BYTES,
+               max_num_shards=_DEFAULT_MAX_NUM_SHARDS):
+    """Init method.
+
+    Args:
+      file_path_prefix: A str, the path prefix of the files to write.
+      codec: (Optional) One of `CACHE_CODEC_NONE`, `CACHE_CODEC_FAST` and
+        `CACHE_CODEC_GZIP`.  Defaults to `CACHE_CODEC_GZIP`.
+      compression_level: (Optional) The compression level of
+        `CACHE_CODEC_GZIP`, from 0 to 9.  Defaults to the zlib default level.
+      max_items_per_record: (Optional) The maximum number of cache items that
+        are written in the same record.  If greater than 1, the file names
+        are marked as batched.
+      num_shards: (Optional) The number of files to write.  If not given, it is
+        the total size of the entry divided by `target_shard_size_bytes`.
+      target_shard_size_bytes: (Optional) The approximate size of each file
+        before compression, when `num_shards` is not given.
+      max_num_shards: (Optional) The maximum number of files to write, when
+        `num_shards` is not given.
+
+    Raises:
+      ValueError: If the codec is unknown, or a compression level is given for
+        a codec other than `CACHE_CODEC_GZIP`.
+    """
+    super(CacheSink, self).__init__()
+    if codec not in _CACHE_CODEC_FILE_NAME_SUFFIXES:
+      raise ValueError('Unknown cache codec {!r}, expected one of {}'.format(
+          codec, sorted(_CACHE_CODEC_FILE_NAME_SUFFIXES)))
+    if compression_level is not None and codec != CACHE_CODEC_GZIP:
+      raise ValueError(
+          'compression_level can only be given for the {!r} codec'.format(
+              CACHE_CODEC_GZIP))
+    if codec == CACHE_CODEC_FAST:
+      compression_level = _FAST_CACHE_CODEC_COMPRESSION_LEVEL
+    self._file_path_prefix = file_path_prefix
+    self._file_name_suffix = _CACHE_CODEC_FILE_NAME_SUFFIXES[codec]
+    if max_items_per_record > 1:
+      self._file_name_suffix = (
+          _BATCHED_CACHE_FILE_NAME_INFIX + self._file_name_suffix)
+    self._compression_level = compression_level
+    self._max_items_per_record = max_items_per_record
+    self._num_shards = num_shards
+    self._target_shard_size_bytes = target_shard_size_bytes
+    self._max_num_shards = max_num_shards
+
+  def _get_num_shards(self, total_size_bytes):
+    if self._num_shards is not None:
+      return self._num_shards
+    return int(
+        min(max(-(-total_size_bytes // self._target_shard_size_bytes), 1),
+            self._max_num_shards))
+
+  def expand(self, pcoll):
+    if self._max_items_per_record > 1:
+      records = (
+          pcoll
+          | 'BatchItems' >> beam.BatchElements(
+              min_batch_size=self._max_items_per_record,
+              max_batch_size=self._max_items_per_record)
+          | 'EncodeRecordBatches' >> beam.Map(_encode_cache_record_batch))
+    else:
+      records = pcoll
+
+    num_shards = beam.pvalue.AsSingleton(
+        records
+        | 'GetSizes' >> beam.Map(len)
+        | 'SumSizes' >> beam.CombineGlobally(sum)
+        | 'GetNumShards' >> beam.Map(self._get_num_shards))
+    keyed_records = (
+        records
+        | 'AssignShards' >> beam.Map(
+            lambda record, num_shards: (zlib.crc32(record) % num_shards, record),
+            num_shards))
+    # Every shard is written, even if it has no records.
+    empty_shards = (
+        pcoll.pipeline
+        | 'CreateSole' >> beam.Create([None])
+        | 'CreateEmptyShards' >> beam.FlatMap(
+            lambda _, num_shards: [(idx, None) for idx in range(num_shards)],
+            num_shards))
+    return ((keyed_records, empty_shards)
+            | 'FlattenShards' >> beam.Flatten()
+            | 'GroupByShard' >> beam.GroupByKey()
+            | 'WriteShards' >> beam.Map(
+                _write_cache_shard, self._file_path_prefix,
+                self._file_name_suffix, self._compression_level, num_shards))
+
+
+def _read_cache_records(path):
+  records = tf.compat.v1.io.tf_record_iterator(path,
+                                               _get_tf_record_options(path))
+  if not _is_batched_cache_file(path):
+    for record in records:
+      yield record
+    return
+  for record in records:
+    for item in _decode_cache_record_batch(record):
+      yield item
+
+
+def _match_cache_files(file_pattern):
+  paths = tf.io.gfile.glob(file_pattern)
+  if not paths:
+    raise IOError(
+        'No cache files found based on the file pattern {}'.format(
+            file_pattern))
+  return paths
+
+
+class CacheSource(beam.PTransform):
+  """Reads a cache entry written by `CacheSink` or `beam.io.WriteToTFRecord`.
+
+  The files are redistributed before being read so that they are read
+  concurrently.  Files are decompressed according to their suffix, and their
+  records are split into items if their names are marked as batched.
+  """
+
+  def __init__(self, file_pattern):
+    """Init method.
+
+    Args:
+      file_pattern: A str, the glob pattern of the files to read.  Reading
+        fails if it matches no files, since `CacheSink` writes at least one
+        file for every entry.
+    """
+    super(CacheSource, self).__init__()
+    self._file_pattern = file_pattern
+
+  def expand(self, pbegin):
+    return (pbegin
+            | 'CreateFilePattern' >> beam.Create([self._file_pattern])
+            | 'MatchFiles' >> beam.FlatMap(_match_cache_files)
+            | 'Reshuffle' >> beam.Reshuffle()
+            | 'ReadFiles' >> beam.FlatMap(_read_cache_records))
+
+
+def _reserve_cache_key_indices(cache_base_dir, dataset_cache_path,
+                               num_indices):
+  """Returns the first of `num_indices` new cache key indices of a dataset."""
+  with _hold_cache_lock(cache_base_dir):
+    with _ManifestFile(dataset_cache_path) as manifest_file:
+      start_cache_idx = manifest_file.read_next_cache_key_index()
+      manifest_file.write(manifest_file.read(), start_cache_idx + num_indices)
+  return start_cache_idx
+
+
+def _commit_cache_entries(unused_element, cache_base_dir, dataset_cache_path,
+                          cache_entries, *unused_written_outputs):
+  """Adds written cache entries to the manifest and records their writes.
+
+  Args:
+    unused_element: The sole element of the pipeline step.
+    cache_base_dir: A str, the path that the cache is stored in.
+    dataset_cache_path: A str, the path of the cache of a dataset key.
+    cache_entries: A dict from cache entry key to the reserved cache key index
+      its files were written to.
+    *unused_written_outputs: The outputs of the sinks that wrote the entries,
+      which are only passed so that the entries are committed after them.
+  """
+  with _hold_cache_lock(cache_base_dir):
+    with _ManifestFile(dataset_cache_path) as manifest_file:
+      manifest = manifest_file.read()
+      next_cache_key_idx = manifest_file.read_next_cache_key_index()
+      manifest.update(cache_entries)
+      manifest_file.write(manifest, next_cache_key_idx)
+  _AccessLog(dataset_cache_path).record(
+      sorted(cache_entries.values()), is_hit=False)
 
 
 @beam.typehints.with_input_types(six.binary_type)
@@ -174,8 +1083,10 @@ class WriteAnalysisCacheToFS(beam.PTransform):
   Given a cache collection, this writes it to the configured directory.
   If the configured directory already contains cache, this will merge the new
   cache with the old.
-  NOTE: This merging of cache is determined at beam graph construction time,
-  so the cache must already exist there when constructing this.
+
+  Each entry is written to a new cache key index, which is reserved in the
+  manifest when constructing this.  Entries are added to the manifest, and
+  their writes recorded, only once the pipeline has written their files.
   """
 
   def __init__(self, pipeline, cache_base_dir, dataset_keys=None, sink=None):
@@ -186,8 +1097,9 @@ class WriteAnalysisCacheToFS(beam.PTransform):
       cache_base_dir: A str, the path that the cache should be stored in.
       dataset_keys: (Optional) An iterable of strings.
       sink: (Optional) A PTransform class that takes a path in its constructor,
-        and is used to write the cache. If not provided this uses a GZipped
-        TFRecord sink.
+        and is used to write the cache. If not provided this uses `CacheSink`
+        with its default options, which can be changed by passing e.g.
+        `functools.partial(CacheSink, codec=CACHE_CODEC_FAST)`.
     """
     self.pipeline = pipeline
     self._cache_base_dir = cache_base_dir
@@ -199,31 +1111,47 @@ class WriteAnalysisCacheToFS(beam.PTransform):
     if self._sink is None:
       # TODO(b/37788560): Possibly use Riegeli as a default file format once
       # possible.
-      self._sink = _WriteToTFRecordGzip
+      self._sink = CacheSink
 
-  def _write_cache(self, manifest_file, dataset_key_index, dataset_key_dir,
-                   cache_dict):
-    manifest = manifest_file.read()
-    start_cache_idx = max(manifest.values()) + 1 if manifest else 0
+  def _write_cache(self, dataset_key_index, dataset_key_dir, cache_dict):
+    start_cache_idx = _reserve_cache_key_indices(
+        self._cache_base_dir, dataset_key_dir, len(cache_dict))
 
-    cache_is_written = []
+    cache_entries = {}
+    written_outputs = []
+    pipeline = self.pipeline
     for cache_key_idx, (cache_entry_key, cache_pcoll) in enumerate(
         six.iteritems(cache_dict), start_cache_idx):
       path = os.path.join(dataset_key_dir, str(cache_key_idx))
-      manifest[cache_entry_key] = cache_key_idx
-      cache_is_written.append(
+      cache_entries[cache_entry_key] = cache_key_idx
+      written = (
           cache_pcoll
           | 'Write[AnalysisIndex{}][CacheKeyIndex{}]'.format(
               dataset_key_index, cache_key_idx) >> self._sink(path))
+      if isinstance(cache_pcoll, beam.pvalue.PCollection):
+        pipeline = cache_pcoll.pipeline
+      # Sinks that return a PCollection are waited for before committing.
+      if isinstance(written, beam.pvalue.PCollection):
+        written_outputs.append(beam.pvalue.AsIter(written))
 
-    manifest_file.write(manifest)
-    return cache_is_written
+    return (pipeline
+            | 'CreateSole[AnalysisIndex{}]'.format(dataset_key_index) >>
+            beam.Create([None])
+            | 'Commit[AnalysisIndex{}]'.format(dataset_key_index) >> beam.Map(
+                _commit_cache_entries, self._cache_base_dir, dataset_key_dir,
+                cache_entries, *written_outputs))
 
   def expand(self, dataset_cache_dict):
     if self._sorted_dataset_keys is None:
       sorted_dataset_keys_list = sorted(dataset_cache_dict.keys())
     else:
       sorted_dataset_keys_list = self._sorted_dataset_keys
+      # Rolling aggregates are written by windowed analysis in addition to the
+      # cache of the analyzed datasets.
+      if (ROLLING_AGGREGATE_DATASET_KEY in dataset_cache_dict and
+          ROLLING_AGGREGATE_DATASET_KEY not in sorted_dataset_keys_list):
+        sorted_dataset_keys_list = sorted(sorted_dataset_keys_list +
+                                          [ROLLING_AGGREGATE_DATASET_KEY])
       missing_keys = set(dataset_cache_dict.keys()).difference(
           set(sorted_dataset_keys_list))
       if missing_keys:
@@ -235,20 +1163,28 @@ class WriteAnalysisCacheToFS(beam.PTransform):
 
     cache_is_written = []
     for dataset_key, cache_dict in dataset_cache_dict.items():
+      if not cache_dict:
+        continue
       dataset_key_idx = sorted_dataset_keys_list.index(dataset_key)
       dataset_key_dir = _get_dataset_cache_path(self._cache_base_dir,
                                                 dataset_key)
-
-      with _ManifestFile(dataset_key_dir) as manifest_file:
-        cache_is_written.extend(
-            self._write_cache(manifest_file, dataset_key_idx, dataset_key_dir,
-                              cache_dict))
+      cache_is_written.append(
+          self._write_cache(dataset_key_idx, dataset_key_dir, cache_dict))
 
     return cache_is_written
 
 
+def _record_cache_hits(unused_element, dataset_cache_path, cache_key_indices):
+  _AccessLog(dataset_cache_path).record(cache_key_indices, is_hit=True)
+
+
 class ReadAnalysisCacheFromFS(beam.PTransform):
-  """Reads cache from the FS written by WriteAnalysisCacheToFS."""
+  """Reads cache from the FS written by WriteAnalysisCacheToFS.
+
+  When the pipeline runs, a hit is recorded for each entry in
+  `cache_entry_keys` that is read.  No hits are recorded if `cache_entry_keys`
+  is not given, since it is not known which of the entries are used.
+  """
 
   def __init__(self,
                cache_base_dir,
@@ -262,9 +1198,10 @@ class ReadAnalysisCacheFromFS(beam.PTransform):
       dataset_keys: An iterable of `DatasetKey`s.
       cache_entry_keys: (Optional) An iterable of cache entry key strings. If
         provided, only cache entries that exist in `cache_entry_keys` will be
-        read.
+        read, and hits are recorded for them.
       source: (Optional) A PTransform class that takes a path argument in its
-        constructor, and is used to read the cache.
+        constructor, and is used to read the cache.  If not provided this uses
+        `CacheSource`.
     """
     self._cache_base_dir = cache_base_dir
     if not all(isinstance(d, DatasetKey) for d in dataset_keys):
@@ -274,7 +1211,7 @@ class ReadAnalysisCacheFromFS(beam.PTransform):
                                        set(cache_entry_keys))
     # TODO(b/37788560): Possibly use Riegeli as a default file format once
     # possible.
-    self._source = source if source is not None else beam.io.ReadFromTFRecord
+    self._source = source if source is not None else CacheSource
 
   def _should_read_cache_entry_key(self, key):
     return (self._filtered_cache_entry_keys is None or
@@ -283,23 +1220,33 @@ class ReadAnalysisCacheFromFS(beam.PTransform):
   def expand(self, pvalue):
     result = {}
 
+    manifests = _read_manifests(self._cache_base_dir, self._sorted_dataset_keys)
     for dataset_key_idx, dataset_key in enumerate(self._sorted_dataset_keys):
 
       dataset_cache_path = _get_dataset_cache_path(self._cache_base_dir,
                                                    dataset_key)
-      manifest_file = _ManifestFile(dataset_cache_path)
-      manifest = manifest_file.read()
+      manifest = manifests.get(dataset_key)
       if not manifest:
         continue
       result[dataset_key] = {}
+      read_cache_key_indices = []
       for key, cache_key_idx in manifest.items():
         if self._should_read_cache_entry_key(key):
+          read_cache_key_indices.append(cache_key_idx)
           result[dataset_key][key] = (
               pvalue.pipeline
               | 'Read[AnalysisIndex{}][CacheKeyIndex{}]'.format(
                   dataset_key_idx, cache_key_idx) >> self._source('{}{}'.format(
                       os.path.join(dataset_cache_path, str(cache_key_idx)),
                       '-*-of-*')))
+      if self._filtered_cache_entry_keys is not None and read_cache_key_indices:
+        _ = (
+            pvalue.pipeline
+            | 'CreateSole[AnalysisIndex{}]'.format(dataset_key_idx) >>
+            beam.Create([None])
+            | 'RecordHits[AnalysisIndex{}]'.format(dataset_key_idx) >> beam.Map(
+                _record_cache_hits, dataset_cache_path,
+                sorted(read_cache_key_indices)))
     return result
 
 
@@ -316,3 +1263,218 @@ def validate_dataset_keys(dataset_keys):
 
 def make_cache_entry_key(cache_key):
   return _CACHE_VERSION + tf.compat.as_bytes(cache_key)
+
+
+def make_rolling_aggregate_cache_entry_key(cache_entry_key, dataset_keys):
+  """Returns the cache entry key of a rolling aggregate over a window.
+
+  Args:
+    cache_entry_key: The cache entry key of the aggregated accumulators.
+    dataset_keys: An iterable of `DatasetKey`s, the window that is aggregated.
+
+  Returns:
+    A cache entry key for `ROLLING_AGGREGATE_DATASET_KEY`.
+  """
+  return (cache_entry_key + _ROLLING_AGGREGATE_WINDOW_INFIX + b','.join(
+      sorted(tf.compat.as_bytes(k.key) for k in dataset_keys)) + b']')
+
+
+def get_rolling_aggregate_windows(rolling_cache_entry_keys,
+                                  cache_entry_key=None):
+  """Parses the windows of rolling aggregate cache entry keys.
+
+  Args:
+    rolling_cache_entry_keys: An iterable of cache entry keys of
+      `ROLLING_AGGREGATE_DATASET_KEY`.
+    cache_entry_key: (Optional) If provided, only the rolling aggregates of the
+      accumulators with this cache entry key are returned.
+
+  Returns:
+    A dict from rolling aggregate cache entry key to the frozenset of
+    `DatasetKey`s that it aggregates.
+  """
+  result = {}
+  for rolling_cache_entry_key in rolling_cache_entry_keys:
+    prefix, infix, window = rolling_cache_entry_key.rpartition(
+        _ROLLING_AGGREGATE_WINDOW_INFIX)
+    if not infix or not window.endswith(b']'):
+      continue
+    if cache_entry_key is not None and prefix != cache_entry_key:
+      continue
+    result[rolling_cache_entry_key] = frozenset(
+        DatasetKey(tf.compat.as_str(k)) for k in window[:-1].split(b','))
+  return result
+
+
+def get_transform_fn_store_path(cache_base_dir, fingerprint):
+  """Returns the path that a transform_fn is stored at in a cache directory.
+
+  Args:
+    cache_base_dir: A str, the path that the cache is stored in.
+    fingerprint: A bytes fingerprint of the transform_fn, as computed by
+      `analysis_graph_builder.get_transform_fn_fingerprint`.
+
+  Returns:
+    A str path, which exists only if the transform_fn was stored.
+  """
+  return os.path.join(cache_base_dir, _TRANSFORM_FN_STORE_DIR,
+                      binascii.hexlify(fingerprint).decode('ascii'))
+
+
+def _record_transform_fn_store_access(transform_fn_store_path, is_hit):
+  store_path, name = os.path.split(transform_fn_store_path)
+  _AccessLog(store_path).record([name], is_hit)
+
+
+def record_transform_fn_store_hit(transform_fn_store_path):
+  """Records a hit of a stored transform_fn, and returns its path.
+
+  Args:
+    transform_fn_store_path: A str, the path returned by
+      get_transform_fn_store_path for a stored transform_fn.
+
+  Returns:
+    transform_fn_store_path.
+  """
+  _record_transform_fn_store_access(transform_fn_store_path, is_hit=True)
+  return transform_fn_store_path
+
+
+def store_transform_fn(saved_model_dir, transform_fn_store_path):
+  """Copies a transform_fn to the path returned by get_transform_fn_store_path.
+
+  The transform_fn is copied to a temporary directory which is then renamed, so
+  that a partially copied transform_fn is never found in the store.
+
+  Args:
+    saved_model_dir: A str, the path of the SavedModel of the transform_fn.
+    transform_fn_store_path: A str, the path to store the transform_fn at.
+
+  Returns:
+    transform_fn_store_path.
+  """
+  if not tf.io.gfile.exists(transform_fn_store_path):
+    temp_path = '{}.{}'.format(transform_fn_store_path, uuid.uuid4().hex)
+    transform_fn_io._copy_tree(saved_model_dir, temp_path)  # pylint: disable=protected-access
+    try:
+      tf.io.gfile.rename(temp_path, transform_fn_store_path)
+    except tf.errors.OpError:
+      # Another pipeline stored the same transform_fn concurrently.
+      if not tf.io.gfile.exists(transform_fn_store_path):
+        raise
+      tf.io.gfile.rmtree(temp_path)
+  _record_transform_fn_store_access(transform_fn_store_path, is_hit=False)
+  return transform_fn_store_path
+
+
+class CacheDecision(
+    collections.namedtuple(
+        'CacheDecision',
+        ['label', 'dataset_key', 'cache_entry_key', 'is_hit', 'miss_reason'])):
+  """Whether the accumulators of an analyzer for a dataset are read from cache.
+
+  Fields:
+    label: The label of the cacheable operation of the analyzer.
+    dataset_key: The `DatasetKey` of the dataset.
+    cache_entry_key: The cache entry key of the accumulators.
+    is_hit: A bool, whether the accumulators are read from cache.
+    miss_reason: None if `is_hit`, otherwise one of `CACHE_MISS_NEW_DATASET_KEY`,
+      `CACHE_MISS_CHANGED_PATH_HASH`, `CACHE_MISS_VERSION_MISMATCH` and
+      `CACHE_MISS_NOT_CACHED`.
+  """
+
+
+def _split_cache_entry_key(cache_entry_key):
+  """Splits a cache entry key into its version prefix and the rest of it."""
+  match = _CACHE_VERSION_REGEX.match(cache_entry_key)
+  if match is None:
+    return b'', cache_entry_key
+  return cache_entry_key[:match.end()], cache_entry_key[match.end():]
+
+
+def get_cache_miss_reason(dataset_cache_entry_keys, cache_entry_key, label):
+  """Explains why a cache entry key is not among a dataset's cache entry keys.
+
+  Args:
+    dataset_cache_entry_keys: A collection of the cache entry keys of the
+      dataset, None or empty if the dataset has no cache.
+    cache_entry_key: The cache entry key that was looked up.
+    label: The label of the operation whose cache entry key it is.  Cache entry
+      keys start with the label, followed by a hash of the path to it.
+
+  Returns:
+    One of `CACHE_MISS_NEW_DATASET_KEY`, `CACHE_MISS_CHANGED_PATH_HASH`,
+    `CACHE_MISS_VERSION_MISMATCH` and `CACHE_MISS_NOT_CACHED`.
+  """
+  if not dataset_cache_entry_keys:
+    return CACHE_MISS_NEW_DATASET_KEY
+  version, unversioned_key = _split_cache_entry_key(cache_entry_key)
+  label_prefix = tf.compat.as_bytes(label) + b'-'
+  result = CACHE_MISS_NOT_CACHED
+  for key in dataset_cache_entry_keys:
+    key_version, unversioned = _split_cache_entry_key(key)
+    if not unversioned.startswith(label_prefix):
+      continue
+    if key_version != version:
+      return CACHE_MISS_VERSION_MISMATCH
+    result = CACHE_MISS_CHANGED_PATH_HASH
+  return result
+
+
+def make_cache_plan(dataset_keys, cache_decisions, skipped_dataset_keys):
+  """Returns a JSON serializable summary of the cache decisions of an analysis.
+
+  Args:
+    dataset_keys: An iterable of the analyzed `DatasetKey`s.
+    cache_decisions: An iterable of `CacheDecision`s.
+    skipped_dataset_keys: An iterable of the `DatasetKey`s whose input data is
+      not read since all of their accumulators are read from cache.
+  """
+  cache_decisions = sorted(
+      cache_decisions, key=lambda d: (d.label, str(d.dataset_key.key)))
+  return {
+      'dataset_keys': sorted(str(k.key) for k in dataset_keys),
+      'skipped_dataset_keys': sorted(str(k.key) for k in skipped_dataset_keys),
+      'num_hits': sum(1 for d in cache_decisions if d.is_hit),
+      'num_misses': sum(1 for d in cache_decisions if not d.is_hit),
+      'decisions': [{
+          'label': decision.label,
+          'dataset_key': str(decision.dataset_key.key),
+          'cache_entry_key': binascii.hexlify(
+              decision.cache_entry_key).decode('ascii'),
+          'is_hit': decision.is_hit,
+          'miss_reason': decision.miss_reason,
+      } for decision in cache_decisions],
+  }
+
+
+def _write_cache_plan(unused_element, cache_base_dir, cache_plan_json):
+  plan_dir = os.path.join(cache_base_dir, _CACHE_PLAN_DIR)
+  tf.io.gfile.makedirs(plan_dir)
+  path = os.path.join(
+      plan_dir, '{}-{}.json'.format(
+          time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()),
+          uuid.uuid4().hex[:8]))
+  with tf.io.gfile.GFile(path, 'w') as f:
+    f.write(cache_plan_json)
+  return path
+
+
+class WriteCachePlanToFS(beam.PTransform):
+  """Writes a cache plan made by `make_cache_plan` to a JSON file.
+
+  The plan is written to a new file in a subdirectory of the cache directory
+  when the pipeline runs, so that the plans of previous runs are kept until
+  they are pruned by `compact_analysis_cache`.
+  """
+
+  def __init__(self, cache_base_dir, cache_plan):
+    self._cache_base_dir = cache_base_dir
+    self._cache_plan_json = json.dumps(cache_plan, indent=2, sort_keys=True)
+
+  def expand(self, pipeline):
+    return (pipeline
+            | 'CreateSole' >> beam.Create([None])
+            | 'WriteCachePlan' >> beam.Map(_write_cache_plan,
+                                           self._cache_base_dir,
+                                           self._cache_plan_json))
@@ -19,7 +19,9 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import os
+import pickle
 
 # GOOGLE-INITIALIZATION
 import apache_beam as beam
@@ -68,6 +70,27 @@ class AnalyzerCacheTest(test_case.TransformTestCase):
           ValueError, 'Dataset key .* does not match allowed pattern:'):
         analyzer_cache.validate_dataset_keys({key})
 
+  def test_rolling_aggregate_windows(self):
+    window = {
+        analyzer_cache.DatasetKey('span-1'),
+        analyzer_cache.DatasetKey('span-0')
+    }
+    cache_entry_key = analyzer_cache.make_cache_entry_key(b'combine-\x00[]')
+    other_cache_entry_key = analyzer_cache.make_cache_entry_key(b'other')
+    rolling_key = analyzer_cache.make_rolling_aggregate_cache_entry_key(
+        cache_entry_key, window)
+    other_rolling_key = analyzer_cache.make_rolling_aggregate_cache_entry_key(
+        other_cache_entry_key, window)
+
+    self.assertEqual(
+        analyzer_cache.get_rolling_aggregate_windows(
+            [rolling_key, other_rolling_key, cache_entry_key],
+            cache_entry_key), {rolling_key: frozenset(window)})
+    self.assertCountEqual(
+        analyzer_cache.get_rolling_aggregate_windows(
+            [rolling_key, other_rolling_key, cache_entry_key]).keys(),
+        [rolling_key, other_rolling_key])
+
   @test_case.named_parameters(
       dict(
           testcase_name='JsonNumpyCacheCoder',
@@ -81,6 +104,19 @@ class AnalyzerCacheTest(test_case.TransformTestCase):
           testcase_name='JsonNumpyCacheCoderNestedNpTypes',
           coder=analyzer_nodes.JsonNumpyCacheCoder(),
           value=[np.int64(1), np.float32(2.5), 3, '4']),
+      dict(
+          testcase_name='NumpyCacheCoder',
+          coder=analyzer_nodes.NumpyCacheCoder(),
+          value=[np.int64(1), np.array([2.5, 3.5], np.float32),
+                 np.array([[1, 2], [3, 4]])]),
+      dict(
+          testcase_name='NumpyCacheCoderNpArray',
+          coder=analyzer_nodes.NumpyCacheCoder(),
+          value=np.array([1, 2.5, 3])),
+      dict(
+          testcase_name='NumpyCacheCoderNonNumeric',
+          coder=analyzer_nodes.NumpyCacheCoder(),
+          value=[1, 2.5, 3, '4']),
       dict(
           testcase_name='_VocabularyAccumulatorCoderIntAccumulator',
           coder=analyzer_nodes._VocabularyAccumulatorCoder(),
@@ -101,6 +137,34 @@ class AnalyzerCacheTest(test_case.TransformTestCase):
                   weight=np.array(0.),
               )
           ]),
+      dict(
+          testcase_name='_VocabularyAccumulatorBlockCoderIntAccumulators',
+          coder=analyzer_nodes._VocabularyAccumulatorBlockCoder(),
+          value=[(b'A', 17), (b'\x8a', 29)]),
+      dict(
+          testcase_name='_VocabularyAccumulatorBlockCoderNumericTokens',
+          coder=analyzer_nodes._VocabularyAccumulatorBlockCoder(
+              input_dtype=tf.int64.name),
+          value=[(3, 1.5), (-1, 2.5)]),
+      dict(
+          testcase_name='_VocabularyAccumulatorBlockCoderClassAccumulators',
+          coder=analyzer_nodes._VocabularyAccumulatorBlockCoder(),
+          value=[
+              (b'A',
+               analyzers._WeightedMeanAndVarAccumulator(
+                   count=np.array(5),
+                   mean=np.array([.4, .9, 1.5]),
+                   variance=np.array(0.),
+                   weight=np.array(1.),
+               )),
+              (b'B',
+               analyzers._WeightedMeanAndVarAccumulator(
+                   count=np.array(2),
+                   mean=np.array([.1, .2]),
+                   variance=np.array(0.),
+                   weight=np.array(.5),
+               )),
+          ]),
       dict(
           testcase_name='_QuantilesAccumulatorCoderClassAccumulator',
           coder=analyzers._QuantilesAccumulatorCacheCoder(),
@@ -109,6 +173,29 @@ class AnalyzerCacheTest(test_case.TransformTestCase):
               '',
               _get_quantiles_summary()
           ]),
+      dict(
+          testcase_name='_QuantilesAccumulatorCoderFloatSummaries',
+          coder=analyzers._QuantilesAccumulatorCacheCoder(),
+          value=[
+              np.array([[1., 1., 2., 1.], [3., 1., 1., 2.]], np.float32),
+              np.zeros((0, 4), np.float32)
+          ]),
+      dict(
+          testcase_name='_QuantilesAccumulatorCoderCompressed',
+          coder=analyzers._QuantilesAccumulatorCacheCoder(
+              compression_level=6),
+          value=[np.array([[1., 1., 2., 1.], [3., 1., 1., 2.]], np.float32)]),
+      dict(
+          testcase_name='_LMomentsAccumulatorCoder',
+          coder=analyzers._LMomentsAccumulatorCacheCoder(),
+          value=analyzers._LMomentsAccumulator(
+              np.array([2., 3.]), np.array([1., 2.]), np.array([0., 1.]),
+              np.array([0., 0.]), np.array([.5, .2]), np.array([.1, .3]),
+              np.array([0., .1]), np.array([0., 0.]))),
+      dict(
+          testcase_name='NumpyCacheCoderCompressed',
+          coder=analyzer_nodes.NumpyCacheCoder(compression_level=6),
+          value=[np.int64(1), np.zeros((100,), np.float32)]),
       dict(
           testcase_name='_CombinerPerKeyAccumulatorCoder',
           coder=analyzer_nodes._CombinerPerKeyAccumulatorCoder(
@@ -119,6 +206,53 @@ class AnalyzerCacheTest(test_case.TransformTestCase):
     encoded = coder.encode_cache(value)
     np.testing.assert_equal(coder.decode_cache(encoded), value)
 
+  def test_numpy_cache_coder_preserves_dtype_and_shape(self):
+    coder = analyzer_nodes.NumpyCacheCoder()
+    value = [np.float32(2.5), np.zeros((0, 3), np.int16)]
+    decoded = coder.decode_cache(coder.encode_cache(value))
+    self.assertEqual([a.dtype for a in decoded], [np.float32, np.int16])
+    self.assertEqual([a.shape for a in decoded], [(), (0, 3)])
+
+  def test_numpy_cache_coders_decode_pickled_entries(self):
+    summaries = [np.array([[1., 1., 2., 1.]], np.float32)]
+    np.testing.assert_equal(
+        analyzers._QuantilesAccumulatorCacheCoder().decode_cache(
+            pickle.dumps(summaries)), summaries)
+    accumulator = analyzers._LMomentsAccumulator(
+        *[np.array([float(idx)]) for idx in range(8)])
+    decoded = analyzers._LMomentsAccumulatorCacheCoder().decode_cache(
+        pickle.dumps(accumulator))
+    self.assertIsInstance(decoded, analyzers._LMomentsAccumulator)
+    np.testing.assert_equal(decoded, accumulator)
+
+  def test_numpy_cache_coder_decodes_compressed_entries(self):
+    value = [np.float32(2.5), np.zeros((1000,), np.int16)]
+    encoded = analyzer_nodes.NumpyCacheCoder(
+        compression_level=9).encode_cache(value)
+    self.assertLess(len(encoded), 1000)
+    np.testing.assert_equal(
+        analyzer_nodes.NumpyCacheCoder().decode_cache(encoded), value)
+
+  def test_numpy_cache_coder_decodes_json_entries(self):
+    value = [np.int64(1), np.float32(2.5), 3]
+    encoded = analyzer_nodes.JsonNumpyCacheCoder().encode_cache(value)
+    np.testing.assert_equal(
+        analyzer_nodes.NumpyCacheCoder().decode_cache(encoded), value)
+    # The coder's repr is part of the cache key of the entries it decodes.
+    self.assertEqual(
+        repr(analyzer_nodes.NumpyCacheCoder()),
+        repr(analyzer_nodes.JsonNumpyCacheCoder()))
+    self.assertEqual(
+        repr(analyzers._LMomentsAccumulatorCacheCoder()),
+        '<_LMomentsAccumulatorCacheCoder>')
+
+  def test_vocabulary_block_coder_decodes_single_accumulators(self):
+    encoded = analyzer_nodes._VocabularyAccumulatorCoder().encode_cache(
+        (b'A', 17))
+    self.assertEqual(
+        analyzer_nodes._VocabularyAccumulatorBlockCoder().decode_cache(encoded),
+        [(b'A', 17)])
+
   def test_cache_helpers_round_trip(self):
     base_test_dir = os.path.join(
         os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
@@ -161,6 +295,384 @@ class AnalyzerCacheTest(test_case.TransformTestCase):
           beam_test_util.equal_to([b'[9, 5, 2, 1]']),
           label='AssertC')
 
+  @test_case.named_parameters(
+      dict(
+          testcase_name='none',
+          sink_kwargs=dict(codec=analyzer_cache.CACHE_CODEC_NONE),
+          expected_suffix='-of-00001'),
+      dict(
+          testcase_name='fast_batched',
+          sink_kwargs=dict(
+              codec=analyzer_cache.CACHE_CODEC_FAST, max_items_per_record=3),
+          expected_suffix='-of-00001.batched.gz'),
+      dict(
+          testcase_name='gzip_sharded',
+          sink_kwargs=dict(
+              codec=analyzer_cache.CACHE_CODEC_GZIP,
+              compression_level=9,
+              target_shard_size_bytes=100),
+          expected_suffix='-of-00004.gz'),
+  )
+  def test_cache_sink_and_source(self, sink_kwargs, expected_suffix):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    dataset_key = analyzer_cache.DatasetKey('dataset_key_0')
+    # 10 items of 40 bytes each.
+    items = [b'item-%035d' % idx for idx in range(10)]
+
+    with beam.Pipeline() as p:
+      _ = {
+          dataset_key: {
+              b'\x8a': p | 'CreateA' >> beam.Create(items),
+              b'\x8b': p | 'CreateB' >> beam.Create([]),
+          }
+      } | analyzer_cache.WriteAnalysisCacheToFS(
+          p,
+          base_test_dir, [dataset_key],
+          sink=functools.partial(analyzer_cache.CacheSink, **sink_kwargs))
+
+    manifest = analyzer_cache._ManifestFile(
+        os.path.join(base_test_dir, dataset_key.key)).read()
+    entry_files = tf.io.gfile.glob(
+        os.path.join(base_test_dir, dataset_key.key,
+                     '{}-*-of-*'.format(manifest[b'\x8a'])))
+    self.assertTrue(entry_files)
+    for path in entry_files:
+      self.assertTrue(path.endswith(expected_suffix), path)
+
+    with beam.Pipeline() as p:
+      read_cache = p | analyzer_cache.ReadAnalysisCacheFromFS(
+          base_test_dir, [dataset_key])
+      beam_test_util.assert_that(
+          read_cache[dataset_key][b'\x8a'],
+          beam_test_util.equal_to(items),
+          label='AssertA')
+      beam_test_util.assert_that(
+          read_cache[dataset_key][b'\x8b'],
+          beam_test_util.equal_to([]),
+          label='AssertB')
+
+  def test_cache_source_raises_if_no_files_match(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    with self.assertRaisesRegexp(Exception, 'No cache files found'):
+      with beam.Pipeline() as p:
+        _ = p | analyzer_cache.CacheSource(
+            os.path.join(base_test_dir, '0-*-of-*'))
+
+  def test_cache_sink_rejects_invalid_codecs(self):
+    with self.assertRaisesRegexp(ValueError, 'Unknown cache codec'):
+      analyzer_cache.CacheSink('path', codec='lz4')
+    with self.assertRaisesRegexp(ValueError, 'compression_level'):
+      analyzer_cache.CacheSink(
+          'path', codec=analyzer_cache.CACHE_CODEC_FAST, compression_level=3)
+
+  def test_get_cache_miss_reason(self):
+    version = analyzer_cache._CACHE_VERSION
+    cache_entry_key = version + b'x/mean-HASH'
+    self.assertEqual(
+        analyzer_cache.CACHE_MISS_NEW_DATASET_KEY,
+        analyzer_cache.get_cache_miss_reason(None, cache_entry_key, 'x/mean'))
+    self.assertEqual(
+        analyzer_cache.CACHE_MISS_NEW_DATASET_KEY,
+        analyzer_cache.get_cache_miss_reason({}, cache_entry_key, 'x/mean'))
+    self.assertEqual(
+        analyzer_cache.CACHE_MISS_CHANGED_PATH_HASH,
+        analyzer_cache.get_cache_miss_reason(
+            {version + b'x/mean-OTHER_HASH': 0}, cache_entry_key, 'x/mean'))
+    self.assertEqual(
+        analyzer_cache.CACHE_MISS_VERSION_MISMATCH,
+        analyzer_cache.get_cache_miss_reason(
+            {b'__v0__2.7_x/mean-HASH': 0}, cache_entry_key, 'x/mean'))
+    # Only entries of the same label are considered, not ones it prefixes.
+    self.assertEqual(
+        analyzer_cache.CACHE_MISS_NOT_CACHED,
+        analyzer_cache.get_cache_miss_reason(
+            {version + b'x/mean_1-HASH': 0, version + b'y/mean-HASH': 1},
+            cache_entry_key, 'x/mean'))
+
+  def test_make_cache_plan(self):
+    span_0_key = analyzer_cache.DatasetKey('span-0')
+    span_1_key = analyzer_cache.DatasetKey('span-1')
+    cache_plan = analyzer_cache.make_cache_plan(
+        [span_1_key, span_0_key], [
+            analyzer_cache.CacheDecision('x/mean', span_1_key, b'\x01', False,
+                                         analyzer_cache.CACHE_MISS_NOT_CACHED),
+            analyzer_cache.CacheDecision('x/mean', span_0_key, b'\x00', True,
+                                         None),
+        ], [])
+    self.assertEqual(
+        {
+            'dataset_keys': ['span-0', 'span-1'],
+            'skipped_dataset_keys': [],
+            'num_hits': 1,
+            'num_misses': 1,
+            'decisions': [{
+                'label': 'x/mean',
+                'dataset_key': 'span-0',
+                'cache_entry_key': '00',
+                'is_hit': True,
+                'miss_reason': None,
+            }, {
+                'label': 'x/mean',
+                'dataset_key': 'span-1',
+                'cache_entry_key': '01',
+                'is_hit': False,
+                'miss_reason': 'not_cached',
+            }],
+        }, cache_plan)
+
+  def test_cache_entry_stats_and_compaction(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+
+    dataset_key_0 = analyzer_cache.DatasetKey('dataset_key_0')
+    dataset_key_1 = analyzer_cache.DatasetKey('dataset_key_1')
+    dataset_keys = (dataset_key_0, dataset_key_1)
+
+    with beam.Pipeline() as p:
+      cache_pcoll_dict = {
+          dataset_key_0: {
+              b'a': p | 'CreateA' >> beam.Create([b'a' * 100]),
+              b'b': p | 'CreateB' >> beam.Create([b'b' * 100]),
+          },
+          dataset_key_1: {
+              b'c': p | 'CreateC' >> beam.Create([b'c' * 100]),
+          },
+      }
+      _ = cache_pcoll_dict | analyzer_cache.WriteAnalysisCacheToFS(
+          p, base_test_dir, dataset_keys)
+
+    with beam.Pipeline() as p:
+      _ = p | analyzer_cache.ReadAnalysisCacheFromFS(base_test_dir,
+                                                     dataset_keys, [b'b'])
+
+    stats = analyzer_cache.get_cache_entry_stats(base_test_dir)
+    self.assertEqual([(s.dataset_key, s.cache_entry_key, s.hit_count)
+                      for s in stats], [(dataset_key_0, b'a', 0),
+                                        (dataset_key_0, b'b', 1),
+                                        (dataset_key_1, b'c', 0)])
+    for s in stats:
+      self.assertGreater(s.size_bytes, 0)
+
+    # Recently accessed entries are not evicted.
+    self.assertEqual(
+        analyzer_cache.compact_analysis_cache(base_test_dir, max_bytes=0), [])
+
+    # The entry that was read is the most recently accessed one.
+    evicted = analyzer_cache.compact_analysis_cache(
+        base_test_dir, max_bytes=stats[1].size_bytes, min_age_seconds=0)
+    self.assertCountEqual([s.cache_entry_key for s in evicted], [b'a', b'c'])
+    self.assertEqual(
+        [s.cache_entry_key
+         for s in analyzer_cache.get_cache_entry_stats(base_test_dir)], [b'b'])
+
+    evicted = analyzer_cache.compact_analysis_cache(
+        base_test_dir, max_age_seconds=0, min_age_seconds=0)
+    self.assertEqual([s.cache_entry_key for s in evicted], [b'b'])
+    self.assertEqual(analyzer_cache.get_cache_entry_stats(base_test_dir), [])
+    self.assertEqual(
+        tf.io.gfile.glob(
+            os.path.join(base_test_dir, dataset_key_0.key, '*-of-*')), [])
+
+  def test_cache_hits_are_recorded_when_read_entries_are_requested(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    dataset_key = analyzer_cache.DatasetKey('dataset_key_0')
+
+    with beam.Pipeline() as p:
+      _ = {
+          dataset_key: {
+              b'a': p | 'CreateA' >> beam.Create([b'a']),
+              b'b': p | 'CreateB' >> beam.Create([b'b']),
+          }
+      } | analyzer_cache.WriteAnalysisCacheToFS(p, base_test_dir,
+                                                [dataset_key])
+
+    def get_hit_counts():
+      return {
+          s.cache_entry_key: s.hit_count
+          for s in analyzer_cache.get_cache_entry_stats(base_test_dir)
+      }
+
+    p = beam.Pipeline()
+    _ = p | 'ReadA' >> analyzer_cache.ReadAnalysisCacheFromFS(
+        base_test_dir, [dataset_key], [b'a'])
+    _ = p | 'ReadAll' >> analyzer_cache.ReadAnalysisCacheFromFS(
+        base_test_dir, [dataset_key])
+    # Hits are only recorded when the pipeline runs.
+    self.assertEqual(get_hit_counts(), {b'a': 0, b'b': 0})
+    p.run().wait_until_finish()
+    # Reading all entries doesn't record hits, since it's unknown which of them
+    # are used.
+    self.assertEqual(get_hit_counts(), {b'a': 1, b'b': 0})
+
+  def test_compaction_interleaved_with_cache_write(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    dataset_key = analyzer_cache.DatasetKey('dataset_key_0')
+    dataset_cache_path = analyzer_cache._get_dataset_cache_path(
+        base_test_dir, dataset_key)
+
+    def read_manifest():
+      return analyzer_cache._ManifestFile(dataset_cache_path).read()
+
+    with beam.Pipeline() as p:
+      _ = {
+          dataset_key: {
+              b'a': p | 'CreateA' >> beam.Create([b'old a']),
+          }
+      } | analyzer_cache.WriteAnalysisCacheToFS(p, base_test_dir,
+                                                [dataset_key])
+    self.assertEqual(read_manifest(), {b'a': 0})
+
+    # Indices are reserved when the writing pipeline is constructed, but the
+    # entries are only added to the manifest once their files are written.
+    writer = beam.Pipeline()
+    _ = {
+        dataset_key: {
+            b'a': writer | 'CreateA' >> beam.Create([b'new a']),
+            b'b': writer | 'CreateB' >> beam.Create([b'b']),
+        }
+    } | analyzer_cache.WriteAnalysisCacheToFS(writer, base_test_dir,
+                                              [dataset_key])
+    self.assertEqual(read_manifest(), {b'a': 0})
+
+    evicted = analyzer_cache.compact_analysis_cache(
+        base_test_dir, max_age_seconds=0, min_age_seconds=0)
+    self.assertEqual([s.cache_entry_key for s in evicted], [b'a'])
+    self.assertEqual(read_manifest(), {})
+
+    writer.run().wait_until_finish()
+    self.assertEqual(read_manifest(), {b'a': 1, b'b': 2})
+    # A failed writer's files are not in the manifest, and are removed by
+    # compaction.
+    orphaned_path = os.path.join(dataset_cache_path, '7-00000-of-00001.gz')
+    with tf.io.gfile.GFile(orphaned_path, 'wb') as f:
+      f.write(b'')
+    self.assertEqual(
+        analyzer_cache.compact_analysis_cache(base_test_dir, min_age_seconds=0),
+        [])
+    self.assertFalse(tf.io.gfile.exists(orphaned_path))
+    self.assertEqual(
+        sorted(s.hit_count for s in
+               analyzer_cache.get_cache_entry_stats(base_test_dir)), [0, 0])
+
+    # Evicted indices are not reused.
+    with beam.Pipeline() as p:
+      _ = {
+          dataset_key: {
+              b'c': p | 'CreateC' >> beam.Create([b'c']),
+          }
+      } | analyzer_cache.WriteAnalysisCacheToFS(p, base_test_dir,
+                                                [dataset_key])
+    self.assertEqual(read_manifest(), {b'a': 1, b'b': 2, b'c': 3})
+
+    with beam.Pipeline() as p:
+      read_cache = p | analyzer_cache.ReadAnalysisCacheFromFS(
+          base_test_dir, [dataset_key])
+      beam_test_util.assert_that(
+          read_cache[dataset_key][b'a'],
+          beam_test_util.equal_to([b'new a']))
+
+  def test_cache_lock_timeout(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    lock = analyzer_cache._CacheLock(base_test_dir)
+    self.assertTrue(lock.acquire())
+    try:
+      with mock.patch.object(analyzer_cache, '_LOCK_TIMEOUT_SECONDS', 0):
+        with self.assertRaisesRegexp(RuntimeError, 'Timed out waiting'):
+          with beam.Pipeline() as p:
+            _ = {
+                analyzer_cache.DatasetKey('dataset_key_0'): {
+                    b'a': p | 'CreateA' >> beam.Create([b'a']),
+                }
+            } | analyzer_cache.WriteAnalysisCacheToFS(p, base_test_dir)
+    finally:
+      lock.release()
+
+  def test_cache_lock_takes_over_stale_lock(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    crashed_lock = analyzer_cache._CacheLock(base_test_dir)
+    self.assertTrue(crashed_lock.acquire())
+    lock = analyzer_cache._CacheLock(base_test_dir)
+    with mock.patch.object(analyzer_cache, '_LOCK_POLL_INTERVAL_SECONDS', 0):
+      # A lock within its lease is not taken over.
+      with mock.patch.object(analyzer_cache, '_LOCK_TIMEOUT_SECONDS', 0.1):
+        self.assertFalse(lock.acquire())
+      with mock.patch.object(analyzer_cache, '_LOCK_LEASE_SECONDS', 0):
+        self.assertTrue(lock.acquire())
+    # Releasing the lock that was taken over keeps the new lock.
+    crashed_lock.release()
+    self.assertTrue(tf.io.gfile.exists(lock.lock_path))
+    lock.release()
+    self.assertFalse(tf.io.gfile.exists(lock.lock_path))
+    self.assertEqual(tf.io.gfile.listdir(base_test_dir), [])
+
+  def test_transform_fn_store_stats_and_compaction(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    saved_model_dir = os.path.join(base_test_dir, 'saved_model')
+    tf.io.gfile.makedirs(os.path.join(saved_model_dir, 'variables'))
+    with tf.io.gfile.GFile(
+        os.path.join(saved_model_dir, 'saved_model.pb'), 'wb') as f:
+      f.write(b'a' * 100)
+    store_key = analyzer_cache.TRANSFORM_FN_STORE_DATASET_KEY
+
+    store_path = analyzer_cache.get_transform_fn_store_path(
+        base_test_dir, b'fingerprint')
+    self.assertEqual(analyzer_cache.get_cache_entry_stats(base_test_dir), [])
+    analyzer_cache.store_transform_fn(saved_model_dir, store_path)
+    self.assertEqual(
+        analyzer_cache.record_transform_fn_store_hit(store_path), store_path)
+    analyzer_cache.record_transform_fn_store_hit(store_path)
+
+    stats = analyzer_cache.get_cache_entry_stats(base_test_dir)
+    self.assertEqual([(s.dataset_key, s.cache_entry_key, s.hit_count)
+                      for s in stats], [(store_key, b'fingerprint', 2)])
+    self.assertEqual(stats[0].size_bytes, 100)
+
+    self.assertEqual(
+        analyzer_cache.compact_analysis_cache(base_test_dir, max_bytes=0), [])
+    evicted = analyzer_cache.compact_analysis_cache(
+        base_test_dir, max_bytes=0, min_age_seconds=0)
+    self.assertEqual([s.cache_entry_key for s in evicted], [b'fingerprint'])
+    self.assertFalse(tf.io.gfile.exists(store_path))
+    self.assertEqual(analyzer_cache.get_cache_entry_stats(base_test_dir), [])
+
+  def test_compaction_prunes_cache_plans(self):
+    base_test_dir = os.path.join(
+        os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
+        self._testMethodName)
+    plan_dir = os.path.join(base_test_dir, analyzer_cache._CACHE_PLAN_DIR)
+    tf.io.gfile.makedirs(plan_dir)
+    plan_names = ['2020010{}T000000Z-00000000.json'.format(idx)
+                  for idx in range(1, 6)]
+    for name in plan_names:
+      with tf.io.gfile.GFile(os.path.join(plan_dir, name), 'w') as f:
+        f.write('{}')
+
+    def list_plans():
+      return sorted(tf.io.gfile.listdir(plan_dir))
+
+    analyzer_cache.compact_analysis_cache(base_test_dir, max_cache_plans=None)
+    self.assertEqual(list_plans(), plan_names)
+    analyzer_cache.compact_analysis_cache(base_test_dir, max_cache_plans=2)
+    self.assertEqual(list_plans(), plan_names[-2:])
+    analyzer_cache.compact_analysis_cache(
+        base_test_dir, max_age_seconds=-1, max_cache_plans=None)
+    self.assertEqual(list_plans(), [])
+
   def test_cache_merge(self):
     base_test_dir = os.path.join(
         os.environ.get('TEST_UNDECLARED_OUTPUTS_DIR', self.get_temp_dir()),
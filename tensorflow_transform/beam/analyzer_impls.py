@@ -28,6 +28,7 @@ import os
 from absl import logging
 import apache_beam as beam
 
+from apache_beam.transforms import util
 from apache_beam.transforms.ptransform import ptransform_fn
 from apache_beam.typehints import Any
 from apache_beam.typehints import Dict
@@ -862,25 +863,12 @@ class _PackedCombinerWrapper(beam.combiners.TupleCombineFn):
     }
 
 
-def _split_inputs_by_key(batch_values):
-  """Takes inputs where first input is a key, and returns (key, value) pairs.
-
-  Takes inputs of the form (key, arg0, ..., arg{N-1}) where `key` is a vector
-  and arg0, ..., arg{N-1} have dimension >1 with size in the first dimension
-  matching `key`.
-
-  It yields pairs of the form
-
-  (key[i], [arg0[i], ..., arg{N-1}[i]])
-
-  for 0 < i < len(key).
+def _check_inputs_by_key(batch_values):
+  """Checks that per-key inputs are a key vector and args of matching size.
 
   Args:
     batch_values: A list of ndarrays representing the input from a batch.
 
-  Yields:
-    (key, args) pairs where args is a list of ndarrays.
-
   Raises:
     ValueError: if inputs do not have correct sizes.
   """
@@ -903,10 +891,41 @@ def _split_inputs_by_key(batch_values):
           'size of the keys vector ({})'.format(
               arg_index, arg_values.shape, keys.shape[0]))
 
-  for instance_index, key in enumerate(keys):
-    instance_args = [arg_values[instance_index]
-                     for arg_values in batch_values[1:]]
-    yield (key, instance_args)
+
+def _accumulate_inputs_by_key(batch_values, combiner):
+  """Takes inputs where first input is a key, and returns per-key accumulators.
+
+  Takes inputs of the form (key, arg0, ..., arg{N-1}) where `key` is a vector
+  and arg0, ..., arg{N-1} have dimension >1 with size in the first dimension
+  matching `key`. It groups the instances of the batch by key and folds each
+  group into a fresh accumulator using `combiner.add_instances`. It yields pairs
+  of the form
+
+  (key, accumulator)
+
+  one for each distinct value of `key` in the batch, in sorted key order.
+
+  Args:
+    batch_values: A list of ndarrays representing the input from a batch.
+    combiner: The `analyzer_nodes.Combiner` to accumulate with.
+
+  Yields:
+    (key, accumulator) pairs.
+
+  Raises:
+    ValueError: if inputs do not have correct sizes.
+  """
+  _check_inputs_by_key(batch_values)
+  unique_keys, key_indices = np.unique(batch_values[0], return_inverse=True)
+  # A stable sort keeps the instances of each key in their batch order.
+  instance_order = np.argsort(key_indices, kind='stable')
+  group_ends = np.cumsum(np.bincount(key_indices, minlength=len(unique_keys)))
+  for key, instance_indices in zip(
+      unique_keys, np.split(instance_order, group_ends[:-1])):
+    instances_values = [arg_values[instance_indices]
+                        for arg_values in batch_values[1:]]
+    yield (key, combiner.add_instances(combiner.create_accumulator(),
+                                       instances_values))
 
 
 def _merge_outputs_by_key(keys_and_outputs, outputs_dtype):
@@ -1159,6 +1178,50 @@ class _MergeAccumulatorsCombineImpl(beam.PTransform):
                 is_combining_accumulators=True)))
 
 
+def _retract_accumulators(accumulator, retracted_accumulators, combiner):
+  return combiner.retract_accumulators(accumulator, retracted_accumulators)
+
+
+@common.register_ptransform(analyzer_nodes.CombineRollingAggregate)
+class _CombineRollingAggregateImpl(beam.PTransform):
+  """Updates a rolling aggregate by merging and retracting accumulators."""
+
+  def __init__(self, operation, extra_args):
+    self._combiner = operation.combiner
+    self._tf_config = extra_args.tf_config
+    self._num_retracted = operation.num_retracted
+    self._name = operation.label
+
+  def expand(self, inputs):
+    num_merged = len(inputs) - self._num_retracted
+    merged_inputs = tuple(inputs[:num_merged])
+    retracted_inputs = tuple(inputs[num_merged:])
+
+    result = (
+        merged_inputs
+        | 'FlattenMergedAccumulators' >> beam.Flatten()
+        | 'MergeCombinesGlobally' >> beam.CombineGlobally(
+            _CombinerWrapper(
+                self._combiner,
+                self._tf_config,
+                is_combining_accumulators=True,
+                should_extract_output=False)))
+    if not retracted_inputs:
+      return result
+
+    retracted_accumulators = (
+        retracted_inputs
+        | 'FlattenRetractedAccumulators' >> beam.Flatten())
+    return (result
+            | 'RetractAccumulators' >> beam.Map(
+                _retract_accumulators,
+                retracted_accumulators=beam.pvalue.AsList(
+                    retracted_accumulators),
+                combiner=self._combiner)
+            | 'Count' >>
+            common.IncrementCounter('num_rolling_aggregate_retractions'))
+
+
 @common.register_ptransform(analyzer_nodes.CacheableCombinePerKeyAccumulate)
 class _InitialAccumulateCombinePerKeyImpl(beam.PTransform):
   """Implement an analyzer based on a CombinePerKey."""
@@ -1169,13 +1232,21 @@ class _InitialAccumulateCombinePerKeyImpl(beam.PTransform):
 
   def expand(self, inputs):
     pcoll, = inputs
+    # The combiner is used outside of a _CombinerWrapper to pre-reduce each
+    # batch to one accumulator per distinct key, so that the CombinePerKey only
+    # has to merge accumulators. Its local state is therefore initialized here
+    # rather than relying on the _CombinerWrapper constructor.
+    if isinstance(self._combiner, analyzers.QuantilesCombiner):
+      self._combiner.initialize_local_state(self._tf_config)
+    combiner_wrapper = _CombinerWrapper(
+        self._combiner,
+        self._tf_config,
+        is_combining_accumulators=True,
+        should_extract_output=False)
     return (pcoll
-            | 'SplitByKey' >> beam.FlatMap(_split_inputs_by_key)
-            | 'CombinePerKey' >> beam.CombinePerKey(
-                _CombinerWrapper(
-                    self._combiner,
-                    self._tf_config,
-                    is_combining_accumulators=False)))
+            | 'AccumulateByKey' >> beam.FlatMap(
+                _accumulate_inputs_by_key, combiner=self._combiner)
+            | 'CombinePerKey' >> beam.CombinePerKey(combiner_wrapper))
 
 
 @common.register_ptransform(analyzer_nodes.CacheableCombinePerKeyMerge)
@@ -1260,6 +1331,11 @@ class _EncodeCacheImpl(beam.PTransform):
   def expand(self, inputs):
     pcoll, = inputs
 
+    if self._coder.block_size is not None:
+      pcoll |= 'BatchEntries' >> util.BatchElements(
+          min_batch_size=self._coder.block_size,
+          max_batch_size=self._coder.block_size)
+
     return (pcoll
             | 'Encode' >> beam.Map(self._coder.encode_cache)
             | 'Count' >> common.IncrementCounter('cache_entries_encoded'))
@@ -1279,8 +1355,13 @@ class _DecodeCacheImpl(beam.PTransform):
   def expand(self, pbegin):
     del pbegin  # unused
 
+    if self._coder.block_size is not None:
+      decode = beam.FlatMap(self._coder.decode_cache)
+    else:
+      decode = beam.Map(self._coder.decode_cache)
+
     return (self._cache_pcoll
-            | 'Decode' >> beam.Map(self._coder.decode_cache)
+            | 'Decode' >> decode
             | 'Count' >> common.IncrementCounter('cache_entries_decoded'))
 
 
@@ -23,32 +23,56 @@ import apache_beam as beam
 
 import numpy as np
 import tensorflow as tf
+from tensorflow_transform import analyzers
 from tensorflow_transform.beam import analyzer_impls
 from tensorflow_transform.beam import tft_unit
 
 
 class AnalyzerImplsTest(tft_unit.TransformTestCase):
 
-  def testSplitInputsByKey(self):
+  def testAccumulateInputsByKey(self):
     inputs = [
-        np.array(['my_key', 'my_other_key']),
-        np.array([[1, 2], [3, 4]]),
-        np.array([5, 6])
+        np.array(['my_key', 'my_other_key', 'my_key']),
+        np.array([[1, 2], [3, 4], [5, 6]]),
+        np.array([5, 6, 7])
     ]
-    split_inputs = list(analyzer_impls._split_inputs_by_key(inputs))
-    self.assertEqual(len(split_inputs), 2)
-
-    self.assertEqual(len(split_inputs[0]), 2)
-    self.assertEqual(split_inputs[0][0], 'my_key')
-    self.assertEqual(len(split_inputs[0][1]), 2)
-    self.assertAllEqual(split_inputs[0][1][0], np.array([1, 2]))
-    self.assertAllEqual(split_inputs[0][1][1], np.array(5))
-
-    self.assertEqual(len(split_inputs[1]), 2)
-    self.assertEqual(split_inputs[1][0], 'my_other_key')
-    self.assertEqual(len(split_inputs[1][1]), 2)
-    self.assertAllEqual(split_inputs[1][1][0], np.array([3, 4]))
-    self.assertAllEqual(split_inputs[1][1][1], np.array(6))
+    combiner = analyzers.NumPyCombiner(
+        fn=np.sum,
+        default_accumulator_value=0,
+        output_dtypes=[np.int64, np.int64],
+        output_shapes=[(2,), ()])
+    accumulated_inputs = list(
+        analyzer_impls._accumulate_inputs_by_key(inputs, combiner))
+    self.assertEqual(len(accumulated_inputs), 2)
+
+    self.assertEqual(accumulated_inputs[0][0], 'my_key')
+    self.assertAllEqual(accumulated_inputs[0][1][0], np.array([6, 8]))
+    self.assertAllEqual(accumulated_inputs[0][1][1], np.array(12))
+
+    self.assertEqual(accumulated_inputs[1][0], 'my_other_key')
+    self.assertAllEqual(accumulated_inputs[1][1][0], np.array([3, 4]))
+    self.assertAllEqual(accumulated_inputs[1][1][1], np.array(6))
+
+  def testAccumulateInputsByKeyMatchesAddInputPerInstance(self):
+    keys = np.array(['a', 'b', 'c', 'b', 'a', 'a', 'c'])
+    values = np.array([3., 1., 4., 1., 5., 9., 2.])
+    combiner = analyzers.WeightedMeanAndVarCombiner(np.float64, output_shape=())
+    inputs = [keys, np.ones_like(values), values, np.zeros_like(values),
+              np.zeros_like(values)]
+
+    expected = {}
+    for instance_index, key in enumerate(keys):
+      instance_args = [arg_values[instance_index] for arg_values in inputs[1:]]
+      expected[key] = combiner.add_input(
+          expected.get(key, combiner.create_accumulator()), instance_args)
+
+    accumulated_inputs = dict(
+        analyzer_impls._accumulate_inputs_by_key(inputs, combiner))
+    self.assertCountEqual(accumulated_inputs.keys(), expected.keys())
+    for key, accumulator in accumulated_inputs.items():
+      self.assertAllClose(
+          combiner.extract_output(accumulator),
+          combiner.extract_output(expected[key]))
 
   def testMergeOutputsByKey(self):
     outputs = [
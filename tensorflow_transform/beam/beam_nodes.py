@@ -76,7 +76,7 @@ class CreateTensorBinding(
 class CreateSavedModel(
     collections.namedtuple(
         'CreateSavedModel',
-        ['table_initializers', 'output_signature', 'label']),
+        ['table_initializers', 'output_signature', 'analysis_only', 'label']),
     nodes.OperationDef):
   """An operation that represents creating a SavedModel with bound values.
 
@@ -97,6 +97,9 @@ class CreateSavedModel(
     output_signature: The output signature of this `SavedModel`, as a dictionary
         whose keys are feature names and values are `Tensor`s or
         `SparseTensor`s.
+    analysis_only: Whether this `SavedModel` only computes the inputs of
+        analyzers, so that it can be pruned to the ops that `output_signature`
+        needs.
     label: A unique label for this operation.
   """
 
@@ -0,0 +1,77 @@
+# Copyright 2020 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for constructing analysis graphs with many features.
+
+Run with:
+  python tensorflow_transform/beam/benchmark_analysis_graph_builder_test.py \
+      --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import time
+
+# GOOGLE-INITIALIZATION
+
+import tensorflow as tf
+import tensorflow_transform as tft
+from tensorflow_transform.beam import analysis_graph_builder
+from tensorflow_transform.beam import analyzer_cache
+
+_NUM_FEATURES = (10, 100, 1000)
+_DATASET_KEYS = [analyzer_cache.DatasetKey('span-0')]
+
+
+def _preprocessing_fn(inputs):
+  # Every feature requires two phases of analysis.
+  return {
+      name: tft.scale_to_0_1(x - tft.mean(x)) for name, x in inputs.items()
+  }
+
+
+class AnalysisGraphBuilderBenchmark(tf.test.Benchmark):
+  """Measures analysis graph construction time as the features increase."""
+
+  def _run_benchmark(self, name, construct_fn):
+    for num_features in _NUM_FEATURES:
+      feature_spec = {
+          'x_{}'.format(idx): tf.io.FixedLenFeature([], tf.float32)
+          for idx in range(num_features)
+      }
+      start = time.time()
+      construct_fn(feature_spec)
+      self.report_benchmark(
+          iters=1,
+          wall_time=time.time() - start,
+          name='{}_{}_features'.format(name, num_features),
+          extras={'num_features': num_features})
+
+  def benchmarkGetAnalysisCacheEntryKeys(self):
+    self._run_benchmark(
+        'get_analysis_cache_entry_keys',
+        lambda feature_spec: analysis_graph_builder.
+        get_analysis_cache_entry_keys(_preprocessing_fn, feature_spec,
+                                      _DATASET_KEYS))
+
+  def benchmarkGetAnalysisDatasetKeys(self):
+    self._run_benchmark(
+        'get_analysis_dataset_keys',
+        lambda feature_spec: analysis_graph_builder.get_analysis_dataset_keys(
+            _preprocessing_fn, feature_spec, _DATASET_KEYS, {}))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -21,6 +21,7 @@ from __future__ import print_function
 
 import collections
 import functools
+import json
 import os
 import struct
 # GOOGLE-INITIALIZATION
@@ -83,7 +84,7 @@ _OPTIMIZE_TRAVERSAL_COMMON_CASE = dict(
     expected_dot_graph_str=r"""digraph G {
 directed=True;
 node [shape=Mrecord];
-"CreateSavedModelForAnalyzerInputs[Phase0]" [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('vocabulary/Reshape', \"Tensor\<shape: [None], \<dtype: 'string'\>\>\"), ('x/mean_and_var/Cast', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x/mean_and_var/truediv', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x/mean_and_var/truediv_1', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x/mean_and_var/zeros', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\")])|label: CreateSavedModelForAnalyzerInputs[Phase0]}"];
+"CreateSavedModelForAnalyzerInputs[Phase0]" [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('vocabulary/Reshape', \"Tensor\<shape: [None], \<dtype: 'string'\>\>\"), ('x/mean_and_var/Cast', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x/mean_and_var/truediv', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x/mean_and_var/truediv_1', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x/mean_and_var/zeros', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\")])|analysis_only: True|label: CreateSavedModelForAnalyzerInputs[Phase0]}"];
 "ExtractInputForSavedModel[AnalysisIndex0]" [label="{ExtractInputForSavedModel|dataset_key: DatasetKey(key='span-0')|label: ExtractInputForSavedModel[AnalysisIndex0]}"];
 "ApplySavedModel[Phase0][AnalysisIndex0]" [label="{ApplySavedModel|phase: 0|label: ApplySavedModel[Phase0][AnalysisIndex0]|partitionable: True}"];
 "CreateSavedModelForAnalyzerInputs[Phase0]" -> "ApplySavedModel[Phase0][AnalysisIndex0]";
@@ -131,7 +132,7 @@ node [shape=Mrecord];
 "ExtractCombineMergeOutputs[x/mean_and_var]":0 -> "CreateTensorBinding[x/mean_and_var/Placeholder]";
 "CreateTensorBinding[x/mean_and_var/Placeholder_1]" [label="{CreateTensorBinding|tensor: x/mean_and_var/Placeholder_1:0|is_asset_filepath: False|label: CreateTensorBinding[x/mean_and_var/Placeholder_1]}"];
 "ExtractCombineMergeOutputs[x/mean_and_var]":1 -> "CreateTensorBinding[x/mean_and_var/Placeholder_1]";
-"CreateSavedModelForAnalyzerInputs[Phase1]" [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('x_square_deviations/mean_and_var/Cast', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x_square_deviations/mean_and_var/truediv', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x_square_deviations/mean_and_var/truediv_1', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x_square_deviations/mean_and_var/zeros', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\")])|label: CreateSavedModelForAnalyzerInputs[Phase1]}"];
+"CreateSavedModelForAnalyzerInputs[Phase1]" [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('x_square_deviations/mean_and_var/Cast', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x_square_deviations/mean_and_var/truediv', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x_square_deviations/mean_and_var/truediv_1', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\"), ('x_square_deviations/mean_and_var/zeros', \"Tensor\<shape: [], \<dtype: 'float32'\>\>\")])|analysis_only: True|label: CreateSavedModelForAnalyzerInputs[Phase1]}"];
 "CreateTensorBinding[vocabulary/vocab_vocabulary_unpruned_vocab_size]" -> "CreateSavedModelForAnalyzerInputs[Phase1]";
 "CreateTensorBinding[vocabulary/Placeholder]" -> "CreateSavedModelForAnalyzerInputs[Phase1]";
 "CreateTensorBinding[x/mean_and_var/Placeholder]" -> "CreateSavedModelForAnalyzerInputs[Phase1]";
@@ -152,7 +153,7 @@ node [shape=Mrecord];
 "ExtractCombineMergeOutputs[x_square_deviations/mean_and_var]":0 -> "CreateTensorBinding[x_square_deviations/mean_and_var/Placeholder]";
 "CreateTensorBinding[x_square_deviations/mean_and_var/Placeholder_1]" [label="{CreateTensorBinding|tensor: x_square_deviations/mean_and_var/Placeholder_1:0|is_asset_filepath: False|label: CreateTensorBinding[x_square_deviations/mean_and_var/Placeholder_1]}"];
 "ExtractCombineMergeOutputs[x_square_deviations/mean_and_var]":1 -> "CreateTensorBinding[x_square_deviations/mean_and_var/Placeholder_1]";
-CreateSavedModel [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('x_normalized', \"Tensor\<shape: [None], \<dtype: 'float32'\>\>\")])|label: CreateSavedModel}"];
+CreateSavedModel [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('x_normalized', \"Tensor\<shape: [None], \<dtype: 'float32'\>\>\")])|analysis_only: False|label: CreateSavedModel}"];
 "CreateTensorBinding[vocabulary/vocab_vocabulary_unpruned_vocab_size]" -> CreateSavedModel;
 "CreateTensorBinding[vocabulary/Placeholder]" -> CreateSavedModel;
 "CreateTensorBinding[x/mean_and_var/Placeholder]" -> CreateSavedModel;
@@ -273,7 +274,7 @@ _OPTIMIZE_TRAVERSAL_GENERALIZED_CHAINED_PTRANSFORMS_CASE = dict(
     expected_dot_graph_str=r"""digraph G {
 directed=True;
 node [shape=Mrecord];
-"CreateSavedModelForAnalyzerInputs[Phase0]" [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('inputs/inputs/x_copy', \"Tensor\<shape: [None], \<dtype: 'float32'\>\>\")])|label: CreateSavedModelForAnalyzerInputs[Phase0]}"];
+"CreateSavedModelForAnalyzerInputs[Phase0]" [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('inputs/inputs/x_copy', \"Tensor\<shape: [None], \<dtype: 'float32'\>\>\")])|analysis_only: True|label: CreateSavedModelForAnalyzerInputs[Phase0]}"];
 "ExtractInputForSavedModel[AnalysisIndex0]" [label="{ExtractInputForSavedModel|dataset_key: DatasetKey(key='span-0')|label: ExtractInputForSavedModel[AnalysisIndex0]}"];
 "ApplySavedModel[Phase0][AnalysisIndex0]" [label="{ApplySavedModel|phase: 0|label: ApplySavedModel[Phase0][AnalysisIndex0]|partitionable: True}"];
 "CreateSavedModelForAnalyzerInputs[Phase0]" -> "ApplySavedModel[Phase0][AnalysisIndex0]";
@@ -323,7 +324,7 @@ node [shape=Mrecord];
 "TensorSource[x]" -> "FakeChainable[x/not-cacheable]";
 "CreateTensorBinding[x/Placeholder_1]" [label="{CreateTensorBinding|tensor: x/Placeholder_1:0|is_asset_filepath: False|label: CreateTensorBinding[x/Placeholder_1]}"];
 "FakeChainable[x/not-cacheable]" -> "CreateTensorBinding[x/Placeholder_1]";
-CreateSavedModel [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('x_chained', \"Tensor\<shape: [17, 27], \<dtype: 'float32'\>\>\"), ('x_plain', \"Tensor\<shape: [7, 13], \<dtype: 'int64'\>\>\")])|label: CreateSavedModel}"];
+CreateSavedModel [label="{CreateSavedModel|table_initializers: 0|output_signature: OrderedDict([('x_chained', \"Tensor\<shape: [17, 27], \<dtype: 'float32'\>\>\"), ('x_plain', \"Tensor\<shape: [7, 13], \<dtype: 'int64'\>\>\")])|analysis_only: False|label: CreateSavedModel}"];
 "CreateTensorBinding[x/Placeholder]" -> CreateSavedModel;
 "CreateTensorBinding[x/Placeholder_1]" -> CreateSavedModel;
 "EncodeCache[FakeChainableCacheable[x/cacheable1]][AnalysisIndex0]" [label="{EncodeCache|coder: Not-a-coder-but-thats-ok!|label: EncodeCache[FakeChainableCacheable[x/cacheable1]][AnalysisIndex0]|partitionable: True}"];
@@ -791,6 +792,117 @@ class CachedImplTest(tft_unit.TransformTestCase):
     self.assertMetricsCounterEqual(p.metrics, 'saved_models_created',
                                    _ZERO_PHASE_NUM_SAVED_MODELS)
 
+  @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
+  def test_reads_json_numpy_cache_entries(self, use_tf_compat_v1):
+    if not use_tf_compat_v1:
+      tft_unit.skip_if_not_tf2('Tensorflow 2.x required.')
+    span_0_key = analyzer_cache.DatasetKey('span-0')
+    span_1_key = analyzer_cache.DatasetKey('span-1')
+
+    def preprocessing_fn(inputs):
+      return {
+          'x_min':
+              tft.min(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+          'x_mean':
+              tft.mean(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+      }
+
+    feature_spec = {'x': tf.io.FixedLenFeature([], tf.float32)}
+    input_data_dict = {
+        span_0_key: [{'x': -2}, {'x': 4}],
+        span_1_key: [{'x': 5}, {'x': 1}],
+    }
+    expected_transformed_data = [{'x_min': -2.0, 'x_mean': 2.0}] * 2
+
+    # Writes the cache as it was written when accumulators were encoded with
+    # `JsonNumpyCacheCoder`.
+    with mock.patch.object(
+        analyzer_nodes.Combiner,
+        'accumulator_coder',
+        new_callable=mock.PropertyMock,
+        return_value=analyzer_nodes.JsonNumpyCacheCoder()):
+      first_run_result = self._run_pipeline(
+          feature_spec,
+          input_data_dict,
+          preprocessing_fn,
+          datasets_to_transform=[span_1_key],
+          expected_transform_data=expected_transformed_data,
+          use_tf_compat_v1=use_tf_compat_v1)
+    self.assertMetricsCounterEqual(first_run_result.pipeline.metrics,
+                                   'cache_entries_encoded', 4)
+
+    second_run_result = self._run_pipeline(
+        feature_spec,
+        input_data_dict,
+        preprocessing_fn,
+        should_read_cache=True,
+        datasets_to_transform=[span_1_key],
+        expected_transform_data=expected_transformed_data,
+        use_tf_compat_v1=use_tf_compat_v1)
+
+    # The entries are found under the same cache keys and decoded.
+    p = second_run_result.pipeline
+    self.assertMetricsCounterEqual(p.metrics, 'num_instances', 2)
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_decoded', 4)
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_encoded', 0)
+
+  @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
+  def test_reads_single_token_vocabulary_cache_entries(self, use_tf_compat_v1):
+    if not use_tf_compat_v1:
+      tft_unit.skip_if_not_tf2('Tensorflow 2.x required.')
+    span_0_key = analyzer_cache.DatasetKey('span-0')
+    span_1_key = analyzer_cache.DatasetKey('span-1')
+
+    def preprocessing_fn(inputs):
+      return {'s_integerized': tft.compute_and_apply_vocabulary(inputs['s'])}
+
+    feature_spec = {'s': tf.io.FixedLenFeature([], tf.string)}
+    input_data_dict = {
+        span_0_key: [{'s': 'a'}, {'s': 'b'}, {'s': 'a'}],
+        span_1_key: [{'s': 'b'}, {'s': 'a'}, {'s': 'c'}],
+    }
+    expected_transformed_data = [{
+        's_integerized': 1
+    }, {
+        's_integerized': 0
+    }, {
+        's_integerized': 2
+    }]
+
+    # Writes the cache as it was written when vocabulary accumulators were
+    # encoded one token per record by `_VocabularyAccumulatorCoder`.
+    def single_token_cache_coder(operation_def):
+      return analyzer_nodes._VocabularyAccumulatorCoder(
+          input_dtype=operation_def.input_dtype)
+
+    with mock.patch.object(analyzer_nodes.VocabularyAccumulate, 'cache_coder',
+                           property(single_token_cache_coder)):
+      first_run_result = self._run_pipeline(
+          feature_spec,
+          input_data_dict,
+          preprocessing_fn,
+          datasets_to_transform=[span_1_key],
+          expected_transform_data=expected_transformed_data,
+          use_tf_compat_v1=use_tf_compat_v1)
+    # One record per distinct token of each span.
+    self.assertMetricsCounterEqual(first_run_result.pipeline.metrics,
+                                   'cache_entries_encoded', 5)
+
+    second_run_result = self._run_pipeline(
+        feature_spec,
+        input_data_dict,
+        preprocessing_fn,
+        should_read_cache=True,
+        datasets_to_transform=[span_1_key],
+        expected_transform_data=expected_transformed_data,
+        use_tf_compat_v1=use_tf_compat_v1)
+
+    # The records are found under the same cache keys and decoded.
+    p = second_run_result.pipeline
+    self.assertMetricsCounterEqual(p.metrics, 'num_instances', 3)
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_decoded', 5)
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_encoded', 0)
+
   @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
   @mock_out_cache_hash
   def test_caching_vocab_for_integer_categorical(self, use_tf_compat_v1):
@@ -1136,6 +1248,256 @@ class CachedImplTest(tft_unit.TransformTestCase):
     self.assertMetricsCounterEqual(p3.metrics, 'cache_entries_encoded', 1)
     self.assertMetricsCounterEqual(p3.metrics, 'saved_models_created', 2)
 
+  @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
+  def test_cache_base_dir_reads_only_required_entries(self, use_tf_compat_v1):
+    if not use_tf_compat_v1:
+      tft_unit.skip_if_not_tf2('Tensorflow 2.x required.')
+
+    def first_preprocessing_fn(inputs):
+      return {
+          'x_min': tft.min(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+          'x_mean':
+              tft.mean(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+      }
+
+    def second_preprocessing_fn(inputs):
+      return {
+          'x_mean':
+              tft.mean(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+      }
+
+    feature_spec = {'x': tf.io.FixedLenFeature([], tf.float32)}
+    span_0_key = analyzer_cache.DatasetKey('span-0')
+    span_1_key = analyzer_cache.DatasetKey('span-1')
+    input_data_dict = {span_0_key: [dict(x=-2), dict(x=4)]}
+    run_result = self._run_pipeline(
+        feature_spec,
+        input_data_dict,
+        first_preprocessing_fn,
+        use_tf_compat_v1=use_tf_compat_v1)
+    self.assertEqual(2, len(run_result.cache_output[span_0_key]))
+
+    input_metadata = dataset_metadata.DatasetMetadata(
+        schema_utils.schema_from_feature_spec(feature_spec))
+    with self._TestPipeline() as p:
+      with tft_beam.Context(force_tf_compat_v1=use_tf_compat_v1):
+        input_data_pcoll_dict = {
+            span_0_key: p | 'CreateSpan0' >> beam.Create([dict(x=-2),
+                                                         dict(x=4)]),
+            span_1_key: p | 'CreateSpan1' >> beam.Create([dict(x=1)]),
+        }
+        _, cache_output = (
+            (input_data_pcoll_dict, None, input_metadata)
+            | 'Analyze' >> tft_beam.AnalyzeDatasetWithCache(
+                second_preprocessing_fn, cache_base_dir=self._cache_dir))
+
+    self.assertEqual([span_1_key], list(cache_output.keys()))
+    self.assertMetricsCounterEqual(p.metrics, 'num_instances', 1)
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_decoded', 1)
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_encoded', 1)
+
+    # Only the mean's cache entry was read.
+    self.assertCountEqual(
+        [(stats.dataset_key, stats.hit_count)
+         for stats in analyzer_cache.get_cache_entry_stats(self._cache_dir)],
+        [(span_0_key, 0), (span_0_key, 1)])
+
+  @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
+  def test_cache_decisions_are_reported(self, use_tf_compat_v1):
+    if not use_tf_compat_v1:
+      tft_unit.skip_if_not_tf2('Tensorflow 2.x required.')
+
+    def first_preprocessing_fn(inputs):
+      return {
+          'x_mean':
+              tft.mean(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+      }
+
+    def second_preprocessing_fn(inputs):
+      return {
+          'x_mean':
+              tft.mean(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+          'y_mean':
+              tft.mean(inputs['y'], name='y') + tf.zeros_like(inputs['y']),
+      }
+
+    feature_spec = {
+        'x': tf.io.FixedLenFeature([], tf.float32),
+        'y': tf.io.FixedLenFeature([], tf.float32),
+    }
+    span_0_key = analyzer_cache.DatasetKey('span-0')
+    span_1_key = analyzer_cache.DatasetKey('span-1')
+    span_2_key = analyzer_cache.DatasetKey('span-2')
+    span_0_data = [dict(x=-2, y=1), dict(x=4, y=3)]
+    self._run_pipeline(
+        feature_spec, {
+            span_0_key: span_0_data,
+            span_1_key: span_0_data
+        },
+        first_preprocessing_fn,
+        use_tf_compat_v1=use_tf_compat_v1)
+    self._run_pipeline(
+        feature_spec, {span_1_key: span_0_data},
+        second_preprocessing_fn,
+        use_tf_compat_v1=use_tf_compat_v1)
+
+    input_metadata = dataset_metadata.DatasetMetadata(
+        schema_utils.schema_from_feature_spec(feature_spec))
+    with self._TestPipeline() as p:
+      with tft_beam.Context(force_tf_compat_v1=use_tf_compat_v1):
+        input_data_pcoll_dict = {
+            key: p | 'Create{}'.format(key.key) >> beam.Create(span_0_data)
+            for key in (span_0_key, span_1_key, span_2_key)
+        }
+        _ = (
+            (input_data_pcoll_dict, None, input_metadata)
+            | 'Analyze' >> tft_beam.AnalyzeDatasetWithCache(
+                second_preprocessing_fn, cache_base_dir=self._cache_dir))
+
+    # The mean of y is not cached for span-0, and nothing is for span-2.
+    self.assertMetricsCounterEqual(p.metrics, 'analyzer_cache_hits', 3)
+    self.assertMetricsCounterEqual(p.metrics, 'analyzer_cache_misses', 3)
+    self.assertMetricsCounterEqual(p.metrics,
+                                   'analyzer_cache_misses_not_cached', 1)
+    self.assertMetricsCounterEqual(p.metrics,
+                                   'analyzer_cache_misses_new_dataset_key', 2)
+    self.assertMetricsCounterEqual(p.metrics,
+                                   'analyzer_cache_skipped_datasets', 1)
+
+    plan_paths = tf.io.gfile.glob(
+        os.path.join(self._cache_dir, '__CACHE_PLANS__', '*.json'))
+    self.assertLen(plan_paths, 1)
+    with tf.io.gfile.GFile(plan_paths[0]) as f:
+      cache_plan = json.load(f)
+    self.assertEqual(['span-1'], cache_plan['skipped_dataset_keys'])
+    self.assertEqual(3, cache_plan['num_hits'])
+    self.assertCountEqual(
+        [('span-0', None), ('span-0', 'not_cached'), ('span-1', None),
+         ('span-1', None), ('span-2', 'new_dataset_key'),
+         ('span-2', 'new_dataset_key')],
+        [(decision['dataset_key'], decision['miss_reason'])
+         for decision in cache_plan['decisions']])
+
+  @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
+  def test_memoize_transform_fn(self, use_tf_compat_v1):
+    if not use_tf_compat_v1:
+      tft_unit.skip_if_not_tf2('Tensorflow 2.x required.')
+
+    def preprocessing_fn(inputs):
+      return {'x_scaled': tft.scale_to_0_1(inputs['x'], name='x')}
+
+    feature_spec = {'x': tf.io.FixedLenFeature([], tf.float32)}
+    span_0_key = analyzer_cache.DatasetKey('span-0')
+    input_data_dict = {span_0_key: [dict(x=-2), dict(x=4)]}
+    run_result = self._run_pipeline(
+        feature_spec,
+        input_data_dict,
+        preprocessing_fn,
+        use_tf_compat_v1=use_tf_compat_v1)
+    self.assertEqual(1, len(run_result.cache_output[span_0_key]))
+
+    input_metadata = dataset_metadata.DatasetMetadata(
+        schema_utils.schema_from_feature_spec(feature_spec))
+
+    def run_memoized():
+      with self._TestPipeline() as p:
+        with tft_beam.Context(force_tf_compat_v1=use_tf_compat_v1):
+          transform_fn, cache_output = (
+              ({span_0_key: None}, None, input_metadata)
+              | 'Analyze' >> tft_beam.AnalyzeDatasetWithCache(
+                  preprocessing_fn,
+                  pipeline=p,
+                  cache_base_dir=self._cache_dir,
+                  memoize_transform_fn=True))
+          transformed_data, _ = (
+              ((p | 'CreateTransformData' >> beam.Create([dict(x=1)]),
+                input_metadata), transform_fn)
+              | 'Transform' >> tft_beam.TransformDataset())
+          beam_test_util.assert_that(transformed_data,
+                                     beam_test_util.equal_to([{
+                                         'x_scaled': 0.5
+                                     }]))
+      self.assertFalse(cache_output)
+      return p
+
+    # The first run is fully covered by cache, and stores its transform_fn.
+    p = run_memoized()
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_decoded', 1)
+    self.assertMetricsCounterEqual(p.metrics, 'transform_fn_store_hits', 0)
+
+    # The second run reads the stored transform_fn without any analysis.
+    p = run_memoized()
+    self.assertMetricsCounterEqual(p.metrics, 'cache_entries_decoded', 0)
+    self.assertMetricsCounterEqual(p.metrics, 'saved_models_created', 0)
+    self.assertMetricsCounterEqual(p.metrics, 'transform_fn_store_hits', 1)
+
+  @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
+  def test_rolling_aggregates_over_sliding_window(self, use_tf_compat_v1):
+    if not use_tf_compat_v1:
+      tft_unit.skip_if_not_tf2('Tensorflow 2.x required.')
+
+    def preprocessing_fn(inputs):
+      return {
+          'x_mean':
+              tft.mean(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+          'x_max': tft.max(inputs['x'], name='x') + tf.zeros_like(inputs['x']),
+      }
+
+    feature_spec = {'x': tf.io.FixedLenFeature([], tf.float32)}
+    input_metadata = dataset_metadata.DatasetMetadata(
+        schema_utils.schema_from_feature_spec(feature_spec))
+    span_data = [[dict(x=x), dict(x=x + 1)] for x in (0., 2., 4., 6., 8.)]
+    span_keys = [
+        analyzer_cache.DatasetKey('span-{}'.format(idx))
+        for idx in range(len(span_data))
+    ]
+
+    def run_window(window):
+      with self._TestPipeline() as p:
+        with tft_beam.Context(force_tf_compat_v1=use_tf_compat_v1):
+          input_data_pcoll_dict = {
+              span_keys[idx]: p | 'CreateSpan{}'.format(idx) >> beam.Create(
+                  span_data[idx]) for idx in window
+          }
+          transform_fn, cache_output = (
+              (input_data_pcoll_dict, None, input_metadata)
+              | 'Analyze' >> tft_beam.AnalyzeDatasetWithCache(
+                  preprocessing_fn,
+                  cache_base_dir=self._cache_dir,
+                  use_rolling_aggregates=True))
+          _ = (
+              cache_output
+              | 'WriteCache' >> analyzer_cache.WriteAnalysisCacheToFS(
+                  p, self._cache_dir))
+
+          window_values = [d['x'] for idx in window for d in span_data[idx]]
+          transformed_data, _ = (
+              ((p | 'CreateTransformData' >> beam.Create([dict(x=0.)]),
+                input_metadata), transform_fn)
+              | 'Transform' >> tft_beam.TransformDataset())
+          beam_test_util.assert_that(
+              transformed_data,
+              beam_test_util.equal_to([{
+                  'x_mean': np.mean(window_values),
+                  'x_max': np.max(window_values),
+              }]))
+      return p
+
+    p = run_window(range(4))
+    self.assertMetricsCounterEqual(p.metrics,
+                                   'num_rolling_aggregate_retractions', 0)
+    self.assertIn(analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY,
+                  [s.dataset_key for s in
+                   analyzer_cache.get_cache_entry_stats(self._cache_dir)])
+
+    # Only the mean is retractable, its rolling aggregate is updated by adding
+    # span-4 and retracting span-0.  The max still merges all spans.
+    p = run_window(range(1, 5))
+    self.assertMetricsCounterEqual(p.metrics,
+                                   'num_rolling_aggregate_retractions', 1)
+    # The instances of span-4 are analyzed, and one instance is transformed.
+    self.assertMetricsCounterEqual(p.metrics, 'num_instances', 3)
+
   @tft_unit.named_parameters(_TF_VERSION_NAMED_PARAMETERS)
   def test_changing_constant_fails_cache(self, use_tf_compat_v1):
     if not use_tf_compat_v1:
@@ -52,6 +52,10 @@ class Context(object):
     force_tf_compat_v1: (Optional) If True, TFT's public APIs
         (e.g. AnalyzeDataset) will use Tensorflow in compat.v1 mode irrespective
         of installed version of Tensorflow. Defaults to `True`.
+    use_trace_cache: (Optional) If True, traces of the preprocessing_fn are
+        kept in memory and reused by later traces of the same preprocessing_fn
+        object, if its code and captured values, its input specs and the
+        analyzer values are unchanged. Defaults to `False`.
 
   Note that the temp dir should be accessible to worker jobs, e.g. if running
   with the Cloud Dataflow runner, the temp dir should be on GCS and should have
@@ -65,6 +69,7 @@ class Context(object):
           'passthrough_keys',
           'use_deep_copy_optimization',
           'force_tf_compat_v1',
+          'use_trace_cache',
       ])):
     """A named tuple to store attributes of `Context`."""
 
@@ -93,7 +98,8 @@ class Context(object):
                passthrough_keys: Optional[Iterable[str]] = None,
                use_deep_copy_optimization: Optional[bool] = None,
                use_tfxio: Any = _DEPRECATED_SENTINEL,
-               force_tf_compat_v1: Optional[bool] = None):
+               force_tf_compat_v1: Optional[bool] = None,
+               use_trace_cache: Optional[bool] = None):
     if use_tfxio is not _DEPRECATED_SENTINEL:
       tf.compat.v1.logging.warning(
           'TFT beam APIs accept both the TFXIO format and the instance dict '
@@ -111,6 +117,7 @@ class Context(object):
     self._passthrough_keys = passthrough_keys
     self._use_deep_copy_optimization = use_deep_copy_optimization
     self._force_tf_compat_v1 = force_tf_compat_v1
+    self._use_trace_cache = use_trace_cache
 
   def __enter__(self):
     # Previous State's properties are inherited if not explicitly specified.
@@ -129,7 +136,10 @@ class Context(object):
             last_frame.use_deep_copy_optimization,
             force_tf_compat_v1=self._force_tf_compat_v1
             if self._force_tf_compat_v1 is not None else
-            last_frame.force_tf_compat_v1))
+            last_frame.force_tf_compat_v1,
+            use_trace_cache=self._use_trace_cache
+            if self._use_trace_cache is not None else
+            last_frame.use_trace_cache))
 
   def __exit__(self, *exn_info):
     self._thread_local.state.frames.pop()
@@ -181,6 +191,14 @@ class Context(object):
       return state.use_deep_copy_optimization
     return False
 
+  @classmethod
+  def get_use_trace_cache(cls) -> bool:
+    """Retrieves a user set use_trace_cache, False if not set."""
+    state = cls._get_topmost_state_frame()
+    if state.use_trace_cache is not None:
+      return state.use_trace_cache
+    return False
+
   @classmethod
   def _get_force_tf_compat_v1(cls) -> bool:
     """Retrieves flag force_tf_compat_v1."""
@@ -75,6 +75,7 @@ from __future__ import print_function
 import collections
 import copy
 import datetime
+import functools
 
 import apache_beam as beam
 
@@ -524,8 +525,10 @@ def _get_tensor_replacement_map(graph, *tensor_bindings):
   return tensor_replacement_map
 
 
-def _replace_tensors_with_constant_values(saved_model_dir, base_temp_dir,
-                                          *tensor_bindings):
+def _replace_tensors_with_constant_values(saved_model_dir,
+                                          base_temp_dir,
+                                          *tensor_bindings,
+                                          pruned_op_names=frozenset()):
   """Replaces specified `Tensor`s with constant values.
 
   Constants are accepted as Python values; these are automatically
@@ -541,6 +544,8 @@ def _replace_tensors_with_constant_values(saved_model_dir, base_temp_dir,
       and 'transform_signature', respectively).
     base_temp_dir: Base temp dir for storage of new model.
     *tensor_bindings: An iterable of `_TensorBinding`s.
+    pruned_op_names: (Optional) The names of the ops that were pruned from the
+      SavedModel.  Bindings of their tensors are ignored.
 
   Returns:
     The directory name containing the updated SavedModel.
@@ -549,6 +554,11 @@ def _replace_tensors_with_constant_values(saved_model_dir, base_temp_dir,
       RuntimeError: if there is no default graph available to which to
         apply the transform.
   """
+  if pruned_op_names:
+    tensor_bindings = [
+        tensor_binding for tensor_binding in tensor_bindings
+        if tensor_binding.tensor_name.split(':')[0] not in pruned_op_names
+    ]
   with tf.compat.v1.Graph().as_default() as graph:
     tensor_replacement_map = (
         _get_tensor_replacement_map(graph, *tensor_bindings))
@@ -578,34 +588,56 @@ class _CreateSavedModelImpl(beam.PTransform):
     self._input_signature = extra_args.input_signature
     self._table_initializers = operation.table_initializers
     self._output_signature = operation.output_signature
+    self._analysis_only = operation.analysis_only
 
   def expand(self, inputs):
     unbound_saved_model_dir = beam_common.get_unique_temp_path(
         self._base_temp_dir)
-    with self._graph.as_default():
-      with tf.compat.v1.Session(graph=self._graph) as session:
+    graph = self._graph
+    input_signature = self._input_signature
+    output_signature = self._output_signature
+    table_initializers = self._table_initializers
+    pruned_op_names = frozenset()
+    # A SavedModel that only computes the inputs of analyzers is pruned to the
+    # ops, tables and assets that these inputs need, so that less of the graph
+    # is loaded and initialized when it is applied.
+    if self._analysis_only:
+      pruned = graph_tools.prune_graph(graph, input_signature,
+                                       output_signature, table_initializers)
+      if pruned is not None:
+        graph, input_signature, output_signature, table_initializers = pruned
+        # Tensor bindings replace placeholders, so only the pruned placeholders
+        # need to be known when binding.
+        pruned_op_names = (
+            frozenset(op.name
+                      for op in self._graph.get_operations()
+                      if op.type == 'Placeholder') -
+            frozenset(op.name for op in graph.get_operations()))
+    with graph.as_default():
+      with tf.compat.v1.Session(graph=graph) as session:
         table_initializers_ref = tf.compat.v1.get_collection_ref(
             tf.compat.v1.GraphKeys.TABLE_INITIALIZERS)
         original_table_initializers = list(table_initializers_ref)
         del table_initializers_ref[:]
-        table_initializers_ref.extend(self._table_initializers)
+        table_initializers_ref.extend(table_initializers)
         # Initialize all variables so they can be saved.
         session.run(tf.compat.v1.global_variables_initializer())
         saved_transform_io.write_saved_transform_from_session(
-            session, self._input_signature, self._output_signature,
+            session, input_signature, output_signature,
             unbound_saved_model_dir)
         del table_initializers_ref[:]
         table_initializers_ref.extend(original_table_initializers)
     return (inputs
             | 'BindTensors' >> _BindTensors(self._base_temp_dir,
-                                            unbound_saved_model_dir)
+                                            unbound_saved_model_dir,
+                                            pruned_op_names)
             | 'Count' >>
             beam_common.IncrementCounter(_CREATE_SAVED_MODEL_COUNTER_NAME))
 
 
 def _create_v2_saved_model(tensor_replacement_map, base_temp_dir,
                            preprocessing_fn, input_signature,
-                           output_keys_to_name_map):
+                           output_keys_to_name_map, use_trace_cache):
   """Writes out a SavedModelV2 with preprocessing_fn traced using tf.function.
 
   The SavedModel written contains a method called `transform_fn` that
@@ -621,10 +653,35 @@ def _create_v2_saved_model(tensor_replacement_map, base_temp_dir,
     input_signature: TypeSpecs describing the inputs to the `preprocessing_fn`.
     output_keys_to_name_map: A map from output dictionary keys to the names of
       the tensors that they represent.
+    use_trace_cache: Whether the traced module is reused by later calls with
+      the same replacement values, e.g. when the same analysis is run again.
 
   Returns:
     Path to which SavedModel was written.
   """
+  trace_stats = collections.Counter()
+  module = impl_helper.get_or_trace(
+      functools.partial(_trace_v2_saved_model_module, tensor_replacement_map,
+                        base_temp_dir, preprocessing_fn, input_signature,
+                        output_keys_to_name_map),
+      preprocessing_fn,
+      input_signature,
+      tensor_replacement_map,
+      ('saved_model_v2', base_temp_dir,
+       sorted(six.iteritems(output_keys_to_name_map))),
+      trace_stats,
+      use_trace_cache)
+  _increment_trace_counters(trace_stats)
+
+  saved_model_dir = beam_common.get_unique_temp_path(base_temp_dir)
+  tf.saved_model.save(module, saved_model_dir)
+  return saved_model_dir
+
+
+def _trace_v2_saved_model_module(tensor_replacement_map, base_temp_dir,
+                                 preprocessing_fn, input_signature,
+                                 output_keys_to_name_map):
+  """Returns the `tf.Module` that `_create_v2_saved_model` saves."""
   module = tf.Module()
   module.transform_fn = impl_helper.get_traced_transform_fn(
       preprocessing_fn,
@@ -663,10 +720,7 @@ def _create_v2_saved_model(tensor_replacement_map, base_temp_dir,
   module.initializers = initializers
   module.assets = concrete_transform_fn.graph.get_collection(
       analyzer_nodes.ASSET_REPLACEMENTS)
-
-  saved_model_dir = beam_common.get_unique_temp_path(base_temp_dir)
-  tf.saved_model.save(module, saved_model_dir)
-  return saved_model_dir
+  return module
 
 
 @beam_common.register_ptransform(
@@ -681,6 +735,7 @@ class _CreateSavedModelImplV2(beam.PTransform):
     self._preprocessing_fn = extra_args.preprocessing_fn
     self._input_signature = extra_args.input_specs
     self._output_signature = operation.output_signature
+    self._use_trace_cache = Context.get_use_trace_cache()
 
   def _maybe_get_output_tensor_names_dict(self):
     # output_signature will contain CompositeTensors only if this is the final
@@ -704,7 +759,8 @@ class _CreateSavedModelImplV2(beam.PTransform):
         input_pcoll
         | 'CreateSavedModel' >> beam.Map(
             _create_v2_saved_model, self._base_temp_dir, self._preprocessing_fn,
-            self._input_signature, self._maybe_get_output_tensor_names_dict())
+            self._input_signature, self._maybe_get_output_tensor_names_dict(),
+            self._use_trace_cache)
         | 'Count' >>
         beam_common.IncrementCounter(_CREATE_SAVED_MODEL_COUNTER_NAME))
 
@@ -712,9 +768,13 @@ class _CreateSavedModelImplV2(beam.PTransform):
 class _BindTensors(beam.PTransform):
   """PTransform to bind tensor in a SavedModel."""
 
-  def __init__(self, base_temp_dir, unbound_saved_model_dir):
+  def __init__(self,
+               base_temp_dir,
+               unbound_saved_model_dir,
+               pruned_op_names=frozenset()):
     self._base_temp_dir = base_temp_dir
     self._unbound_saved_model_dir = unbound_saved_model_dir
+    self._pruned_op_names = pruned_op_names
 
   def expand(self, inputs):
     pipeline = (inputs[0] if isinstance(inputs, tuple) else inputs).pipeline
@@ -725,8 +785,10 @@ class _BindTensors(beam.PTransform):
       return saved_model_dir_pcoll
 
     return saved_model_dir_pcoll | 'ReplaceWithConstants' >> beam.Map(
-        _replace_tensors_with_constant_values, self._base_temp_dir,
-        *[beam.pvalue.AsSingleton(pcoll) for pcoll in inputs])
+        _replace_tensors_with_constant_values,
+        self._base_temp_dir,
+        *[beam.pvalue.AsSingleton(pcoll) for pcoll in inputs],
+        pruned_op_names=self._pruned_op_names)
 
 
 @beam_common.register_ptransform(beam_nodes.ExtractInputForSavedModel)
@@ -930,6 +992,61 @@ class _InstrumentAPI(beam.PTransform):
                  self._mapper_use_counter))
 
 
+def _increment_trace_counters(trace_stats):
+  for name, count in trace_stats.items():
+    beam.metrics.Metrics.counter(beam_common.METRICS_NAMESPACE,
+                                 name).inc(count)
+
+
+class _InstrumentTraces(beam.PTransform):
+  """PTransform that adds metrics for the traces of the preprocessing_fn."""
+
+  def __init__(self, trace_stats):
+    self._trace_stats = dict(trace_stats)
+
+  def expand(self, pipeline):
+
+    def _make_and_increment_counters(unused_element, trace_stats):
+      del unused_element
+      _increment_trace_counters(trace_stats)
+
+    _ = (
+        pipeline
+        | 'CreateSoleTraces' >> beam.Create([None])
+        | 'CountTraces' >> beam.Map(_make_and_increment_counters,
+                                    self._trace_stats))
+
+
+class _InstrumentCacheDecisions(beam.PTransform):
+  """PTransform that adds metrics for the cache decisions of an analysis."""
+
+  def __init__(self, cache_decisions, skipped_dataset_keys):
+    self._counter = collections.Counter()
+    for decision in cache_decisions:
+      if decision.is_hit:
+        self._counter['analyzer_cache_hits'] += 1
+      else:
+        self._counter['analyzer_cache_misses'] += 1
+        self._counter['analyzer_cache_misses_{}'.format(
+            decision.miss_reason)] += 1
+    self._counter['analyzer_cache_skipped_datasets'] = len(
+        skipped_dataset_keys)
+
+  def expand(self, pipeline):
+
+    def _make_and_increment_counters(unused_element, counter):
+      del unused_element
+      for name, count in counter.items():
+        beam.metrics.Metrics.counter(beam_common.METRICS_NAMESPACE,
+                                     name).inc(count)
+
+    _ = (
+        pipeline
+        | 'CreateSoleCacheDecisions' >> beam.Create([None])
+        | 'CountCacheDecisions' >> beam.Map(_make_and_increment_counters,
+                                            dict(self._counter)))
+
+
 @beam.typehints.with_input_types(_DATASET_ELEMENT_TYPE)
 @beam.typehints.with_output_types(pa.RecordBatch)
 class _InstanceDictInputToTFXIOInput(beam.PTransform):
@@ -969,6 +1086,8 @@ class _AnalyzeDatasetCommon(beam.PTransform):
     self._preprocessing_fn = preprocessing_fn
     self.pipeline = pipeline
     self._use_tf_compat_v1 = Context.get_use_tf_compat_v1()
+    self._use_trace_cache = Context.get_use_trace_cache()
+    self._use_rolling_aggregates = False
     _assert_tensorflow_version()
 
   def _extract_input_pvalues(self, dataset):
@@ -993,6 +1112,47 @@ class _AnalyzeDatasetCommon(beam.PTransform):
             pvalues), 'If there is no data, a pipeline must be provided'
     return dataset, pvalues
 
+  def _get_cache_pcoll_dict(self, pipeline, transform_fn_future,
+                            dataset_cache_dict):
+    """Returns the cache PCollections that the analysis graph may read.
+
+    Args:
+      pipeline: A beam Pipeline.
+      transform_fn_future: The analysis graph returned by
+        `analysis_graph_builder.build`.
+      dataset_cache_dict: The cache dictionary that the graph was built with.
+    """
+    del pipeline, transform_fn_future  # unused
+    return dataset_cache_dict
+
+  def _get_transform_fn_store_path(self, graph, transform_fn_future,
+                                   cache_value_nodes, dataset_keys):
+    """Returns the path that the output transform_fn is stored at, or None.
+
+    Args:
+      graph: The `tf.Graph` that the analysis graph was built from.
+      transform_fn_future: The analysis graph returned by
+        `analysis_graph_builder.build`.
+      cache_value_nodes: The output cache returned by
+        `analysis_graph_builder.build`.
+      dataset_keys: The dataset keys that the graph was built with.
+    """
+    del graph, transform_fn_future, cache_value_nodes, dataset_keys  # unused
+    return None
+
+  def _write_cache_plan(self, pipeline, dataset_keys, cache_decisions,
+                        skipped_dataset_keys):
+    """Writes a summary of the cache decisions of the analysis, if supported.
+
+    Args:
+      pipeline: A beam Pipeline.
+      dataset_keys: The dataset keys that the graph was built with.
+      cache_decisions: The `analyzer_cache.CacheDecision`s made while building
+        the graph.
+      skipped_dataset_keys: The dataset keys whose input data is not read.
+    """
+    del pipeline, dataset_keys, cache_decisions, skipped_dataset_keys  # unused
+
   def expand(self, dataset):
     """Analyze the dataset.
 
@@ -1034,10 +1194,18 @@ class _AnalyzeDatasetCommon(beam.PTransform):
 
     specs = TensorAdapter(input_tensor_adapter_config).OriginalTypeSpecs()
     base_temp_dir = Context.create_base_temp_dir()
+    trace_stats = collections.Counter()
+    # Writing the SavedModels of a TF1 graph adds ops to it, so that the graph
+    # is not shared with later traces.
     graph, structured_inputs, structured_outputs = (
-        impl_helper.trace_preprocessing_function(self._preprocessing_fn, specs,
-                                                 self._use_tf_compat_v1,
-                                                 base_temp_dir))
+        impl_helper.trace_preprocessing_function(
+            self._preprocessing_fn,
+            specs,
+            self._use_tf_compat_v1,
+            base_temp_dir,
+            trace_stats,
+            use_trace_cache=(self._use_trace_cache and
+                             not self._use_tf_compat_v1)))
 
     # At this point we check that the preprocessing_fn has at least one
     # output. This is because if we allowed the output of preprocessing_fn to
@@ -1060,6 +1228,37 @@ class _AnalyzeDatasetCommon(beam.PTransform):
     # them as a beam metric.
     _ = (pipeline | 'InstrumentAPI' >> _InstrumentAPI(graph))
 
+    cache_decisions = [] if dataset_cache_dict is not None else None
+    transform_fn_future, cache_value_nodes = analysis_graph_builder.build(
+        graph,
+        structured_inputs,
+        structured_outputs,
+        input_values_pcoll_dict.keys(),
+        cache_dict=dataset_cache_dict,
+        use_rolling_aggregates=self._use_rolling_aggregates,
+        cache_decisions=cache_decisions)
+    if cache_decisions is not None:
+      dataset_keys = list(input_values_pcoll_dict.keys())
+      skipped_dataset_keys = set(dataset_keys).difference(
+          analysis_graph_builder.get_read_dataset_keys(transform_fn_future,
+                                                       dataset_keys))
+      _ = (
+          pipeline
+          | 'InstrumentCacheDecisions' >> _InstrumentCacheDecisions(
+              cache_decisions, skipped_dataset_keys))
+      self._write_cache_plan(pipeline, dataset_keys, cache_decisions,
+                             skipped_dataset_keys)
+    transform_fn_store_path = self._get_transform_fn_store_path(
+        graph, transform_fn_future, cache_value_nodes,
+        input_values_pcoll_dict.keys())
+    is_transform_fn_stored = (
+        transform_fn_store_path is not None and
+        tf.io.gfile.exists(transform_fn_store_path))
+    if not is_transform_fn_stored:
+      dataset_cache_dict = self._get_cache_pcoll_dict(pipeline,
+                                                      transform_fn_future,
+                                                      dataset_cache_dict)
+
     tf_config = _DEFAULT_TENSORFLOW_CONFIG_BY_BEAM_RUNNER_TYPE.get(
         type(pipeline.runner))
     extra_args = beam_common.ConstructBeamPipelineVisitor.ExtraArgs(
@@ -1076,15 +1275,25 @@ class _AnalyzeDatasetCommon(beam.PTransform):
         cache_pcoll_dict=dataset_cache_dict,
         preprocessing_fn=self._preprocessing_fn)
 
-    transform_fn_future, cache_value_nodes = analysis_graph_builder.build(
-        graph,
-        structured_inputs,
-        structured_outputs,
-        input_values_pcoll_dict.keys(),
-        cache_dict=dataset_cache_dict)
     traverser = nodes.Traverser(
         beam_common.ConstructBeamPipelineVisitor(extra_args))
-    transform_fn_pcoll = traverser.visit_value_node(transform_fn_future)
+    if is_transform_fn_stored:
+      # The same analysis was performed before, and since it reads no input
+      # data its transform_fn is read from the store instead of running it.
+      transform_fn_pcoll = (
+          pipeline
+          | 'ReadStoredTransformFn' >> beam.Create([transform_fn_store_path])
+          | 'RecordStoredTransformFnHit' >> beam.Map(
+              analyzer_cache.record_transform_fn_store_hit)
+          | 'CountStoredTransformFn' >> beam_common.IncrementCounter(
+              'transform_fn_store_hits'))
+    else:
+      transform_fn_pcoll = traverser.visit_value_node(transform_fn_future)
+      if transform_fn_store_path is not None:
+        _ = (
+            transform_fn_pcoll
+            | 'StoreTransformFn' >> beam.Map(analyzer_cache.store_transform_fn,
+                                             transform_fn_store_path))
 
     if cache_value_nodes is not None:
       output_cache_pcoll_dict = {}
@@ -1113,10 +1322,15 @@ class _AnalyzeDatasetCommon(beam.PTransform):
           input_signature=specs,
           base_temp_dir=base_temp_dir,
           evaluate_schema_overrides=False)
+      concrete_metadata_fn = impl_helper.get_or_trace(
+          metadata_fn.get_concrete_function, self._preprocessing_fn, specs, {},
+          ('metadata_fn', base_temp_dir, False), trace_stats,
+          self._use_trace_cache)
       schema = _infer_feature_schema_from_concrete_function(
-          metadata_fn.get_concrete_function(),
+          concrete_metadata_fn,
           structured_outputs,
           evaluate_schema_overrides=False)
+    _ = (pipeline | 'InstrumentTraces' >> _InstrumentTraces(trace_stats))
     deferred_metadata = (
         transform_fn_pcoll
         | 'ComputeDeferredMetadata[compat_v1={}]'.format(self._use_tf_compat_v1)
@@ -1150,8 +1364,110 @@ class AnalyzeDatasetWithCache(_AnalyzeDatasetCommon):
       cache_output
       | tft.analyzer_cache.WriteAnalysisCacheToFS(pipeline, cache_dir))
   ```
+
+  Alternatively, the cache directory can be given directly, in which case only
+  the cache entries that the analysis uses are read:
+  ```
+  transform_fn, cache_output = (
+      (input_data_pcoll_dict, None, input_metadata)
+      | tft_beam.AnalyzeDatasetWithCache(
+          preprocessing_fn, cache_base_dir=cache_dir))
+  ```
+
+  When the cache directory is given, `memoize_transform_fn=True` stores the
+  output transform_fn of analyses that are fully covered by cache in the cache
+  directory.  Rerunning the same analysis over the same cache then reads the
+  stored transform_fn instead of running any analysis stages.  Stored
+  transform_fns are evicted by `tft_beam.analyzer_cache.compact_analysis_cache`
+  like other cache entries.
+
+  When analyzing a sliding window of datasets, `use_rolling_aggregates=True`
+  makes analyzers whose accumulators can be retracted (such as sums, counts,
+  means, variances and covariances) update the rolling aggregate cached by a
+  previous window, instead of merging the accumulators of all datasets. Other
+  analyzers merge the accumulators of all datasets as usual.
   """
 
+  def __init__(self,
+               preprocessing_fn,
+               pipeline=None,
+               cache_base_dir=None,
+               use_rolling_aggregates=False,
+               memoize_transform_fn=False):
+    """Init method.
+
+    Args:
+      preprocessing_fn: A function that accepts and returns a dictionary from
+        strings to `Tensor` or 2D `SparseTensor`s.
+      pipeline: (Optional) a beam Pipeline.
+      cache_base_dir: (Optional) A str, the path that the cache is stored in, as
+        written by `tft.analyzer_cache.WriteAnalysisCacheToFS`.  If given, the
+        input cache dictionary must be None, and a JSON summary of which
+        analyzers are read from cache, and why the others are not, is written
+        to a new file under its `__CACHE_PLANS__` subdirectory.
+      use_rolling_aggregates: (Optional) A bool, whether to maintain rolling
+        aggregates for analyzers that support it.  The rolling aggregates are
+        cached under `tft.analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY`, and
+        updating one requires the cache of the datasets that left the window
+        since it was written.  When `cache_base_dir` is given these are read
+        automatically, otherwise they must be part of the input cache
+        dictionary.
+      memoize_transform_fn: (Optional) A bool, whether the transform_fn of an
+        analysis that reads no input data should be stored in `cache_base_dir`
+        and read from there when the same analysis is performed again.  The
+        transform_fn is identified by the traced preprocessing graph, the
+        analyzed dataset keys and the cache entry keys that it is computed
+        from.
+        Requires `cache_base_dir`.
+    """
+    super(AnalyzeDatasetWithCache, self).__init__(preprocessing_fn, pipeline)
+    if memoize_transform_fn and cache_base_dir is None:
+      raise ValueError('memoize_transform_fn requires cache_base_dir')
+    self._cache_base_dir = cache_base_dir
+    self._use_rolling_aggregates = use_rolling_aggregates
+    self._memoize_transform_fn = memoize_transform_fn
+
+  def _get_cache_pcoll_dict(self, pipeline, transform_fn_future,
+                            dataset_cache_dict):
+    if self._cache_base_dir is None:
+      return dataset_cache_dict
+    # The graph was built with the cache entry keys found in the manifests, so
+    # only the entries that it decodes need to be read.
+    required_cache_entry_keys = (
+        analysis_graph_builder.get_required_cache_entry_keys(
+            transform_fn_future))
+    if not required_cache_entry_keys:
+      return {}
+    return (pipeline
+            | 'ReadAnalysisCache' >> analyzer_cache.ReadAnalysisCacheFromFS(
+                self._cache_base_dir,
+                list(required_cache_entry_keys.keys()),
+                set().union(*required_cache_entry_keys.values())))
+
+  def _get_transform_fn_store_path(self, graph, transform_fn_future,
+                                   cache_value_nodes, dataset_keys):
+    # An analysis that writes cache computes some of its outputs from input
+    # data, so its transform_fn can't be memoized.
+    if not self._memoize_transform_fn or cache_value_nodes:
+      return None
+    fingerprint = analysis_graph_builder.get_transform_fn_fingerprint(
+        graph, transform_fn_future, dataset_keys)
+    if fingerprint is None:
+      return None
+    return analyzer_cache.get_transform_fn_store_path(self._cache_base_dir,
+                                                      fingerprint)
+
+  def _write_cache_plan(self, pipeline, dataset_keys, cache_decisions,
+                        skipped_dataset_keys):
+    if self._cache_base_dir is None:
+      return
+    _ = (
+        pipeline
+        | 'WriteCachePlan' >> analyzer_cache.WriteCachePlanToFS(
+            self._cache_base_dir,
+            analyzer_cache.make_cache_plan(dataset_keys, cache_decisions,
+                                           skipped_dataset_keys)))
+
   def _make_parent_dataset(self, dataset):
     if len(dataset) > 3:
       raise ValueError('This API no longer requires flattened_pcoll')
@@ -1167,6 +1483,27 @@ class AnalyzeDatasetWithCache(_AnalyzeDatasetCommon):
   def expand(self, dataset):
     input_values_pcoll_dict = dataset[1] or dict()
     analyzer_cache.validate_dataset_keys(input_values_pcoll_dict.keys())
+    if self._cache_base_dir is not None:
+      if dataset[1] is not None:
+        raise ValueError(
+            'The input cache dictionary must be None when cache_base_dir is '
+            'given, got {}'.format(dataset[1]))
+      dataset_keys = list((dataset[0] or dict()).keys())
+      if self._use_rolling_aggregates:
+        dataset_keys.append(analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY)
+      manifests = analyzer_cache._read_manifests(  # pylint: disable=protected-access
+          self._cache_base_dir, dataset_keys)
+      if self._use_rolling_aggregates:
+        # The cache of datasets that left the window of a rolling aggregate is
+        # needed in order to retract them from it.
+        windows = analyzer_cache.get_rolling_aggregate_windows(
+            manifests.get(analyzer_cache.ROLLING_AGGREGATE_DATASET_KEY, {}))
+        expired_dataset_keys = set().union(*windows.values()).difference(
+            dataset_keys)
+        manifests.update(
+            analyzer_cache._read_manifests(  # pylint: disable=protected-access
+                self._cache_base_dir, expired_dataset_keys))
+      dataset = (dataset[0], manifests) + tuple(dataset[2:])
     return super(AnalyzeDatasetWithCache,
                  self).expand(self._make_parent_dataset(dataset))
 
@@ -2467,6 +2467,37 @@ class BeamImplTest(tft_unit.TransformTestCase):
         expected_outputs,
         test_data=test_data)
 
+  def testCovarianceSparseTwoDimensions(self):
+    def analyzer_fn(inputs):
+      return {'y': tft.covariance(inputs['x'], dtype=tf.float32)}
+
+    input_data = [{'idx': idx, 'val': val} for idx, val in [
+        ([], []), ([0], [4]), ([0, 1], [2, -2]), ([0, 1], [2, 2])]]
+    input_metadata = tft_unit.metadata_from_feature_spec(
+        {'x': tf.io.SparseFeature('idx', 'val', tf.float32, 2)})
+    expected_outputs = {'y': np.array([[2, 0], [0, 2]], np.float32)}
+    self.assertAnalyzerOutputs(
+        input_data, input_metadata, analyzer_fn, expected_outputs)
+
+  def testCovarianceSparseTopNColumns(self):
+    def analyzer_fn(inputs):
+      return {
+          'y': tft.covariance(inputs['x'], dtype=tf.float32, top_n_columns=2)
+      }
+
+    input_data = [{'idx': idx, 'val': val} for idx, val in [
+        ([0, 2], [1, 2]), ([0, 1], [3, 4]), ([0, 2], [5, -2])]]
+    input_metadata = tft_unit.metadata_from_feature_spec(
+        {'x': tf.io.SparseFeature('idx', 'val', tf.float32, 3)})
+    # Column 1 has the fewest values, so its values are dropped.
+    expected_outputs = {
+        'y':
+            np.array([[8. / 3, 0, -8. / 3], [0, 0, 0], [-8. / 3, 0, 8. / 3]],
+                     np.float32)
+    }
+    self.assertAnalyzerOutputs(
+        input_data, input_metadata, analyzer_fn, expected_outputs)
+
   def testPCAThreeToTwoDimensions(self):
     def analyzer_fn(inputs):
       return {'y': tft.pca(inputs['x'], 2, dtype=tf.float32)}
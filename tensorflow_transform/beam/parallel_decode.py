@@ -0,0 +1,134 @@
+# Copyright 2020 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A transform to decode records in a pool of local processes."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import multiprocessing
+import pickle
+
+# GOOGLE-INITIALIZATION
+
+import apache_beam as beam
+from apache_beam.utils import windowed_value
+import pyarrow as pa
+
+_DEFAULT_BATCH_SIZE = 1000
+
+# The coder of a worker process of the pool, set by `_initialize_worker`.
+_WORKER_CODER = None
+
+
+def _initialize_worker(pickled_coder):
+  global _WORKER_CODER
+  _WORKER_CODER = pickle.loads(pickled_coder)
+
+
+def _decode_batch(records):
+  return _WORKER_CODER.decode_batch(records)
+
+
+class _DecodeInProcessPoolDoFn(beam.DoFn):
+  """Decodes batches of records in a pool of processes.
+
+  Each process of the pool unpickles its own copy of the coder.  Batches are
+  decoded asynchronously, and the decoded batches are output in the order of
+  the input batches, with at most two batches per process pending at a time.
+  """
+
+  def __init__(self, coder, num_processes):
+    self._pickled_coder = pickle.dumps(coder)
+    self._num_processes = num_processes
+    self._pool = None
+    self._pending = None
+
+  def setup(self):
+    # Processes are spawned rather than forked, since forking a process that
+    # runs TensorFlow threads is not safe.
+    self._pool = multiprocessing.get_context('spawn').Pool(
+        self._num_processes,
+        initializer=_initialize_worker,
+        initargs=(self._pickled_coder,))
+
+  def start_bundle(self):
+    self._pending = collections.deque()
+
+  def _pop_decoded(self):
+    result, timestamp, window = self._pending.popleft()
+    return windowed_value.WindowedValue(result.get(), timestamp, [window])
+
+  def process(self,
+              records,
+              timestamp=beam.DoFn.TimestampParam,
+              window=beam.DoFn.WindowParam):
+    self._pending.append(
+        (self._pool.apply_async(_decode_batch, (records,)), timestamp, window))
+    while self._pending and (len(self._pending) > 2 * self._num_processes or
+                             self._pending[0][0].ready()):
+      yield self._pop_decoded()
+
+  def finish_bundle(self):
+    while self._pending:
+      yield self._pop_decoded()
+
+  def teardown(self):
+    if self._pool is not None:
+      self._pool.terminate()
+      self._pool = None
+
+
+@beam.typehints.with_output_types(pa.RecordBatch)
+class DecodeInProcessPool(beam.PTransform):
+  """Decodes records into `pa.RecordBatch`es in a pool of local processes.
+
+  Records are batched and each batch is decoded with `coder.decode_batch` in
+  one of a pool of processes, so that decoding is not limited to a single core
+  when running locally, e.g. with the `DirectRunner`.  The coder must be
+  picklable, like `tft.coders.CsvCoder` and `tft.coders.ExampleProtoCoder`.
+
+  The output can be used with `coder.tensor_adapter_config()` as the input of
+  `AnalyzeDataset` and `TransformDataset`:
+
+    coder = tft.coders.CsvCoder(column_names, schema)
+    raw_data = lines | tft_beam.DecodeInProcessPool(coder)
+    raw_dataset = (raw_data, coder.tensor_adapter_config())
+  """
+
+  def __init__(self,
+               coder,
+               num_processes=None,
+               batch_size=_DEFAULT_BATCH_SIZE):
+    """Init method.
+
+    Args:
+      coder: A coder with a `decode_batch` method, that returns a
+        `pa.RecordBatch` for a list of records.
+      num_processes: (Optional) The number of processes of the pool of each
+        worker.  Defaults to the number of CPUs.
+      batch_size: (Optional) The number of records decoded at once by a process.
+    """
+    self._coder = coder
+    self._num_processes = num_processes or multiprocessing.cpu_count()
+    self._batch_size = batch_size
+
+  def expand(self, records):
+    return (records
+            | 'BatchRecords' >> beam.BatchElements(
+                min_batch_size=self._batch_size,
+                max_batch_size=self._batch_size)
+            | 'Decode' >> beam.ParDo(
+                _DecodeInProcessPoolDoFn(self._coder, self._num_processes)))
@@ -0,0 +1,80 @@
+# Copyright 2020 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for tensorflow_transform.beam.parallel_decode."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# GOOGLE-INITIALIZATION
+import apache_beam as beam
+from apache_beam.testing import util as beam_test_util
+
+import tensorflow as tf
+
+from tensorflow_transform import test_case
+from tensorflow_transform.beam import parallel_decode
+from tensorflow_transform.coders import csv_coder
+from tensorflow_transform.tf_metadata import schema_utils
+
+_COLUMN_NAMES = ['x', 'y', 'z']
+_FEATURE_SPEC = {
+    'x': tf.io.FixedLenFeature([], tf.int64),
+    'y': tf.io.VarLenFeature(tf.float32),
+    'z': tf.io.FixedLenFeature([], tf.string),
+}
+
+
+def _to_rows(record_batch):
+  columns = record_batch.to_pydict()
+  return [
+      tuple((name, tuple(values[row])) for name, values in sorted(
+          columns.items())) for row in range(record_batch.num_rows)
+  ]
+
+
+class ParallelDecodeTest(test_case.TransformTestCase):
+
+  def _make_coder(self):
+    return csv_coder.CsvCoder(
+        _COLUMN_NAMES, schema_utils.schema_from_feature_spec(_FEATURE_SPEC))
+
+  def test_decode_in_process_pool(self):
+    lines = ['{},{},value_{}'.format(i, '' if i % 3 else i / 2, i)
+             for i in range(10)]
+    coder = self._make_coder()
+    expected_rows = _to_rows(coder.decode_batch(lines))
+
+    with beam.Pipeline() as p:
+      rows = (
+          p
+          | beam.Create(lines)
+          | parallel_decode.DecodeInProcessPool(
+              coder, num_processes=2, batch_size=3)
+          | beam.FlatMap(_to_rows))
+      beam_test_util.assert_that(rows, beam_test_util.equal_to(expected_rows))
+
+  def test_decode_in_process_pool_error(self):
+    with self.assertRaisesRegexp(Exception,
+                                 'Columns do not match specified csv headers'):
+      with beam.Pipeline() as p:
+        _ = (
+            p
+            | beam.Create(['1,2.0,a', '1,2.0'])
+            | parallel_decode.DecodeInProcessPool(
+                self._make_coder(), num_processes=2))
+
+
+if __name__ == '__main__':
+  test_case.main()
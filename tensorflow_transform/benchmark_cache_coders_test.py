@@ -0,0 +1,110 @@
+# Copyright 2020 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for the cache coders of quantiles and L-moments accumulators.
+
+Run with:
+  python tensorflow_transform/benchmark_cache_coders_test.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import pickle
+import time
+
+# GOOGLE-INITIALIZATION
+
+import numpy as np
+import tensorflow as tf
+from tensorflow_transform import analyzers
+
+_NUM_ITERS = 100
+_NUM_STREAMS = 10
+_SUMMARY_SIZES = (10, 1000, 100000)
+_L_MOMENTS_SIZES = (1, 1000, 100000)
+
+_CODERS = {
+    'pickle': None,
+    'numpy': {},
+    'numpy_compressed': {'compression_level': 1},
+}
+
+
+class _PickleCoder(object):
+
+  def encode_cache(self, accumulator):
+    return pickle.dumps(accumulator)
+
+  def decode_cache(self, encoded_accumulator):
+    return pickle.loads(encoded_accumulator)
+
+
+class CacheCodersBenchmark(tf.test.Benchmark):
+  """Compares the cache coders of large accumulators with pickle."""
+
+  def _run_benchmark(self, coder_cls, accumulator, name, extras):
+    for coder_name, coder_kwargs in _CODERS.items():
+      if coder_kwargs is None:
+        coder = _PickleCoder()
+      else:
+        coder = coder_cls(**coder_kwargs)
+      encoded = coder.encode_cache(accumulator)
+      start = time.time()
+      for _ in range(_NUM_ITERS):
+        coder.encode_cache(accumulator)
+      encode_time = (time.time() - start) / _NUM_ITERS
+      start = time.time()
+      for _ in range(_NUM_ITERS):
+        coder.decode_cache(encoded)
+      decode_time = (time.time() - start) / _NUM_ITERS
+      benchmark_extras = dict(extras)
+      benchmark_extras.update({
+          'encoded_bytes': len(encoded),
+          'encode_wall_time': encode_time,
+          'decode_wall_time': decode_time,
+      })
+      self.report_benchmark(
+          iters=_NUM_ITERS,
+          wall_time=encode_time + decode_time,
+          name='{}_{}'.format(name, coder_name),
+          extras=benchmark_extras)
+
+  def benchmarkQuantilesAccumulator(self):
+    random_state = np.random.RandomState(0)
+    for summary_size in _SUMMARY_SIZES:
+      accumulator = [
+          random_state.rand(summary_size, 4).astype(np.float32)
+          for _ in range(_NUM_STREAMS)
+      ]
+      self._run_benchmark(
+          analyzers._QuantilesAccumulatorCacheCoder,  # pylint: disable=protected-access
+          accumulator,
+          'quantiles_{}'.format(summary_size),
+          {'summary_size': summary_size, 'num_streams': _NUM_STREAMS})
+
+  def benchmarkLMomentsAccumulator(self):
+    random_state = np.random.RandomState(0)
+    for size in _L_MOMENTS_SIZES:
+      accumulator = analyzers._LMomentsAccumulator(  # pylint: disable=protected-access
+          *[random_state.rand(size) for _ in range(8)])
+      self._run_benchmark(
+          analyzers._LMomentsAccumulatorCacheCoder,  # pylint: disable=protected-access
+          accumulator,
+          'l_moments_{}'.format(size),
+          {'size': size})
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,85 @@
+# Copyright 2020 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for tensorflow_transform.tf_utils.
+
+Run with:
+  python tensorflow_transform/benchmark_tf_utils_test.py --benchmarks=.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# GOOGLE-INITIALIZATION
+
+import numpy as np
+import tensorflow as tf
+from tensorflow_transform import tf_utils
+from tensorflow_transform import tf_utils_test
+
+_NUM_ROWS = 1000000
+_NUM_COLUMNS = 8
+_SPARSE_DENSITY = 0.1
+
+_L_MOMENTS_IMPLEMENTATIONS = {
+    'vectorized': tf_utils.reduce_batch_count_l_moments,
+    'while_loop': tf_utils_test.reduce_batch_count_l_moments_while_loop,
+}
+
+
+class LMomentsBenchmark(tf.test.Benchmark):
+  """Compares L-moments batch reductions on batches of 1M rows."""
+
+  def _make_dense_input(self):
+    return tf.constant(
+        np.random.RandomState(0).lognormal(
+            size=(_NUM_ROWS, _NUM_COLUMNS)).astype(np.float32))
+
+  def _make_sparse_input(self):
+    random_state = np.random.RandomState(0)
+    rows, columns = np.nonzero(
+        random_state.rand(_NUM_ROWS, _NUM_COLUMNS) < _SPARSE_DENSITY)
+    return tf.SparseTensor(
+        indices=np.stack([rows, columns], axis=1).astype(np.int64),
+        values=random_state.lognormal(size=rows.size).astype(np.float32),
+        dense_shape=[_NUM_ROWS, _NUM_COLUMNS])
+
+  def _run_benchmark(self, make_input, reduce_instance_dims, name):
+    for implementation_name, reduce_fn in _L_MOMENTS_IMPLEMENTATIONS.items():
+      with tf.compat.v1.Graph().as_default():
+        outputs = reduce_fn(make_input(), reduce_instance_dims)
+        with tf.compat.v1.Session() as sess:
+          self.run_op_benchmark(
+              sess,
+              tf.group(*outputs),
+              burn_iters=1,
+              min_iters=5,
+              name='{}_{}'.format(name, implementation_name),
+              extras={
+                  'num_rows': _NUM_ROWS,
+                  'num_columns': _NUM_COLUMNS
+              })
+
+  def benchmarkDense(self):
+    self._run_benchmark(self._make_dense_input, True, 'dense')
+
+  def benchmarkDenseElementwise(self):
+    self._run_benchmark(self._make_dense_input, False, 'dense_elementwise')
+
+  def benchmarkSparseElementwise(self):
+    self._run_benchmark(self._make_sparse_input, False, 'sparse_elementwise')
+
+
+if __name__ == '__main__':
+  tf.test.main()
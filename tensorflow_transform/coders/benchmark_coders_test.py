@@ -0,0 +1,309 @@
+# Copyright 2020 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks for tensorflow_transform.coders.
+
+Encodes and decodes records of schemas of scalar, multivalent, VarLen and
+SparseFeature features, at several numbers of features, with `CsvCoder` and
+`ExampleProtoCoder`.  Each benchmark reports the number of records per second,
+and the number of memory blocks (and the peak number of bytes) allocated per
+record, as traced by `tracemalloc`.  The allocated blocks are those still held
+by the encoded or decoded records.
+
+Run with:
+  python tensorflow_transform/coders/benchmark_coders_test.py --benchmarks=. \
+      --coder_benchmark_results=/tmp/coder_benchmarks.json
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import json
+import platform
+import time
+import tracemalloc
+
+# GOOGLE-INITIALIZATION
+
+from absl import flags
+import numpy as np
+import tensorflow as tf
+from tensorflow_transform.coders import csv_coder
+from tensorflow_transform.coders import example_proto_coder
+from tensorflow_transform.tf_metadata import schema_utils
+
+flags.DEFINE_string(
+    'coder_benchmark_results', None,
+    'If set, the path of a JSON file to which the results of the coder '
+    'benchmarks are written.')
+
+_NUM_RECORDS = 1000
+_BATCH_SIZE = 100
+_WIDTHS = (1, 10, 100)
+_NUM_VALUES = 4
+_SPARSE_SIZE = 100
+_DTYPES = (tf.int64, tf.float32, tf.string)
+_SCHEMA_KINDS = ('scalar', 'multivalent', 'varlen', 'sparse')
+
+_RESULTS = []
+
+
+def _make_value_strs(random_state, dtype, num_values):
+  if dtype == tf.int64:
+    return [str(v) for v in random_state.randint(1000, size=num_values)]
+  elif dtype == tf.float32:
+    return ['%.4f' % v for v in random_state.rand(num_values)]
+  else:
+    return ['value_%d' % v for v in random_state.randint(1000, size=num_values)]
+
+
+def _make_dataset(schema_kind, width):
+  """Returns the feature spec, CSV coder arguments and lines of a dataset.
+
+  Args:
+    schema_kind: One of `_SCHEMA_KINDS`.
+    width: The number of features.
+
+  Returns:
+    A tuple of the feature spec, a dict of the arguments of `CsvCoder` other
+    than the schema, and a list of CSV lines.
+  """
+  random_state = np.random.RandomState(0)
+  feature_spec = {}
+  column_names = []
+  for i in range(width):
+    name = 'feature_{}'.format(i)
+    dtype = _DTYPES[i % len(_DTYPES)]
+    if schema_kind == 'scalar':
+      feature_spec[name] = tf.io.FixedLenFeature([], dtype)
+      column_names.append(name)
+    elif schema_kind == 'multivalent':
+      feature_spec[name] = tf.io.FixedLenFeature([_NUM_VALUES], dtype)
+      column_names.append(name)
+    elif schema_kind == 'varlen':
+      feature_spec[name] = tf.io.VarLenFeature(dtype)
+      column_names.append(name)
+    else:
+      index_key = '{}_index'.format(name)
+      value_key = '{}_value'.format(name)
+      feature_spec[name] = tf.io.SparseFeature(index_key, value_key, dtype,
+                                               _SPARSE_SIZE)
+      column_names.extend([index_key, value_key])
+
+  lines = []
+  for _ in range(_NUM_RECORDS):
+    fields = []
+    for i in range(width):
+      dtype = _DTYPES[i % len(_DTYPES)]
+      if schema_kind == 'scalar':
+        fields.extend(_make_value_strs(random_state, dtype, 1))
+      elif schema_kind == 'multivalent':
+        fields.append('|'.join(_make_value_strs(random_state, dtype,
+                                                _NUM_VALUES)))
+      elif schema_kind == 'varlen':
+        num_values = random_state.randint(1, 2 * _NUM_VALUES)
+        fields.append('|'.join(_make_value_strs(random_state, dtype,
+                                                num_values)))
+      else:
+        num_values = random_state.randint(1, 2 * _NUM_VALUES)
+        indices = np.sort(
+            random_state.choice(_SPARSE_SIZE, num_values, replace=False))
+        fields.append('|'.join(str(index) for index in indices))
+        fields.append('|'.join(_make_value_strs(random_state, dtype,
+                                                num_values)))
+    lines.append(','.join(fields))
+
+  csv_coder_kwargs = {'column_names': column_names}
+  if schema_kind != 'scalar':
+    csv_coder_kwargs.update({
+        'secondary_delimiter': '|',
+        'multivalent_columns': list(feature_spec),
+    })
+  return feature_spec, csv_coder_kwargs, lines
+
+
+def _make_batch_dict(feature_spec, instances):
+  """Returns the batch dict, as returned by `tf.Session.run`, of instances."""
+  batch_dict = {}
+  for name, spec in feature_spec.items():
+    if isinstance(spec, tf.io.FixedLenFeature):
+      batch_dict[name] = np.array([instance[name] for instance in instances])
+      continue
+    if isinstance(spec, tf.io.SparseFeature):
+      row_indices = [instance[spec.index_key] for instance in instances]
+      row_values = [instance[spec.value_key] for instance in instances]
+      dense_size = spec.size
+    else:
+      row_values = [instance[name] for instance in instances]
+      row_indices = [np.arange(len(values)) for values in row_values]
+      dense_size = max(len(values) for values in row_values)
+    indices = np.concatenate([
+        np.stack([np.full(len(indices), row), indices], axis=1)
+        for row, indices in enumerate(row_indices)
+    ]).astype(np.int64)
+    batch_dict[name] = tf.compat.v1.SparseTensorValue(
+        indices=indices,
+        values=np.concatenate(row_values),
+        dense_shape=[len(instances), dense_size])
+  return batch_dict
+
+
+def _batches(values):
+  return [
+      values[i:i + _BATCH_SIZE] for i in range(0, len(values), _BATCH_SIZE)
+  ]
+
+
+def _write_results():
+  if flags.FLAGS.coder_benchmark_results is None:
+    return
+  with tf.io.gfile.GFile(flags.FLAGS.coder_benchmark_results, 'w') as f:
+    json.dump({
+        'timestamp': time.time(),
+        'python_version': platform.python_version(),
+        'tensorflow_version': tf.__version__,
+        'num_records': _NUM_RECORDS,
+        'batch_size': _BATCH_SIZE,
+        'results': _RESULTS,
+    }, f, indent=2, sort_keys=True)
+
+
+class CodersBenchmark(tf.test.Benchmark):
+  """Benchmarks the encode and decode methods of the coders."""
+
+  def _run_benchmark(self, fn, inputs, name, extras):
+    """Reports the throughput and allocations of applying `fn` to `inputs`.
+
+    Args:
+      fn: A function that encodes or decodes one of `inputs`.
+      inputs: A list of records or batches of records, `_NUM_RECORDS` in
+        total.
+      name: The name of the benchmark.
+      extras: A dict of the parameters of the benchmark.
+    """
+    # Warms up any caches of the coder.
+    fn(inputs[0])
+    start = time.time()
+    for x in inputs:
+      fn(x)
+    wall_time = time.time() - start
+
+    outputs = [None] * len(inputs)
+    tracemalloc.start()
+    try:
+      before = tracemalloc.take_snapshot()
+      for i, x in enumerate(inputs):
+        outputs[i] = fn(x)
+      after = tracemalloc.take_snapshot()
+      _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+      tracemalloc.stop()
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    allocated_blocks = sum(
+        stat.count_diff for stat in after.filter_traces(filters).compare_to(
+            before.filter_traces(filters), 'filename'))
+    del outputs
+
+    benchmark_extras = dict(extras)
+    benchmark_extras.update({
+        'records_per_second': _NUM_RECORDS / wall_time,
+        'allocated_blocks_per_record': allocated_blocks / _NUM_RECORDS,
+        'peak_bytes_per_record': peak_bytes / _NUM_RECORDS,
+    })
+    self.report_benchmark(
+        iters=_NUM_RECORDS,
+        wall_time=wall_time,
+        name=name,
+        extras=benchmark_extras)
+    result = dict(benchmark_extras)
+    result.update({'name': name, 'wall_time': wall_time})
+    _RESULTS.append(result)
+    _write_results()
+
+  def _run_benchmarks(self, coder_name, run_fn):
+    for schema_kind in _SCHEMA_KINDS:
+      for width in _WIDTHS:
+        feature_spec, csv_coder_kwargs, lines = _make_dataset(schema_kind,
+                                                              width)
+        schema = schema_utils.schema_from_feature_spec(feature_spec)
+        instances = [
+            csv_coder.CsvCoder(schema=schema, **csv_coder_kwargs).decode(line)
+            for line in lines
+        ]
+
+        def run_benchmark(operation, fn, inputs, schema_kind=schema_kind,
+                          width=width, **extras):
+          name = '{}_{}_{}_{}'.format(coder_name, operation, schema_kind, width)
+          if extras:
+            name += ''.join('_{}'.format(key) for key, value in
+                            sorted(extras.items()) if value)
+          extras.update({
+              'coder': coder_name,
+              'operation': operation,
+              'schema_kind': schema_kind,
+              'width': width,
+          })
+          self._run_benchmark(fn, inputs, name, extras)
+
+        run_fn(run_benchmark, feature_spec, schema, csv_coder_kwargs, lines,
+               instances)
+
+  def benchmarkCsvCoder(self):
+
+    def run_fn(run_benchmark, feature_spec, schema, csv_coder_kwargs, lines,
+               instances):
+      coder = csv_coder.CsvCoder(schema=schema, **csv_coder_kwargs)
+      run_benchmark('decode', coder.decode, lines)
+      run_benchmark('encode', coder.encode, instances)
+      run_benchmark('decode_batch', coder.decode_batch, _batches(lines))
+      run_benchmark('encode_batch', coder.encode_batch, [
+          _make_batch_dict(feature_spec, batch)
+          for batch in _batches(instances)
+      ])
+
+    self._run_benchmarks('csv_coder', run_fn)
+
+  def benchmarkExampleProtoCoder(self):
+
+    def run_fn(run_benchmark, feature_spec, schema, csv_coder_kwargs, lines,
+               instances):
+      del csv_coder_kwargs, lines  # Unused.
+      coder = example_proto_coder.ExampleProtoCoder(schema)
+      serialized_examples = [coder.encode(instance) for instance in instances]
+      for generate_decoder in (False, True):
+        run_benchmark(
+            'decode',
+            example_proto_coder.ExampleProtoCoder(
+                schema, generate_decoder=generate_decoder).decode,
+            serialized_examples,
+            generate_decoder=generate_decoder)
+      batch_dicts = [
+          _make_batch_dict(feature_spec, batch)
+          for batch in _batches(instances)
+      ]
+      run_benchmark('decode_batch', coder.decode_batch,
+                    _batches(serialized_examples))
+      for serialize_features in (False, True):
+        encode_coder = example_proto_coder.ExampleProtoCoder(
+            schema, serialize_features=serialize_features)
+        run_benchmark('encode', encode_coder.encode, instances,
+                      serialize_features=serialize_features)
+        run_benchmark('encode_batch', encode_coder.encode_batch, batch_dicts,
+                      serialize_features=serialize_features)
+
+    self._run_benchmarks('example_proto_coder', run_fn)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -17,12 +17,15 @@ from __future__ import division
 from __future__ import print_function
 
 import csv
+import itertools
 # GOOGLE-INITIALIZATION
 
 import numpy as np
+import pyarrow as pa
 import six
 from six import moves
 import tensorflow as tf
+from tensorflow_transform.coders import record_batch_util
 from tensorflow_transform.tf_metadata import schema_utils
 
 
@@ -79,6 +82,40 @@ def _make_cast_fn(dtype):
     return _elements_to_bytes
 
 
+def _cast_column(value_strs, dtype):
+  """Casts a list of strings to the values of a feature of the given dtype.
+
+  Args:
+    value_strs: A list or array of strings to be cast.
+    dtype: The type of the Tensorflow feature.
+
+  Returns:
+    A numpy array for numeric dtypes, and a list of bytes otherwise.
+  """
+  if dtype.is_integer or dtype.is_floating:
+    # Casting from objects parses each string like `_make_cast_fn`, with the
+    # same error messages.
+    return np.asarray(value_strs, dtype=np.object_).astype(dtype.as_numpy_dtype)
+  return [_to_bytes(x) for x in value_strs]
+
+
+def _values_to_strings(values):
+  """Converts a numpy array of values to a list of strings.
+
+  Numbers are formatted in a single call, like `_to_string` formats each of
+  them.
+
+  Args:
+    values: A numpy array.
+
+  Returns:
+    A list of strings, Unicode for Py3.
+  """
+  if values.dtype.kind in 'iuf':
+    return values.astype(np.str_).tolist()
+  return [_to_string(x) for x in values.tolist()]
+
+
 def _decode_with_reader(value, reader):
   """Parse the input value into a list of strings.
 
@@ -113,7 +150,9 @@ class _FixedLenFeatureHandler(object):
     self._index = index
     self._reader = reader
     self._encoder = encoder
+    self._dtype = feature_spec.dtype
     self._np_dtype = feature_spec.dtype.as_numpy_dtype
+    self._arrow_type = record_batch_util.make_arrow_type(feature_spec.dtype)
     self._shape = feature_spec.shape
     self._rank = len(feature_spec.shape)
     self._size = 1
@@ -163,6 +202,50 @@ class _FixedLenFeatureHandler(object):
     else:
       return np.asarray(values, dtype=self._np_dtype).reshape(self._shape)
 
+  def parse_column(self, string_columns):
+    """Parse the values of this feature from the columns of a batch of lines.
+
+    Args:
+      string_columns: A list of the columns split from a batch of CSV lines,
+        each column a sequence of strings with one string per line.
+
+    Returns:
+      A `pa.LargeListArray` with the flattened values of each line.
+    """
+    value_strs = string_columns[self._index]
+    if self._reader:
+      values, row_lengths = self._reader.read_flat_records(value_strs)
+      # Only missing values are split into empty records.
+      is_missing = row_lengths == 0
+      if self._default_value is not None and is_missing.any():
+        # NOTE: Like in `parse_value`, the default value is only used for
+        # missing values.
+        row_lengths[is_missing] = 1
+      wrong_lengths = np.flatnonzero(row_lengths != self._size)
+      if wrong_lengths.size:
+        raise ValueError(
+            'FixedLenFeature "{}" got wrong number of values. Expected'
+            ' {} but got {}'.format(self._name, self._size,
+                                    row_lengths[wrong_lengths[0]]))
+      if self._default_value is not None and is_missing.any():
+        # All rows have a single value, since the default value has one.
+        all_values = np.empty(len(row_lengths), dtype=np.object_)
+        all_values[~is_missing] = values
+        all_values[is_missing] = self._default_value
+        values = all_values
+      return record_batch_util.make_list_array(
+          _cast_column(values, self._dtype), row_lengths, self._arrow_type)
+
+    value_strs = np.array(value_strs, dtype=np.object_)
+    is_missing = value_strs == ''
+    if is_missing.any():
+      if self._default_value is None:
+        raise ValueError('expected a value on column "{}"'.format(self._name))
+      value_strs[is_missing] = self._default_value
+    return record_batch_util.make_list_array(
+        _cast_column(value_strs, self._dtype),
+        np.ones(len(value_strs), dtype=np.int64), self._arrow_type)
+
   def encode_value(self, string_list, values):
     """Encode the value of this feature into the CSV line."""
 
@@ -184,6 +267,13 @@ class _FixedLenFeatureHandler(object):
     else:
       string_list[self._index] = _to_string(flattened_values[0])
 
+  def encode_flat_value(self, string_list, value_strs):
+    """Encode the flattened value strings of this feature into the CSV line."""
+    if self._encoder:
+      string_list[self._index] = self._encoder.encode_record(value_strs)
+    else:
+      string_list[self._index] = value_strs[0]
+
 
 class _VarLenFeatureHandler(object):
   """Handler for `VarLenFeature` values.
@@ -196,7 +286,9 @@ class _VarLenFeatureHandler(object):
   def __init__(self, name, dtype, index, reader=None, encoder=None):
     self._name = name
     self._cast_fn = _make_cast_fn(dtype)
+    self._dtype = dtype
     self._np_dtype = dtype.as_numpy_dtype
+    self._arrow_type = record_batch_util.make_arrow_type(dtype)
     self._index = index
     self._reader = reader
     self._encoder = encoder
@@ -216,6 +308,29 @@ class _VarLenFeatureHandler(object):
     else:
       return []
 
+  def parse_column(self, string_columns):
+    """Parse the values of this feature from the columns of a batch of lines.
+
+    Args:
+      string_columns: A list of the columns split from a batch of CSV lines,
+        each column a sequence of strings with one string per line.
+
+    Returns:
+      A `pa.LargeListArray` with the values of each line.
+    """
+    value_strs = string_columns[self._index]
+    if self._reader:
+      # Missing values are split into empty records.
+      values, row_lengths = self._reader.read_flat_records(value_strs)
+      values = _cast_column(values, self._dtype)
+    else:
+      value_strs = np.asarray(value_strs, dtype=np.object_)
+      is_present = value_strs != ''
+      row_lengths = is_present.astype(np.int64)
+      values = _cast_column(value_strs[is_present], self._dtype)
+    return record_batch_util.make_list_array(values, row_lengths,
+                                             self._arrow_type)
+
   def encode_value(self, string_list, values):
     """Encode the value of this feature into the CSV line."""
     if self._encoder:
@@ -223,6 +338,13 @@ class _VarLenFeatureHandler(object):
     else:
       string_list[self._index] = _to_string(values[0]) if values else ''
 
+  def encode_flat_value(self, string_list, value_strs):
+    """Encode the value strings of this feature into the CSV line."""
+    if self._encoder:
+      string_list[self._index] = self._encoder.encode_record(value_strs)
+    else:
+      string_list[self._index] = value_strs[0] if value_strs else ''
+
 
 class DecodeError(Exception):
   """Base decode error."""
@@ -234,6 +356,14 @@ class EncodeError(Exception):
   pass
 
 
+_EMPTY_LINE_ERROR_MESSAGE = (
+    'Columns do not match specified csv headers: empty line was found')
+
+# Characters that `csv.reader` does not read verbatim with the default dialect,
+# besides the delimiter.  Lines without any of them are split with `str.split`.
+_CSV_SPECIAL_CHARS = ('"', '\r', '\n', '\0')
+
+
 # TODO(b/32491265) Revisit using cStringIO for design compatibility with
 # coders.CsvCoder.
 class _LineGenerator(object):
@@ -256,8 +386,7 @@ class _LineGenerator(object):
     # attempt to read more than one record if one of the records is empty line
     line_length = len(self._lines)
     if line_length == 0:
-      raise DecodeError(
-          'Columns do not match specified csv headers: empty line was found')
+      raise DecodeError(_EMPTY_LINE_ERROR_MESSAGE)
     assert line_length == 1, 'Unexpected number of lines %d' % line_length
     # This doesn't maintain insertion order to the list, which is fine
     # because the list has only 1 element. If there were more and we wanted
@@ -275,16 +404,97 @@ class CsvCoder(object):
 
     def __init__(self, delimiter):
       self._state = (delimiter)
+      self._delimiter = _to_string(delimiter)
       self._line_generator = _LineGenerator()
       self._reader = csv.reader(
-          self._line_generator, delimiter=_to_string(delimiter))
+          self._line_generator, delimiter=self._delimiter)
+
+    def _can_split(self, lines):
+      """Returns whether splitting lines reads them like `csv.reader`."""
+      if self._delimiter in _CSV_SPECIAL_CHARS:
+        return False
+      text = ''.join(lines)
+      return (not any(c in text for c in _CSV_SPECIAL_CHARS) and
+              max(map(len, lines), default=0) <= csv.field_size_limit())
 
     def read_record(self, x):
       """Reads out Unicode for PY3."""
       line = _to_string(x)
+      if self._can_split((line,)):
+        return line.split(self._delimiter) if line else []
       self._line_generator.push_line(line)
       return next(self._reader)
 
+    def read_records(self, xs):
+      """Reads out one record for each of xs, as Unicode for PY3.
+
+      Args:
+        xs: A sequence of strings, each of which must be a complete record.
+
+      Returns:
+        A list of records, each a list of strings.
+
+      Raises:
+        DecodeError: An error occurred when parsing one of xs.
+      """
+      lines = [_to_string(x) for x in xs]
+      if self._can_split(lines):
+        return [line.split(self._delimiter) if line else [] for line in lines]
+
+      records = []
+
+      def generate_lines():
+        for index, x in enumerate(lines):
+          # A record that spans more than one of xs is an error, like when
+          # reading a single record.
+          if index != len(records):
+            raise DecodeError(_EMPTY_LINE_ERROR_MESSAGE)
+          yield x
+        if len(xs) != len(records):
+          raise DecodeError(_EMPTY_LINE_ERROR_MESSAGE)
+
+      reader = csv.reader(generate_lines(), delimiter=_to_string(self._state))
+      try:
+        for record in reader:
+          records.append(record)
+      except Exception as e:  # pylint: disable=broad-except
+        raise DecodeError('{}: {}'.format(e, xs[len(records)]))
+      return records
+
+    def read_flat_records(self, xs):
+      """Reads out the values of all of xs, flattened, as Unicode for PY3.
+
+      Lines that `csv.reader` reads verbatim are joined and split at once, and
+      the number of values of each of them is counted with NumPy.
+
+      Args:
+        xs: A sequence of strings, each of which must be a complete record.
+
+      Returns:
+        A tuple of a list of the strings of all records, and a numpy array of
+        the number of strings of each record.
+
+      Raises:
+        DecodeError: An error occurred when parsing one of xs.
+      """
+      lines = [_to_string(x) for x in xs]
+      if not self._can_split(lines):
+        records = self.read_records(lines)
+        return (list(itertools.chain.from_iterable(records)),
+                np.fromiter(map(len, records), dtype=np.int64,
+                            count=len(records)))
+
+      lines = np.array(lines, dtype=np.str_)
+      is_present = lines != ''
+      row_lengths = np.where(is_present,
+                             np.char.count(lines, self._delimiter) + 1,
+                             0).astype(np.int64)
+      if not is_present.any():
+        return [], row_lengths
+      values = self._delimiter.join(lines[is_present].tolist()).split(
+          self._delimiter)
+      return values, row_lengths
+
     def __getstate__(self):
       return self._state
 
@@ -444,6 +654,47 @@ class CsvCoder(object):
             e, feature_handler.name))
     return self._encoder.encode_record(string_list)
 
+  def encode_batch(self, batch_dict):
+    """Encode a batch of values as a list of csv-formatted strings.
+
+    Rather than unbatching the values into instance dicts and encoding each of
+    them, the values of each feature are flattened and formatted as strings
+    once for the whole batch.
+
+    Args:
+      batch_dict: A dict from feature name to a batch of values, as returned by
+        `tf.Session.run`: a numpy array whose first dimension is the batch for
+        a `FixedLenFeature`, and a `tf.compat.v1.SparseTensorValue` for a
+        `VarLenFeature` or a `SparseFeature`.
+
+    Returns:
+      A list of csv-formatted strings, one for each instance.  The order of the
+      columns is given by column_names.
+
+    Raises:
+      ValueError: If `batch_dict` is invalid.
+    """
+    batch_size, columns = record_batch_util.get_flat_columns(
+        self._schema,
+        batch_dict,
+        fixed_len_error_format=(
+            'FixedLenFeature "{}" got wrong number of values. Expected {} but '
+            'got {}'))
+    handler_columns = []
+    for feature_handler in self._feature_handlers:
+      flat_values, offsets = columns[feature_handler.name]
+      handler_columns.append((feature_handler, _values_to_strings(flat_values),
+                              offsets.tolist()))
+
+    result = []
+    string_list = [None] * len(self._column_names)
+    for row in range(batch_size):
+      for feature_handler, value_strs, offsets in handler_columns:
+        feature_handler.encode_flat_value(
+            string_list, value_strs[offsets[row]:offsets[row + 1]])
+      result.append(self._encoder.encode_record(string_list))
+    return result
+
   # Please run tensorflow_transform/coders/benchmark_coders_test.py
   # if you make any changes on these methods.
   def decode(self, csv_string):
@@ -500,3 +751,49 @@ class CsvCoder(object):
         feature_handler.name: feature_handler.parse_value(raw_values)
         for feature_handler in self._feature_handlers
     }
+
+  def decode_batch(self, csv_strings):
+    """Decodes a batch of string records into a `pa.RecordBatch`.
+
+    Each line is split into columns once, and each column is then cast as a
+    whole.  Missing values are handled like in `decode`, and the same errors
+    are raised for invalid lines.  The result has a `large_list` column for each
+    feature (for `SparseFeature`s, one for its indices and one for its values),
+    and is described by `tensor_adapter_config`, so that it can be the input of
+    `tft_beam.AnalyzeDataset` and `tft_beam.TransformDataset`.
+
+    Args:
+      csv_strings: A list of strings to be decoded.
+
+    Returns:
+      A `pa.RecordBatch` with a row for each of `csv_strings`.
+
+    Raises:
+      DecodeError: If columns do not match specified csv headers.
+      ValueError: If some numeric column has non-numeric data, if a
+          FixedLenFeature has missing values and no default value, or
+          multivalent data has the wrong length.
+    """
+    raw_records = self._reader.read_records(csv_strings)
+    num_columns = len(self._column_names)
+    for index, raw_values in enumerate(raw_records):
+      # See `decode` for why an empty line is a valid single column line.
+      if not raw_values and num_columns == 1:
+        raw_records[index] = raw_values = ['']
+      if len(raw_values) != num_columns:
+        raise DecodeError(
+            'Columns do not match specified csv headers: {} -> {}'.format(
+                self._column_names, raw_values))
+
+    if raw_records:
+      string_columns = list(zip(*raw_records))
+    else:
+      string_columns = [()] * num_columns
+    return pa.RecordBatch.from_arrays(
+        [feature_handler.parse_column(string_columns)
+         for feature_handler in self._feature_handlers],
+        [feature_handler.name for feature_handler in self._feature_handlers])
+
+  def tensor_adapter_config(self):
+    """Returns a `TensorAdapterConfig` for the output of `decode_batch`."""
+    return record_batch_util.make_tensor_adapter_config(self._schema)
@@ -372,6 +372,49 @@ class TestCSVCoder(test_case.TransformTestCase):
     coder = csv_coder.CsvCoder(columns, schema, **kwargs)
     np.testing.assert_equal(coder.decode(csv_line), instance)
 
+  @test_case.named_parameters(*(_ENCODE_DECODE_CASES + _DECODE_ONLY_CASES))
+  def test_decode_batch(self, columns, feature_spec, csv_line, instance,
+                        **kwargs):
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = csv_coder.CsvCoder(columns, schema, **kwargs)
+    record_batch = coder.decode_batch([csv_line, csv_line])
+    self.assertEqual(coder.tensor_adapter_config().arrow_schema,
+                     record_batch.schema)
+    expected_columns = {
+        name: [np.asarray(value).reshape(-1).tolist()] * 2
+        for name, value in instance.items()
+    }
+    self.assertEqual(
+        expected_columns,
+        dict(zip(record_batch.schema.names,
+                 [column.to_pylist() for column in record_batch.columns])))
+
+  def test_decode_batch_multivalent_with_and_without_quotes(self):
+    schema = schema_utils.schema_from_feature_spec({
+        'x': tf.io.FixedLenFeature([2], tf.int64),
+        'y': tf.io.VarLenFeature(tf.string),
+    })
+    coder = csv_coder.CsvCoder(['x', 'y'],
+                               schema,
+                               secondary_delimiter='|',
+                               multivalent_columns=['x', 'y'])
+    unquoted_lines = ['1|2,a|b', '3|4,', '5|6,c']
+    for csv_lines, expected_columns in [
+        (unquoted_lines, {
+            'x': [[1, 2], [3, 4], [5, 6]],
+            'y': [[b'a', b'b'], [], [b'c']],
+        }),
+        (unquoted_lines + ['"7|8","d|""e|f"""'], {
+            'x': [[1, 2], [3, 4], [5, 6], [7, 8]],
+            'y': [[b'a', b'b'], [], [b'c'], [b'd', b'e|f']],
+        }),
+    ]:
+      record_batch = coder.decode_batch(csv_lines)
+      self.assertEqual(
+          expected_columns,
+          dict(zip(record_batch.schema.names,
+                   [column.to_pylist() for column in record_batch.columns])))
+
   @test_case.named_parameters(*_ENCODE_DECODE_CASES)
   def test_encode(self, columns, feature_spec, csv_line, instance, **kwargs):
     schema = schema_utils.schema_from_feature_spec(feature_spec)
@@ -402,6 +445,19 @@ class TestCSVCoder(test_case.TransformTestCase):
     with self.assertRaisesRegexp(error_type, error_msg):
       coder.decode(csv_line)
 
+  @test_case.named_parameters(*_DECODE_ERROR_CASES)
+  def test_decode_batch_error(self,
+                              columns,
+                              feature_spec,
+                              csv_line,
+                              error_msg,
+                              error_type=ValueError,
+                              **kwargs):
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = csv_coder.CsvCoder(columns, schema, **kwargs)
+    with self.assertRaisesRegexp(error_type, error_msg):
+      coder.decode_batch([csv_line])
+
   @test_case.named_parameters(*_ENCODE_ERROR_CASES)
   def test_encode_error(self,
                         columns,
@@ -415,6 +471,61 @@ class TestCSVCoder(test_case.TransformTestCase):
     with self.assertRaisesRegexp(error_type, error_msg):
       coder.encode(instance)
 
+  def test_encode_batch(self):
+    columns = ['numeric1', 'category1', 'idx', 'numeric2', 'value', 'text1']
+    feature_spec = {
+        'numeric1': tf.io.FixedLenFeature([2], tf.int64),
+        'numeric2': tf.io.VarLenFeature(tf.float32),
+        'text1': tf.io.FixedLenFeature([], tf.string),
+        'category1': tf.io.VarLenFeature(tf.string),
+        'y': tf.io.SparseFeature('idx', 'value', tf.float32, 10),
+    }
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = csv_coder.CsvCoder(
+        columns,
+        schema,
+        secondary_delimiter='|',
+        multivalent_columns=['numeric1', 'numeric2', 'y'])
+    batch_dict = {
+        'numeric1':
+            np.array([[11, 12], [13, 14]]),
+        'numeric2':
+            tf.compat.v1.SparseTensorValue(
+                indices=[[0, 0], [0, 1]],
+                values=np.array([89.0, 91.5], dtype=np.float32),
+                dense_shape=[2, 2]),
+        'text1':
+            np.array([b'this is a ,text', b'other'], dtype=object),
+        'category1':
+            tf.compat.v1.SparseTensorValue(
+                indices=[[1, 0]],
+                values=np.array([b'categorical_value'], dtype=object),
+                dense_shape=[2, 1]),
+        'y':
+            tf.compat.v1.SparseTensorValue(
+                indices=[[0, 1], [0, 3], [1, 5]],
+                values=np.array([12.0, 15.0, 1.5], dtype=np.float32),
+                dense_shape=[2, 10]),
+    }
+    self.assertEqual([
+        b'11|12,,1|3,89.0|91.5,12.0|15.0,"this is a ,text"',
+        b'13|14,categorical_value,5,,1.5,other'
+    ], coder.encode_batch(batch_dict))
+
+  def test_encode_batch_error(self):
+    schema = schema_utils.schema_from_feature_spec(
+        {'x': tf.io.FixedLenFeature([2], tf.int64)})
+    coder = csv_coder.CsvCoder(['x'],
+                               schema,
+                               secondary_delimiter='|',
+                               multivalent_columns=['x'])
+    # The error is the same as when encoding a single instance.
+    error_msg = r'FixedLenFeature "x" got wrong number of values. Expected 2'
+    with self.assertRaisesRegexp(ValueError, error_msg):
+      coder.encode({'x': [1, 2, 3]})
+    with self.assertRaisesRegexp(ValueError, error_msg):
+      coder.encode_batch({'x': np.array([[1, 2, 3]])})
+
   def test_picklable(self):
     csv_line = '12,"this is a ,text",categorical_value,1,89.0,12.0,20'
     instance = {
@@ -22,11 +22,16 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import hashlib
+import threading
+
 # GOOGLE-INITIALIZATION
 
 import numpy as np
+import pyarrow as pa
 import six
 import tensorflow as tf
+from tensorflow_transform.coders import record_batch_util
 from tensorflow_transform.tf_metadata import schema_utils
 
 
@@ -120,6 +125,91 @@ def _make_feature_value_fn(dtype):
   return lambda feature: feature.bytes_list.value
 
 
+# The tags of the length-delimited fields that serialized Examples are built
+# of: Example.features, Features.feature (whose entries have a key and a value
+# field), Feature.float_list and FloatList.value (which is packed).
+_FEATURES_TAG = b'\x0a'
+_FEATURE_ENTRY_TAG = b'\x0a'
+_ENTRY_KEY_TAG = b'\x0a'
+_ENTRY_VALUE_TAG = b'\x12'
+_FLOAT_LIST_TAG = b'\x12'
+_PACKED_VALUE_TAG = b'\x0a'
+
+
+def _encode_varint(value):
+  """Returns the protocol buffer varint encoding of a non-negative int."""
+  result = bytearray()
+  while value > 0x7f:
+    result.append((value & 0x7f) | 0x80)
+    value >>= 7
+  result.append(value)
+  return bytes(result)
+
+
+def _serialize_length_delimited(tag, data):
+  return tag + _encode_varint(len(data)) + data
+
+
+def _serialize_feature_entry(name, serialized_feature):
+  """Returns a serialized entry of the feature map of a tf.train.Example.
+
+  Args:
+    name: The name of the feature.
+    serialized_feature: A serialized `tf.train.Feature`.
+
+  Returns:
+    The entry, serialized as a field of `tf.train.Features`.
+  """
+  return _serialize_length_delimited(
+      _FEATURE_ENTRY_TAG,
+      _serialize_length_delimited(_ENTRY_KEY_TAG, tf.compat.as_bytes(name)) +
+      _serialize_length_delimited(_ENTRY_VALUE_TAG, serialized_feature))
+
+
+def _is_bulk_float_array(dtype, values):
+  """Whether values are a non-empty float32 array of a floating feature."""
+  return (dtype.is_floating and isinstance(values, np.ndarray) and
+          values.dtype == np.float32 and values.size > 0)
+
+
+def _float_bytes(values):
+  """Returns the little-endian bytes of a float32 array's values."""
+  return values.astype('<f4', copy=False).tobytes()
+
+
+def _serialize_float_feature(values):
+  """Returns a serialized tf.train.Feature of a float32 array's buffer."""
+  return _serialize_length_delimited(
+      _FLOAT_LIST_TAG,
+      _serialize_length_delimited(_PACKED_VALUE_TAG, _float_bytes(values)))
+
+
+def _replace_values(feature, value, cast_fn, dtype, flat_values):
+  """Replaces the values of an encoded feature.
+
+  Numeric arrays are converted in bulk: float32 arrays are merged into the
+  feature as a serialized packed `FloatList`, and other arrays are converted to
+  Python values at once.
+
+  Args:
+    feature: The `tf.train.Feature` being encoded.
+    value: The repeated value field of `feature`'s list for its dtype.
+    cast_fn: The cast function of the feature, see `_make_cast_fn`.
+    dtype: The type of the Tensorflow feature.
+    flat_values: A list or a 1-d numpy array of the new values.
+  """
+  del value[:]
+  if isinstance(flat_values, np.ndarray) and flat_values.size:
+    if _is_bulk_float_array(dtype, flat_values):
+      feature.MergeFromString(_serialize_float_feature(flat_values))
+      return
+    if ((dtype.is_floating and flat_values.dtype.kind == 'f') or
+        (dtype.is_integer and flat_values.dtype.kind in 'iu')):
+      value.extend(flat_values.tolist())
+      return
+  value.extend(cast_fn(flat_values))
+
+
 class _FixedLenFeatureHandler(object):
   """Handler for `FixedLenFeature` values.
 
@@ -129,8 +219,10 @@ class _FixedLenFeatureHandler(object):
 
   def __init__(self, name, feature_spec):
     self._name = name
+    self._dtype = feature_spec.dtype
     self._np_dtype = feature_spec.dtype.as_numpy_dtype
     self._value_fn = _make_feature_value_fn(feature_spec.dtype)
+    self._arrow_type = record_batch_util.make_arrow_type(feature_spec.dtype)
     self._shape = feature_spec.shape
     self._rank = len(feature_spec.shape)
     self._size = 1
@@ -150,19 +242,57 @@ class _FixedLenFeatureHandler(object):
             self._name)
       default_value = np_default_value.reshape(-1).tolist()
     self._default_value = default_value
+    # The serialized feature map entry of float32 values is their bytes,
+    # following a prefix that only depends on their number.
+    self._float_entry_prefix = None
+    if self._dtype.is_floating and self._size:
+      float_entry = _serialize_feature_entry(
+          name, _serialize_float_feature(np.zeros(self._size, np.float32)))
+      self._float_entry_prefix = float_entry[:-4 * self._size]
 
   @property
   def name(self):
     """The name of the feature."""
     return self._name
 
+  @property
+  def dtype(self):
+    """The type of the Tensorflow feature."""
+    return self._dtype
+
+  @property
+  def np_dtype(self):
+    """The numpy type of the Tensorflow feature."""
+    return self._np_dtype
+
+  @property
+  def shape(self):
+    """The shape of the feature."""
+    return self._shape
+
+  @property
+  def rank(self):
+    """The rank of the feature."""
+    return self._rank
+
+  @property
+  def size(self):
+    """The number of values of the feature."""
+    return self._size
+
+  @property
+  def default_value(self):
+    """The flattened default value of the feature, or None."""
+    return self._default_value
+
   def initialize_encode_cache(self, example):
     """Initialize fields (performance caches) that point to example's state."""
     self._cast_fn = _make_cast_fn(self._np_dtype)
-    self._value = self._value_fn(example.features.feature[self._name])
+    self._feature = example.features.feature[self._name]
+    self._value = self._value_fn(self._feature)
 
-  def parse_value(self, feature_map):
-    """Non-Mutating Decode of a feature into its TF.Transform representation."""
+  def _get_values(self, feature_map):
+    """Returns the flattened values of the feature in feature_map."""
     if self._name in feature_map:
       feature = feature_map[self._name]
       if feature.WhichOneof('kind') is None:
@@ -177,6 +307,30 @@ class _FixedLenFeatureHandler(object):
     if len(values) != self._size:
       raise ValueError('FixedLenFeature %r got wrong number of values. Expected'
                        ' %d but got %d' % (self._name, self._size, len(values)))
+    return values
+
+  def extend_values(self, feature_map, flat_values):
+    """Appends the flattened values of the feature to flat_values.
+
+    Args:
+      feature_map: The feature map of an Example.
+      flat_values: A list of the flattened values of a batch of Examples.
+
+    Returns:
+      The number of values appended.
+    """
+    flat_values.extend(self._get_values(feature_map))
+    return self._size
+
+  def make_list_array(self, flat_values, row_lengths):
+    """Returns a `pa.LargeListArray` of values appended by `extend_values`."""
+    return record_batch_util.make_list_array(
+        np.asarray(flat_values, dtype=self._np_dtype), row_lengths,
+        self._arrow_type)
+
+  def parse_value(self, feature_map):
+    """Non-Mutating Decode of a feature into its TF.Transform representation."""
+    values = self._get_values(feature_map)
 
     if self._rank == 0:
       # Encode the values as a scalar if shape == [].
@@ -188,20 +342,45 @@ class _FixedLenFeatureHandler(object):
 
     return np.asarray(values, dtype=self._np_dtype).reshape(self._shape)
 
+  def _flatten(self, values):
+    """Returns the flattened values of a feature of rank > 0."""
+    flattened_values = (
+        values if self._rank == 1 else np.asarray(
+            values, dtype=self._np_dtype).reshape(-1))
+    if len(flattened_values) != self._size:
+      raise ValueError('FixedLenFeature %r got wrong number of values. '
+                       'Expected %d but got %d' %
+                       (self._name, self._size, len(flattened_values)))
+    return flattened_values
+
   def encode_value(self, values):
     """Encodes a feature into its Example proto representation."""
-    del self._value[:]
     if self._rank == 0:
+      del self._value[:]
       self._value.append(self._cast_fn(values))
     else:
-      flattened_values = (
-          values if self._rank == 1 else np.asarray(
-              values, dtype=self._np_dtype).reshape(-1))
-      if len(flattened_values) != self._size:
-        raise ValueError('FixedLenFeature %r got wrong number of values. '
-                         'Expected %d but got %d' %
-                         (self._name, self._size, len(flattened_values)))
-      self._value.extend(self._cast_fn(flattened_values))
+      self.encode_flat_values(self._flatten(values))
+
+  def encode_flat_values(self, flat_values):
+    """Encodes the flattened values of a feature, of the right size."""
+    _replace_values(self._feature, self._value, self._cast_fn, self._dtype,
+                    flat_values)
+
+  def serialize_value(self, values):
+    """Encodes a feature as a serialized entry of an Example's feature map."""
+    if self._rank == 0:
+      self.encode_value(values)
+      return _serialize_feature_entry(self._name,
+                                      self._feature.SerializeToString())
+    return self.serialize_flat_values(self._flatten(values))
+
+  def serialize_flat_values(self, flat_values):
+    """Encodes flattened values, of the right size, as a feature map entry."""
+    if _is_bulk_float_array(self._dtype, flat_values):
+      return self._float_entry_prefix + _float_bytes(flat_values)
+    self.encode_flat_values(flat_values)
+    return _serialize_feature_entry(self._name,
+                                    self._feature.SerializeToString())
 
 
 class _VarLenFeatureHandler(object):
@@ -212,14 +391,21 @@ class _VarLenFeatureHandler(object):
 
   def __init__(self, name, dtype):
     self._name = name
+    self._dtype = dtype
     self._np_dtype = dtype.as_numpy_dtype
     self._value_fn = _make_feature_value_fn(dtype)
+    self._arrow_type = record_batch_util.make_arrow_type(dtype)
 
   @property
   def name(self):
     """The name of the feature."""
     return self._name
 
+  @property
+  def dtype(self):
+    """The type of the Tensorflow feature."""
+    return self._dtype
+
   def initialize_encode_cache(self, example):
     """Initialize fields (performance caches) that point to example's state."""
     self._cast_fn = _make_cast_fn(self._np_dtype)
@@ -237,6 +423,30 @@ class _VarLenFeatureHandler(object):
 
     return list(self._value_fn(feature))
 
+  def extend_values(self, feature_map, flat_values):
+    """Appends the values of the feature to flat_values.
+
+    A missing feature has no values, like an empty one.
+
+    Args:
+      feature_map: The feature map of an Example.
+      flat_values: A list of the values of a batch of Examples.
+
+    Returns:
+      The number of values appended.
+    """
+    if self._name not in feature_map:
+      return 0
+    values = self._value_fn(feature_map[self._name])
+    flat_values.extend(values)
+    return len(values)
+
+  def make_list_array(self, flat_values, row_lengths):
+    """Returns a `pa.LargeListArray` of values appended by `extend_values`."""
+    return record_batch_util.make_list_array(
+        np.asarray(flat_values, dtype=self._np_dtype), row_lengths,
+        self._arrow_type)
+
   def encode_value(self, values):
     """Encode values as tf.train.Feature."""
     if values is None:
@@ -245,28 +455,167 @@ class _VarLenFeatureHandler(object):
       # self._feature so we need to reset it.
       self._value = self._value_fn(self._feature)
     else:
-      del self._value[:]
-
       # Scalar must be length 1 array.
       values = values if isinstance(values, (list, np.ndarray)) else [values]
-      self._value.extend(self._cast_fn(values))
+      self.encode_flat_values(values)
+
+  def encode_flat_values(self, flat_values):
+    """Encodes the values of a feature, which may be empty."""
+    _replace_values(self._feature, self._value, self._cast_fn, self._dtype,
+                    flat_values)
+
+  def serialize_value(self, values):
+    """Encodes a feature as a serialized entry of an Example's feature map."""
+    self.encode_value(values)
+    return _serialize_feature_entry(self._name,
+                                    self._feature.SerializeToString())
+
+  def serialize_flat_values(self, flat_values):
+    """Encodes the values of a feature as a feature map entry."""
+    self.encode_flat_values(flat_values)
+    return _serialize_feature_entry(self._name,
+                                    self._feature.SerializeToString())
+
+
+# Decode functions generated by `_make_generated_decode_fn`, by the fingerprint
+# of the schema that they were generated for.
+_GENERATED_DECODE_FNS = {}
+_GENERATED_DECODE_FNS_LOCK = threading.Lock()
+
+
+def _get_feature_value_attribute(dtype):
+  """Returns the tf.train.Feature field that `_make_feature_value_fn` reads."""
+  if dtype.is_integer:
+    return 'int64_list'
+  if dtype.is_floating:
+    return 'float_list'
+  return 'bytes_list'
+
+
+def _make_generated_decode_fn(feature_handlers):
+  """Returns a decode function with the features of the handlers unrolled.
+
+  The function maps the feature map of a tf.Example to the same dict as the
+  `parse_value` methods of the handlers would, and raises the same errors, but
+  without a method call, a dtype dispatch or a shape dispatch per feature.
+
+  Args:
+    feature_handlers: A list of `_FixedLenFeatureHandler`s and
+      `_VarLenFeatureHandler`s.
+
+  Returns:
+    A function of the feature map of a tf.Example.
+  """
+  lines = ['def decode(feature_map):']
+  env = {'np': np}
+  result_items = []
+  for index, handler in enumerate(feature_handlers):
+    name = repr(handler.name)
+    value_field = _get_feature_value_attribute(handler.dtype)
+    result = 'value_{}'.format(index)
+    result_items.append('{}: {}'.format(name, result))
+    if isinstance(handler, _VarLenFeatureHandler):
+      lines.extend([
+          '  if {} in feature_map:'.format(name),
+          '    feature = feature_map[{}]'.format(name),
+          "    if feature.WhichOneof('kind') is None:",
+          '      {} = None'.format(result),
+          '    else:',
+          '      {} = list(feature.{}.value)'.format(result, value_field),
+          '  else:',
+          '    {} = None'.format(result),
+      ])
+      continue
+
+    default_value = 'default_value_{}'.format(index)
+    env[default_value] = handler.default_value
+    np_dtype = 'np_dtype_{}'.format(index)
+    env[np_dtype] = handler.np_dtype
+    lines.extend([
+        '  if {} in feature_map:'.format(name),
+        '    feature = feature_map[{}]'.format(name),
+        "    if feature.WhichOneof('kind') is None:",
+        '      values = {}'.format(default_value),
+        '    else:',
+        '      values = feature.{}.value'.format(value_field),
+    ])
+    if handler.default_value is not None:
+      lines.extend([
+          '  else:',
+          '    values = {}'.format(default_value),
+      ])
+    else:
+      lines.extend([
+          '  else:',
+          '    values = []',
+      ])
+    lines.extend([
+        '  if len(values) != {}:'.format(handler.size),
+        "    raise ValueError('FixedLenFeature %r got wrong number of values. "
+        "Expected'",
+        "                     ' %d but got %d' % ({}, {}, len(values)))".format(
+            name, handler.size),
+    ])
+    if handler.rank == 0:
+      lines.append('  {} = values[0]'.format(result))
+    elif handler.rank == 1:
+      lines.append('  {} = np.asarray(values, dtype={})'.format(
+          result, np_dtype))
+    else:
+      lines.append('  {} = np.asarray(values, dtype={}).reshape({!r})'.format(
+          result, np_dtype, list(handler.shape)))
+  lines.append('  return {{{}}}'.format(', '.join(result_items)))
+
+  exec(compile('\n'.join(lines), '<generated ExampleProtoCoder decode>',  # pylint: disable=exec-used
+               'exec'), env)
+  return env['decode']
+
+
+def _get_generated_decode_fn(schema, feature_handlers):
+  """Returns the generated decode function of a schema, generating it once."""
+  fingerprint = hashlib.sha256(
+      schema.SerializeToString(deterministic=True)).hexdigest()
+  with _GENERATED_DECODE_FNS_LOCK:
+    decode_fn = _GENERATED_DECODE_FNS.get(fingerprint)
+    if decode_fn is None:
+      decode_fn = _make_generated_decode_fn(feature_handlers)
+      _GENERATED_DECODE_FNS[fingerprint] = decode_fn
+  return decode_fn
 
 
 class ExampleProtoCoder(object):
   """A coder between maybe-serialized TF Examples and tf.Transform datasets."""
 
-  def __init__(self, schema, serialized=True):
+  def __init__(self,
+               schema,
+               serialized=True,
+               generate_decoder=False,
+               serialize_features=False):
     """Build an ExampleProtoCoder.
 
     Args:
       schema: A `Schema` proto.
       serialized: Whether to encode / decode serialized Example protos (as
         opposed to in-memory Example protos).
+      generate_decoder: Whether `decode` should use a function generated for
+        `schema`, which reads every feature inline instead of calling a handler
+        for it.  The generated functions are shared by the coders of a process
+        with the same schema.
+      serialize_features: Whether `encode` and `encode_batch` should serialize
+        each feature on its own and join their bytes into a serialized Example,
+        rather than serialize a whole Example proto.  The float32 arrays of
+        `FixedLenFeature`s are then serialized straight from their buffers.
+        Requires `serialized`.
     Raises:
-      ValueError: If `schema` is invalid.
+      ValueError: If `schema` is invalid, or `serialize_features` is set but not
+        `serialized`.
     """
+    if serialize_features and not serialized:
+      raise ValueError('serialize_features requires serialized')
     self._schema = schema
     self._serialized = serialized
+    self._generate_decoder = generate_decoder
+    self._serialize_features = serialize_features
 
     # Using pre-allocated tf.train.Example and FeatureHandler objects for
     # performance reasons.
@@ -305,11 +654,30 @@ class ExampleProtoCoder(object):
     for feature_handler in self._feature_handlers:
       feature_handler.initialize_encode_cache(self._encode_example_cache)
 
+    if generate_decoder:
+      self._decode_fn = _get_generated_decode_fn(schema,
+                                                 self._feature_handlers)
+    else:
+      self._decode_fn = None
+
   def __reduce__(self):
-    return self.__class__, (self._schema, self._serialized)
+    return self.__class__, (self._schema, self._serialized,
+                            self._generate_decoder, self._serialize_features)
 
   def encode(self, instance):
     """Encode a tf.transform encoded dict as tf.Example."""
+    if self._serialize_features:
+      serialized_entries = []
+      for feature_handler in self._feature_handlers:
+        value = instance[feature_handler.name]
+        try:
+          serialized_entries.append(feature_handler.serialize_value(value))
+        except TypeError as e:
+          raise TypeError('%s while encoding feature "%s"' %
+                          (e, feature_handler.name))
+      return _serialize_length_delimited(_FEATURES_TAG,
+                                         b''.join(serialized_entries))
+
     # The feature handles encode using the self._encode_example_cache.
     for feature_handler in self._feature_handlers:
       value = instance[feature_handler.name]
@@ -326,6 +694,68 @@ class ExampleProtoCoder(object):
     result.CopyFrom(self._encode_example_cache)
     return result
 
+  def encode_batch(self, batch_dict):
+    """Encode a batch of values as a list of tf.Examples.
+
+    Rather than unbatching the values into instance dicts and encoding each of
+    them, the values of each feature are flattened and converted to Python
+    values once for the whole batch.  The float32 values of floating features
+    are instead copied in bulk from their array.
+
+    Args:
+      batch_dict: A dict from feature name to a batch of values, as returned by
+        `tf.Session.run`: a numpy array whose first dimension is the batch for
+        a `FixedLenFeature`, and a `tf.compat.v1.SparseTensorValue` for a
+        `VarLenFeature` or a `SparseFeature`.
+
+    Returns:
+      A list of maybe-serialized tf.Examples, one for each instance.
+
+    Raises:
+      ValueError: If `batch_dict` is invalid.
+    """
+    batch_size, columns = record_batch_util.get_flat_columns(
+        self._schema, batch_dict)
+    handler_columns = []
+    for feature_handler in self._feature_handlers:
+      flat_values, offsets = columns[feature_handler.name]
+      if not _is_bulk_float_array(feature_handler.dtype, flat_values):
+        flat_values = flat_values.tolist()
+      handler_columns.append((feature_handler, flat_values, offsets.tolist()))
+
+    result = []
+    for row in range(batch_size):
+      if self._serialize_features:
+        serialized_entries = []
+        for feature_handler, flat_values, offsets in handler_columns:
+          try:
+            serialized_entries.append(
+                feature_handler.serialize_flat_values(
+                    flat_values[offsets[row]:offsets[row + 1]]))
+          except TypeError as e:
+            raise TypeError('%s while encoding feature "%s"' %
+                            (e, feature_handler.name))
+        result.append(
+            _serialize_length_delimited(_FEATURES_TAG,
+                                        b''.join(serialized_entries)))
+        continue
+
+      # The feature handles encode using the self._encode_example_cache.
+      for feature_handler, flat_values, offsets in handler_columns:
+        try:
+          feature_handler.encode_flat_values(
+              flat_values[offsets[row]:offsets[row + 1]])
+        except TypeError as e:
+          raise TypeError('%s while encoding feature "%s"' %
+                          (e, feature_handler.name))
+      if self._serialized:
+        result.append(self._encode_example_cache.SerializeToString())
+      else:
+        example = tf.train.Example()
+        example.CopyFrom(self._encode_example_cache)
+        result.append(example)
+    return result
+
   def decode(self, example_proto):
     """Decode tf.Example as a tf.transform encoded dict."""
     if self._serialized:
@@ -335,5 +765,51 @@ class ExampleProtoCoder(object):
       example = example_proto
 
     feature_map = example.features.feature
+    if self._decode_fn is not None:
+      return self._decode_fn(feature_map)
     return {feature_handler.name: feature_handler.parse_value(feature_map)
             for feature_handler in self._feature_handlers}
+
+  def decode_batch(self, example_protos):
+    """Decode a batch of tf.Examples into a `pa.RecordBatch`.
+
+    Rather than building a value for each Example like `decode`, the values of
+    each feature in all of the Examples are appended to a single list, which is
+    converted to an array once.  Missing values are handled like in `decode`,
+    except that a missing `VarLenFeature` has no values, rather than None.  The
+    result has a `large_list` column for each feature (for `SparseFeature`s, one
+    for its indices and one for its values), and is described by
+    `tensor_adapter_config`, so that it can be the input of
+    `tft_beam.AnalyzeDataset` and `tft_beam.TransformDataset`.
+
+    Args:
+      example_protos: A list of maybe-serialized tf.Examples.
+
+    Returns:
+      A `pa.RecordBatch` with a row for each of `example_protos`.
+    """
+    flat_values = [[] for _ in self._feature_handlers]
+    row_lengths = [
+        np.empty(len(example_protos), dtype=np.int64)
+        for _ in self._feature_handlers
+    ]
+    for row, example_proto in enumerate(example_protos):
+      if self._serialized:
+        example = self._decode_example_cache
+        example.ParseFromString(example_proto)
+      else:
+        example = example_proto
+      feature_map = example.features.feature
+      for feature_handler, values, lengths in zip(self._feature_handlers,
+                                                  flat_values, row_lengths):
+        lengths[row] = feature_handler.extend_values(feature_map, values)
+
+    return pa.RecordBatch.from_arrays(
+        [feature_handler.make_list_array(values, lengths)
+         for feature_handler, values, lengths in zip(
+             self._feature_handlers, flat_values, row_lengths)],
+        [feature_handler.name for feature_handler in self._feature_handlers])
+
+  def tensor_adapter_config(self):
+    """Returns a `TensorAdapterConfig` for the output of `decode_batch`."""
+    return record_batch_util.make_tensor_adapter_config(self._schema)
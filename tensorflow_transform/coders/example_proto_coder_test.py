@@ -83,6 +83,17 @@ class ExampleProtoCoderTest(test_case.TransformTestCase):
     serialized_proto = _ascii_to_binary(ascii_proto)
     np.testing.assert_equal(coder.decode(serialized_proto), instance)
 
+  @test_case.named_parameters(*(
+      example_proto_coder_test_cases.ENCODE_DECODE_CASES +
+      example_proto_coder_test_cases.DECODE_ONLY_CASES))
+  def test_decode_with_generated_decoder(self, feature_spec, ascii_proto,
+                                         instance, **kwargs):
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = example_proto_coder.ExampleProtoCoder(
+        schema, generate_decoder=True, **kwargs)
+    serialized_proto = _ascii_to_binary(ascii_proto)
+    np.testing.assert_equal(coder.decode(serialized_proto), instance)
+
   @test_case.named_parameters(*(
       example_proto_coder_test_cases.ENCODE_DECODE_CASES +
       example_proto_coder_test_cases.DECODE_ONLY_CASES))
@@ -94,6 +105,39 @@ class ExampleProtoCoderTest(test_case.TransformTestCase):
     proto = _ascii_to_example(ascii_proto)
     np.testing.assert_equal(coder.decode(proto), instance)
 
+  @test_case.named_parameters(*(
+      example_proto_coder_test_cases.ENCODE_DECODE_CASES +
+      example_proto_coder_test_cases.DECODE_ONLY_CASES))
+  def test_decode_batch(self, feature_spec, ascii_proto, instance, **kwargs):
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = example_proto_coder.ExampleProtoCoder(schema, **kwargs)
+    serialized_proto = _ascii_to_binary(ascii_proto)
+    record_batch = coder.decode_batch([serialized_proto, serialized_proto])
+    self.assertEqual(coder.tensor_adapter_config().arrow_schema,
+                     record_batch.schema)
+    expected_columns = {
+        name: [[] if value is None else np.asarray(value).reshape(-1).tolist()
+              ] * 2 for name, value in instance.items()
+    }
+    self.assertEqual(
+        expected_columns,
+        dict(zip(record_batch.schema.names,
+                 [column.to_pylist() for column in record_batch.columns])))
+
+  @test_case.named_parameters(
+      *example_proto_coder_test_cases.DECODE_ERROR_CASES)
+  def test_decode_batch_error(self,
+                              feature_spec,
+                              ascii_proto,
+                              error_msg,
+                              error_type=ValueError,
+                              **kwargs):
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = example_proto_coder.ExampleProtoCoder(schema, **kwargs)
+    serialized_proto = _ascii_to_binary(ascii_proto)
+    with self.assertRaisesRegexp(error_type, error_msg):
+      coder.decode_batch([serialized_proto])
+
   @test_case.named_parameters(*(
       example_proto_coder_test_cases.ENCODE_DECODE_CASES +
       example_proto_coder_test_cases.ENCODE_ONLY_CASES))
@@ -103,6 +147,57 @@ class ExampleProtoCoderTest(test_case.TransformTestCase):
     serialized_proto = _ascii_to_binary(ascii_proto)
     self.assertSerializedProtosEqual(coder.encode(instance), serialized_proto)
 
+  @test_case.named_parameters(*(
+      example_proto_coder_test_cases.ENCODE_DECODE_CASES +
+      example_proto_coder_test_cases.ENCODE_ONLY_CASES))
+  def test_encode_with_serialized_features(self, feature_spec, ascii_proto,
+                                           instance, **kwargs):
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = example_proto_coder.ExampleProtoCoder(
+        schema, serialize_features=True, **kwargs)
+    serialized_proto = _ascii_to_binary(ascii_proto)
+    self.assertSerializedProtosEqual(coder.encode(instance), serialized_proto)
+
+  @test_case.parameters((False,), (True,))
+  def test_encode_float32_arrays(self, serialize_features):
+    schema = schema_utils.schema_from_feature_spec({
+        'vector_feature': tf.io.FixedLenFeature([3], tf.float32),
+        'matrix_feature': tf.io.FixedLenFeature([2, 2], tf.float32),
+        'varlen_feature': tf.io.VarLenFeature(tf.float32),
+    })
+    coder = example_proto_coder.ExampleProtoCoder(
+        schema, serialize_features=serialize_features)
+    instance = {
+        'vector_feature': np.array([1.5, -2.0, 1e-3], dtype=np.float32),
+        'matrix_feature': np.array([[1.0, 2.0], [3.0, 4.0]]),
+        'varlen_feature': np.array([0.25], dtype=np.float32),
+    }
+    ascii_proto = """
+    features {
+      feature { key: "vector_feature"
+                value { float_list { value: [ 1.5, -2.0, 0.001 ] } } }
+      feature { key: "matrix_feature"
+                value { float_list { value: [ 1.0, 2.0, 3.0, 4.0 ] } } }
+      feature { key: "varlen_feature"
+                value { float_list { value: [ 0.25 ] } } }
+    }
+    """
+    self.assertSerializedProtosEqual(
+        coder.encode(instance), _ascii_to_binary(ascii_proto))
+    with self.assertRaisesRegexp(
+        ValueError, "FixedLenFeature 'vector_feature' got wrong number of "
+        'values. Expected 3 but got 2'):
+      coder.encode(
+          dict(instance, vector_feature=np.zeros(2, dtype=np.float32)))
+
+  def test_serialize_features_requires_serialized(self):
+    schema = schema_utils.schema_from_feature_spec(
+        example_proto_coder_test_cases.FEATURE_SPEC)
+    with self.assertRaisesRegexp(ValueError,
+                                 'serialize_features requires serialized'):
+      example_proto_coder.ExampleProtoCoder(
+          schema, serialized=False, serialize_features=True)
+
   @test_case.named_parameters(*(
       example_proto_coder_test_cases.ENCODE_DECODE_CASES +
       example_proto_coder_test_cases.ENCODE_ONLY_CASES))
@@ -128,6 +223,31 @@ class ExampleProtoCoderTest(test_case.TransformTestCase):
     with self.assertRaisesRegexp(error_type, error_msg):
       coder.decode(serialized_proto)
 
+  @test_case.named_parameters(
+      *example_proto_coder_test_cases.DECODE_ERROR_CASES)
+  def test_decode_error_with_generated_decoder(self,
+                                               feature_spec,
+                                               ascii_proto,
+                                               error_msg,
+                                               error_type=ValueError,
+                                               **kwargs):
+    schema = schema_utils.schema_from_feature_spec(feature_spec)
+    coder = example_proto_coder.ExampleProtoCoder(
+        schema, generate_decoder=True, **kwargs)
+    serialized_proto = _ascii_to_binary(ascii_proto)
+    with self.assertRaisesRegexp(error_type, error_msg):
+      coder.decode(serialized_proto)
+
+  def test_generated_decoder_is_shared_and_picklable(self):
+    schema = schema_utils.schema_from_feature_spec(
+        example_proto_coder_test_cases.FEATURE_SPEC)
+    coder = example_proto_coder.ExampleProtoCoder(schema, generate_decoder=True)
+    other_coder = example_proto_coder.ExampleProtoCoder(
+        schema, generate_decoder=True)
+    self.assertIs(coder._decode_fn, other_coder._decode_fn)
+    pickled_coder = pickle.loads(pickle.dumps(coder))
+    self.assertIs(coder._decode_fn, pickled_coder._decode_fn)
+
   @test_case.named_parameters(
       *example_proto_coder_test_cases.ENCODE_ERROR_CASES)
   def test_encode_error(self,
@@ -141,6 +261,84 @@ class ExampleProtoCoderTest(test_case.TransformTestCase):
     with self.assertRaisesRegexp(error_type, error_msg):
       coder.encode(instance)
 
+  def test_encode_batch(self):
+    schema = schema_utils.schema_from_feature_spec(
+        example_proto_coder_test_cases.FEATURE_SPEC)
+    coder = example_proto_coder.ExampleProtoCoder(schema)
+    batch_dict = {
+        'scalar_feature_1':
+            np.array([12, 13]),
+        'scalar_feature_2':
+            np.array([12, 214]),
+        'scalar_feature_3':
+            np.array([1.0, 2.0], dtype=np.float32),
+        'varlen_feature_1':
+            tf.compat.v1.SparseTensorValue(
+                indices=[[0, 0], [1, 0], [1, 1]],
+                values=np.array([89.0, 1.0, 2.0], dtype=np.float32),
+                dense_shape=[2, 2]),
+        'varlen_feature_2':
+            tf.compat.v1.SparseTensorValue(
+                indices=[[0, 0], [1, 0]],
+                values=np.array([b'female', b'male'], dtype=object),
+                dense_shape=[2, 1]),
+        '1d_vector_feature':
+            np.array([[b'this is a ,text'], [b'this is another ,text']],
+                     dtype=object),
+        '2d_vector_feature':
+            np.array([[[1.0, 2.0], [3.0, 4.0]], [[9.0, 8.0], [7.0, 6.0]]],
+                     dtype=np.float32),
+        'sparse_feature':
+            tf.compat.v1.SparseTensorValue(
+                indices=[[0, 1], [0, 4], [1, 2], [1, 5]],
+                values=np.array([12.0, 20.0, 13.0, 21.0], dtype=np.float32),
+                dense_shape=[2, 10]),
+    }
+    instances = [{
+        'scalar_feature_1': 12,
+        'scalar_feature_2': 12,
+        'scalar_feature_3': 1.0,
+        'varlen_feature_1': [89.0],
+        'varlen_feature_2': [b'female'],
+        '1d_vector_feature': [b'this is a ,text'],
+        '2d_vector_feature': [[1.0, 2.0], [3.0, 4.0]],
+        'idx': [1, 4],
+        'value': [12.0, 20.0],
+    }, {
+        'scalar_feature_1': 13,
+        'scalar_feature_2': 214,
+        'scalar_feature_3': 2.0,
+        'varlen_feature_1': [1.0, 2.0],
+        'varlen_feature_2': [b'male'],
+        '1d_vector_feature': [b'this is another ,text'],
+        '2d_vector_feature': [[9.0, 8.0], [7.0, 6.0]],
+        'idx': [2, 5],
+        'value': [13.0, 21.0],
+    }]
+    serialized_protos = coder.encode_batch(batch_dict)
+    self.assertLen(serialized_protos, 2)
+    for serialized_proto, instance in zip(serialized_protos, instances):
+      self.assertSerializedProtosEqual(serialized_proto,
+                                       coder.encode(instance))
+    serialize_features_coder = example_proto_coder.ExampleProtoCoder(
+        schema, serialize_features=True)
+    for serialized_proto, instance in zip(
+        serialize_features_coder.encode_batch(batch_dict), instances):
+      self.assertSerializedProtosEqual(serialized_proto,
+                                       coder.encode(instance))
+
+  def test_encode_batch_error(self):
+    schema = schema_utils.schema_from_feature_spec(
+        {'2d_vector_feature': tf.io.FixedLenFeature([2, 2], tf.int64)})
+    coder = example_proto_coder.ExampleProtoCoder(schema)
+    # The error is the same as when encoding a single instance.
+    error_msg = (r"FixedLenFeature '2d_vector_feature' got wrong number of "
+                 r'values. Expected 4 but got 3')
+    with self.assertRaisesRegexp(ValueError, error_msg):
+      coder.encode({'2d_vector_feature': [1, 2, 3]})
+    with self.assertRaisesRegexp(ValueError, error_msg):
+      coder.encode_batch({'2d_vector_feature': np.array([[1, 2, 3]])})
+
   def test_example_proto_coder_picklable(self):
     schema = schema_utils.schema_from_feature_spec(
         example_proto_coder_test_cases.FEATURE_SPEC)
@@ -0,0 +1,184 @@
+# Copyright 2020 Google Inc. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Utilities for the batches that coders decode and encode.
+
+A decoded batch is a `pa.RecordBatch` with a `large_list` column for each
+feature, and for each of the index and value keys of a `SparseFeature`, with the
+flattened values of each instance.  A batch to encode is a dict of batched
+values, as returned by `tf.Session.run`.
+"""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+# GOOGLE-INITIALIZATION
+
+import numpy as np
+import pyarrow as pa
+import six
+import tensorflow as tf
+from tensorflow_transform.tf_metadata import schema_utils
+from tfx_bsl.tfxio import tensor_adapter
+
+from tensorflow_metadata.proto.v0 import schema_pb2
+
+
+def make_arrow_type(dtype):
+  """Returns the Arrow type of the values of a feature of the given dtype."""
+  if dtype.is_integer:
+    return pa.int64()
+  elif dtype.is_floating:
+    return pa.float32()
+  else:
+    return pa.large_binary()
+
+
+def make_list_array(values, row_lengths, arrow_type):
+  """Returns a `pa.LargeListArray` of the given flattened values.
+
+  Args:
+    values: A numpy array or list of the flattened values of all rows.
+    row_lengths: A sequence of the number of values of each row.
+    arrow_type: The Arrow type of the values.
+
+  Returns:
+    A `pa.LargeListArray` with a row for each of `row_lengths`.
+  """
+  offsets = np.zeros(len(row_lengths) + 1, dtype=np.int64)
+  np.cumsum(row_lengths, out=offsets[1:])
+  return pa.LargeListArray.from_arrays(
+      pa.array(offsets, type=pa.int64()), pa.array(values, type=arrow_type))
+
+
+def make_tensor_adapter_config(schema):
+  """Returns a `TensorAdapterConfig` for the batches decoded with a schema.
+
+  Default values are filled in when decoding, so that every row of a
+  `FixedLenFeature` column has all of its values.
+
+  Args:
+    schema: A `Schema` proto.
+
+  Returns:
+    A `tensor_adapter.TensorAdapterConfig`.
+  """
+  arrow_fields = []
+  tensor_representations = {}
+  for name, feature_spec in six.iteritems(
+      schema_utils.schema_as_feature_spec(schema).feature_spec):
+    representation = schema_pb2.TensorRepresentation()
+    if isinstance(feature_spec, tf.io.FixedLenFeature):
+      representation.dense_tensor.column_name = name
+      for dim in feature_spec.shape:
+        representation.dense_tensor.shape.dim.add().size = dim
+      column_dtypes = [(name, feature_spec.dtype)]
+    elif isinstance(feature_spec, tf.io.VarLenFeature):
+      representation.varlen_sparse_tensor.column_name = name
+      column_dtypes = [(name, feature_spec.dtype)]
+    elif isinstance(feature_spec, tf.io.SparseFeature):
+      representation.sparse_tensor.index_column_names.append(
+          feature_spec.index_key)
+      representation.sparse_tensor.value_column_name = feature_spec.value_key
+      representation.sparse_tensor.dense_shape.dim.add().size = (
+          feature_spec.size)
+      column_dtypes = [(feature_spec.index_key, tf.int64),
+                       (feature_spec.value_key, feature_spec.dtype)]
+    else:
+      raise ValueError('feature_spec should be one of tf.FixedLenFeature, '
+                       'tf.VarLenFeature or tf.SparseFeature: {!r} was '
+                       '{!r}'.format(name, type(feature_spec)))
+    tensor_representations[name] = representation
+    arrow_fields.extend(
+        pa.field(column_name, pa.large_list(make_arrow_type(dtype)))
+        for column_name, dtype in column_dtypes)
+  return tensor_adapter.TensorAdapterConfig(
+      pa.schema(arrow_fields), tensor_representations)
+
+
+def get_flat_columns(
+    schema,
+    batch_dict,
+    fixed_len_error_format=(
+        'FixedLenFeature {!r} got wrong number of values. Expected {} but got '
+        '{}')):
+  """Returns the flattened values of each column of a batch dict.
+
+  Args:
+    schema: A `Schema` proto.
+    batch_dict: A dict from feature name to a batch of values of the feature,
+      as returned by `tf.Session.run`: a numpy array whose first dimension is
+      the batch for a `FixedLenFeature`, and a `tf.compat.v1.SparseTensorValue`
+      for a `VarLenFeature` or a 1-d `SparseFeature`.
+    fixed_len_error_format: (Optional) The message of the error raised when a
+      `FixedLenFeature` has the wrong number of values, formatted with its
+      name, expected and actual number of values, so that a coder can raise the
+      same error as when encoding a single instance.
+
+  Returns:
+    A tuple of the batch size and a dict from column name (for
+    `SparseFeature`s, its index and value keys) to a tuple of a numpy array of
+    the flattened values of all rows, and the offsets of each row's values in it
+    followed by their total number.
+
+  Raises:
+    ValueError: If a `FixedLenFeature` has the wrong number of values, a
+      `SparseTensorValue` has out-of-order indices or is not a list of values
+      for a `VarLenFeature`, or the batch sizes of the features differ.
+  """
+  columns = {}
+  batch_sizes = {}
+  for name, feature_spec in six.iteritems(
+      schema_utils.schema_as_feature_spec(schema).feature_spec):
+    value = batch_dict[name]
+    if isinstance(feature_spec, tf.io.FixedLenFeature):
+      value = np.asarray(value)
+      batch_size = value.shape[0]
+      size = int(np.prod(feature_spec.shape, dtype=np.int64))
+      if value.size != batch_size * size:
+        raise ValueError(
+            fixed_len_error_format.format(name, size,
+                                          value.size // max(batch_size, 1)))
+      columns[name] = (value.reshape(-1),
+                       np.arange(batch_size + 1, dtype=np.int64) * size)
+    elif isinstance(feature_spec,
+                    (tf.io.VarLenFeature, tf.io.SparseFeature)):
+      indices, values, dense_shape = value
+      indices = np.asarray(indices, dtype=np.int64)
+      values = np.asarray(values)
+      batch_size = int(dense_shape[0])
+      rows = indices[:, 0]
+      out_of_order = np.flatnonzero(rows[1:] < rows[:-1])
+      if out_of_order.size:
+        raise ValueError('Encountered out-of-order sparse index: {}.'.format(
+            indices[out_of_order[0] + 1]))
+      offsets = np.zeros(batch_size + 1, dtype=np.int64)
+      np.cumsum(np.bincount(rows, minlength=batch_size), out=offsets[1:])
+      if isinstance(feature_spec, tf.io.VarLenFeature):
+        if (indices.shape[1] != 2 or np.any(
+            indices[:, 1] != np.arange(len(rows)) - offsets[rows])):
+          raise ValueError('Encountered a SparseTensorValue that cannot be '
+                           'decoded by ListColumnRepresentation.\n'
+                           '"{}" : {}'.format(name, value))
+        columns[name] = (values, offsets)
+      else:
+        columns[feature_spec.index_key] = (indices[:, 1], offsets)
+        columns[feature_spec.value_key] = (values, offsets)
+    else:
+      raise ValueError('Invalid feature spec {}.'.format(feature_spec))
+    batch_sizes[name] = batch_size
+
+  if len(set(batch_sizes.values())) > 1:
+    raise ValueError('Inconsistent batch sizes: {}'.format(batch_sizes))
+  return next(six.itervalues(batch_sizes), 0), columns
@@ -102,19 +102,25 @@ def _tukey_hh_l_skewness_and_kurtosis(h_params):
 
 
 def _binary_search(error_fn, low_value, high_value):
-  """Binary search for a function given start and end interval.
+  """Binary search for a function given start and end intervals.
 
   This is a simple binary search over the values of the function error_fn given
-  the interval [low_value, high_value]. We expect that the starting condition is
-  error_fn(low_value) < 0 and error_fn(high_value) > 0 and we bisect the
-  interval until the exit conditions are met. The result is the final interval
+  the intervals [low_value, high_value]. We expect that the starting condition
+  is error_fn(low_value) < 0 and error_fn(high_value) > 0 and we bisect the
+  intervals until the exit conditions are met. The result is the final interval
   [low_value, high_value] that is normally much smaller than the initial one,
   but still satisfying the starting condition.
 
+  All intervals are bisected at once: error_fn is evaluated elementwise on an
+  array of midpoints, and each interval stops being updated as soon as it meets
+  its own exit conditions.
+
   Args:
-    error_fn: Function mapping values to errors.
-    low_value: Lower interval endpoint. We expect f(low_value) < 0.
-    high_value: Higher interval endpoint. We expect f(high_value) > 0.
+    error_fn: Elementwise function mapping an np.array of values to errors.
+    low_value: np.array of lower interval endpoints. We expect
+      f(low_value) < 0.
+    high_value: np.array of higher interval endpoints. We expect
+      f(high_value) > 0.
 
   Returns:
     The final interval endpoints (low_value, high_value) after the sequence of
@@ -125,19 +131,20 @@ def _binary_search(error_fn, low_value, high_value):
   stop_error_step = 1e-6  # Minimum function variation.
   stop_value_step = 1e-6  # Minimum variable variation.
 
+  low_value = np.array(low_value)
+  high_value = np.array(high_value)
+  searching = np.ones(low_value.shape, dtype=bool)
   current_iter = 0
-  while True:
+  while np.any(searching):
     current_value = (low_value + high_value) / 2.0
     current_error = error_fn(current_value)
-    if current_error < 0.0:
-      low_value = current_value
-    else:
-      high_value = current_value
+    is_low = current_error < 0.0
+    low_value = np.where(searching & is_low, current_value, low_value)
+    high_value = np.where(searching & ~is_low, current_value, high_value)
     current_iter += 1
-    if (current_iter > stop_iter_step or
-        np.abs(current_error) < stop_error_step or
-        high_value - low_value < stop_value_step):
-      break
+    searching &= ~((current_iter > stop_iter_step) |
+                   (np.abs(current_error) < stop_error_step) |
+                   (high_value - low_value < stop_value_step))
   return low_value, high_value
 
 
@@ -167,11 +174,13 @@ def compute_tukey_hh_params(l_skewness_and_kurtosis):
   """Computes the H paramesters of a Tukey HH distribution.
 
   Given the L-skewness and L-kurtosis of a Tukey HH distribution we compute
-  the H parameters of the distribution.
+  the H parameters of the distribution. The search is done for all elements at
+  once, with each element leaving the search as soon as it has converged.
 
   Args:
-    l_skewness_and_kurtosis: A np.array with shape (2,) containing L-skewness
-    and L-kurtosis.
+    l_skewness_and_kurtosis: A np.array with dimension 2 on the first axis. The
+    slice l_skewness_and_kurtosis[0, ...] contains L-skewness and the slice
+    l_skewness_and_kurtosis[1, ...] L-kurtosis.
 
   Returns:
     An np.array with the same type and shape of the argument containing the
@@ -184,103 +193,98 @@ def compute_tukey_hh_params(l_skewness_and_kurtosis):
   stop_value_step = 1e-6  # Minimum variable variation.
 
   dtype = l_skewness_and_kurtosis.dtype
+  l_skewness = l_skewness_and_kurtosis[0, ...]
+  l_kurtosis = l_skewness_and_kurtosis[1, ...]
 
   # Returns zero parameters (i.e. treat as gaussian) if L-kurtosis is smaller
   # than for a gaussian.
 
-  result = np.zeros_like(l_skewness_and_kurtosis)
-  if l_skewness_and_kurtosis[1] < 0.1226017:
-    return result
+  searching = ~(l_kurtosis < 0.1226017)
 
   # If L-skewness is negative, swap the parameters.
 
-  swap_params = False
-  if l_skewness_and_kurtosis[0] < 0.0:
-    l_skewness_and_kurtosis[0] = -l_skewness_and_kurtosis[0]
-    swap_params = True
-
-  l_skewness_and_kurtosis[1] = np.minimum(
-      l_skewness_and_kurtosis[1], 1.0 - 1.0e-5)
+  swap_params = l_skewness < 0.0
+  target = np.array(
+      [np.abs(l_skewness),
+       np.minimum(l_kurtosis, 1.0 - 1.0e-5)], dtype=dtype)
 
   # If L-skewness is zero, left and right parameters are equal and there is a
   # a closed form to compute them from L-kurtosis. We start from this value
   # and then change them to match simultaneously L-skeweness and L-kurtosis.
-  # For that, we parametrize the search space with the array
-  # [h_rigth, h_right - h_left], i.e. the value of the right parameter and the
-  # difference right minus left paramerters. In the search iteration, we
-  # alternate between updates on the first and the second entry of the search
-  # parameters.
+  # For that, we parametrize the search space with the arrays
+  # h (the value of the right parameter) and delta_h (the difference right
+  # minus left paramerters). In the search iteration, we alternate between
+  # updates on h and delta_h.
 
-  initial_h = 3.0 - 1.0 / np.cos(
-      np.pi / 15.0 * (l_skewness_and_kurtosis[1] - 6.0))
-  search_params = np.array([initial_h, 0.0], dtype=dtype)
+  initial_h = np.array(
+      3.0 - 1.0 / np.cos(np.pi / 15.0 * (target[1, ...] - 6.0)), dtype=dtype)
+  h = initial_h
+  delta_h = np.zeros_like(initial_h)
 
   # Current lower and upper bounds for the search parameters.
 
-  min_search_params = np.array([initial_h, 0.0], dtype=dtype)
-  max_search_params = np.array([1.0 - 1.0e-7, initial_h], dtype=dtype)
+  min_h = initial_h
+  max_h = np.full_like(initial_h, 1.0 - 1.0e-7)
+  min_delta_h = np.zeros_like(initial_h)
+  max_delta_h = initial_h
 
   current_iter = 0
-  previous_search_params = np.zeros_like(search_params)
-  while current_iter < stop_iter_step:
+  previous_h = np.zeros_like(h)
+  previous_delta_h = np.zeros_like(delta_h)
+  while current_iter < stop_iter_step and np.any(searching):
     # Search for L-skewness at constant h. Increase delta_h.
-    error_skewness = lambda x: _params_to_errors(  # pylint: disable=g-long-lambda
-        search_params[0], x, l_skewness_and_kurtosis)[0]
-    if error_skewness(max_search_params[1]) > 0.0:
-      low_delta_h, high_delta_h = _binary_search(
-          error_skewness, min_search_params[1], max_search_params[1])
-      search_params[1] = high_delta_h
-      max_search_params[1] = high_delta_h  # The new delta is an upperbound.
-      upperbound_delta_found = True
-    else:
-      search_params[1] = max_search_params[1]
-      min_search_params[1] = max_search_params[1]  # No solution: lowerbound.
-      upperbound_delta_found = False
+    error_skewness = lambda x: _params_to_errors(h, x, target)[0, ...]  # pylint: disable=cell-var-from-loop
+    upperbound_delta_found = searching & (error_skewness(max_delta_h) > 0.0)
+    not_found = searching & ~upperbound_delta_found
+    _, high_delta_h = _binary_search(error_skewness, min_delta_h, max_delta_h)
+    # The new delta is an upperbound.
+    delta_h = np.where(upperbound_delta_found, high_delta_h, delta_h)
+    max_delta_h = np.where(upperbound_delta_found, high_delta_h, max_delta_h)
+    # No solution: lowerbound.
+    delta_h = np.where(not_found, max_delta_h, delta_h)
+    min_delta_h = np.where(not_found, max_delta_h, min_delta_h)
 
     # Search for L-kurtosis at constant possibly overestimated delta.
-    error_kurtosis = lambda x: _params_to_errors(  # pylint: disable=g-long-lambda
-        x, search_params[1], l_skewness_and_kurtosis)[1]
-    low_h, high_h = _binary_search(
-        error_kurtosis, min_search_params[0], max_search_params[0])
-    if upperbound_delta_found:
-      search_params[0] = high_h
-      max_search_params[0] = high_h   # Delta overestimated: upperbound for h.
-    else:
-      search_params[0] = low_h
-      min_search_params[0] = low_h   # Delta underestimated: lowerbound for h.
-      max_search_params[1] = low_h  # Delta not found, search on full range.
-
-    if upperbound_delta_found:  # If not found, we repeat the first 2 steps.
+    error_kurtosis = lambda x: _params_to_errors(x, delta_h, target)[1, ...]  # pylint: disable=cell-var-from-loop
+    low_h, high_h = _binary_search(error_kurtosis, min_h, max_h)
+    # Delta overestimated: upperbound for h.
+    h = np.where(upperbound_delta_found, high_h, h)
+    max_h = np.where(upperbound_delta_found, high_h, max_h)
+    # Delta underestimated: lowerbound for h.
+    h = np.where(not_found, low_h, h)
+    min_h = np.where(not_found, low_h, min_h)
+    # Delta not found, search on full range.
+    max_delta_h = np.where(not_found, low_h, max_delta_h)
+
+    if np.any(upperbound_delta_found):  # If not found, repeat the first steps.
       # Otherwise, Search for delta at constant overestimated h.
-      error_skewness = lambda x: _params_to_errors(  # pylint: disable=g-long-lambda
-          search_params[0], x, l_skewness_and_kurtosis)[0]
-      low_delta_h, high_delta_h = _binary_search(
-          error_skewness, min_search_params[1], max_search_params[1])
-      search_params[1] = low_delta_h
-      min_search_params[1] = low_delta_h
+      error_skewness = lambda x: _params_to_errors(h, x, target)[0, ...]  # pylint: disable=cell-var-from-loop
+      low_delta_h, _ = _binary_search(
+          error_skewness, min_delta_h, max_delta_h)
+      delta_h = np.where(upperbound_delta_found, low_delta_h, delta_h)
+      min_delta_h = np.where(upperbound_delta_found, low_delta_h, min_delta_h)
 
       # Search for h at constant delta.
-      error_kurtosis = lambda x: _params_to_errors(  # pylint: disable=g-long-lambda
-          x, search_params[1], l_skewness_and_kurtosis)[1]
-      low_h, high_h = _binary_search(
-          error_kurtosis, min_search_params[0], max_search_params[0])
-      search_params[0] = low_h
-      min_search_params[0] = low_h
-
-    current_error = _params_to_errors(
-        search_params[0], search_params[1], l_skewness_and_kurtosis)
-    delta_search_params = search_params - previous_search_params
+      error_kurtosis = lambda x: _params_to_errors(x, delta_h, target)[1, ...]  # pylint: disable=cell-var-from-loop
+      low_h, _ = _binary_search(error_kurtosis, min_h, max_h)
+      h = np.where(upperbound_delta_found, low_h, h)
+      min_h = np.where(upperbound_delta_found, low_h, min_h)
+
+    current_error = _params_to_errors(h, delta_h, target)
     current_iter += 1
-    previous_search_params = search_params.copy()
-    if (np.all(np.abs(current_error) < stop_error_step) or
-        np.all(np.abs(delta_search_params) < stop_value_step)):
-      break
-
-  result[0] = search_params[0] - search_params[1]
-  result[1] = search_params[0]
-  if swap_params:
-    result = result[::-1]
-  return result
+    searching &= ~(
+        np.all(np.abs(current_error) < stop_error_step, axis=0) |
+        ((np.abs(h - previous_h) < stop_value_step) &
+         (np.abs(delta_h - previous_delta_h) < stop_value_step)))
+    previous_h = h
+    previous_delta_h = delta_h
+
+  h = np.where(l_kurtosis < 0.1226017, 0.0, h)
+  delta_h = np.where(l_kurtosis < 0.1226017, 0.0, delta_h)
+  hl = h - delta_h
+  return np.array(
+      [np.where(swap_params, h, hl), np.where(swap_params, hl, h)],
+      dtype=dtype)
 
 
 def lambert_w(x):
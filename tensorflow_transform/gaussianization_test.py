@@ -242,6 +242,23 @@ class GaussianizationTest(test_case.TransformTestCase):
     self.assertAllEqual(output.shape, expected_output.shape)
     self.assertAllClose(output, expected_output)
 
+  def test_compute_tukey_hh_params_nd(self):
+    test_cases = (
+        [_COMPUTE_TUKEY_H_PARAMS_NEG_SKEWNESS_TEST] +
+        _COMPUTE_TUKEY_H_PARAMS_REGULAR_TESTS +
+        _COMPUTE_TUKEY_H_PARAMS_PATOLOGICAL_TESTS)
+    # Adds a gaussian case, for which parameters are not searched.
+    l_skewness_and_kurtosis = np.stack(
+        [t['l_skewness_and_kurtosis'] for t in test_cases] +
+        [np.array([0.0, 0.1], np.float32)], axis=1).reshape((2, 3, 3))
+    expected_output = np.stack(
+        [t['expected_output'] for t in test_cases] +
+        [np.array([0.0, 0.0], np.float32)], axis=1).reshape((2, 3, 3))
+    output = gaussianization.compute_tukey_hh_params(l_skewness_and_kurtosis)
+    self.assertEqual(output.dtype, expected_output.dtype)
+    self.assertAllEqual(output.shape, expected_output.shape)
+    self.assertAllClose(output, expected_output)
+
   @test_case.named_parameters(*_LAMBERT_W_SCALAR_TESTS + _LAMBERT_W_ND_TESTS)
   def test_lambert_w(self, samples, expected_output):
     output = gaussianization.lambert_w(samples)
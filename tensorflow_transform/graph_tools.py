@@ -780,3 +780,134 @@ def get_dependent_inputs(graph, input_tensors, output_tensors):
       for name, tensor in six.iteritems(input_tensors)
       if name in dependent_inputs
   }
+
+
+# Collections whose values cannot be copied to a pruned graph.
+_UNPRUNABLE_COLLECTIONS = [
+    tf.compat.v1.GraphKeys.GLOBAL_VARIABLES,
+    tf.compat.v1.GraphKeys.LOCAL_VARIABLES,
+    tf.compat.v1.GraphKeys.COND_CONTEXT,
+    tf.compat.v1.GraphKeys.WHILE_CONTEXT,
+    tf.compat.v1.GraphKeys.QUEUE_RUNNERS,
+    tf.compat.v1.GraphKeys.SAVEABLE_OBJECTS,
+]
+
+
+def _as_operation(tensor_or_op):
+  if isinstance(tensor_or_op, tf.Operation):
+    return tensor_or_op
+  return tensor_or_op.op
+
+
+def _get_required_op_names(graph, sinks, table_initializers):
+  """Returns the names of the ops needed to run `sinks`.
+
+  Besides the inputs and control inputs of each op, this includes the ops an op
+  is colocated with, and the initializers of the tables that are used.
+
+  Args:
+    graph: A `tf.Graph`.
+    sinks: An iterable of `tf.Operation`s.
+    table_initializers: A list of table initializer ops and tensors.
+
+  Returns:
+    A set of op names.
+  """
+  required_op_names = set()
+  ops_to_visit = list(sinks)
+  remaining_initializers = list(table_initializers)
+  while ops_to_visit:
+    while ops_to_visit:
+      op = ops_to_visit.pop()
+      if op.name in required_op_names:
+        continue
+      required_op_names.add(op.name)
+      ops_to_visit.extend(tensor.op for tensor in op.inputs)
+      ops_to_visit.extend(op.control_inputs)
+      for colocation_group in op.colocation_groups():
+        ops_to_visit.append(graph.get_operation_by_name(
+            tf.compat.as_str(colocation_group[len(b'loc:@'):])))
+    # A table initializer is needed once the table it initializes is.  When the
+    # table cannot be determined, e.g. for a `StatefulPartitionedCall`, the
+    # initializer is always kept.
+    initializers = remaining_initializers
+    remaining_initializers = []
+    for initializer in initializers:
+      initializer_op = _as_operation(initializer)
+      table_ops = [tensor.op for tensor in initializer_op.inputs
+                   if tensor.dtype == tf.resource]
+      if not table_ops or any(
+          table_op.name in required_op_names for table_op in table_ops):
+        ops_to_visit.append(initializer_op)
+      else:
+        remaining_initializers.append(initializer)
+  return required_op_names
+
+
+def prune_graph(graph, input_signature, output_signature, table_initializers):
+  """Returns a copy of `graph` with only the ops needed for `output_signature`.
+
+  The copy contains the ops that the outputs depend on, the inputs, and the
+  table initializers of the tables that these ops use.  The values of the
+  collections of `graph` are copied, except for the ops and tensors that were
+  pruned.
+
+  Args:
+    graph: A `tf.Graph`.
+    input_signature: A dict of logical name to `tf.Tensor`, `tf.SparseTensor`,
+      or `tf.RaggedTensor` in `graph`.
+    output_signature: A dict of logical name to `tf.Tensor`, `tf.SparseTensor`,
+      or `tf.RaggedTensor` in `graph`.
+    table_initializers: A list of table initializer ops and tensors in `graph`.
+
+  Returns:
+    A tuple of the pruned graph, and of `input_signature`, `output_signature`
+    and the needed `table_initializers` with their tensors and ops in the pruned
+    graph, or `None` if `graph` has variables or TF1 control flow, that cannot
+    be pruned.
+  """
+  if any(graph.get_collection(key) for key in _UNPRUNABLE_COLLECTIONS):
+    return None
+
+  sinks = [
+      _as_operation(component)
+      for value in itertools.chain(
+          six.itervalues(input_signature), six.itervalues(output_signature))
+      for component in _decompose_tensor_or_op(value)
+  ]
+  required_op_names = _get_required_op_names(graph, sinks, table_initializers)
+
+  graph_def = graph.as_graph_def()
+  pruned_graph_def = tf.compat.v1.GraphDef()
+  pruned_graph_def.versions.CopyFrom(graph_def.versions)
+  pruned_graph_def.library.CopyFrom(graph_def.library)
+  pruned_graph_def.node.extend(
+      node for node in graph_def.node if node.name in required_op_names)
+
+  with tf.compat.v1.Graph().as_default() as pruned_graph:
+    tf.import_graph_def(pruned_graph_def, name='')
+
+  def is_required(value):
+    return _as_operation(value).name in required_op_names
+
+  def to_pruned_graph(value):
+    return tf.nest.map_structure(
+        lambda t: pruned_graph.as_graph_element(t.name),
+        value,
+        expand_composites=True)
+
+  for key in graph.get_all_collection_keys():
+    for value in graph.get_collection(key):
+      if isinstance(value, (tf.Tensor, tf.Operation)):
+        if is_required(value):
+          pruned_graph.add_to_collection(key, to_pruned_graph(value))
+      else:
+        pruned_graph.add_to_collection(key, value)
+
+  return (pruned_graph,
+          {key: to_pruned_graph(value)
+           for key, value in six.iteritems(input_signature)},
+          {key: to_pruned_graph(value)
+           for key, value in six.iteritems(output_signature)},
+          [to_pruned_graph(initializer)
+           for initializer in table_initializers if is_required(initializer)])
@@ -741,6 +741,41 @@ class GraphToolsTest(test_case.TransformTestCase):
     for input_name in expected_dependent_inputs:
       self.assertIs(tensors[input_name], got[input_name])
 
+  def testPruneGraph(self):
+    with tf.compat.v1.Graph().as_default() as graph:
+      x = tf.compat.v1.placeholder(tf.string, (None,))
+      table1 = _create_lookup_table_from_file(tf.constant('vocab1'))
+      filename2 = tf.compat.v1.placeholder(tf.string, ())
+      table2 = _create_lookup_table_from_file(filename2)
+      y1 = table1.lookup(x)
+      y2 = table2.lookup(x)
+      table_initializers = graph.get_collection(
+          tf.compat.v1.GraphKeys.TABLE_INITIALIZERS)
+
+    (pruned_graph, input_signature, output_signature,
+     pruned_table_initializers) = graph_tools.prune_graph(
+         graph, {'x': x}, {'y1': y1}, table_initializers)
+
+    pruned_op_names = {op.name for op in pruned_graph.get_operations()}
+    self.assertIn(y1.op.name, pruned_op_names)
+    self.assertNotIn(y2.op.name, pruned_op_names)
+    self.assertNotIn(filename2.op.name, pruned_op_names)
+    self.assertIs(pruned_graph, input_signature['x'].graph)
+    self.assertEqual(x.name, input_signature['x'].name)
+    self.assertIs(pruned_graph, output_signature['y1'].graph)
+    self.assertEqual(y1.name, output_signature['y1'].name)
+    self.assertEqual([table_initializers[0].name],
+                     [op.name for op in pruned_table_initializers])
+    self.assertEqual(
+        pruned_table_initializers,
+        pruned_graph.get_collection(tf.compat.v1.GraphKeys.TABLE_INITIALIZERS))
+
+  def testPruneGraphWithVariables(self):
+    with tf.compat.v1.Graph().as_default() as graph:
+      x = tf.compat.v1.placeholder(tf.int64, (None,))
+      y = x + tf.compat.v1.Variable(1, dtype=tf.int64)
+    self.assertIsNone(graph_tools.prune_graph(graph, {'x': x}, {'y': y}, []))
+
 
 class GraphToolsTestUniquePath(test_case.TransformTestCase):
 
@@ -18,9 +18,14 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
 import copy
+import functools
+import hashlib
 import itertools
 import re
+import threading
+import time
 
 # GOOGLE-INITIALIZATION
 
@@ -42,6 +47,19 @@ _CACHED_EMPTY_ARRAY_BY_DTYPE = {}
 _VALID_SCOPE_REGEX = re.compile('^[A-Za-z0-9]*$')
 _INVALID_SCOPE_CHAR = re.compile('[^A-Za-z0-9_.\\-/>]')
 
+# Names of the counts that `get_or_trace` adds to its `trace_stats`.
+TRACE_COUNTER_NAME = 'preprocessing_fn_traces'
+TRACE_CACHE_HIT_COUNTER_NAME = 'preprocessing_fn_trace_cache_hits'
+TRACE_MSECS_COUNTER_NAME = 'preprocessing_fn_trace_msecs'
+
+# The maximum number of traces kept by `get_or_trace`.
+_TRACE_CACHE_SIZE = 8
+
+# The traces made by `get_or_trace`, by their key, least recently used first.
+# Each value is a tuple of the traced `preprocessing_fn` and the trace.
+_TRACE_CACHE = collections.OrderedDict()
+_TRACE_CACHE_LOCK = threading.Lock()
+
 
 def _get_empty_array(dtype):
   if dtype not in _CACHED_EMPTY_ARRAY_BY_DTYPE:
@@ -443,6 +461,140 @@ def _copy_tensor_or_composite_tensor(tensor):
   return _copy_tensor(tensor)
 
 
+def _make_hashable(value):
+  """Returns `value` with lists, tuples and dicts replaced by hashable tuples."""
+  if isinstance(value, (list, tuple)):
+    # The type distinguishes e.g. `tf.io.FixedLenFeature`s from
+    # `tf.io.VarLenFeature`s with the same fields.
+    return (type(value),) + tuple(_make_hashable(v) for v in value)
+  if isinstance(value, dict):
+    return (type(value),) + tuple(
+        (k, _make_hashable(v)) for k, v in sorted(six.iteritems(value)))
+  return value
+
+
+def _make_preprocessing_fn_key(preprocessing_fn):
+  """Returns a key of `preprocessing_fn` that changes with what it captures.
+
+  Besides the identity of `preprocessing_fn`, the key contains its code, the
+  default values of its arguments and the values of the variables that it
+  closes over, so that rebinding one of these is not hidden by a cached trace.
+
+  Args:
+    preprocessing_fn: The user defined python function, or a
+      `functools.partial` of one.
+
+  Returns:
+    A hashable key.
+
+  Raises:
+    TypeError: If a captured value is not hashable.
+    ValueError: If a variable that `preprocessing_fn` closes over is unbound.
+  """
+  if isinstance(preprocessing_fn, functools.partial):
+    return (_make_preprocessing_fn_key(preprocessing_fn.func),
+            _make_hashable(preprocessing_fn.args),
+            _make_hashable(preprocessing_fn.keywords or {}))
+  closure = getattr(preprocessing_fn, '__closure__', None) or ()
+  key = (id(preprocessing_fn), getattr(preprocessing_fn, '__code__', None),
+         _make_hashable(getattr(preprocessing_fn, '__defaults__', None)),
+         _make_hashable([cell.cell_contents for cell in closure]))
+  hash(key)
+  return key
+
+
+def _digest_tensor_replacement_map(tensor_replacement_map):
+  """Returns a digest of the names and values of the replacement tensors."""
+  if tensor_replacement_map is None:
+    return None
+  digest = hashlib.sha1()
+  for name in sorted(tensor_replacement_map):
+    value = tf.get_static_value(tensor_replacement_map[name])
+    if value is None:
+      raise ValueError('Replacement of {} is not a constant'.format(name))
+    digest.update(tf.compat.as_bytes(name))
+    digest.update(tf.make_tensor_proto(value).SerializeToString())
+  return digest.hexdigest()
+
+
+def _make_trace_cache_key(preprocessing_fn, input_specs,
+                          tensor_replacement_map, extra_key):
+  """Returns the key of a trace, or `None` if it cannot be cached."""
+  try:
+    key = (_make_preprocessing_fn_key(preprocessing_fn),
+           _make_hashable(sorted(six.iteritems(input_specs))),
+           _digest_tensor_replacement_map(tensor_replacement_map),
+           _make_hashable(extra_key))
+    hash(key)
+  except (TypeError, ValueError):
+    return None
+  return key
+
+
+def get_or_trace(trace_fn,
+                 preprocessing_fn,
+                 input_specs,
+                 tensor_replacement_map,
+                 extra_key,
+                 trace_stats=None,
+                 use_cache=False):
+  """Returns the result of `trace_fn`, reusing the result of an earlier trace.
+
+  Traces are only cached and reused if `use_cache` is `True`.  A trace is
+  reused when it is of the same `preprocessing_fn` object whose code, default
+  argument values and closed over values are unchanged, with the same input
+  specs, replacement tensors with the same names and values, and the same
+  `extra_key`.  This assumes that tracing `preprocessing_fn` doesn't depend on
+  global state, e.g. values of module attributes that it reads.  The least
+  recently used traces are evicted once more than `_TRACE_CACHE_SIZE` traces
+  are cached.
+
+  Args:
+    trace_fn: A function without arguments that traces `preprocessing_fn`.
+    preprocessing_fn: The user defined python function that `trace_fn` traces.
+    input_specs: A dictionary from input feature name to its FeatureSpec or
+      TypeSpec.
+    tensor_replacement_map: A map from placeholder tensor names to their
+      evaluated replacement tensors, or `None`.
+    extra_key: A tuple of any other values that the result of `trace_fn`
+      depends on, e.g. what it traces and its temp dir.
+    trace_stats: (Optional) A `collections.Counter` that the number of traces,
+      of cache hits and the milliseconds spent tracing are added to.
+    use_cache: (Optional) Whether the result of `trace_fn` is cached and
+      reused.  Must be `False` when the caller modifies the result.  Defaults
+      to `False`.
+
+  Returns:
+    The result of `trace_fn`.
+  """
+  if trace_stats is None:
+    trace_stats = collections.Counter()
+  key = None
+  if use_cache:
+    key = _make_trace_cache_key(preprocessing_fn, input_specs,
+                                tensor_replacement_map, extra_key)
+  if key is not None:
+    with _TRACE_CACHE_LOCK:
+      cached = _TRACE_CACHE.get(key)
+      if cached is not None and cached[0] is preprocessing_fn:
+        _TRACE_CACHE.move_to_end(key)
+        trace_stats[TRACE_CACHE_HIT_COUNTER_NAME] += 1
+        return cached[1]
+
+  start = time.time()
+  result = trace_fn()
+  trace_stats[TRACE_COUNTER_NAME] += 1
+  trace_stats[TRACE_MSECS_COUNTER_NAME] += int((time.time() - start) * 1000)
+
+  if key is not None:
+    with _TRACE_CACHE_LOCK:
+      _TRACE_CACHE[key] = (preprocessing_fn, result)
+      _TRACE_CACHE.move_to_end(key)
+      while len(_TRACE_CACHE) > _TRACE_CACHE_SIZE:
+        _TRACE_CACHE.popitem(last=False)
+  return result
+
+
 # TODO(b/149997088): Split into two APIs one that will just trace the
 # `preprocessing_fn` using tf.function as is and another that will return
 # specific outputs requested for.
@@ -541,9 +693,14 @@ def _trace_preprocessing_fn_v2(preprocessing_fn, specs, base_temp_dir):
 def trace_preprocessing_function(preprocessing_fn,
                                  input_specs,
                                  use_tf_compat_v1,
-                                 base_temp_dir=None):
+                                 base_temp_dir=None,
+                                 trace_stats=None,
+                                 use_trace_cache=False):
   """Trace graph for `preprocessing_fn`.
 
+  If `use_trace_cache` is `True`, the graph of an earlier trace with the same
+  arguments is reused, see `get_or_trace`.
+
   Args:
     preprocessing_fn: A user defined python function to be traced.
     input_specs: A dictionary from input feature name to its FeatureSpec or
@@ -553,6 +710,11 @@ def trace_preprocessing_function(preprocessing_fn,
       a TF 1.x graph. Else, it is traced using tf.function.
     base_temp_dir: (Optional) Base path to write any dummy assets to during
       tracing. Required when `use_tf_compat_v1` is `False`.
+    trace_stats: (Optional) A `collections.Counter` that the number of traces,
+      of cache hits and the milliseconds spent tracing are added to.
+    use_trace_cache: (Optional) If `True`, the graph of an earlier trace is
+      reused, and the graph is reused by later calls.  Ops must not be added to
+      a graph that is reused.  Defaults to `False`.
 
   Returns:
     A tuple of:
@@ -563,8 +725,26 @@ def trace_preprocessing_function(preprocessing_fn,
 
   """
   if use_tf_compat_v1:
-    return _trace_preprocessing_fn_v1(preprocessing_fn, input_specs)
+    trace_fn = functools.partial(_trace_preprocessing_fn_v1, preprocessing_fn,
+                                 input_specs)
+    extra_key = ('preprocessing_fn_v1',)
   else:
     assert base_temp_dir
-    return _trace_preprocessing_fn_v2(preprocessing_fn, input_specs,
-                                      base_temp_dir)
+    trace_fn = functools.partial(_trace_preprocessing_fn_v2, preprocessing_fn,
+                                 input_specs, base_temp_dir)
+    extra_key = ('preprocessing_fn_v2', base_temp_dir)
+
+  def trace_with_tensor_sinks():
+    graph, structured_inputs, structured_outputs = trace_fn()
+    return (graph, structured_inputs, structured_outputs,
+            graph.get_collection(analyzer_nodes.TENSOR_REPLACEMENTS))
+
+  graph, structured_inputs, structured_outputs, tensor_sinks = get_or_trace(
+      trace_with_tensor_sinks, preprocessing_fn, input_specs, None, extra_key,
+      trace_stats, use_trace_cache)
+  # Analyzing a graph clears its `TENSOR_REPLACEMENTS` collection, so it is
+  # restored for each use of the graph.
+  graph.clear_collection(analyzer_nodes.TENSOR_REPLACEMENTS)
+  for tensor_sink in tensor_sinks:
+    graph.add_to_collection(analyzer_nodes.TENSOR_REPLACEMENTS, tensor_sink)
+  return graph, copy.copy(structured_inputs), copy.copy(structured_outputs)
@@ -17,6 +17,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
 import copy
 
 # GOOGLE-INITIALIZATION
@@ -24,6 +25,8 @@ import copy
 import numpy as np
 import six
 import tensorflow as tf
+import tensorflow_transform as tft
+from tensorflow_transform import analyzer_nodes
 from tensorflow_transform import impl_helper
 from tensorflow_transform import test_case
 from tensorflow_transform.tf_metadata import schema_utils
@@ -563,6 +566,105 @@ class ImplHelperTest(test_case.TransformTestCase):
         self.assertAllEqual(sample_tensors['ragged'].row_splits,
                             ragged_value.row_splits)
 
+  @test_case.named_parameters(
+      dict(testcase_name='_tf_compat_v1', use_tf_compat_v1=True),
+      dict(testcase_name='_tf2', use_tf_compat_v1=False))
+  def test_trace_preprocessing_function_reuses_trace(self, use_tf_compat_v1):
+    if not use_tf_compat_v1:
+      test_case.skip_if_not_tf2('Tensorflow 2.x required')
+    num_calls = []
+
+    def preprocessing_fn(inputs):
+      num_calls.append(None)
+      return {'x_scaled': tft.scale_to_0_1(inputs['x'])}
+
+    specs = {'x': tf.TensorSpec([None], tf.float32)}
+    base_temp_dir = self.get_temp_dir()
+    trace_stats = collections.Counter()
+    graph, _, _ = impl_helper.trace_preprocessing_function(
+        preprocessing_fn,
+        specs,
+        use_tf_compat_v1,
+        base_temp_dir,
+        trace_stats,
+        use_trace_cache=True)
+    tensor_sinks = graph.get_collection(analyzer_nodes.TENSOR_REPLACEMENTS)
+    self.assertNotEmpty(tensor_sinks)
+    graph.clear_collection(analyzer_nodes.TENSOR_REPLACEMENTS)
+
+    reused_graph, _, _ = impl_helper.trace_preprocessing_function(
+        preprocessing_fn,
+        specs,
+        use_tf_compat_v1,
+        base_temp_dir,
+        trace_stats,
+        use_trace_cache=True)
+    self.assertIs(graph, reused_graph)
+    self.assertEqual(
+        tensor_sinks,
+        reused_graph.get_collection(analyzer_nodes.TENSOR_REPLACEMENTS))
+    self.assertLen(num_calls, 1)
+    self.assertEqual(1, trace_stats[impl_helper.TRACE_COUNTER_NAME])
+    self.assertEqual(1, trace_stats[impl_helper.TRACE_CACHE_HIT_COUNTER_NAME])
+
+    new_graph, _, _ = impl_helper.trace_preprocessing_function(
+        preprocessing_fn, specs, use_tf_compat_v1, base_temp_dir, trace_stats)
+    self.assertIsNot(graph, new_graph)
+    self.assertLen(num_calls, 2)
+    self.assertEqual(2, trace_stats[impl_helper.TRACE_COUNTER_NAME])
+
+  def test_get_or_trace_with_tensor_replacement_map(self):
+    test_case.skip_if_not_tf2('Tensorflow 2.x required')
+    preprocessing_fn = lambda inputs: inputs
+    specs = {'x': tf.TensorSpec([None], tf.float32)}
+    traces = []
+
+    def trace_fn():
+      traces.append(None)
+      return len(traces)
+
+    def get_or_trace(tensor_replacement_map):
+      return impl_helper.get_or_trace(
+          trace_fn,
+          preprocessing_fn,
+          specs,
+          tensor_replacement_map, ('test',),
+          use_cache=True)
+
+    self.assertEqual(1, get_or_trace({'a:0': tf.constant([1, 2])}))
+    self.assertEqual(1, get_or_trace({'a:0': tf.constant([1, 2])}))
+    self.assertEqual(2, get_or_trace({'a:0': tf.constant([1, 3])}))
+    self.assertEqual(3, get_or_trace({'b:0': tf.constant([1, 3])}))
+    self.assertEqual(4, get_or_trace(None))
+
+  def test_get_or_trace_with_changed_captured_values(self):
+    specs = {'x': tf.io.FixedLenFeature([], tf.float32)}
+    traces = []
+
+    def trace_fn():
+      traces.append(None)
+      return len(traces)
+
+    def get_or_trace(preprocessing_fn):
+      return impl_helper.get_or_trace(
+          trace_fn, preprocessing_fn, specs, None, ('test',), use_cache=True)
+
+    scale = 2.
+
+    def preprocessing_fn(inputs):
+      return {'x_scaled': inputs['x'] * scale}
+
+    self.assertEqual(1, get_or_trace(preprocessing_fn))
+    self.assertEqual(1, get_or_trace(preprocessing_fn))
+    scale = 3.
+    self.assertEqual(2, get_or_trace(preprocessing_fn))
+
+    # Functions that capture unhashable values are not cached.
+    features = {'x'}
+    features_fn = lambda inputs: {k: inputs[k] for k in features}
+    self.assertEqual(3, get_or_trace(features_fn))
+    self.assertEqual(4, get_or_trace(features_fn))
+
 
 def _subtract_ten_with_tf_while(x):
   """Subtracts 10 from x using control flow ops.
@@ -18,7 +18,6 @@ from __future__ import division
 from __future__ import print_function
 
 # GOOGLE-INITIALIZATION
-import tensorflow as tf
 from tensorflow_transform import analyzer_nodes
 from tensorflow_transform import graph_tools
 from tensorflow_transform import impl_helper
@@ -51,20 +50,16 @@ def get_analyze_input_columns(preprocessing_fn, specs):
   Returns:
     A list of columns that are required inputs of analyzers.
   """
+  graph, input_signature, _ = impl_helper.trace_preprocessing_function(
+      preprocessing_fn, specs, use_tf_compat_v1=True)
+  tensor_sinks = graph.get_collection(analyzer_nodes.TENSOR_REPLACEMENTS)
+  visitor = _SourcedTensorsVisitor()
+  for tensor_sink in tensor_sinks:
+    nodes.Traverser(visitor).visit_value_node(tensor_sink.future)
 
-  with tf.compat.v1.Graph().as_default() as graph:
-    input_signature = impl_helper.batched_placeholders_from_specs(
-        specs)
-    _ = preprocessing_fn(input_signature.copy())
-
-    tensor_sinks = graph.get_collection(analyzer_nodes.TENSOR_REPLACEMENTS)
-    visitor = _SourcedTensorsVisitor()
-    for tensor_sink in tensor_sinks:
-      nodes.Traverser(visitor).visit_value_node(tensor_sink.future)
-
-    analyze_input_tensors = graph_tools.get_dependent_inputs(
-        graph, input_signature, visitor.sourced_tensors)
-    return list(analyze_input_tensors.keys())
+  analyze_input_tensors = graph_tools.get_dependent_inputs(
+      graph, input_signature, visitor.sourced_tensors)
+  return list(analyze_input_tensors.keys())
 
 
 def get_transform_input_columns(preprocessing_fn, specs):
@@ -78,10 +73,9 @@ def get_transform_input_columns(preprocessing_fn, specs):
     A list of columns that are required inputs of the transform `tf.Graph`
     defined by `preprocessing_fn`.
   """
-  with tf.compat.v1.Graph().as_default() as graph:
-    input_signature = impl_helper.batched_placeholders_from_specs(
-        specs)
-    output_signature = preprocessing_fn(input_signature.copy())
-    transform_input_tensors = graph_tools.get_dependent_inputs(
-        graph, input_signature, output_signature)
-    return list(transform_input_tensors.keys())
+  graph, input_signature, output_signature = (
+      impl_helper.trace_preprocessing_function(
+          preprocessing_fn, specs, use_tf_compat_v1=True))
+  transform_input_tensors = graph_tools.get_dependent_inputs(
+      graph, input_signature, output_signature)
+  return list(transform_input_tensors.keys())
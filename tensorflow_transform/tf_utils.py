@@ -637,6 +637,69 @@ def reduce_batch_count_mean_and_var(x, reduce_instance_dims):
   return (x_count, x_mean, x_variance)
 
 
+def _num_terms(num_samples, dtype):
+  """Computes the number of samples, pairs, triplets and quadruplets.
+
+  Args:
+    num_samples: An integral type `Tensor` containing numbers of samples. This
+    must be non-negative.
+    dtype: The dtype of the output `Tensor`s.
+
+  Returns:
+    The tuple (samples, pairs, triplets, quadruplets) of `Tensor`s with the
+    same shape as num_samples and the given dtype.
+  """
+  samples = tf.cast(num_samples, dtype=dtype)
+  pairs = tf.cast(samples * (samples - 1.0) / 2.0, dtype=dtype)
+  triplets = tf.cast(pairs * (samples - 2.0) / 3.0, dtype=dtype)
+  quadruplets = tf.cast(triplets * (samples - 3.0) / 4.0, dtype=dtype)
+  return samples, pairs, triplets, quadruplets
+
+
+def _l_moments_factors(rank, samples, pairs, triplets, quadruplets):
+  """Computes the factors to apply to sorted samples to compute L-moments.
+
+  All arguments must have the same floating point dtype and broadcast together.
+
+  Args:
+    rank: A `Tensor` of the 0-based positions of samples in ascending order.
+    samples: A `Tensor` of the number of samples that `rank` refers to.
+    pairs: A `Tensor` of the number of pairs of these samples.
+    triplets: A `Tensor` of the number of triplets of these samples.
+    quadruplets: A `Tensor` of the number of quadruplets of these samples.
+
+  Returns:
+    The tuple (l1_factors, l2_factors, l3_factors, l4_factors) of `Tensor`s with
+    the broadcast shape of the arguments.
+  """
+  dtype = rank.dtype
+  one = tf.constant(1, dtype)
+  term_up = rank
+  term_up_delay_1 = rank - 1.0
+  term_up_delay_2 = rank - 2.0
+  term_down = samples - 1.0 - rank
+  term_down_delay_1 = samples - 2.0 - rank
+  term_down_delay_2 = samples - 3.0 - rank
+
+  l1_denominator = tf.where(tf.math.greater(samples, 0.0), samples, one)
+  l1_factors = tf.ones_like(rank) / l1_denominator
+  l2_denominator = tf.where(
+      tf.math.greater(samples, 1.0), pairs * 2.0, one)
+  l2_factors = (term_up - term_down) / l2_denominator
+  l3_denominator = tf.where(
+      tf.math.greater(samples, 2.0), triplets * 6.0, one)
+  l3_factors = ((term_up * term_up_delay_1 - 4.0 * term_up * term_down +
+                 term_down * term_down_delay_1) / l3_denominator)
+  l4_denominator = tf.where(
+      tf.math.greater(samples, 3.0), quadruplets * 24.0, one)
+  l4_factors = ((term_up * term_up_delay_1 * term_up_delay_2 -
+                 9.0 * term_up * term_up_delay_1 * term_down +
+                 9.0 * term_up * term_down * term_down_delay_1 -
+                 term_down * term_down_delay_1 * term_down_delay_2) /
+                l4_denominator)
+  return l1_factors, l2_factors, l3_factors, l4_factors
+
+
 def _num_terms_and_factors(num_samples, dtype):
   """Computes counts and sample multipliers for the given number of samples.
 
@@ -652,136 +715,27 @@ def _num_terms_and_factors(num_samples, dtype):
     Entries are `Tensor`s with the given dtype containing counters for each
     moment and the factors to use to compute the moments.
   """
-  has_pairs = tf.math.greater(num_samples, 1)
-  has_triplets = tf.math.greater(num_samples, 2)
-  has_quadruplets = tf.math.greater(num_samples, 3)
-
-  current_samples = tf.cast(num_samples, dtype=dtype)
-  current_pairs = tf.cast(
-      current_samples * (current_samples - 1.0) / 2.0, dtype=dtype)
-  current_triplets = tf.cast(
-      current_pairs * (current_samples - 2.0) / 3.0, dtype=dtype)
-  current_quadruplets = tf.cast(
-      current_triplets * (current_samples - 3.0) / 4.0, dtype=dtype)
-
-  term_up = tf.range(0, current_samples, 1, dtype=dtype)
-  term_up_delay_1 = tf.range(-1, current_samples - 1, 1, dtype=dtype)
-  term_up_delay_2 = tf.range(-2, current_samples - 2, 1, dtype=dtype)
-  term_down = tf.range(current_samples - 1, -1, -1, dtype=dtype)
-  term_down_delay_1 = tf.range(current_samples - 2, -2, -1, dtype=dtype)
-  term_down_delay_2 = tf.range(current_samples - 3, -3, -1, dtype=dtype)
-
-  l1_denominator = tf.cond(tf.math.greater(num_samples, 0),
-                           lambda: current_samples,
-                           lambda: tf.constant(1, dtype))
-  l1_factors = tf.ones([num_samples], dtype=dtype) / l1_denominator
-  l2_denominator = tf.cond(has_pairs,
-                           lambda: tf.cast(current_pairs * 2.0, dtype=dtype),
-                           lambda: tf.constant(1, dtype))
-  l2_factors = (term_up - term_down) / l2_denominator
-  l3_denominator = tf.cond(has_triplets,
-                           lambda: tf.cast(current_triplets * 6, dtype=dtype),
-                           lambda: tf.constant(1, dtype))
-  l3_factors = ((term_up * term_up_delay_1 - 4.0 * term_up * term_down +
-                 term_down * term_down_delay_1) / l3_denominator)
-  l4_denominator = tf.cond(
-      has_quadruplets,
-      lambda: tf.cast(current_quadruplets * 24, dtype=dtype),
-      lambda: tf.constant(1, dtype))
-  l4_factors = ((term_up * term_up_delay_1 * term_up_delay_2 -
-                 9.0 * term_up * term_up_delay_1 * term_down +
-                 9.0 * term_up * term_down * term_down_delay_1 -
-                 term_down * term_down_delay_1 * term_down_delay_2) /
-                l4_denominator)
-  return (current_samples, current_pairs, current_triplets, current_quadruplets,
-          l1_factors, l2_factors, l3_factors, l4_factors)
-
-
-@tf.function
-def _condition_l_moments_sparse(
-    current_index, unused_l1_sum, unused_l2_sum, unused_l3_sum, unused_l4_sum,
-    unused_count_samples, unused_count_pairs, unused_count_triplets,
-    unused_count_quadruplets, x_rank_2):
-  """Condition for the loop that computes L-moments for a `SparseTensor`."""
-  return tf.less(current_index, x_rank_2.dense_shape[1])
-
-
-@tf.function
-def _iteration_l_moments_sparse(
-    current_index, l1_sum, l2_sum, l3_sum, l4_sum, count_samples,
-    count_pairs, count_triplets, count_quadruplets, x_rank_2):
-  """Process one column of a `SparseTensor` and updates L-moments variables."""
-  current_x = tf.boolean_mask(
-      x_rank_2.values,
-      tf.math.equal(x_rank_2.indices[:, 1], [current_index]))
-  sorted_x = tf.sort(current_x, axis=0)
-  num_samples = tf.shape(current_x)[0]
-  (current_samples, current_pairs, current_triplets, current_quadruplets,
-   l1_factors, l2_factors, l3_factors,
-   l4_factors) = _num_terms_and_factors(num_samples, x_rank_2.values.dtype)
-
-  dim_1 = x_rank_2.dense_shape[1]
-  new_l1_sum = l1_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l1_factors), axis=0)], [dim_1])
-  new_l2_sum = l2_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l2_factors), axis=0)], [dim_1])
-  new_l3_sum = l3_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l3_factors), axis=0)], [dim_1])
-  new_l4_sum = l4_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l4_factors), axis=0)], [dim_1])
-
-  new_count_samples = count_samples + tf.scatter_nd(
-      [[current_index]], [current_samples], [dim_1])
-  new_count_pairs = count_pairs + tf.scatter_nd(
-      [[current_index]], [current_pairs], [dim_1])
-  new_count_triplets = count_triplets + tf.scatter_nd(
-      [[current_index]], [current_triplets], [dim_1])
-  new_count_quadruplets = count_quadruplets + tf.scatter_nd(
-      [[current_index]], [current_quadruplets], [dim_1])
-
-  return (tf.add(current_index, 1),
-          new_l1_sum, new_l2_sum, new_l3_sum, new_l4_sum,
-          new_count_samples, new_count_pairs, new_count_triplets,
-          new_count_quadruplets, x_rank_2)
-
-
-@tf.function
-def _condition_l_moments_dense(
-    current_index, unused_l1_sum, unused_l2_sum, unused_l3_sum, unused_l4_sum,
-    unused_l1_factors, unused_l2_factors, unused_l3_factors, unused_l4_factors,
-    x_rank_2):
-  """Condition for the loop that computes L-moments for a `Tensor`."""
-  return tf.less(current_index, tf.shape(x_rank_2)[1])
-
-
-@tf.function
-def _iteration_l_moments_dense(
-    current_index, l1_sum, l2_sum, l3_sum, l4_sum, l1_factors, l2_factors,
-    l3_factors, l4_factors, x_rank_2):
-  """Process one column of a `Tensor` and updates L-moments variables."""
-  current_x = x_rank_2[:, current_index]
-  sorted_x = tf.sort(current_x)
-
-  dim_1 = tf.shape(x_rank_2)[1]
-  new_l1_sum = l1_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l1_factors), axis=0)], [dim_1])
-  new_l2_sum = l2_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l2_factors), axis=0)], [dim_1])
-  new_l3_sum = l3_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l3_factors), axis=0)], [dim_1])
-  new_l4_sum = l4_sum + tf.scatter_nd(
-      [[current_index]],
-      [tf.reduce_sum(tf.multiply(sorted_x, l4_factors), axis=0)], [dim_1])
-  return (tf.add(current_index, 1),
-          new_l1_sum, new_l2_sum, new_l3_sum, new_l4_sum, l1_factors,
-          l2_factors, l3_factors, l4_factors, x_rank_2)
+  counts = _num_terms(num_samples, dtype)
+  rank = tf.range(0, counts[0], 1, dtype=dtype)
+  return counts + _l_moments_factors(rank, *counts)
+
+
+def _sort_by_segment_and_value(values, segment_ids):
+  """Sorts values by their segment, and by value within each segment.
+
+  Args:
+    values: A 1-D `Tensor`.
+    segment_ids: A 1-D integral `Tensor` of the same size as values.
+
+  Returns:
+    A 2-tuple of `Tensor`s (sorted_values, sorted_segment_ids).
+  """
+  # tf.argsort is stable, so sorting by value and then by segment keeps the
+  # values sorted within each segment.
+  value_order = tf.argsort(values, stable=True)
+  segment_order = tf.argsort(tf.gather(segment_ids, value_order), stable=True)
+  order = tf.gather(value_order, segment_order)
+  return tf.gather(values, order), tf.gather(segment_ids, order)
 
 
 def reduce_batch_count_l_moments(x, reduce_instance_dims):
@@ -790,6 +744,10 @@ def reduce_batch_count_l_moments(x, reduce_instance_dims):
   Computes the first 4 L-moments (https://en.wikipedia.org/wiki/L-moment) and
   the number of samples, pairs, etc. used to compute them.
 
+  The samples of each element are sorted, and each L-moment is computed in a
+  single vectorized reduction as the sum of the sorted samples weighted by
+  factors that only depend on their rank and the number of samples.
+
   Args:
     x: A `Tensor` or `SparseTensor`.
     reduce_instance_dims: A bool, if True - collapses the batch and instance
@@ -806,53 +764,51 @@ def reduce_batch_count_l_moments(x, reduce_instance_dims):
   if isinstance(x, tf.SparseTensor) and reduce_instance_dims:
     x = x.values
 
+  final_shape = (() if reduce_instance_dims else tf.shape(x)[1:])
   if isinstance(x, tf.SparseTensor):
     batch_size = x.dense_shape[0]
     x_rank_2 = tf.sparse.reshape(x, [batch_size, -1])
     dim_1 = x_rank_2.dense_shape[1]
-    initial_values = tf.zeros([dim_1], dtype=x.dtype)
-    (unused_current_index, l1_sum, l2_sum, l3_sum, l4_sum,
-     count_samples, count_pairs, count_triplets,
-     count_quadruplets, unused_x_rank_2) = tf.while_loop(
-         _condition_l_moments_sparse,
-         _iteration_l_moments_sparse,
-         [tf.constant(0, dim_1.dtype)] + [initial_values] * 8 + [x_rank_2])
-    final_shape = (() if reduce_instance_dims else tf.shape(x)[1:])
-    l1 = tf.reshape(l1_sum, final_shape)
-    l2 = tf.reshape(l2_sum, final_shape)
-    l3 = tf.reshape(l3_sum, final_shape)
-    l4 = tf.reshape(l4_sum, final_shape)
-    count_l1 = tf.reshape(count_samples, final_shape)
-    count_l2 = tf.reshape(count_pairs, final_shape)
-    count_l3 = tf.reshape(count_triplets, final_shape)
-    count_l4 = tf.reshape(count_quadruplets, final_shape)
+    sorted_x, columns = _sort_by_segment_and_value(x_rank_2.values,
+                                                   x_rank_2.indices[:, 1])
+    column_samples = tf.math.unsorted_segment_sum(
+        tf.ones_like(columns), columns, dim_1)
+    column_starts = tf.math.cumsum(column_samples, exclusive=True)
+    rank = tf.cast(
+        tf.range(tf.size(columns, out_type=columns.dtype)) -
+        tf.gather(column_starts, columns), x.dtype)
+    counts = _num_terms(column_samples, x.dtype)
+    factors = _l_moments_factors(
+        rank, *[tf.gather(count, columns) for count in counts])
+    moments = [
+        tf.math.unsorted_segment_sum(sorted_x * factor, columns, dim_1)
+        for factor in factors
+    ]
+    counts = [tf.reshape(count, final_shape) for count in counts]
 
   else:
     num_samples = tf.size(x) if reduce_instance_dims else tf.shape(x)[0]
     (count_samples, count_pairs, count_triplets, count_quadruplets,
      l1_factors, l2_factors, l3_factors, l4_factors) = _num_terms_and_factors(
          num_samples, x.dtype)
-    x_rank_2 = tf.reshape(x, [num_samples, -1])
-    dim_1 = tf.shape(x_rank_2)[1]
-    initial_moment_values = tf.zeros([dim_1], dtype=x.dtype)
-    (unused_current_index, l1_sum, l2_sum, l3_sum, l4_sum, unused_l1_factors,
-     unused_l2_factors, unused_l3_factors, unused_l4_factors,
-     unused_x_rank_2) = tf.while_loop(
-         _condition_l_moments_dense,
-         _iteration_l_moments_dense,
-         [tf.constant(0, dim_1.dtype)] + [initial_moment_values] * 4 +
-         [l1_factors, l2_factors, l3_factors, l4_factors, x_rank_2])
-    final_shape = (() if reduce_instance_dims else tf.shape(x)[1:])
-    l1 = tf.reshape(l1_sum, final_shape)
-    l2 = tf.reshape(l2_sum, final_shape)
-    l3 = tf.reshape(l3_sum, final_shape)
-    l4 = tf.reshape(l4_sum, final_shape)
-    count_l1 = tf.fill(final_shape, count_samples)
-    count_l2 = tf.fill(final_shape, count_pairs)
-    count_l3 = tf.fill(final_shape, count_triplets)
-    count_l4 = tf.fill(final_shape, count_quadruplets)
-
-  return  (count_l1, l1, count_l2, l2, count_l3, l3, count_l4, l4)
+    sorted_x = tf.sort(tf.reshape(x, [num_samples, -1]), axis=0)
+    # A single [dim_1, num_samples] x [num_samples, 4] product computes all
+    # four L-moments of all columns.
+    moments = tf.unstack(
+        tf.matmul(
+            sorted_x,
+            tf.stack([l1_factors, l2_factors, l3_factors, l4_factors], axis=1),
+            transpose_a=True),
+        num=4,
+        axis=1)
+    counts = [
+        tf.fill(final_shape, count) for count in
+        (count_samples, count_pairs, count_triplets, count_quadruplets)
+    ]
+
+  l1, l2, l3, l4 = [tf.reshape(moment, final_shape) for moment in moments]
+  count_l1, count_l2, count_l3, count_l4 = counts
+  return (count_l1, l1, count_l2, l2, count_l3, l3, count_l4, l4)
 
 
 def _validate_and_get_dense_value_key_inputs(x, key):
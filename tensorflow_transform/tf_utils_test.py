@@ -40,6 +40,159 @@ if not hasattr(tf, 'SparseTensorSpec'):
   tf.SparseTensorSpec = _SparseTensorSpec
 
 
+@tf.function
+def _condition_l_moments_sparse(
+    current_index, unused_l1_sum, unused_l2_sum, unused_l3_sum, unused_l4_sum,
+    unused_count_samples, unused_count_pairs, unused_count_triplets,
+    unused_count_quadruplets, x_rank_2):
+  """Condition for the loop that computes L-moments for a `SparseTensor`."""
+  return tf.less(current_index, x_rank_2.dense_shape[1])
+
+
+@tf.function
+def _iteration_l_moments_sparse(
+    current_index, l1_sum, l2_sum, l3_sum, l4_sum, count_samples,
+    count_pairs, count_triplets, count_quadruplets, x_rank_2):
+  """Process one column of a `SparseTensor` and updates L-moments variables."""
+  current_x = tf.boolean_mask(
+      x_rank_2.values,
+      tf.math.equal(x_rank_2.indices[:, 1], [current_index]))
+  sorted_x = tf.sort(current_x, axis=0)
+  num_samples = tf.shape(current_x)[0]
+  (current_samples, current_pairs, current_triplets, current_quadruplets,
+   l1_factors, l2_factors, l3_factors,
+   l4_factors) = tf_utils._num_terms_and_factors(num_samples, x_rank_2.values.dtype)
+
+  dim_1 = x_rank_2.dense_shape[1]
+  new_l1_sum = l1_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l1_factors), axis=0)], [dim_1])
+  new_l2_sum = l2_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l2_factors), axis=0)], [dim_1])
+  new_l3_sum = l3_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l3_factors), axis=0)], [dim_1])
+  new_l4_sum = l4_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l4_factors), axis=0)], [dim_1])
+
+  new_count_samples = count_samples + tf.scatter_nd(
+      [[current_index]], [current_samples], [dim_1])
+  new_count_pairs = count_pairs + tf.scatter_nd(
+      [[current_index]], [current_pairs], [dim_1])
+  new_count_triplets = count_triplets + tf.scatter_nd(
+      [[current_index]], [current_triplets], [dim_1])
+  new_count_quadruplets = count_quadruplets + tf.scatter_nd(
+      [[current_index]], [current_quadruplets], [dim_1])
+
+  return (tf.add(current_index, 1),
+          new_l1_sum, new_l2_sum, new_l3_sum, new_l4_sum,
+          new_count_samples, new_count_pairs, new_count_triplets,
+          new_count_quadruplets, x_rank_2)
+
+
+@tf.function
+def _condition_l_moments_dense(
+    current_index, unused_l1_sum, unused_l2_sum, unused_l3_sum, unused_l4_sum,
+    unused_l1_factors, unused_l2_factors, unused_l3_factors, unused_l4_factors,
+    x_rank_2):
+  """Condition for the loop that computes L-moments for a `Tensor`."""
+  return tf.less(current_index, tf.shape(x_rank_2)[1])
+
+
+@tf.function
+def _iteration_l_moments_dense(
+    current_index, l1_sum, l2_sum, l3_sum, l4_sum, l1_factors, l2_factors,
+    l3_factors, l4_factors, x_rank_2):
+  """Process one column of a `Tensor` and updates L-moments variables."""
+  current_x = x_rank_2[:, current_index]
+  sorted_x = tf.sort(current_x)
+
+  dim_1 = tf.shape(x_rank_2)[1]
+  new_l1_sum = l1_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l1_factors), axis=0)], [dim_1])
+  new_l2_sum = l2_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l2_factors), axis=0)], [dim_1])
+  new_l3_sum = l3_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l3_factors), axis=0)], [dim_1])
+  new_l4_sum = l4_sum + tf.scatter_nd(
+      [[current_index]],
+      [tf.reduce_sum(tf.multiply(sorted_x, l4_factors), axis=0)], [dim_1])
+  return (tf.add(current_index, 1),
+          new_l1_sum, new_l2_sum, new_l3_sum, new_l4_sum, l1_factors,
+          l2_factors, l3_factors, l4_factors, x_rank_2)
+
+
+def reduce_batch_count_l_moments_while_loop(x, reduce_instance_dims):
+  """Like reduce_batch_count_l_moments but loops over the columns of x.
+
+  This is the previous implementation of reduce_batch_count_l_moments, which
+  processes one column per `tf.while_loop` iteration. It is the reference that
+  the vectorized implementation is tested and benchmarked against.
+
+  Args:
+    x: A `Tensor` or `SparseTensor`.
+    reduce_instance_dims: See tf_utils.reduce_batch_count_l_moments.
+
+  Returns:
+    See tf_utils.reduce_batch_count_l_moments.
+  """
+  if isinstance(x, tf.SparseTensor) and reduce_instance_dims:
+    x = x.values
+
+  if isinstance(x, tf.SparseTensor):
+    batch_size = x.dense_shape[0]
+    x_rank_2 = tf.sparse.reshape(x, [batch_size, -1])
+    dim_1 = x_rank_2.dense_shape[1]
+    initial_values = tf.zeros([dim_1], dtype=x.dtype)
+    (unused_current_index, l1_sum, l2_sum, l3_sum, l4_sum,
+     count_samples, count_pairs, count_triplets,
+     count_quadruplets, unused_x_rank_2) = tf.while_loop(
+         _condition_l_moments_sparse,
+         _iteration_l_moments_sparse,
+         [tf.constant(0, dim_1.dtype)] + [initial_values] * 8 + [x_rank_2])
+    final_shape = (() if reduce_instance_dims else tf.shape(x)[1:])
+    l1 = tf.reshape(l1_sum, final_shape)
+    l2 = tf.reshape(l2_sum, final_shape)
+    l3 = tf.reshape(l3_sum, final_shape)
+    l4 = tf.reshape(l4_sum, final_shape)
+    count_l1 = tf.reshape(count_samples, final_shape)
+    count_l2 = tf.reshape(count_pairs, final_shape)
+    count_l3 = tf.reshape(count_triplets, final_shape)
+    count_l4 = tf.reshape(count_quadruplets, final_shape)
+
+  else:
+    num_samples = tf.size(x) if reduce_instance_dims else tf.shape(x)[0]
+    (count_samples, count_pairs, count_triplets, count_quadruplets,
+     l1_factors, l2_factors, l3_factors, l4_factors) = tf_utils._num_terms_and_factors(
+         num_samples, x.dtype)
+    x_rank_2 = tf.reshape(x, [num_samples, -1])
+    dim_1 = tf.shape(x_rank_2)[1]
+    initial_moment_values = tf.zeros([dim_1], dtype=x.dtype)
+    (unused_current_index, l1_sum, l2_sum, l3_sum, l4_sum, unused_l1_factors,
+     unused_l2_factors, unused_l3_factors, unused_l4_factors,
+     unused_x_rank_2) = tf.while_loop(
+         _condition_l_moments_dense,
+         _iteration_l_moments_dense,
+         [tf.constant(0, dim_1.dtype)] + [initial_moment_values] * 4 +
+         [l1_factors, l2_factors, l3_factors, l4_factors, x_rank_2])
+    final_shape = (() if reduce_instance_dims else tf.shape(x)[1:])
+    l1 = tf.reshape(l1_sum, final_shape)
+    l2 = tf.reshape(l2_sum, final_shape)
+    l3 = tf.reshape(l3_sum, final_shape)
+    l4 = tf.reshape(l4_sum, final_shape)
+    count_l1 = tf.fill(final_shape, count_samples)
+    count_l2 = tf.fill(final_shape, count_pairs)
+    count_l3 = tf.fill(final_shape, count_triplets)
+    count_l4 = tf.fill(final_shape, count_quadruplets)
+
+  return (count_l1, l1, count_l2, l2, count_l3, l3, count_l4, l4)
+
+
 class TFUtilsTest(test_case.TransformTestCase):
 
   def _assertCompositeRefEqual(self, left, right):
@@ -673,6 +826,44 @@ class TFUtilsTest(test_case.TransformTestCase):
       self.assertEqual(moments[i].dtype, expected_moments[i].dtype)
       self.assertAllClose(moments[i], expected_moments[i], rtol=1e-8)
 
+  @test_case.named_parameters(test_case.cross_with_function_handlers([
+      dict(
+          testcase_name='dense',
+          x=np.random.RandomState(0).lognormal(size=(100, 3, 2)).astype(
+              np.float32),
+          reduce_instance_dims=True,
+          input_signature=[tf.TensorSpec(None, tf.float32)]),
+      dict(
+          testcase_name='dense_elementwise',
+          x=np.random.RandomState(0).lognormal(size=(100, 3, 2)).astype(
+              np.float32),
+          reduce_instance_dims=False,
+          input_signature=[tf.TensorSpec(None, tf.float32)]),
+      dict(
+          testcase_name='sparse_elementwise',
+          x=tf.compat.v1.SparseTensorValue(
+              indices=[[i, i % 7 // 2] for i in range(50)],
+              values=np.random.RandomState(0).lognormal(size=50).astype(
+                  np.float32),
+              dense_shape=[50, 4]),
+          reduce_instance_dims=False,
+          input_signature=[tf.SparseTensorSpec([None, 4], tf.float32)]),
+  ]))
+  def test_reduce_batch_count_l_moments_matches_while_loop(
+      self, x, input_signature, reduce_instance_dims, function_handler):
+
+    @function_handler(input_signature=input_signature)
+    def _reduce_batch_count_l_moments(x):
+      return (tf_utils.reduce_batch_count_l_moments(
+          x, reduce_instance_dims=reduce_instance_dims) +
+              reduce_batch_count_l_moments_while_loop(
+                  x, reduce_instance_dims=reduce_instance_dims))
+
+    results = _reduce_batch_count_l_moments(x)
+    for result, expected_result in zip(results[:8], results[8:]):
+      self.assertEqual(result.dtype, expected_result.dtype)
+      self.assertAllClose(result, expected_result, rtol=1e-5, atol=1e-6)
+
   @test_case.named_parameters(test_case.cross_with_function_handlers([
       dict(
           testcase_name='dense',